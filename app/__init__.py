@@ -3,13 +3,23 @@ from flask import Flask
 from dotenv import load_dotenv
 import os
 
+from app.log import configure_logging
+
 def create_app():
     # Load environment variables first
     load_dotenv()
+    configure_logging()
 
     app = Flask(__name__)
     app.config.from_object('config')
 
+    from app import metrics
+    metrics.init_app(app)
+
+    # Per-clinic rate limits run before any route reads its body or calls Heidi
+    from app import rate_limit
+    rate_limit.init_app(app)
+
     # Import and register blueprints with error handling
     try:
         # Main routes (auth)
@@ -68,6 +78,14 @@ def create_app():
     except ImportError as e:
         print(f"❌ Failed to import document routes: {e}")
 
+    try:
+        # Background job routes
+        from app.routes.jobs import jobs_bp
+        app.register_blueprint(jobs_bp)
+        print("✅ Job routes registered")
+    except ImportError as e:
+        print(f"❌ Failed to import job routes: {e}")
+
     # Add a simple health check route
     @app.route('/health')
     def health_check():
@@ -80,10 +98,17 @@ def create_app():
                 "/test-session",
                 "/debug-api",
                 "/process-document",
-                "/ask-question"
+                "/ask-question",
+                "/ask-questions",
+                "/metrics"
             ]
         }
 
+    # Prometheus scrape endpoint: upstream Heidi calls and per-route timings
+    @app.route('/metrics')
+    def metrics_endpoint():
+        return metrics.render(), 200, {"Content-Type": metrics.CONTENT_TYPE}
+
     # Add environment check route
     @app.route('/env-check')
     def env_check():
@@ -0,0 +1,155 @@
+# app/aio_app.py - aiohttp application for long-running Heidi calls
+import logging
+
+from aiohttp import web
+from dotenv import load_dotenv
+
+from app import metrics, rate_limit
+from app.api.aio.client import close_session
+from app.log import configure_logging
+from app.services import aio_flows
+
+logger = logging.getLogger(__name__)
+
+_TRUTHY = ("1", "true", "yes", "on")
+
+
+def _wants_event_stream(request: web.Request, data) -> bool:
+    flag = request.query.get("stream")
+    if flag is None and hasattr(data, "get"):
+        flag = data.get("stream")
+    if flag is None:
+        return "text/event-stream" in request.headers.get("Accept", "")
+    return flag is True or str(flag).lower() in _TRUTHY
+
+
+async def _read_payload(request: web.Request):
+    if request.content_type == "application/json":
+        try:
+            return await request.json()
+        except ValueError:
+            return None
+    return await request.post()
+
+
+async def _respond(flow_result) -> web.Response:
+    payload, status = await flow_result
+    return web.json_response(payload, status=status)
+
+
+async def _respond_stream(request: web.Request, stream_result) -> web.StreamResponse:
+    events, error = await stream_result
+    if error:
+        payload, status = error
+        return web.json_response(payload, status=status)
+
+    response = web.StreamResponse(
+        headers={
+            "Content-Type": "text/event-stream",
+            "Cache-Control": "no-cache",
+            "X-Accel-Buffering": "no",
+        }
+    )
+    await response.prepare(request)
+    async for event in events:
+        await response.write(event.encode("utf-8"))
+    await response.write_eof()
+    return response
+
+
+@web.middleware
+async def _enforce_rate_limit(request: web.Request, handler):
+    """Per-clinic limits, checked before the handler reads the body or calls Heidi."""
+    limiter = rate_limit.get_rate_limiter()
+    endpoint_class = rate_limit.ROUTE_CLASSES.get(request.path)
+    if limiter is None or endpoint_class is None or request.method != "POST":
+        return await handler(request)
+    cost = 1
+    if request.path == "/ask-questions" and request.content_type == "application/json":
+        try:
+            cost = rate_limit.batch_cost(await request.json())
+        except ValueError:
+            pass
+    decision = await limiter.check_async(
+        rate_limit.tenant_of(request.headers, request.remote), endpoint_class, cost
+    )
+    if not decision.allowed:
+        return web.json_response(
+            rate_limit.rejection(decision, endpoint_class), status=429, headers=decision.headers()
+        )
+    return await handler(request)
+
+
+async def health(request: web.Request) -> web.Response:
+    return web.json_response({"status": "healthy", "message": "Heidi AI async server is running"})
+
+
+async def metrics_endpoint(request: web.Request) -> web.Response:
+    return web.Response(
+        text=metrics.render(), headers={"Content-Type": metrics.CONTENT_TYPE}
+    )
+
+
+async def ask_question(request: web.Request) -> web.StreamResponse:
+    data = await _read_payload(request)
+    if not data:
+        return web.json_response({"error": "No JSON data provided"}, status=400)
+    question, session_id = data.get("question", ""), data.get("session_id")
+    if _wants_event_stream(request, data):
+        return await _respond_stream(
+            request, aio_flows.ask_question_stream_flow(question, session_id)
+        )
+    return await _respond(aio_flows.ask_question_flow(question, session_id))
+
+
+async def ask_questions(request: web.Request) -> web.StreamResponse:
+    data = await _read_payload(request)
+    if not data:
+        return web.json_response({"error": "No JSON data provided"}, status=400)
+    questions, session_id = data.get("questions"), data.get("session_id")
+    if _wants_event_stream(request, data):
+        return await _respond_stream(
+            request, aio_flows.ask_questions_stream_flow(questions, session_id)
+        )
+    return await _respond(aio_flows.ask_questions_flow(questions, session_id))
+
+
+async def process_document(request: web.Request) -> web.StreamResponse:
+    data = await _read_payload(request) or {}
+    document_text = data.get("document_text", "")
+    if _wants_event_stream(request, data):
+        return await _respond_stream(
+            request, aio_flows.process_document_stream_flow(document_text)
+        )
+    return await _respond(aio_flows.process_document_flow(document_text))
+
+
+async def transcribe_audio(request: web.Request) -> web.Response:
+    form = await request.post()
+    audio_field = form.get("audio_file")
+    if audio_field is None or not getattr(audio_field, "filename", None):
+        return web.json_response({"success": False, "error": "No audio file provided"}, status=400)
+    audio = audio_field.file.read()
+    return await _respond(
+        aio_flows.transcribe_audio_flow(audio, audio_field.filename, form.get("session_id"))
+    )
+
+
+async def _close_client(app: web.Application) -> None:
+    await close_session()
+
+
+def create_async_app() -> web.Application:
+    """Build the aiohttp app serving the long-running demo endpoints."""
+    load_dotenv()
+    configure_logging()
+
+    app = web.Application(client_max_size=20 * 1024 * 1024, middlewares=[_enforce_rate_limit])
+    app.router.add_get("/health", health)
+    app.router.add_get("/metrics", metrics_endpoint)
+    app.router.add_post("/ask-question", ask_question)
+    app.router.add_post("/ask-questions", ask_questions)
+    app.router.add_post("/process-document", process_document)
+    app.router.add_post("/transcribe-audio", transcribe_audio)
+    app.on_cleanup.append(_close_client)
+    return app
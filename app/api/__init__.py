@@ -1 +1,6 @@
-BASE_URL = "https://registrar.api.heidihealth.com/api/v2/ml-scribe/open-api"
+import os
+
+# Point at a staging deployment or a local stand-in (see benchmarks/) with HEIDI_BASE_URL.
+BASE_URL = os.getenv(
+    "HEIDI_BASE_URL", "https://registrar.api.heidihealth.com/api/v2/ml-scribe/open-api"
+).rstrip("/")
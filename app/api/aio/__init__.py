@@ -0,0 +1,5 @@
+"""Asyncio (aiohttp) counterparts of the ``app.api`` modules.
+
+Request construction is shared with the synchronous modules, so both clients
+always send identical requests and return identically shaped results.
+"""
@@ -0,0 +1,279 @@
+import asyncio
+import json
+import time
+from typing import AsyncIterator, List, Optional, Tuple
+
+import aiohttp
+
+from app import metrics
+from app.api.aio import client
+from app.api.ask_heidi import (
+    COALESCE_REQUESTS,
+    RACE_CONTENT_TYPES,
+    _all_failed,
+    _ask_ai_request,
+    _attempt_record,
+    _extract_sse_chunk,
+    _flight_key,
+    _status_error_result,
+    cached_response,
+    content_type_memory,
+    fallback_plan,
+    get_response_cache,
+    is_retryable,
+    race_candidates,
+    store_response,
+)
+from app.api.resilience import retry_allowed
+from app.api.single_flight import AsyncSingleFlight, AsyncStreamFlights
+
+ASK_AI_TIMEOUT = client.make_timeout(10, 70)
+
+_ask_ai_flights = AsyncSingleFlight()
+_ask_ai_stream_flights = AsyncStreamFlights()
+
+
+async def _aiter_sse_chunks(response: aiohttp.ClientResponse) -> AsyncIterator[str]:
+    """Yield the text of each SSE ``data:`` payload as it arrives."""
+    async for raw_line in response.content:
+        line = raw_line.decode("utf-8", errors="replace").strip()
+        if not line.startswith("data:"):
+            continue
+        chunk = _extract_sse_chunk(line[5:].lstrip())
+        if chunk:
+            metrics.first_chunk(response)
+            yield chunk
+
+
+def _exception_error(exc: BaseException) -> dict:
+    if isinstance(exc, asyncio.TimeoutError):
+        return {
+            "error": True,
+            "message": "Request timeout - AI response took too long",
+            "suggestion": "Try again with simpler content or check network connection"
+        }
+
+    if isinstance(exc, aiohttp.ClientConnectionError):
+        return {
+            "error": True,
+            "message": "Connection error - unable to reach Heidi API",
+            "suggestion": "Check internet connection and API status"
+        }
+
+    return {
+        "error": True,
+        "message": f"Unexpected error: {str(exc)}",
+        "suggestion": "Check logs for more details"
+    }
+
+
+async def _post_ask_ai(jwt_token, session_id, ai_command_text, content, content_type):
+    url, headers, payload = _ask_ai_request(
+        jwt_token, session_id, ai_command_text, content, content_type
+    )
+    return await client.request(
+        "POST", url, headers=headers, json=payload, timeout=ASK_AI_TIMEOUT
+    )
+
+
+async def ask_ai_stream(jwt_token, session_id, ai_command_text, content, content_type="MARKDOWN"):
+    """Async ``ask_ai_stream``; returns the same result dictionaries."""
+    if not COALESCE_REQUESTS:
+        return await _ask_ai_once(jwt_token, session_id, ai_command_text, content, content_type)
+
+    result, shared = await _ask_ai_flights.do(
+        _flight_key(jwt_token, session_id, ai_command_text, content, content_type),
+        lambda: _ask_ai_once(jwt_token, session_id, ai_command_text, content, content_type),
+    )
+    if shared:
+        metrics.ASK_AI_COALESCED.inc(("call",))
+        return dict(result)
+    return result
+
+
+async def _ask_ai_once(jwt_token, session_id, ai_command_text, content, content_type):
+    try:
+        response = await _post_ask_ai(
+            jwt_token, session_id, ai_command_text, content, content_type
+        )
+        async with response:
+            if response.status != 200:
+                return _status_error_result(response.status, await response.text())
+
+            normalized_content_type = response.headers.get("Content-Type", "").lower()
+            if "text/event-stream" in normalized_content_type:
+                combined_chunks: List[str] = []
+                async for chunk in _aiter_sse_chunks(response):
+                    combined_chunks.append(chunk)
+                if combined_chunks:
+                    return {"success": True, "response": "".join(combined_chunks), "format": "sse"}
+                return {
+                    "error": True,
+                    "message": "SSE response was empty after parsing",
+                    "status_code": response.status
+                }
+
+            text_body = await response.text()
+            if "application/json" in normalized_content_type:
+                try:
+                    return {"success": True, "response": json.loads(text_body), "format": "json"}
+                except json.JSONDecodeError:
+                    return {
+                        "success": True,
+                        "response": text_body,
+                        "format": "text",
+                        "warning": "Expected JSON but got raw text"
+                    }
+
+            if text_body.strip():
+                return {"success": True, "response": text_body, "format": "text"}
+            return {
+                "error": True,
+                "message": "Empty response received",
+                "status_code": response.status
+            }
+
+    except Exception as e:
+        return _exception_error(e)
+
+
+async def _aiter_response_text(response: aiohttp.ClientResponse, is_sse: bool) -> AsyncIterator[str]:
+    try:
+        if is_sse:
+            async for chunk in _aiter_sse_chunks(response):
+                yield chunk
+        else:
+            text_body = await response.text()
+            if text_body.strip():
+                yield text_body
+    finally:
+        response.release()
+
+
+async def open_ai_stream(
+    jwt_token, session_id, ai_command_text, content, content_type="MARKDOWN"
+) -> Tuple[Optional[AsyncIterator[str]], Optional[dict]]:
+    """Async ``open_ai_stream``: ``(chunks, None)`` or ``(None, error)``; identical streams are shared."""
+    if not COALESCE_REQUESTS:
+        return await _open_ai_stream_once(jwt_token, session_id, ai_command_text, content, content_type)
+
+    chunks, error, shared = await _ask_ai_stream_flights.open(
+        _flight_key(jwt_token, session_id, ai_command_text, content, content_type),
+        lambda: _open_ai_stream_once(jwt_token, session_id, ai_command_text, content, content_type),
+    )
+    if shared:
+        metrics.ASK_AI_COALESCED.inc(("stream",))
+    return chunks, error
+
+
+async def _open_ai_stream_once(
+    jwt_token, session_id, ai_command_text, content, content_type
+) -> Tuple[Optional[AsyncIterator[str]], Optional[dict]]:
+    try:
+        response = await _post_ask_ai(
+            jwt_token, session_id, ai_command_text, content, content_type
+        )
+    except Exception as e:
+        return None, _exception_error(e)
+
+    if response.status != 200:
+        error = _status_error_result(response.status, await response.text())
+        response.release()
+        return None, error
+
+    is_sse = "text/event-stream" in response.headers.get("Content-Type", "").lower()
+    return _aiter_response_text(response, is_sse), None
+
+
+async def open_ai_stream_with_fallbacks(
+    jwt_token, session_id, ai_command_text, content
+) -> Tuple[Optional[AsyncIterator[str]], Optional[dict]]:
+    memory_key, content_types = fallback_plan(ai_command_text, content)
+    last_error: Optional[dict] = None
+    for content_type in content_types:
+        if last_error is not None and not retry_allowed():
+            break
+        chunks, error = await open_ai_stream(
+            jwt_token, session_id, ai_command_text, content, content_type
+        )
+        if error is None:
+            content_type_memory.record_success(memory_key, content_type)
+            return chunks, None
+        last_error = error
+        if not is_retryable(error):
+            break
+    return None, last_error
+
+
+async def _race_content_types(jwt_token, session_id, ai_command_text, content, content_types, memory_key):
+    started = time.perf_counter()
+    content_types = race_candidates(content_types)
+    pending = {
+        asyncio.ensure_future(
+            ask_ai_stream(jwt_token, session_id, ai_command_text, content, content_type)
+        ): content_type
+        for content_type in content_types
+    }
+
+    attempts: List[dict] = []
+    last_error: Optional[dict] = None
+    try:
+        while pending:
+            done, _ = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+            for task in done:
+                content_type = pending.pop(task)
+                result = task.result()
+                attempts.append(_attempt_record(content_type, result, started))
+                if result.get("success"):
+                    content_type_memory.record_success(memory_key, content_type)
+                    return dict(result, content_type=content_type, attempts=attempts)
+                last_error = result
+    finally:
+        for task in pending:
+            task.cancel()
+
+    return _all_failed(attempts, last_error)
+
+
+async def ask_ai_with_fallbacks(jwt_token, session_id, ai_command_text, content, *, race=None, use_cache=False):
+    """Async ``ask_ai_with_fallbacks``; losing race attempts are cancelled outright."""
+    memory_key, content_types = fallback_plan(ai_command_text, content)
+    cache = get_response_cache() if use_cache else None
+    if cache is not None:
+        hit = cached_response(cache, ai_command_text, content, content_types)
+        if hit is not None:
+            return hit
+
+    if RACE_CONTENT_TYPES if race is None else race:
+        result = await _race_content_types(
+            jwt_token, session_id, ai_command_text, content, content_types, memory_key
+        )
+    else:
+        result = await _try_content_types_in_order(
+            jwt_token, session_id, ai_command_text, content, content_types, memory_key
+        )
+
+    if cache is not None:
+        store_response(cache, ai_command_text, content, result)
+    return result
+
+
+async def _try_content_types_in_order(jwt_token, session_id, ai_command_text, content, content_types, memory_key):
+    attempts: List[dict] = []
+    last_error: Optional[dict] = None
+    for content_type in content_types:
+        if attempts and not retry_allowed():
+            break
+        started = time.perf_counter()
+        result = await ask_ai_stream(
+            jwt_token, session_id, ai_command_text, content, content_type
+        )
+        attempts.append(_attempt_record(content_type, result, started))
+        if result.get("success"):
+            content_type_memory.record_success(memory_key, content_type)
+            return dict(result, content_type=content_type, attempts=attempts)
+        last_error = result
+        if not is_retryable(result):
+            break
+
+    return _all_failed(attempts, last_error)
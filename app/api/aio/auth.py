@@ -0,0 +1,15 @@
+from app.api.aio import client
+from app.api.auth import _jwt_request
+
+
+async def get_jwt_token():
+    url, headers, params = _jwt_request()
+
+    try:
+        async with client.request("GET", url, headers=headers, params=params) as response:
+            if response.status == 200:
+                return (await response.json(content_type=None)).get("token")
+            else:
+                return f"Error: {response.status} - {await response.text()}"
+    except Exception as e:
+        return f"Exception occurred: {str(e)}"
@@ -0,0 +1,204 @@
+"""Shared aiohttp session for the async Heidi client."""
+import asyncio
+import json
+import time
+import weakref
+from typing import Any, Dict, Optional
+
+import aiohttp
+
+from app import metrics
+from app.api.client import (
+    CONNECT_TIMEOUT,
+    LONG_READ_TIMEOUT,
+    POOL_MAXSIZE,
+    READ_TIMEOUT,
+    notify_unauthorized,
+)
+from app.api.resilience import Admission, get_resilience
+
+
+def make_timeout(connect: float, read: float) -> aiohttp.ClientTimeout:
+    """Build a connect/read timeout equivalent to a ``requests`` timeout tuple."""
+    return aiohttp.ClientTimeout(total=None, sock_connect=connect, sock_read=read)
+
+
+DEFAULT_TIMEOUT = make_timeout(CONNECT_TIMEOUT, READ_TIMEOUT)
+LONG_TIMEOUT = make_timeout(CONNECT_TIMEOUT, LONG_READ_TIMEOUT)
+
+# aiohttp sessions are bound to the loop that created them.
+_sessions: "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, aiohttp.ClientSession]" = (
+    weakref.WeakKeyDictionary()
+)
+
+
+async def _on_request_start(session, context, params):
+    context.started = time.perf_counter()
+    context.sent = 0
+
+
+async def _on_request_chunk_sent(session, context, params):
+    context.sent += len(params.chunk)
+
+
+async def _on_request_end(session, context, params):
+    context.endpoint = metrics.record_upstream(
+        params.method, str(params.url), str(params.response.status),
+        time.perf_counter() - context.started, context.sent,
+    )
+    metrics.watch_first_chunk(params.response, context.endpoint, context.started)
+    _record_body_on_release(params.response, context.endpoint)
+
+
+def _record_body_on_release(response: aiohttp.ClientResponse, endpoint: str) -> None:
+    # Bodies may be streamed by the caller, so count them when the response is released.
+    release = response.release
+    recorded = []
+
+    def release_and_record():
+        if not recorded:
+            recorded.append(True)
+            metrics.record_received(endpoint, response.content.total_bytes)
+        return release()
+
+    response.release = release_and_record
+
+
+async def _on_request_exception(session, context, params):
+    metrics.record_upstream(
+        params.method, str(params.url), "error", time.perf_counter() - context.started, context.sent
+    )
+
+
+def _trace_config() -> aiohttp.TraceConfig:
+    """Feed every request on the session into ``app.metrics``."""
+    trace = aiohttp.TraceConfig()
+    trace.on_request_start.append(_on_request_start)
+    trace.on_request_chunk_sent.append(_on_request_chunk_sent)
+    trace.on_request_end.append(_on_request_end)
+    trace.on_request_exception.append(_on_request_exception)
+    return trace
+
+
+def get_session() -> aiohttp.ClientSession:
+    """Return the keep-alive session for the running event loop."""
+    loop = asyncio.get_running_loop()
+    session = _sessions.get(loop)
+    if session is None or session.closed:
+        connector = aiohttp.TCPConnector(limit=POOL_MAXSIZE, limit_per_host=POOL_MAXSIZE)
+        session = aiohttp.ClientSession(
+            connector=connector, timeout=DEFAULT_TIMEOUT, trace_configs=[_trace_config()]
+        )
+        _sessions[loop] = session
+    return session
+
+
+async def close_session() -> None:
+    """Close the running loop's session and its pooled connections."""
+    session = _sessions.pop(asyncio.get_running_loop(), None)
+    if session is not None and not session.closed:
+        await session.close()
+
+
+def _without_none(mapping):
+    # requests silently drops None headers/params; aiohttp rejects them.
+    if mapping is None:
+        return None
+    return {key: value for key, value in mapping.items() if value is not None}
+
+
+class UnavailableResponse:
+    """Local 503 with the parts of ``ClientResponse`` the API modules use, for refused calls."""
+
+    def __init__(self, method: str, url: str, refusal: Dict[str, Any]):
+        self.method = method
+        self.url = url
+        self.status = 503
+        self.reason = "Service Unavailable"
+        self.headers = {"Content-Type": "application/json", "Retry-After": str(refusal["retry_after"])}
+        self._body = json.dumps(refusal)
+
+    async def text(self, *args, **kwargs) -> str:
+        return self._body
+
+    async def json(self, *args, **kwargs) -> Any:
+        return json.loads(self._body)
+
+    async def read(self) -> bytes:
+        return self._body.encode("utf-8")
+
+    def release(self) -> None:
+        pass
+
+    async def __aenter__(self) -> "UnavailableResponse":
+        return self
+
+    async def __aexit__(self, *exc_info) -> None:
+        self.release()
+
+
+def _release_slot_on_release(response: aiohttp.ClientResponse, admission: Admission) -> None:
+    # The concurrency slot is held until the caller releases the (possibly streamed) body.
+    release_slot = weakref.finalize(response, admission.release)
+    release = response.release
+
+    def release_and_free_slot():
+        try:
+            return release()
+        finally:
+            release_slot()
+
+    response.release = release_and_free_slot
+
+
+class _GuardedRequest:
+    """Awaitable / async context manager like aiohttp's, admitted by the resilience layer first."""
+
+    def __init__(self, method: str, url: str, kwargs: Dict[str, Any]):
+        self._method = method
+        self._url = url
+        self._kwargs = kwargs
+        self._response: Optional[Any] = None
+
+    async def _send(self):
+        admission: Optional[Admission] = None
+        layer = get_resilience()
+        if layer is not None:
+            admission, refusal = await layer.admit_async(self._method, self._url)
+            if refusal is not None:
+                return UnavailableResponse(self._method, self._url, refusal)
+        try:
+            response = await get_session().request(self._method, self._url, **self._kwargs)
+        except Exception:
+            if admission is not None:
+                admission.finish(None)
+            raise
+        except BaseException:
+            # A cancelled caller says nothing about the upstream's health.
+            if admission is not None:
+                admission.release()
+            raise
+        if response.status == 401:
+            notify_unauthorized(self._kwargs.get("headers"))
+        if admission is not None:
+            admission.record(response.status)
+            _release_slot_on_release(response, admission)
+        return response
+
+    def __await__(self):
+        return self._send().__await__()
+
+    async def __aenter__(self):
+        self._response = await self._send()
+        return self._response
+
+    async def __aexit__(self, *exc_info) -> None:
+        self._response.release()
+
+
+def request(method: str, url: str, **kwargs):
+    """Start a request on the shared session; await it or use with ``async with``."""
+    for key in ("headers", "params"):
+        if key in kwargs:
+            kwargs[key] = _without_none(kwargs[key])
+    return _GuardedRequest(method, url, kwargs)
@@ -0,0 +1,87 @@
+import codecs
+
+from app.api.aio import client
+from app.api.aio.ask_heidi import _aiter_sse_chunks
+from app.api.consult import _consult_note_request, _templates_request
+
+
+async def get_consult_note_templates(jwt_token):
+    url, headers, params = _templates_request(jwt_token)
+
+    try:
+        async with client.request("GET", url, headers=headers, params=params) as response:
+            if response.status == 200:
+                return await response.json(content_type=None)
+            else:
+                return {
+                    "error": True,
+                    "status_code": response.status,
+                    "message": await response.text()
+                }
+    except Exception as e:
+        return {
+            "error": True,
+            "message": str(e)
+        }
+
+
+async def _aiter_note_text(response):
+    try:
+        if "text/event-stream" in response.headers.get("Content-Type", "").lower():
+            async for chunk in _aiter_sse_chunks(response):
+                yield chunk
+        else:
+            decoder = codecs.getincrementaldecoder(response.charset or "utf-8")(errors="replace")
+            async for data in response.content.iter_any():
+                text = decoder.decode(data)
+                if text:
+                    yield text
+            tail = decoder.decode(b"", final=True)
+            if tail:
+                yield tail
+    finally:
+        response.release()
+
+
+async def open_consult_note_stream(jwt_token, session_id, template_id, voice_style="GOLDILOCKS", brain="LEFT", addition=""):
+    """Async ``open_consult_note_stream``: ``(chunks, None)`` or ``(None, error)``."""
+    url, headers, payload = _consult_note_request(
+        jwt_token, session_id, template_id, voice_style, brain, addition
+    )
+
+    try:
+        response = await client.request(
+            "POST", url, headers=headers, json=payload, timeout=client.LONG_TIMEOUT
+        )
+    except Exception as e:
+        return None, {
+            "error": True,
+            "message": str(e)
+        }
+
+    if response.status != 200:
+        error = {
+            "error": True,
+            "status_code": response.status,
+            "message": await response.text()
+        }
+        response.release()
+        return None, error
+
+    return _aiter_note_text(response), None
+
+
+async def generate_consult_note(jwt_token, session_id, template_id, voice_style="GOLDILOCKS", brain="LEFT", addition=""):
+    chunks, error = await open_consult_note_stream(
+        jwt_token, session_id, template_id, voice_style, brain, addition
+    )
+    if error:
+        return error
+
+    try:
+        return {"success": True, "note": "".join([chunk async for chunk in chunks])}
+    except Exception as e:
+        return {
+            "error": True,
+            "message": str(e)
+        }
@@ -0,0 +1,62 @@
+from app.api import BASE_URL
+from app.api.aio import client
+from app.api.session import (
+    _create_session_request,
+    _session_headers,
+    _session_id_from_response,
+    _update_session_payload,
+)
+
+
+async def _json_or_error(response):
+    if response.status == 200:
+        return await response.json(content_type=None)
+    return {
+        "error": True,
+        "status_code": response.status,
+        "message": await response.text()
+    }
+
+
+async def create_session(jwt_token):
+    url, headers, payload = _create_session_request(jwt_token)
+
+    try:
+        async with client.request("POST", url, headers=headers, json=payload) as response:
+            if response.status in (200, 201):
+                return _session_id_from_response(await response.json(content_type=None))
+            return await _json_or_error(response)
+    except Exception as e:
+        return {
+            "error": True,
+            "message": str(e)
+        }
+
+
+async def get_session_details(jwt_token, session_id):
+    url = f"{BASE_URL}/sessions/{session_id}"
+    headers = _session_headers(jwt_token)
+    try:
+        async with client.request("GET", url, headers=headers) as response:
+            return await _json_or_error(response)
+    except Exception as e:
+        return {
+            "error": True,
+            "message": str(e)
+        }
+
+
+async def update_session(jwt_token: str, session_id: str, **fields):
+    """Async ``update_session``; keyword fields match the sync signature."""
+    url = f"{BASE_URL}/sessions/{session_id}"
+    headers = _session_headers(jwt_token, json_body=True)
+    payload = _update_session_payload(**fields)
+
+    try:
+        async with client.request("PATCH", url, headers=headers, json=payload) as response:
+            return await _json_or_error(response)
+    except Exception as e:
+        return {
+            "error": True,
+            "message": str(e)
+        }
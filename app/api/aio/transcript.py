@@ -0,0 +1,82 @@
+import asyncio
+import os
+
+import aiohttp
+
+from app.api.aio import client
+from app.api.transcript import _transcript_url, _transcription_headers, _transcription_url
+
+
+async def start_transcription(jwt_token, session_id):
+    url = _transcription_url(session_id)
+    headers = _transcription_headers(jwt_token)
+
+    async with client.request("POST", url, headers=headers) as response:
+        if response.status == 200:
+            return (await response.json(content_type=None)).get("recording_id")
+        else:
+            return {
+                "error": True,
+                "status_code": response.status,
+                "message": await response.text()
+            }
+
+
+async def upload_audio_bytes(jwt_token, session_id, recording_id, audio, filename="audio.mp3", index="0"):
+    """Upload one in-memory audio segment."""
+    url = _transcription_url(session_id, recording_id, "transcribe")
+    headers = _transcription_headers(jwt_token)
+    form = aiohttp.FormData()
+    form.add_field("index", str(index))
+    form.add_field("file", audio, filename=filename)
+
+    async with client.request(
+        "POST", url, headers=headers, data=form, timeout=client.LONG_TIMEOUT
+    ) as response:
+        if response.status != 200:
+            return {
+                "error": True,
+                "status_code": response.status,
+                "message": await response.text()
+            }
+        return await response.json(content_type=None)
+
+
+def _read_file(file_path):
+    with open(file_path, "rb") as audio_file:
+        return audio_file.read()
+
+
+async def upload_audio(jwt_token, session_id, recording_id, file_path, index="0"):
+    audio = await asyncio.to_thread(_read_file, file_path)
+    return await upload_audio_bytes(
+        jwt_token, session_id, recording_id, audio, os.path.basename(file_path), index
+    )
+
+
+async def finish_transcription(jwt_token, session_id, recording_id):
+    url = _transcription_url(session_id, recording_id, "finish")
+    headers = _transcription_headers(jwt_token)
+
+    async with client.request("POST", url, headers=headers) as response:
+        if response.status != 200:
+            return {
+                "error": True,
+                "status_code": response.status,
+                "message": await response.text()
+            }
+        return await response.json(content_type=None)
+
+
+async def get_transcript(jwt_token, session_id):
+    url = _transcript_url(session_id)
+    headers = _transcription_headers(jwt_token)
+
+    async with client.request("GET", url, headers=headers) as response:
+        if response.status != 200:
+            return {
+                "error": True,
+                "status_code": response.status,
+                "message": await response.text()
+            }
+        return await response.json(content_type=None)
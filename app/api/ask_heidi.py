@@ -1,7 +1,39 @@
+import hashlib
 import json
-from typing import List
+import logging
+import os
+import re
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from typing import Any, Iterator, List, Optional, Set, Tuple
 import requests
-from app.api import BASE_URL
+from app import metrics
+from app.api import BASE_URL, client
+from app.api.resilience import NON_RETRYABLE_STATUSES, is_retryable, retry_allowed
+from app.api.single_flight import SingleFlight, StreamFlights
+from app.cache import CacheBackend, cache_from_env, hash_key
+from app.log import sampled
+
+logger = logging.getLogger(__name__)
+# Per-chunk parse events; one in HEIDI_LOG_SAMPLE_EVERY is kept.
+chunk_logger = sampled(logger)
+
+# Content types Heidi accepts for ask-ai, in default order of preference.
+CONTENT_TYPES = ("MARKDOWN", "TEXT", "PLAIN_TEXT")
+# Send every content type at once and keep the first success.
+RACE_CONTENT_TYPES = os.getenv("HEIDI_ASK_AI_RACE", "").lower() in ("1", "true", "yes")
+# Threads that may race at once: the care plan map and question batch pools, plus request threads.
+RACE_CALLERS = int(os.getenv(
+    "HEIDI_ASK_AI_RACE_CALLERS",
+    str(int(os.getenv("HEIDI_CARE_PLAN_MAP_WORKERS", "6")) + int(os.getenv("HEIDI_BATCH_WORKERS", "16")) + 8),
+))
+# Identical concurrent Ask AI calls share one upstream request.
+COALESCE_REQUESTS = os.getenv("HEIDI_ASK_AI_COALESCE", "1").lower() in ("1", "true", "yes")
+
+_ask_ai_flights = SingleFlight()
+_ask_ai_stream_flights = StreamFlights()
 
 
 def _extract_sse_chunk(raw_payload: str) -> str:
@@ -9,51 +41,110 @@ def _extract_sse_chunk(raw_payload: str) -> str:
     try:
         data_obj = json.loads(raw_payload)
     except json.JSONDecodeError as exc:
-        print(f"  Failed to parse SSE chunk: {exc}")
+        chunk_logger.debug("Failed to parse SSE chunk: %s", exc)
         return ""
 
     if isinstance(data_obj, dict):
         if isinstance(data_obj.get("data"), str):
-            print(f"  Parsed chunk: {data_obj['data'][:50]}...")
             return data_obj["data"]
         if isinstance(data_obj.get("content"), str):
-            print(f"  Parsed content: {data_obj['content'][:50]}...")
             return data_obj["content"]
     elif isinstance(data_obj, str):
-        print(f"  Parsed string chunk: {data_obj[:50]}...")
         return data_obj
 
-    print(f"  Unknown data format: {data_obj}")
+    chunk_logger.debug("Unknown SSE data format: %.100r", data_obj)
     return ""
 
 
-def _consume_sse_stream(response: requests.Response) -> str:
+def iter_sse_chunks(response: requests.Response) -> Iterator[str]:
+    """Yield the text of each SSE ``data:`` payload as it arrives."""
+    for raw_line in response.iter_lines(decode_unicode=True):
+        if not raw_line:
+            continue
+        line = raw_line.strip()
+        # keep only lines with data: prefix
+        if not line.startswith("data:"):
+            continue
+        chunk = _extract_sse_chunk(line[5:].lstrip())
+        if chunk:
+            metrics.first_chunk(response)
+            yield chunk
+
+
+def _shutdown_response(response: requests.Response) -> None:
+    """Interrupt a read blocked on ``response`` in another thread."""
+    try:
+        response.raw.shutdown()
+    except Exception as exc:  # urllib3 before 2.3, or no socket left to shut down
+        logger.debug("Could not shut down an Ask AI response: %s", exc)
+
+
+class RaceCancellation(threading.Event):
+    """
+    Cancel event for a content-type race, set by the first candidate to succeed.
+
+    Winning also shuts down the other candidates' open SSE responses, so
+    losers release their thread and upstream connection at once instead of
+    at their next chunk.
+    """
+
+    def __init__(self) -> None:
+        super().__init__()
+        self.winner: Optional[str] = None
+        self._responses: Set[requests.Response] = set()
+        self._lock = threading.Lock()
+
+    def claim(self, content_type: str) -> bool:
+        """Make ``content_type`` the winner unless another candidate already is."""
+        with self._lock:
+            if self.winner is not None:
+                return False
+            self.winner = content_type
+            self.set()
+            # Shut down under the lock so no response is released to the pool meanwhile.
+            for response in self._responses:
+                _shutdown_response(response)
+            self._responses.clear()
+        return True
+
+    def attach(self, response: requests.Response) -> bool:
+        """Track a candidate's open response; False when the race is already won."""
+        with self._lock:
+            if self.is_set():
+                return False
+            self._responses.add(response)
+            return True
+
+    def detach(self, response: requests.Response) -> None:
+        with self._lock:
+            self._responses.discard(response)
+
+
+def _consume_sse_stream(response: requests.Response, cancel_event: Optional[threading.Event] = None) -> str:
     """Iterate through the SSE stream and concatenate payloads."""
+    racing = isinstance(cancel_event, RaceCancellation)
+    if racing and not cancel_event.attach(response):
+        return ""
     combined_chunks: List[str] = []
     try:
-        for raw_line in response.iter_lines(decode_unicode=True):
-            if not raw_line:
-                continue
-            line = raw_line.strip()
-            # keep only lines with data: prefix
-            if not line.startswith("data:"):
-                continue
-            chunk = _extract_sse_chunk(line[5:].lstrip())
-            if chunk:
-                combined_chunks.append(chunk)
+        for chunk in iter_sse_chunks(response):
+            if cancel_event is not None and cancel_event.is_set():
+                return ""
+            combined_chunks.append(chunk)
     except (requests.exceptions.ChunkedEncodingError, json.JSONDecodeError) as exc:
-        print(f"Error while streaming SSE: {exc}")
+        if cancel_event is not None and cancel_event.is_set():
+            return ""
+        logger.warning("Error while streaming SSE: %s", exc)
         return ""
+    finally:
+        if racing:
+            cancel_event.detach(response)
 
     return "".join(combined_chunks)
 
 
 def parse_sse_response(sse_text: str) -> str:
     """Parse Server-Sent Events format and extract the actual content."""
-    print("=== PARSING SSE RESPONSE ===")
-    print(f"Raw response length: {len(sse_text)}")
-    print(f"First 200 chars: {sse_text[:200]}")
-
     lines = sse_text.strip().split("\n")
     combined_content = ""
     data_lines_found = 0
@@ -67,22 +158,15 @@ def parse_sse_response(sse_text: str) -> str:
             if chunk:
                 combined_content += chunk
 
-    print(f"Data lines found: {data_lines_found}")
-    print(f"Combined content length: {len(combined_content)}")
+    logger.debug(
+        "Parsed %s SSE data lines into %s characters", data_lines_found, len(combined_content)
+    )
 
     return combined_content.strip()
 
 
-def ask_ai_stream(jwt_token, session_id, ai_command_text, content, content_type="MARKDOWN"):
-    """
-    Enhanced Ask AI function with comprehensive error handling and multiple format support
-    """
-    print(f"=== ASK AI STREAM CALLED ===")
-    print(f"Session ID: {session_id}")
-    print(f"Content type: {content_type}")
-    print(f"AI command: {ai_command_text[:100]}...")
-    print(f"Content: {content[:100]}...")
-
+def _ask_ai_request(jwt_token, session_id, ai_command_text, content, content_type):
+    """Return the url, headers and JSON body for ``POST /ask-ai``."""
     url = f"{BASE_URL}/sessions/{session_id}/ask-ai"
     headers = {
         "Authorization": f"Bearer {jwt_token}",
@@ -93,46 +177,158 @@ def ask_ai_stream(jwt_token, session_id, ai_command_text, content, content_type=
         "content": content,
         "content_type": content_type
     }
+    return url, headers, payload
+
+
+def _post_ask_ai(jwt_token, session_id, ai_command_text, content, content_type) -> requests.Response:
+    """Open the streaming Ask AI request; the caller owns the response."""
+    url, headers, payload = _ask_ai_request(
+        jwt_token, session_id, ai_command_text, content, content_type
+    )
 
-    print(f"Request URL: {url}")
-    print(f"Request headers: {headers}")
-    print(f"Request payload: {payload}")
+    logger.debug("Ask AI request", extra={"url": url, "content_type": content_type})
 
+    # Increase timeout for potentially slow AI responses
+    return client.post(
+        url,
+        headers=headers,
+        json=payload,
+        stream=True,
+        timeout=(10, 70),
+    )
+
+
+def _response_content_type(response: requests.Response) -> str:
+    """Return the response Content-Type header, matched case-insensitively."""
+    for header_key, header_value in response.headers.items():
+        if header_key.lower() == "content-type":
+            return header_value
+    return ""
+
+
+def _status_error_result(status_code: int, body_text: str) -> dict:
+    """Map a non-200 Ask AI status and body to an error dictionary."""
+    if status_code == 401:
+        return {
+            "error": True,
+            "status_code": status_code,
+            "message": "Authentication failed - JWT token may be expired",
+            "suggestion": "Try refreshing the JWT token"
+        }
+
+    if status_code == 404:
+        return {
+            "error": True,
+            "status_code": status_code,
+            "message": "Session not found - session may have expired",
+            "suggestion": "Create a new session"
+        }
+
+    if status_code == 503:
+        return {
+            "error": True,
+            "status_code": status_code,
+            "message": "Heidi API unavailable - failing fast",
+            "details": body_text,
+            "suggestion": "Wait for the Retry-After period before trying again"
+        }
+
+    return {
+        "error": True,
+        "status_code": status_code,
+        "message": body_text,
+        "suggestion": "Check API documentation for status code meaning"
+    }
+
+
+def _status_error(response: requests.Response) -> dict:
+    return _status_error_result(response.status_code, response.text)
+
+
+def _exception_error(exc: Exception) -> dict:
+    """Map a request exception to an error dictionary."""
+    if isinstance(exc, requests.exceptions.Timeout):
+        return {
+            "error": True,
+            "message": "Request timeout - AI response took too long",
+            "suggestion": "Try again with simpler content or check network connection"
+        }
+
+    if isinstance(exc, requests.exceptions.ConnectionError):
+        return {
+            "error": True,
+            "message": "Connection error - unable to reach Heidi API",
+            "suggestion": "Check internet connection and API status"
+        }
+
+    return {
+        "error": True,
+        "message": f"Unexpected error: {str(exc)}",
+        "suggestion": "Check logs for more details"
+    }
+
+
+def _flight_key(jwt_token, session_id, ai_command_text, content, content_type) -> tuple:
+    """Requests are only shared between callers presenting the same token."""
+    return (session_id, ai_command_text, content, content_type, jwt_token)
+
+
+def ask_ai_stream(jwt_token, session_id, ai_command_text, content, content_type="MARKDOWN", *, cancel_event=None):
+    """
+    Enhanced Ask AI function with comprehensive error handling and multiple format support
+
+    Setting ``cancel_event`` abandons an SSE response at its next chunk.
+    Concurrent identical calls share one upstream request unless
+    ``HEIDI_ASK_AI_COALESCE`` is off.
+    """
+    if not COALESCE_REQUESTS:
+        return _ask_ai_once(jwt_token, session_id, ai_command_text, content, content_type, cancel_event)
+
+    key = _flight_key(jwt_token, session_id, ai_command_text, content, content_type)
+    while True:
+        result, shared = _ask_ai_flights.do(
+            key,
+            lambda: _ask_ai_once(jwt_token, session_id, ai_command_text, content, content_type, cancel_event),
+        )
+        if not shared:
+            return result
+        metrics.ASK_AI_COALESCED.inc(("call",))
+        # A leader cancelled by its own content-type race says nothing about this caller's.
+        if not result.get("cancelled") or (cancel_event is not None and cancel_event.is_set()):
+            return dict(result)
+
+
+def _ask_ai_once(jwt_token, session_id, ai_command_text, content, content_type, cancel_event):
     try:
-        # Increase timeout for potentially slow AI responses
-        with requests.post(
-            url,
-            headers=headers,
-            json=payload,
-            stream=True,
-            timeout=(10, 70),
+        with _post_ask_ai(
+            jwt_token, session_id, ai_command_text, content, content_type
         ) as response:
 
-            print(f"Response status: {response.status_code}")
-            print(f"Response headers: {dict(response.headers)}")
+            logger.debug(
+                "Ask AI answered %s for %s", response.status_code, content_type,
+                extra={"session_id": session_id},
+            )
 
             if response.status_code == 200:
                 # Check content type header to determine parsing strategy
-                raw_content_type = ""
-                for header_key, header_value in response.headers.items():
-                    if header_key.lower() == "content-type":
-                        raw_content_type = header_value
-                        # stop looping once you found header
-                        break
-
+                raw_content_type = _response_content_type(response)
                 normalized_content_type = raw_content_type.lower()
-                print(f"Content-Type header: {raw_content_type}")
 
                 if 'text/event-stream' in normalized_content_type:
-                    print("Detected SSE format response")
-                    parsed_content = _consume_sse_stream(response)
+                    parsed_content = _consume_sse_stream(response, cancel_event)
+                    if cancel_event is not None and cancel_event.is_set():
+                        return {
+                            "error": True,
+                            "cancelled": True,
+                            "message": "Cancelled - another content type answered first"
+                        }
                     if parsed_content:
                         return {
                             "success": True,
                             "response": parsed_content,
                             "format": "sse",
                         }
-                    print("SSE parsing returned empty content")
+                    logger.warning("Ask AI SSE response was empty after parsing")
                     return {
                         "error": True,
                         "message": "SSE response was empty after parsing",
@@ -140,7 +336,6 @@ def ask_ai_stream(jwt_token, session_id, ai_command_text, content, content_type=
                     }
 
                 if 'application/json' in normalized_content_type:
-                    print("Detected JSON format response")
                     try:
                         json_response = response.json()
                         return {
@@ -149,7 +344,7 @@ def ask_ai_stream(jwt_token, session_id, ai_command_text, content, content_type=
                             "format": "json"
                         }
                     except json.JSONDecodeError as e:
-                        print(f"JSON parsing failed: {e}")
+                        logger.warning("Ask AI JSON response did not parse: %s", e)
                         text_body = response.text
                         return {
                             "success": True,
@@ -158,7 +353,6 @@ def ask_ai_stream(jwt_token, session_id, ai_command_text, content, content_type=
                             "warning": "Expected JSON but got raw text"
                         }
 
-                print("Detected raw text response")
                 text_body = response.text
                 if text_body.strip():
                     return {
@@ -173,76 +367,331 @@ def ask_ai_stream(jwt_token, session_id, ai_command_text, content, content_type=
                     "status_code": response.status_code
                 }
 
-            if response.status_code == 401:
-                return {
-                    "error": True,
-                    "status_code": response.status_code,
-                    "message": "Authentication failed - JWT token may be expired",
-                    "suggestion": "Try refreshing the JWT token"
-                }
+            return _status_error(response)
 
-            if response.status_code == 404:
-                return {
-                    "error": True,
-                    "status_code": response.status_code,
-                    "message": "Session not found - session may have expired",
-                    "suggestion": "Create a new session"
-                }
+    except Exception as e:
+        return _exception_error(e)
 
-            return {
-                "error": True,
-                "status_code": response.status_code,
-                "message": response.text,
-                "suggestion": "Check API documentation for status code meaning"
-            }
 
-    except requests.exceptions.Timeout:
-        return {
-            "error": True,
-            "message": "Request timeout - AI response took too long",
-            "suggestion": "Try again with simpler content or check network connection"
-        }
+def _iter_response_text(response: requests.Response, is_sse: bool) -> Iterator[str]:
+    """Yield response text as it arrives and always release the connection."""
+    try:
+        if is_sse:
+            yield from iter_sse_chunks(response)
+        else:
+            text_body = response.text
+            if text_body.strip():
+                yield text_body
+    finally:
+        response.close()
 
-    except requests.exceptions.ConnectionError:
-        return {
-            "error": True,
-            "message": "Connection error - unable to reach Heidi API",
-            "suggestion": "Check internet connection and API status"
-        }
 
-    except Exception as e:
-        return {
-            "error": True,
-            "message": f"Unexpected error: {str(e)}",
-            "suggestion": "Check logs for more details"
-        }
+def open_ai_stream(
+    jwt_token, session_id, ai_command_text, content, content_type="MARKDOWN"
+) -> Tuple[Optional[Iterator[str]], Optional[dict]]:
+    """
+    Start an Ask AI request without buffering the answer.
 
+    Returns ``(chunks, None)`` once Heidi has accepted the request, where
+    ``chunks`` yields text fragments as they arrive, or ``(None, error)``.
+    The upstream connection stays open until ``chunks`` is exhausted or closed.
 
-def ask_ai_with_fallbacks(jwt_token, session_id, ai_command_text, content):
+    A caller arriving while an identical stream is open joins it: ``chunks``
+    first replays what was already received, then follows the live stream.
     """
-    Test Ask AI with multiple content types as fallbacks
-    """
-    print(f"=== TESTING ASK AI WITH FALLBACKS ===")
+    if not COALESCE_REQUESTS:
+        return _open_ai_stream_once(jwt_token, session_id, ai_command_text, content, content_type)
 
-    # Try different content types in order of preference
-    content_types = ["MARKDOWN", "TEXT", "PLAIN_TEXT"]
+    chunks, error, shared = _ask_ai_stream_flights.open(
+        _flight_key(jwt_token, session_id, ai_command_text, content, content_type),
+        lambda: _open_ai_stream_once(jwt_token, session_id, ai_command_text, content, content_type),
+    )
+    if shared:
+        metrics.ASK_AI_COALESCED.inc(("stream",))
+    return chunks, error
 
-    for content_type in content_types:
-        print(f"\nTrying content type: {content_type}")
 
-        result = ask_ai_stream(jwt_token, session_id,
-                               ai_command_text, content, content_type)
+def _open_ai_stream_once(
+    jwt_token, session_id, ai_command_text, content, content_type
+) -> Tuple[Optional[Iterator[str]], Optional[dict]]:
+    try:
+        response = _post_ask_ai(jwt_token, session_id, ai_command_text, content, content_type)
+    except Exception as e:
+        return None, _exception_error(e)
+
+    if response.status_code != 200:
+        error = _status_error(response)
+        response.close()
+        return None, error
+
+    is_sse = "text/event-stream" in _response_content_type(response).lower()
+    return _iter_response_text(response, is_sse), None
+
+
+def open_ai_stream_with_fallbacks(
+    jwt_token, session_id, ai_command_text, content
+) -> Tuple[Optional[Iterator[str]], Optional[dict]]:
+    """Streaming counterpart of ``ask_ai_with_fallbacks``."""
+    memory_key, content_types = fallback_plan(ai_command_text, content)
+    last_error: Optional[dict] = None
+    for content_type in content_types:
+        if last_error is not None and not retry_allowed():
+            break
+        chunks, error = open_ai_stream(
+            jwt_token, session_id, ai_command_text, content, content_type
+        )
+        if error is None:
+            content_type_memory.record_success(memory_key, content_type)
+            return chunks, None
+        logger.info("Failed to open stream with %s: %s", content_type, error.get("message", "Unknown error"))
+        last_error = error
+        if not is_retryable(error):
+            break
+
+    return None, last_error
+
+
+def _content_shape(content: str) -> str:
+    """Coarse description of the content used to bucket fallback history."""
+    has_markdown = bool(re.search(r"^\s*(#|[-*] |\d+\. )|\*\*", content, re.MULTILINE))
+    lines = "multi" if "\n" in content.strip() else "single"
+    if len(content) < 1_000:
+        size = "s"
+    elif len(content) < 20_000:
+        size = "m"
+    else:
+        size = "l"
+    return f"{'md' if has_markdown else 'plain'}:{lines}:{size}"
+
+
+class ContentTypeMemory:
+    """Remember which content type last worked for a command and content shape."""
+
+    def __init__(self, max_entries: int = 1024):
+        self._max_entries = max_entries
+        self._entries: "OrderedDict[str, str]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def key(ai_command_text: str, content: str) -> str:
+        command_hash = hashlib.sha1(ai_command_text.encode("utf-8")).hexdigest()[:16]
+        return f"{command_hash}:{_content_shape(content)}"
+
+    def order(self, key: str) -> List[str]:
+        """Content types to try, last known good first."""
+        with self._lock:
+            preferred = self._entries.get(key)
+            if preferred is not None:
+                self._entries.move_to_end(key)
+        if preferred is None:
+            return list(CONTENT_TYPES)
+        return [preferred] + [ct for ct in CONTENT_TYPES if ct != preferred]
+
+    def record_success(self, key: str, content_type: str) -> None:
+        with self._lock:
+            self._entries[key] = content_type
+            self._entries.move_to_end(key)
+            while len(self._entries) > self._max_entries:
+                self._entries.popitem(last=False)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+
+
+content_type_memory = ContentTypeMemory()
+
+
+def fallback_plan(ai_command_text: str, content: str) -> Tuple[str, List[str]]:
+    """Return the memory key and the content types to try, in order."""
+    key = ContentTypeMemory.key(ai_command_text, content)
+    return key, content_type_memory.order(key)
+
+
+def _attempt_record(content_type: str, result: dict, started: float) -> dict:
+    return {
+        "content_type": content_type,
+        "success": bool(result.get("success")),
+        "status_code": result.get("status_code"),
+        "elapsed_ms": round((time.perf_counter() - started) * 1000, 1),
+    }
 
-        if result.get("success"):
-            print(f"✅ Success with content type: {content_type}")
-            return result
-        else:
-            print(
-                f"❌ Failed with {content_type}: {result.get('message', 'Unknown error')}")
 
-    # If all content types fail, return the last error
+def _all_failed(attempts: List[dict], last_error: Optional[dict]) -> dict:
+    # Surface a non-retryable error as-is so callers keep its status code.
+    if last_error is not None and not is_retryable(last_error):
+        return dict(last_error, attempts=attempts)
     return {
         "error": True,
         "message": "All content types failed",
-        "suggestion": "Check JWT token and session validity"
+        "suggestion": "Check JWT token and session validity",
+        "attempts": attempts,
+        "last_error": last_error,
     }
+
+
+_race_executor: Optional[ThreadPoolExecutor] = None
+_race_executor_lock = threading.Lock()
+
+
+def _get_race_executor() -> ThreadPoolExecutor:
+    global _race_executor
+    if _race_executor is None:
+        with _race_executor_lock:
+            if _race_executor is None:
+                # Sized so every racing caller can run all its candidates at once;
+                # threads are only started when needed.
+                _race_executor = ThreadPoolExecutor(
+                    max_workers=RACE_CALLERS * len(CONTENT_TYPES), thread_name_prefix="ask-ai-race"
+                )
+    return _race_executor
+
+
+def race_candidates(content_types: List[str]) -> List[str]:
+    """The preferred content type, plus as many others as the retry budget allows."""
+    candidates = list(content_types[:1])
+    for content_type in content_types[1:]:
+        if not retry_allowed():
+            break
+        candidates.append(content_type)
+    return candidates
+
+
+def _race_candidate(cancellation, jwt_token, session_id, ai_command_text, content, content_type):
+    result = ask_ai_stream(
+        jwt_token, session_id, ai_command_text, content, content_type, cancel_event=cancellation
+    )
+    if result.get("success"):
+        # The first success cancels the others from this thread, not when the caller wakes.
+        cancellation.claim(content_type)
+    return result
+
+
+def _race_content_types(jwt_token, session_id, ai_command_text, content, content_types, memory_key):
+    """Send every content type at once; the first success wins, the rest are cancelled."""
+    content_types = race_candidates(content_types)
+    cancellation = RaceCancellation()
+    started = time.perf_counter()
+    executor = _get_race_executor()
+    pending = {
+        executor.submit(
+            _race_candidate, cancellation, jwt_token, session_id, ai_command_text, content, content_type
+        ): content_type
+        for content_type in content_types
+    }
+
+    attempts: List[dict] = []
+    last_error: Optional[dict] = None
+    while pending:
+        done, _ = wait(pending, return_when=FIRST_COMPLETED)
+        for future in done:
+            content_type = pending.pop(future)
+            result = future.result()
+            attempts.append(_attempt_record(content_type, result, started))
+            if result.get("success") and cancellation.winner == content_type:
+                content_type_memory.record_success(memory_key, content_type)
+                return dict(result, content_type=content_type, attempts=attempts)
+            if not result.get("success"):
+                last_error = result
+
+    return _all_failed(attempts, last_error)
+
+
+_UNSET: Any = object()
+_response_cache: Any = _UNSET
+_response_cache_lock = threading.Lock()
+
+
+def get_response_cache() -> Optional[CacheBackend]:
+    """Return the Ask AI response cache configured by ``HEIDI_AI_CACHE``, if any."""
+    global _response_cache
+    if _response_cache is _UNSET:
+        with _response_cache_lock:
+            if _response_cache is _UNSET:
+                _response_cache = cache_from_env("HEIDI_AI_CACHE", namespace="ask-ai")
+    return _response_cache
+
+
+def configure_response_cache(cache: Optional[CacheBackend] = _UNSET) -> None:
+    """Install a response cache, or reset to re-read the environment on next use."""
+    global _response_cache
+    with _response_cache_lock:
+        _response_cache = cache
+
+
+def _response_cache_key(ai_command_text: str, content: str, content_type: str) -> str:
+    return hash_key("ask-ai", ai_command_text, content, content_type)
+
+
+def cached_response(cache: CacheBackend, ai_command_text: str, content: str, content_types: List[str]) -> Optional[dict]:
+    """Return a cached successful answer for any of the candidate content types."""
+    for content_type in content_types:
+        hit = cache.get(_response_cache_key(ai_command_text, content, content_type))
+        if hit is not None:
+            return dict(hit, content_type=content_type, cached=True)
+    return None
+
+
+def store_response(cache: CacheBackend, ai_command_text: str, content: str, result: dict) -> None:
+    """Cache a successful answer under the content type that produced it."""
+    if not result.get("success") or not result.get("content_type"):
+        return
+    entry = {key: result[key] for key in ("success", "response", "format") if key in result}
+    cache.set(_response_cache_key(ai_command_text, content, result["content_type"]), entry)
+
+
+def _try_content_types_in_order(jwt_token, session_id, ai_command_text, content, content_types, memory_key):
+    attempts: List[dict] = []
+    last_error: Optional[dict] = None
+    for content_type in content_types:
+        if attempts and not retry_allowed():
+            break
+        started = time.perf_counter()
+        result = ask_ai_stream(jwt_token, session_id,
+                               ai_command_text, content, content_type)
+        attempts.append(_attempt_record(content_type, result, started))
+
+        if result.get("success"):
+            logger.debug("Ask AI succeeded with content type %s", content_type)
+            content_type_memory.record_success(memory_key, content_type)
+            return dict(result, content_type=content_type, attempts=attempts)
+
+        logger.info("Ask AI failed with %s: %s", content_type, result.get("message", "Unknown error"))
+        last_error = result
+        if not is_retryable(result):
+            break
+
+    return _all_failed(attempts, last_error)
+
+
+def ask_ai_with_fallbacks(jwt_token, session_id, ai_command_text, content, *, race=None, use_cache=False):
+    """
+    Ask AI, falling back across content types.
+
+    The content type that last succeeded for this command and content shape is
+    tried first. Auth and missing-session errors stop the fallback loop. With
+    ``race=True`` (default: ``HEIDI_ASK_AI_RACE``) all content types are sent
+    concurrently. Results carry per-attempt timings under ``"attempts"``.
+
+    ``use_cache=True`` opts deterministic prompts into the response cache
+    (enabled with ``HEIDI_AI_CACHE``); hits are marked ``"cached": True``.
+    """
+    memory_key, content_types = fallback_plan(ai_command_text, content)
+    cache = get_response_cache() if use_cache else None
+    if cache is not None:
+        hit = cached_response(cache, ai_command_text, content, content_types)
+        if hit is not None:
+            return hit
+
+    if RACE_CONTENT_TYPES if race is None else race:
+        result = _race_content_types(
+            jwt_token, session_id, ai_command_text, content, content_types, memory_key
+        )
+    else:
+        result = _try_content_types_in_order(
+            jwt_token, session_id, ai_command_text, content, content_types, memory_key
+        )
+
+    if cache is not None:
+        store_response(cache, ai_command_text, content, result)
+    return result
@@ -1,8 +1,8 @@
 import os
-import requests
-from app.api import BASE_URL
+from app.api import BASE_URL, client
 
-def get_jwt_token():
+def _jwt_request():
+    """Return the url, headers and query params for ``GET /jwt``."""
     url = f"{BASE_URL}/jwt"
 
     headers = {
@@ -12,9 +12,14 @@ def get_jwt_token():
         "email": os.getenv("HEIDI_EMAIL"),
         "third_party_internal_id": os.getenv("HEIDI_USER_ID")
     }
+    return url, headers, params
+
+
+def get_jwt_token():
+    url, headers, params = _jwt_request()
 
     try:
-        response = requests.get(url, headers=headers, params=params)
+        response = client.get(url, headers=headers, params=params)
         if response.status_code == 200:
             return response.json().get("token")
         else:
@@ -0,0 +1,186 @@
+"""Shared, pooled HTTP client used by every Heidi API module."""
+import json
+import os
+import threading
+import time
+import weakref
+from typing import Any, Callable, Dict, List, Optional
+
+import requests
+from requests.adapters import HTTPAdapter
+
+from app import metrics
+from app.api.resilience import Admission, get_resilience
+
+# Number of distinct hosts to keep pools for, and connections kept per host.
+POOL_CONNECTIONS = int(os.getenv("HEIDI_HTTP_POOL_CONNECTIONS", "4"))
+POOL_MAXSIZE = int(os.getenv("HEIDI_HTTP_POOL_MAXSIZE", "32"))
+CONNECT_TIMEOUT = float(os.getenv("HEIDI_HTTP_CONNECT_TIMEOUT", "10"))
+READ_TIMEOUT = float(os.getenv("HEIDI_HTTP_READ_TIMEOUT", "30"))
+DEFAULT_TIMEOUT = (CONNECT_TIMEOUT, READ_TIMEOUT)
+# For calls that legitimately take long: note generation, audio upload.
+LONG_READ_TIMEOUT = float(os.getenv("HEIDI_HTTP_LONG_READ_TIMEOUT", "120"))
+LONG_TIMEOUT = (CONNECT_TIMEOUT, LONG_READ_TIMEOUT)
+
+_session: Optional[requests.Session] = None
+_session_lock = threading.Lock()
+# Called with the bearer token of every request Heidi answers with 401.
+_unauthorized_listeners: List[Callable[[str], None]] = []
+
+
+def _build_session() -> requests.Session:
+    session = requests.Session()
+    # Never wait for a pooled connection: SSE streams can hold one for the whole
+    # read timeout. Past POOL_MAXSIZE a throwaway connection is opened instead,
+    # and the resilience layer's concurrency limit bounds how many there are.
+    adapter = HTTPAdapter(
+        pool_connections=POOL_CONNECTIONS,
+        pool_maxsize=POOL_MAXSIZE,
+        pool_block=False,
+    )
+    session.mount("https://", adapter)
+    session.mount("http://", adapter)
+    session.headers["Connection"] = "keep-alive"
+    return session
+
+
+def get_session() -> requests.Session:
+    """Return the process-wide keep-alive session."""
+    global _session
+    if _session is None:
+        with _session_lock:
+            if _session is None:
+                _session = _build_session()
+    return _session
+
+
+def reset_session() -> None:
+    """Close pooled connections and start afresh on the next request."""
+    global _session
+    with _session_lock:
+        if _session is not None:
+            _session.close()
+        _session = None
+
+
+def add_unauthorized_listener(listener: Callable[[str], None]) -> None:
+    _unauthorized_listeners.append(listener)
+
+
+def remove_unauthorized_listener(listener: Callable[[str], None]) -> None:
+    if listener in _unauthorized_listeners:
+        _unauthorized_listeners.remove(listener)
+
+
+def notify_unauthorized(headers: Optional[Dict[str, Any]]) -> None:
+    """Tell listeners which bearer token Heidi just rejected."""
+    authorization = str((headers or {}).get("Authorization") or "")
+    if not authorization.startswith("Bearer "):
+        return
+    token = authorization[len("Bearer "):]
+    for listener in list(_unauthorized_listeners):
+        listener(token)
+
+
+def _record_body_on_close(response: requests.Response, endpoint: str) -> None:
+    # Streamed bodies are read by the caller, so count them when the response is released.
+    close = response.close
+    recorded = []
+
+    def close_and_record():
+        if not recorded:
+            recorded.append(True)
+            try:
+                metrics.record_received(endpoint, int(response.raw.tell()))
+            except (AttributeError, TypeError, ValueError):
+                pass
+        close()
+
+    response.close = close_and_record
+
+
+def _release_on_close(response: requests.Response, admission: Admission) -> None:
+    # A streamed response holds its concurrency slot until the caller is done with the body.
+    release = weakref.finalize(response, admission.release)
+    close = response.close
+
+    def close_and_release():
+        try:
+            close()
+        finally:
+            release()
+
+    response.close = close_and_release
+
+
+def unavailable_response(method: str, url: str, refusal: Dict[str, Any]) -> requests.Response:
+    """A local 503 standing in for a call the resilience layer refused to send."""
+    response = requests.Response()
+    response.status_code = 503
+    response.reason = "Service Unavailable"
+    response.url = url
+    response.headers["Content-Type"] = "application/json"
+    response.headers["Retry-After"] = str(refusal["retry_after"])
+    response._content = json.dumps(refusal).encode("utf-8")
+    response.request = requests.Request(method, url).prepare()
+    return response
+
+
+def request(method: str, url: str, **kwargs) -> requests.Response:
+    """
+    Send a request through the shared pool, applying the default timeout.
+
+    Calls refused by the resilience layer (open circuit, concurrency limit)
+    come back at once as a 503 response; see ``app.api.resilience``.
+    """
+    kwargs.setdefault("timeout", DEFAULT_TIMEOUT)
+    admission: Optional[Admission] = None
+    layer = get_resilience()
+    if layer is not None:
+        admission, refusal = layer.admit(method, url)
+        if refusal is not None:
+            return unavailable_response(method, url, refusal)
+
+    started = time.perf_counter()
+    try:
+        response = get_session().request(method, url, **kwargs)
+    except Exception:
+        metrics.record_upstream(method, url, "error", time.perf_counter() - started)
+        if admission is not None:
+            admission.finish(None)
+        raise
+
+    elapsed = time.perf_counter() - started
+    if response.status_code == 401:
+        notify_unauthorized(kwargs.get("headers"))
+    sent = metrics.content_length(response.request.headers)
+    if admission is not None:
+        admission.record(response.status_code)
+    if kwargs.get("stream"):
+        endpoint = metrics.record_upstream(method, url, str(response.status_code), elapsed, sent)
+        metrics.watch_first_chunk(response, endpoint, started)
+        _record_body_on_close(response, endpoint)
+        if admission is not None:
+            _release_on_close(response, admission)
+    else:
+        try:
+            received = len(response.content)
+        finally:
+            if admission is not None:
+                admission.release()
+        metrics.record_upstream(
+            method, url, str(response.status_code), elapsed, sent, received
+        )
+    return response
+
+
+def get(url: str, **kwargs) -> requests.Response:
+    return request("GET", url, **kwargs)
+
+
+def post(url: str, **kwargs) -> requests.Response:
+    return request("POST", url, **kwargs)
+
+
+def patch(url: str, **kwargs) -> requests.Response:
+    return request("PATCH", url, **kwargs)
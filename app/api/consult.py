@@ -1,10 +1,11 @@
-import requests
-from app.api import BASE_URL
+from app.api import BASE_URL, client
 import os
+from app.api.ask_heidi import iter_sse_chunks
 from app.api.session import create_session
 
 
-def get_consult_note_templates(jwt_token):
+def _templates_request(jwt_token):
+    """Return the url, headers and query params for the template catalogue."""
     url = f"{BASE_URL}/templates/consult-note-templates"
     headers = {
         "Authorization": f"Bearer {jwt_token}",
@@ -14,25 +15,11 @@ def get_consult_note_templates(jwt_token):
         "email": os.getenv("HEIDI_EMAIL"),
         "third_party_internal_id": os.getenv("HEIDI_USER_ID")
     }
-
-    try:
-        response = requests.get(url, headers=headers, params=params)
-        if response.status_code == 200:
-            return response.json()
-        else:
-            return {
-                "error": True,
-                "status_code": response.status_code,
-                "message": response.text
-            }
-    except Exception as e:
-        return {
-            "error": True,
-            "message": str(e)
-        }
+    return url, headers, params
 
 
-def generate_consult_note(jwt_token, session_id, template_id, voice_style="GOLDILOCKS", brain="LEFT", addition=""):
+def _consult_note_request(jwt_token, session_id, template_id, voice_style, brain, addition):
+    """Return the url, headers and JSON body for consult-note generation."""
     url = f"{BASE_URL}/sessions/{session_id}/consult-note"
     headers = {
         "Authorization": f"Bearer {jwt_token}",
@@ -47,16 +34,16 @@ def generate_consult_note(jwt_token, session_id, template_id, voice_style="GOLDI
         "voice_style": voice_style,
         "brain": brain
     }
+    return url, headers, payload
+
+
+def get_consult_note_templates(jwt_token):
+    url, headers, params = _templates_request(jwt_token)
 
     try:
-        response = requests.post(url, headers=headers, json=payload)
+        response = client.get(url, headers=headers, params=params)
         if response.status_code == 200:
-            # Read and decode streamed response
-            chunks = []
-            for chunk in response.iter_lines():
-                if chunk:
-                    chunks.append(chunk.decode("utf-8"))
-            return {"success": True, "note": "".join(chunks)}
+            return response.json()
         else:
             return {
                 "error": True,
@@ -68,3 +55,106 @@ def generate_consult_note(jwt_token, session_id, template_id, voice_style="GOLDI
             "error": True,
             "message": str(e)
         }
+
+
+def revalidate_consult_note_templates(jwt_token, etag=None, last_modified=None):
+    """
+    Conditionally fetch the template catalogue.
+
+    Returns ``{"status": 304}`` when the cached copy identified by ``etag`` /
+    ``last_modified`` is still current, ``{"status": 200, "catalogue": ...,
+    "etag": ..., "last_modified": ...}`` for a fresh copy, or an error dict.
+    """
+    url, headers, params = _templates_request(jwt_token)
+    if etag:
+        headers["If-None-Match"] = etag
+    if last_modified:
+        headers["If-Modified-Since"] = last_modified
+
+    try:
+        response = client.get(url, headers=headers, params=params)
+        if response.status_code == 304:
+            return {"status": 304}
+        if response.status_code == 200:
+            return {
+                "status": 200,
+                "catalogue": response.json(),
+                "etag": response.headers.get("ETag"),
+                "last_modified": response.headers.get("Last-Modified")
+            }
+        return {
+            "error": True,
+            "status_code": response.status_code,
+            "message": response.text
+        }
+    except Exception as e:
+        return {
+            "error": True,
+            "message": str(e)
+        }
+
+
+def _iter_note_text(response):
+    """Yield note text as it arrives and always release the connection."""
+    content_type = response.headers.get("Content-Type", "").lower()
+    try:
+        if "text/event-stream" in content_type:
+            yield from iter_sse_chunks(response)
+        else:
+            # Plain-text bodies are relayed verbatim, newlines included.
+            if "charset" not in content_type:
+                response.encoding = "utf-8"
+            for text in response.iter_content(chunk_size=None, decode_unicode=True):
+                if text:
+                    yield text
+    finally:
+        response.close()
+
+
+def open_consult_note_stream(jwt_token, session_id, template_id, voice_style="GOLDILOCKS", brain="LEFT", addition=""):
+    """
+    Start consult-note generation without buffering the note.
+
+    Returns ``(chunks, None)``, where ``chunks`` yields note text as Heidi
+    produces it, or ``(None, error)``.
+    """
+    url, headers, payload = _consult_note_request(
+        jwt_token, session_id, template_id, voice_style, brain, addition
+    )
+
+    try:
+        response = client.post(
+            url, headers=headers, json=payload, stream=True, timeout=client.LONG_TIMEOUT
+        )
+    except Exception as e:
+        return None, {
+            "error": True,
+            "message": str(e)
+        }
+
+    if response.status_code != 200:
+        error = {
+            "error": True,
+            "status_code": response.status_code,
+            "message": response.text
+        }
+        response.close()
+        return None, error
+
+    return _iter_note_text(response), None
+
+
+def generate_consult_note(jwt_token, session_id, template_id, voice_style="GOLDILOCKS", brain="LEFT", addition=""):
+    chunks, error = open_consult_note_stream(
+        jwt_token, session_id, template_id, voice_style, brain, addition
+    )
+    if error:
+        return error
+
+    try:
+        return {"success": True, "note": "".join(chunks)}
+    except Exception as e:
+        return {
+            "error": True,
+            "message": str(e)
+        }
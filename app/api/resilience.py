@@ -0,0 +1,411 @@
+"""
+Circuit breakers, an adaptive concurrency limit and a retry budget for Heidi API calls.
+
+Every upstream call is admitted by ``Resilience.admit`` first. A call is
+refused locally, and turned into a 503 by the clients, when its endpoint's
+breaker is open (too many recent errors or slow responses) or when the
+number of concurrent upstream calls has reached the AIMD limit. The limit
+grows by one per "round" of healthy calls and halves on errors or slow
+answers. Fallback loops ask the retry budget before sending a retry, so a
+struggling upstream sees at most ``HEIDI_RETRY_BUDGET_RATIO`` extra load.
+"""
+import asyncio
+import logging
+import os
+import threading
+import time
+from collections import deque
+from typing import Any, Callable, Deque, Dict, Optional, Tuple
+
+from app import metrics
+
+logger = logging.getLogger(__name__)
+
+# Breakers judge the last BREAKER_WINDOW calls per endpoint, once there are BREAKER_MIN_CALLS.
+BREAKER_WINDOW = int(os.getenv("HEIDI_BREAKER_WINDOW", "20"))
+BREAKER_MIN_CALLS = int(os.getenv("HEIDI_BREAKER_MIN_CALLS", "10"))
+BREAKER_ERROR_RATE = float(os.getenv("HEIDI_BREAKER_ERROR_RATE", "0.5"))
+# Calls slower than this (to response headers) count as slow.
+BREAKER_SLOW_SECONDS = float(os.getenv("HEIDI_BREAKER_SLOW_SECONDS", "20"))
+BREAKER_SLOW_RATE = float(os.getenv("HEIDI_BREAKER_SLOW_RATE", "0.8"))
+# How long an open breaker refuses calls before letting one probe through.
+BREAKER_OPEN_SECONDS = float(os.getenv("HEIDI_BREAKER_OPEN_SECONDS", "15"))
+
+LIMIT_INITIAL = int(os.getenv("HEIDI_UPSTREAM_LIMIT_INITIAL", "16"))
+LIMIT_MIN = int(os.getenv("HEIDI_UPSTREAM_LIMIT_MIN", "2"))
+LIMIT_MAX = int(os.getenv("HEIDI_UPSTREAM_LIMIT_MAX", "64"))
+# How long a call may wait for a free slot before it is refused.
+LIMIT_QUEUE_SECONDS = float(os.getenv("HEIDI_UPSTREAM_QUEUE_SECONDS", "0.5"))
+
+# Retries allowed per request sent, plus a floor so a quiet service can still retry.
+RETRY_BUDGET_RATIO = float(os.getenv("HEIDI_RETRY_BUDGET_RATIO", "0.2"))
+RETRY_BUDGET_MIN_PER_SECOND = float(os.getenv("HEIDI_RETRY_BUDGET_MIN_PER_SECOND", "1"))
+RETRY_BUDGET_SECONDS = 10.0
+# Failures a retry cannot fix: auth, a missing session or recording, and refusals.
+NON_RETRYABLE_STATUSES = frozenset({401, 403, 404, 503})
+
+CLOSED, OPEN, HALF_OPEN = "closed", "open", "half_open"
+
+
+def is_failure(status: Optional[int]) -> bool:
+    """Transport errors (``None``), 5xx and 429 count against the upstream; other 4xx do not."""
+    return status is None or status >= 500 or status == 429
+
+
+class CircuitBreaker:
+    """Closed -> open on error or slow-call rate -> half-open single probe -> closed."""
+
+    def __init__(
+        self,
+        name: str,
+        window: int = BREAKER_WINDOW,
+        min_calls: int = BREAKER_MIN_CALLS,
+        error_rate: float = BREAKER_ERROR_RATE,
+        slow_seconds: float = BREAKER_SLOW_SECONDS,
+        slow_rate: float = BREAKER_SLOW_RATE,
+        open_seconds: float = BREAKER_OPEN_SECONDS,
+        clock: Callable[[], float] = time.monotonic,
+    ):
+        self.name = name
+        self.min_calls = max(1, min_calls)
+        self.error_rate = error_rate
+        self.slow_seconds = slow_seconds
+        self.slow_rate = slow_rate
+        self.open_seconds = open_seconds
+        self._clock = clock
+        self._outcomes: Deque[Tuple[bool, bool]] = deque(maxlen=max(window, self.min_calls))
+        self._state = CLOSED
+        self._opened_at = 0.0
+        self._probing = False
+        self._lock = threading.Lock()
+
+    @property
+    def state(self) -> str:
+        with self._lock:
+            return self._state
+
+    def allow(self) -> bool:
+        """True if a call may go out now; in half-open state only one probe at a time may."""
+        with self._lock:
+            if self._state == OPEN:
+                if self._clock() - self._opened_at < self.open_seconds:
+                    return False
+                self._state, self._probing = HALF_OPEN, False
+            if self._state == HALF_OPEN:
+                if self._probing:
+                    return False
+                self._probing = True
+            return True
+
+    def cancel_probe(self) -> None:
+        """Hand back a half-open probe slot for a call that never went out."""
+        with self._lock:
+            if self._state == HALF_OPEN:
+                self._probing = False
+
+    def retry_after(self) -> float:
+        with self._lock:
+            if self._state != OPEN:
+                return 0.0
+            return max(0.0, self.open_seconds - (self._clock() - self._opened_at))
+
+    def record(self, failed: bool, seconds: float) -> None:
+        slow = seconds >= self.slow_seconds
+        with self._lock:
+            if self._state == HALF_OPEN:
+                self._probing = False
+                if failed or slow:
+                    self._trip("probe failed")
+                else:
+                    self._state = CLOSED
+                    self._outcomes.clear()
+                    logger.info("Circuit for %s closed again", self.name)
+                return
+            if self._state == OPEN:
+                return  # a call admitted before the breaker opened
+
+            self._outcomes.append((failed, slow))
+            calls = len(self._outcomes)
+            if calls < self.min_calls:
+                return
+            errors = sum(1 for failed_call, _ in self._outcomes if failed_call)
+            slow_calls = sum(1 for _, slow_call in self._outcomes if slow_call)
+            if errors / calls >= self.error_rate:
+                self._trip(f"{errors}/{calls} recent calls failed")
+            elif slow_calls / calls >= self.slow_rate:
+                self._trip(f"{slow_calls}/{calls} recent calls took over {self.slow_seconds:g}s")
+
+    def _trip(self, reason: str) -> None:
+        self._state = OPEN
+        self._opened_at = self._clock()
+        self._outcomes.clear()
+        logger.warning("Circuit for %s opened for %.0fs: %s", self.name, self.open_seconds, reason)
+
+
+class AdaptiveLimiter:
+    """
+    AIMD cap on concurrent upstream calls.
+
+    Each healthy call raises the limit by ``1 / limit`` (about one per full
+    round of calls); an error or slow call halves it, at most once per
+    ``decrease_interval`` so one burst of failures counts as one signal.
+    """
+
+    def __init__(
+        self,
+        initial: int = LIMIT_INITIAL,
+        minimum: int = LIMIT_MIN,
+        maximum: int = LIMIT_MAX,
+        slow_seconds: float = BREAKER_SLOW_SECONDS,
+        backoff: float = 0.5,
+        decrease_interval: float = 1.0,
+        clock: Callable[[], float] = time.monotonic,
+    ):
+        self.minimum = max(1, minimum)
+        self.maximum = max(self.minimum, maximum)
+        self.slow_seconds = slow_seconds
+        self.backoff = backoff
+        self.decrease_interval = decrease_interval
+        self._clock = clock
+        self._limit = float(min(max(initial, self.minimum), self.maximum))
+        self._in_flight = 0
+        self._last_decrease = float("-inf")
+        self._cond = threading.Condition()
+
+    @property
+    def limit(self) -> int:
+        with self._cond:
+            return int(self._limit)
+
+    @property
+    def in_flight(self) -> int:
+        with self._cond:
+            return self._in_flight
+
+    def acquire(self, timeout: float = 0.0) -> bool:
+        """Take a slot, waiting up to ``timeout`` seconds for one; False if none came free."""
+        deadline = time.monotonic() + timeout
+        with self._cond:
+            while self._in_flight >= int(self._limit):
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    return False
+                self._cond.wait(remaining)
+            self._in_flight += 1
+            return True
+
+    def sample(self, failed: bool, seconds: float) -> None:
+        """Adjust the limit from one call's outcome."""
+        with self._cond:
+            if failed or seconds >= self.slow_seconds:
+                now = self._clock()
+                if now - self._last_decrease >= self.decrease_interval:
+                    self._limit = max(float(self.minimum), self._limit * self.backoff)
+                    self._last_decrease = now
+            else:
+                self._limit = min(float(self.maximum), self._limit + 1 / self._limit)
+                self._cond.notify_all()
+
+    def release(self) -> None:
+        with self._cond:
+            self._in_flight -= 1
+            self._cond.notify()
+
+
+class RetryBudget:
+    """Allow retries up to ``ratio`` of recent requests, plus ``min_per_second``."""
+
+    def __init__(
+        self,
+        ratio: float = RETRY_BUDGET_RATIO,
+        min_per_second: float = RETRY_BUDGET_MIN_PER_SECOND,
+        window_seconds: float = RETRY_BUDGET_SECONDS,
+        clock: Callable[[], float] = time.monotonic,
+    ):
+        self.ratio = ratio
+        self.min_per_second = min_per_second
+        self.window_seconds = window_seconds
+        self._clock = clock
+        self._requests: Deque[float] = deque()
+        self._retries: Deque[float] = deque()
+        self._lock = threading.Lock()
+
+    def _prune(self, now: float) -> None:
+        horizon = now - self.window_seconds
+        for stamps in (self._requests, self._retries):
+            while stamps and stamps[0] < horizon:
+                stamps.popleft()
+
+    def record_request(self) -> None:
+        with self._lock:
+            now = self._clock()
+            self._prune(now)
+            self._requests.append(now)
+
+    def try_spend(self) -> bool:
+        """Take one retry from the budget; False means do not retry."""
+        with self._lock:
+            now = self._clock()
+            self._prune(now)
+            allowed = self.ratio * len(self._requests) + self.min_per_second * self.window_seconds
+            if len(self._retries) >= allowed:
+                return False
+            self._retries.append(now)
+            return True
+
+
+class Admission:
+    """One admitted upstream call: report its status once, and release its slot once."""
+
+    def __init__(self, breaker: CircuitBreaker, limiter: AdaptiveLimiter):
+        self._breaker = breaker
+        self._limiter = limiter
+        self._started = time.perf_counter()
+        self._recorded = False
+        self._released = False
+        self._lock = threading.Lock()
+
+    def record(self, status: Optional[int]) -> None:
+        """Feed the outcome (``None`` for a transport error) to the breaker and limiter."""
+        with self._lock:
+            if self._recorded:
+                return
+            self._recorded = True
+        failed, seconds = is_failure(status), time.perf_counter() - self._started
+        self._breaker.record(failed, seconds)
+        self._limiter.sample(failed, seconds)
+
+    def release(self) -> None:
+        with self._lock:
+            if self._released:
+                return
+            self._released = True
+        self._limiter.release()
+
+    def finish(self, status: Optional[int]) -> None:
+        self.record(status)
+        self.release()
+
+
+class Resilience:
+    """Per-endpoint breakers, one shared limiter and one retry budget."""
+
+    def __init__(
+        self,
+        limiter: Optional[AdaptiveLimiter] = None,
+        retry_budget: Optional[RetryBudget] = None,
+        breaker_factory: Callable[[str], CircuitBreaker] = CircuitBreaker,
+        queue_seconds: float = LIMIT_QUEUE_SECONDS,
+    ):
+        self.limiter = limiter or AdaptiveLimiter()
+        self.retry_budget = retry_budget or RetryBudget()
+        self.queue_seconds = queue_seconds
+        self._breaker_factory = breaker_factory
+        self._breakers: Dict[str, CircuitBreaker] = {}
+        self._lock = threading.Lock()
+
+    def breaker(self, name: str) -> CircuitBreaker:
+        with self._lock:
+            breaker = self._breakers.get(name)
+            if breaker is None:
+                breaker = self._breakers[name] = self._breaker_factory(name)
+            return breaker
+
+    def admit(self, method: str, url: str) -> Tuple[Optional[Admission], Optional[Dict[str, Any]]]:
+        """
+        Return ``(admission, None)`` for a call that may go out, or
+        ``(None, refusal)`` describing why it was refused.
+        """
+        name, breaker, refusal = self._check_breaker(method, url)
+        if refusal is not None:
+            return None, refusal
+        if not self.limiter.acquire(self.queue_seconds):
+            return None, self._overloaded(name, breaker)
+        return Admission(breaker, self.limiter), None
+
+    async def admit_async(self, method: str, url: str) -> Tuple[Optional[Admission], Optional[Dict[str, Any]]]:
+        """``admit`` that waits for a slot without blocking the event loop."""
+        name, breaker, refusal = self._check_breaker(method, url)
+        if refusal is not None:
+            return None, refusal
+        deadline = time.monotonic() + self.queue_seconds
+        while not self.limiter.acquire():
+            if time.monotonic() >= deadline:
+                return None, self._overloaded(name, breaker)
+            await asyncio.sleep(0.01)
+        return Admission(breaker, self.limiter), None
+
+    def _check_breaker(self, method: str, url: str) -> Tuple[str, CircuitBreaker, Optional[Dict[str, Any]]]:
+        name = f"{method.upper()} {metrics.endpoint_label(url)}"
+        breaker = self.breaker(name)
+        if not breaker.allow():
+            return name, breaker, self._refuse(
+                name, "circuit_open", breaker.retry_after(),
+                "Too many recent errors or slow responses from this endpoint",
+            )
+        self.retry_budget.record_request()
+        return name, breaker, None
+
+    def _overloaded(self, name: str, breaker: CircuitBreaker) -> Dict[str, Any]:
+        breaker.cancel_probe()
+        return self._refuse(
+            name, "overloaded", 1.0, f"Concurrent Heidi API call limit ({self.limiter.limit}) reached"
+        )
+
+    @staticmethod
+    def _refuse(name: str, reason: str, retry_after: float, message: str) -> Dict[str, Any]:
+        metrics.UPSTREAM_REFUSED.inc((name, reason))
+        logger.info("Refused %s locally: %s", name, reason)
+        return {
+            "error": "Heidi API unavailable",
+            "reason": reason,
+            "endpoint": name,
+            "message": f"{message}; failing fast instead of waiting",
+            "retry_after": max(1, round(retry_after)),
+        }
+
+    def snapshot(self) -> Dict[str, Any]:
+        with self._lock:
+            breakers = {name: breaker.state for name, breaker in self._breakers.items()}
+        return {
+            "limit": self.limiter.limit,
+            "in_flight": self.limiter.in_flight,
+            "breakers": breakers,
+        }
+
+
+_UNSET: Any = object()
+_resilience: Any = _UNSET
+_resilience_lock = threading.Lock()
+
+
+def get_resilience() -> Optional[Resilience]:
+    """Return the process-wide layer, or None when ``HEIDI_RESILIENCE`` is off."""
+    global _resilience
+    if _resilience is _UNSET:
+        with _resilience_lock:
+            if _resilience is _UNSET:
+                enabled = os.getenv("HEIDI_RESILIENCE", "on").lower() not in ("0", "off", "false", "no")
+                _resilience = Resilience() if enabled else None
+    return _resilience
+
+
+def configure_resilience(layer: Optional[Resilience] = _UNSET) -> None:
+    """Install a layer (None disables it), or reset to re-read the environment on next use."""
+    global _resilience
+    with _resilience_lock:
+        _resilience = layer
+
+
+def is_retryable(error: dict) -> bool:
+    """False for failures that retrying, or switching content type, cannot fix."""
+    return error.get("status_code") not in NON_RETRYABLE_STATUSES
+
+
+def retry_allowed() -> bool:
+    """Spend one retry from the shared budget; always True when the layer is off."""
+    layer = get_resilience()
+    if layer is None or layer.retry_budget.try_spend():
+        return True
+    logger.warning("Retry budget exhausted; not retrying")
+    return False
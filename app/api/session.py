@@ -1,39 +1,81 @@
-import requests
-from app.api import BASE_URL
+import logging
 import os
 
+from app.api import BASE_URL, client
 
-def create_session(jwt_token):
-    url = f"{BASE_URL}/sessions"
+logger = logging.getLogger(__name__)
+
+
+def _session_headers(jwt_token, json_body=False):
     headers = {
         "Authorization": f"Bearer {jwt_token}",
-        "Content-Type": "application/json",
         "Heidi-Api-Key": os.getenv("HEIDI_API_KEY")
     }
+    if json_body:
+        headers["Content-Type"] = "application/json"
+    return headers
+
+
+def _create_session_request(jwt_token):
+    """Return the url, headers and JSON body for ``POST /sessions``."""
+    url = f"{BASE_URL}/sessions"
+    headers = _session_headers(jwt_token, json_body=True)
 
     # Add payload instead of params
     payload = {
         "email": os.getenv("HEIDI_EMAIL"),
         "third_party_internal_id": os.getenv("HEIDI_USER_ID")
     }
+    return url, headers, payload
+
+
+def _session_id_from_response(response_data):
+    # Try both possible response formats
+    return response_data.get("session_id") or response_data.get("id")
+
+
+def _update_session_payload(
+    duration=None,
+    language_code=None,
+    output_language_code=None,
+    patient=None,
+    clinician_notes=None,
+    generate_output_without_recording=None,
+):
+    payload = {}
+    if duration is not None:
+        payload["duration"] = duration
+    if language_code is not None:
+        payload["language_code"] = language_code
+    if output_language_code is not None:
+        payload["output_language_code"] = output_language_code
+    if patient is not None:
+        payload["patient"] = patient
+    if clinician_notes is not None:
+        payload["clinician_notes"] = clinician_notes
+    if generate_output_without_recording is not None:
+        payload["generate_output_without_recording"] = generate_output_without_recording
+    return payload
+
+
+def create_session(jwt_token):
+    url, headers, payload = _create_session_request(jwt_token)
 
     try:
-        response = requests.post(url, headers=headers, json=payload)
-        print(f"Session creation response: {response.status_code}")
-        print(f"Response body: {response.text}")
+        response = client.post(url, headers=headers, json=payload)
+        logger.debug("Session creation answered %s", response.status_code)
 
         if response.status_code == 200 or response.status_code == 201:
-            response_data = response.json()
-            # Try both possible response formats
-            session_id = response_data.get("session_id") or response_data.get("id")
-            return session_id
+            return _session_id_from_response(response.json())
         else:
+            logger.warning("Session creation failed with %s", response.status_code)
             return {
                 "error": True,
                 "status_code": response.status_code,
                 "message": response.text
             }
     except Exception as e:
+        logger.warning("Session creation failed: %s", e)
         return {
             "error": True,
             "message": str(e)
@@ -41,14 +83,10 @@ def create_session(jwt_token):
 
 
 def get_session_details(jwt_token, session_id):
-    print(os.getenv("HEIDI_API_KEY"))
     url = f"{BASE_URL}/sessions/{session_id}"
-    headers = {
-        "Authorization": f"Bearer {jwt_token}",
-        "Heidi-Api-Key": os.getenv("HEIDI_API_KEY")
-    }
+    headers = _session_headers(jwt_token)
     try:
-        response = requests.get(url, headers=headers)
+        response = client.get(url, headers=headers)
         if response.status_code == 200:
             return response.json()
         else:
@@ -75,27 +113,18 @@ def update_session(
     generate_output_without_recording: bool = None
 ):
     url = f"{BASE_URL}/sessions/{session_id}"
-    headers = {
-        "Authorization": f"Bearer {jwt_token}",
-        "Content-Type": "application/json",
-        "Heidi-Api-Key": os.getenv("HEIDI_API_KEY")
-    }
-    payload = {}
-    if duration is not None:
-        payload["duration"] = duration
-    if language_code is not None:
-        payload["language_code"] = language_code
-    if output_language_code is not None:
-        payload["output_language_code"] = output_language_code
-    if patient is not None:
-        payload["patient"] = patient
-    if clinician_notes is not None:
-        payload["clinician_notes"] = clinician_notes
-    if generate_output_without_recording is not None:
-        payload["generate_output_without_recording"] = generate_output_without_recording
+    headers = _session_headers(jwt_token, json_body=True)
+    payload = _update_session_payload(
+        duration=duration,
+        language_code=language_code,
+        output_language_code=output_language_code,
+        patient=patient,
+        clinician_notes=clinician_notes,
+        generate_output_without_recording=generate_output_without_recording,
+    )
 
     try:
-        response = requests.patch(url, headers=headers, json=payload)
+        response = client.patch(url, headers=headers, json=payload)
         if response.status_code == 200:
             return response.json()
         else:
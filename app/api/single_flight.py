@@ -0,0 +1,382 @@
+"""
+Coalescing of identical in-flight upstream calls ("single flight").
+
+``SingleFlight`` shares one call's result with every concurrent caller using
+the same key. ``StreamFlights`` does the same for chunk streams: the first
+caller opens the upstream stream, later callers replay the chunks already
+received and then follow along live. A flight is forgotten as soon as it
+finishes, so this removes duplicate load during bursts without caching.
+The ``Async*`` classes are the asyncio equivalents.
+"""
+import asyncio
+import contextlib
+import threading
+from typing import Any, AsyncIterator, Awaitable, Callable, Dict, Hashable, Iterator, List, Optional, Tuple
+
+# (chunks, None) or (None, error), as returned by ``open_ai_stream``.
+OpenResult = Tuple[Optional[Any], Optional[dict]]
+
+_OPEN_FAILED = {"error": True, "message": "Upstream stream could not be opened"}
+
+
+class _Call:
+    def __init__(self) -> None:
+        self.done = threading.Event()
+        self.result: Any = None
+        self.exception: Optional[BaseException] = None
+
+
+class SingleFlight:
+    """Run at most one call per key; concurrent callers with that key wait for its result."""
+
+    def __init__(self) -> None:
+        self._lock = threading.Lock()
+        self._calls: Dict[Hashable, _Call] = {}
+
+    def do(self, key: Hashable, fn: Callable[[], Any]) -> Tuple[Any, bool]:
+        """Return ``(result, shared)``; ``shared`` is True for callers that joined another's call."""
+        with self._lock:
+            call = self._calls.get(key)
+            leader = call is None
+            if leader:
+                call = self._calls[key] = _Call()
+
+        if not leader:
+            call.done.wait()
+            if call.exception is not None:
+                raise call.exception
+            return call.result, True
+
+        try:
+            call.result = fn()
+        except BaseException as exc:
+            call.exception = exc
+            raise
+        finally:
+            with self._lock:
+                del self._calls[key]
+            call.done.set()
+        return call.result, False
+
+
+class _Broadcast:
+    """One upstream chunk stream read on demand by whichever subscriber is furthest ahead."""
+
+    def __init__(self) -> None:
+        self.opened = threading.Event()
+        self.error: Optional[dict] = None
+        self.subscribers = 0
+        self._upstream: Optional[Iterator[str]] = None
+        self._chunks: List[str] = []
+        self._done = False
+        self._exception: Optional[BaseException] = None
+        self._pulling = False
+        self._cond = threading.Condition()
+
+    def start(self, upstream: Optional[Iterator[str]], error: Optional[dict]) -> None:
+        if upstream is None and error is None:
+            error = dict(_OPEN_FAILED)
+        self._upstream, self.error = upstream, error
+        self.opened.set()
+
+    def read(self, index: int) -> Optional[str]:
+        """Chunk ``index``, pulling it from upstream if nobody has yet; None at the end."""
+        with self._cond:
+            while True:
+                if index < len(self._chunks):
+                    return self._chunks[index]
+                if self._done:
+                    if self._exception is not None:
+                        raise self._exception
+                    return None
+                if not self._pulling:
+                    self._pulling = True
+                    break
+                self._cond.wait()
+
+        try:
+            chunk = next(self._upstream)  # type: ignore[arg-type]
+        except StopIteration:
+            self._finish(None)
+            return None
+        except Exception as exc:
+            self._finish(exc)
+            raise
+        with self._cond:
+            self._chunks.append(chunk)
+            self._pulling = False
+            self._cond.notify_all()
+        return chunk
+
+    @property
+    def done(self) -> bool:
+        with self._cond:
+            return self._done
+
+    def _finish(self, exception: Optional[BaseException]) -> None:
+        with self._cond:
+            self._done = True
+            self._exception = exception
+            self._pulling = False
+            self._cond.notify_all()
+
+    def abandon(self) -> None:
+        """Close the upstream once no subscriber is left to read it."""
+        self._finish(None)
+        close = getattr(self._upstream, "close", None)
+        if close is not None:
+            close()
+
+
+class _Subscriber:
+    """Iterator over a broadcast from the first chunk; ``close()`` detaches it."""
+
+    def __init__(self, flights: "StreamFlights", key: Hashable, flight: _Broadcast) -> None:
+        self._flights = flights
+        self._key = key
+        self._flight = flight
+        self._index = 0
+        self._closed = False
+
+    def __iter__(self) -> "_Subscriber":
+        return self
+
+    def __next__(self) -> str:
+        if self._closed:
+            raise StopIteration
+        try:
+            chunk = self._flight.read(self._index)
+        except BaseException:
+            self.close()
+            raise
+        if chunk is None:
+            self.close()
+            raise StopIteration
+        self._index += 1
+        return chunk
+
+    def close(self) -> None:
+        if not self._closed:
+            self._closed = True
+            self._flights._leave(self._key, self._flight)
+
+
+class StreamFlights:
+    """Share one open upstream chunk stream between concurrent callers with the same key."""
+
+    def __init__(self) -> None:
+        self._lock = threading.Lock()
+        self._flights: Dict[Hashable, _Broadcast] = {}
+
+    def open(
+        self, key: Hashable, opener: Callable[[], OpenResult]
+    ) -> Tuple[Optional[Iterator[str]], Optional[dict], bool]:
+        """
+        Return ``(chunks, error, shared)``.
+
+        The first caller runs ``opener``; everyone else waits for it and gets
+        an iterator replaying the stream from its first chunk. Each iterator
+        must be exhausted or closed; the upstream is closed when the last
+        one is.
+        """
+        with self._lock:
+            flight = self._flights.get(key)
+            leader = flight is None
+            if leader:
+                flight = self._flights[key] = _Broadcast()
+            flight.subscribers += 1
+
+        if leader:
+            try:
+                upstream, error = opener()
+            except BaseException:
+                flight.start(None, None)
+                self._leave(key, flight)
+                raise
+            flight.start(upstream, error)
+        else:
+            flight.opened.wait()
+
+        if flight.error is not None:
+            self._leave(key, flight)
+            return None, dict(flight.error), not leader
+        return _Subscriber(self, key, flight), None, not leader
+
+    def _leave(self, key: Hashable, flight: _Broadcast) -> None:
+        with self._lock:
+            flight.subscribers -= 1
+            last = flight.subscribers == 0
+            # Finished or failed flights take no new subscribers; later callers start afresh.
+            if (last or flight.error is not None or flight.done) and self._flights.get(key) is flight:
+                del self._flights[key]
+        if last and flight.error is None and not flight.done:
+            flight.abandon()
+
+    def in_flight(self) -> int:
+        with self._lock:
+            return len(self._flights)
+
+
+class _AsyncCall:
+    def __init__(self, task: "asyncio.Task[Any]") -> None:
+        self.task = task
+        self.waiters = 0
+
+
+class AsyncSingleFlight:
+    """``SingleFlight`` for coroutines; the call is cancelled only when every waiter is."""
+
+    def __init__(self) -> None:
+        self._calls: Dict[Hashable, _AsyncCall] = {}
+
+    def _current(self, key: Hashable) -> Optional[_AsyncCall]:
+        call = self._calls.get(key)
+        if call is not None and call.task.get_loop() is not asyncio.get_running_loop():
+            return None
+        return call
+
+    async def do(self, key: Hashable, fn: Callable[[], Awaitable[Any]]) -> Tuple[Any, bool]:
+        call = self._current(key)
+        shared = call is not None
+        if call is None:
+            call = self._calls[key] = _AsyncCall(asyncio.ensure_future(fn()))
+            call.task.add_done_callback(lambda _: self._discard(key, call))
+
+        call.waiters += 1
+        try:
+            return await asyncio.shield(call.task), shared
+        finally:
+            call.waiters -= 1
+            if call.waiters == 0 and not call.task.done():
+                call.task.cancel()
+
+    def _discard(self, key: Hashable, call: _AsyncCall) -> None:
+        if self._calls.get(key) is call:
+            del self._calls[key]
+
+
+class _AsyncBroadcast:
+    def __init__(self, opening: "asyncio.Task[OpenResult]") -> None:
+        self.opening = opening
+        self.subscribers = 0
+        self.error: Optional[dict] = None
+        self._upstream: Optional[AsyncIterator[str]] = None
+        self._chunks: List[str] = []
+        self.done = False
+        self._exception: Optional[BaseException] = None
+        self._pending: Optional["asyncio.Task[None]"] = None
+
+    async def wait_opened(self) -> Optional[dict]:
+        upstream, error = await asyncio.shield(self.opening)
+        if upstream is None and error is None:
+            error = dict(_OPEN_FAILED)
+        self._upstream, self.error = upstream, error
+        return error
+
+    async def read(self, index: int) -> Optional[str]:
+        while True:
+            if index < len(self._chunks):
+                return self._chunks[index]
+            if self.done:
+                if self._exception is not None:
+                    raise self._exception
+                return None
+            if self._pending is None:
+                self._pending = asyncio.ensure_future(self._pull())
+            # Shielded so a reader whose client went away does not break the stream for the rest.
+            await asyncio.shield(self._pending)
+
+    async def _pull(self) -> None:
+        try:
+            chunk = await self._upstream.__anext__()  # type: ignore[union-attr]
+        except StopAsyncIteration:
+            self.done = True
+        except Exception as exc:
+            self.done, self._exception = True, exc
+        else:
+            self._chunks.append(chunk)
+        finally:
+            self._pending = None
+
+    async def abandon(self) -> None:
+        self.done = True
+        for task in (self._pending, self.opening):
+            if task is not None and not task.done():
+                task.cancel()
+                with contextlib.suppress(asyncio.CancelledError):
+                    await task
+        opening = self.opening
+        if self._upstream is None and opening.done() and not opening.cancelled() and opening.exception() is None:
+            self._upstream = opening.result()[0]
+        if self._upstream is not None:
+            await self._upstream.aclose()  # type: ignore[attr-defined]
+
+
+class _AsyncSubscriber:
+    def __init__(self, flights: "AsyncStreamFlights", key: Hashable, flight: _AsyncBroadcast) -> None:
+        self._flights = flights
+        self._key = key
+        self._flight = flight
+        self._index = 0
+        self._closed = False
+
+    def __aiter__(self) -> "_AsyncSubscriber":
+        return self
+
+    async def __anext__(self) -> str:
+        if self._closed:
+            raise StopAsyncIteration
+        try:
+            chunk = await self._flight.read(self._index)
+        except BaseException:
+            await self.aclose()
+            raise
+        if chunk is None:
+            await self.aclose()
+            raise StopAsyncIteration
+        self._index += 1
+        return chunk
+
+    async def aclose(self) -> None:
+        if not self._closed:
+            self._closed = True
+            await self._flights._leave(self._key, self._flight)
+
+
+class AsyncStreamFlights:
+    """``StreamFlights`` for async chunk iterators."""
+
+    def __init__(self) -> None:
+        self._flights: Dict[Hashable, _AsyncBroadcast] = {}
+
+    async def open(
+        self, key: Hashable, opener: Callable[[], Awaitable[OpenResult]]
+    ) -> Tuple[Optional[AsyncIterator[str]], Optional[dict], bool]:
+        flight = self._flights.get(key)
+        if flight is not None and flight.opening.get_loop() is not asyncio.get_running_loop():
+            flight = None
+        shared = flight is not None
+        if flight is None:
+            flight = self._flights[key] = _AsyncBroadcast(asyncio.ensure_future(opener()))
+        flight.subscribers += 1
+
+        try:
+            error = await flight.wait_opened()
+        except BaseException:
+            await self._leave(key, flight)
+            raise
+        if error is not None:
+            await self._leave(key, flight)
+            return None, dict(error), shared
+        return _AsyncSubscriber(self, key, flight), None, shared
+
+    async def _leave(self, key: Hashable, flight: _AsyncBroadcast) -> None:
+        flight.subscribers -= 1
+        last = flight.subscribers == 0
+        if (last or flight.error is not None or flight.done) and self._flights.get(key) is flight:
+            del self._flights[key]
+        if last and flight.error is None and not flight.done:
+            await flight.abandon()
+
+    def in_flight(self) -> int:
+        return len(self._flights)
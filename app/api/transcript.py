@@ -1,14 +1,128 @@
-import requests
-from app.api import BASE_URL
+from app.api import BASE_URL, client
+import io
 import os
-def start_transcription(jwt_token, session_id):
-    url = f"{BASE_URL}/sessions/{session_id}/restful-segment-transcription"
-    headers = {
+import shutil
+import tempfile
+import uuid
+
+# Memory a body of unknown length may use before spilling to a temp file.
+SPOOL_MEMORY_LIMIT = int(os.getenv("HEIDI_UPLOAD_SPOOL_BYTES", str(1024 * 1024)))
+_READ_BLOCK = 64 * 1024
+# RFC 7578 section 4.2: escape what would end the quoted name or the header line.
+_PARAM_ESCAPES = str.maketrans({'"': "%22", "\r": "%0D", "\n": "%0A"})
+
+
+def _header_param(value):
+    """``value`` safe to place inside a quoted Content-Disposition parameter."""
+    return str(value).translate(_PARAM_ESCAPES)
+
+
+def _strip_line_breaks(value):
+    return str(value).replace("\r", "").replace("\n", "")
+
+
+class _MultipartStream(io.RawIOBase):
+    """
+    A ``multipart/form-data`` body that reads the file part lazily.
+
+    ``requests`` sends file-like bodies block by block, so the audio flows
+    from ``fileobj`` to the socket without being copied into memory.
+    """
+
+    def __init__(self, fields, file_field, filename, fileobj, file_length, file_content_type):
+        boundary = uuid.uuid4().hex
+        self.content_type = f"multipart/form-data; boundary={boundary}"
+        preamble = b""
+        for name, value in fields.items():
+            preamble += (
+                f"--{boundary}\r\n"
+                f'Content-Disposition: form-data; name="{_header_param(name)}"\r\n\r\n'
+                f"{value}\r\n"
+            ).encode("utf-8")
+        preamble += (
+            f"--{boundary}\r\n"
+            f'Content-Disposition: form-data; name="{_header_param(file_field)}";'
+            f' filename="{_header_param(filename)}"\r\n'
+            f"Content-Type: {_strip_line_breaks(file_content_type)}\r\n\r\n"
+        ).encode("utf-8")
+        epilogue = f"\r\n--{boundary}--\r\n".encode("utf-8")
+        self._length = len(preamble) + file_length + len(epilogue)
+        self._parts = [io.BytesIO(preamble), fileobj, io.BytesIO(epilogue)]
+        self._position = 0
+
+    def __len__(self):
+        return self._length
+
+    def tell(self):
+        # requests subtracts tell() from len() to size the body.
+        return self._position
+
+    def readable(self):
+        return True
+
+    def read(self, size=-1):
+        if size is None or size < 0:
+            size = self._length
+        chunks = []
+        while size > 0 and self._parts:
+            chunk = self._parts[0].read(size)
+            if not chunk:
+                self._parts.pop(0)
+                continue
+            chunks.append(chunk)
+            size -= len(chunk)
+        data = b"".join(chunks)
+        self._position += len(data)
+        return data
+
+    def readinto(self, buffer):
+        data = self.read(len(buffer))
+        buffer[:len(data)] = data
+        return len(data)
+
+
+def _remaining_length(fileobj):
+    """Bytes left in a seekable file object, or None when it cannot seek."""
+    try:
+        position = fileobj.tell()
+        end = fileobj.seek(0, os.SEEK_END)
+        fileobj.seek(position)
+    except (AttributeError, OSError, ValueError):
+        return None
+    return end - position
+
+
+def _spool(stream):
+    """Copy a non-seekable stream into bounded memory, spilling to disk if large."""
+    spooled = tempfile.SpooledTemporaryFile(max_size=SPOOL_MEMORY_LIMIT)
+    shutil.copyfileobj(stream, spooled, _READ_BLOCK)
+    spooled.seek(0)
+    return spooled
+
+
+def _transcription_headers(jwt_token):
+    return {
         "Authorization": f"Bearer {jwt_token}",
         "Heidi-Api-Key": os.getenv("HEIDI_API_KEY")
     }
 
-    response = requests.post(url, headers=headers)
+
+def _transcription_url(session_id, recording_id=None, action=None):
+    url = f"{BASE_URL}/sessions/{session_id}/restful-segment-transcription"
+    if recording_id:
+        url = f"{url}/{recording_id}:{action}"
+    return url
+
+
+def _transcript_url(session_id):
+    return f"{BASE_URL}/sessions/{session_id}/transcript"
+
+
+def start_transcription(jwt_token, session_id):
+    url = _transcription_url(session_id)
+    headers = _transcription_headers(jwt_token)
+
+    response = client.post(url, headers=headers)
     if response.status_code == 200:
         return response.json().get("recording_id")
     else:
@@ -19,37 +133,79 @@ def start_transcription(jwt_token, session_id):
         }
 
 def upload_audio(jwt_token, session_id, recording_id, file_path, index="0"):
-    url = f"{BASE_URL}/sessions/{session_id}/restful-segment-transcription/{recording_id}:transcribe"
-    headers = {
-        "Authorization": f"Bearer {jwt_token}",
-        "Heidi-Api-Key": os.getenv("HEIDI_API_KEY")
-    }
-    files = {
-        "file": open(file_path, "rb")
-    }
-    data = {
-        "index": index
-    }
+    with open(file_path, "rb") as audio_file:
+        return upload_audio_fileobj(
+            jwt_token, session_id, recording_id, audio_file, index,
+            os.path.basename(file_path),
+        )
+
+def upload_audio_fileobj(
+    jwt_token,
+    session_id,
+    recording_id,
+    fileobj,
+    index="0",
+    filename="audio.mp3",
+    content_length=None,
+    content_type="application/octet-stream",
+):
+    """
+    Upload one audio segment from a binary stream without copying it to disk.
+
+    ``content_length`` is the number of bytes to send; it is measured for
+    seekable streams. Streams of unknown length are spooled with bounded memory.
+    """
+    spooled = None
+    if content_length is None:
+        content_length = _remaining_length(fileobj)
+    if content_length is None:
+        spooled = fileobj = _spool(fileobj)
+        content_length = _remaining_length(fileobj)
+
+    url = _transcription_url(session_id, recording_id, "transcribe")
+    headers = _transcription_headers(jwt_token)
+    body = _MultipartStream(
+        {"index": str(index)}, "file", filename, fileobj, content_length, content_type
+    )
+    headers["Content-Type"] = body.content_type
 
-    response = requests.post(url, headers=headers, files=files, data=data)
+    try:
+        response = client.post(
+            url, headers=headers, data=body, timeout=client.LONG_TIMEOUT
+        )
+    finally:
+        if spooled is not None:
+            spooled.close()
+    if response.status_code != 200:
+        return {
+            "error": True,
+            "status_code": response.status_code,
+            "message": response.text
+        }
     return response.json()
 
 def finish_transcription(jwt_token, session_id, recording_id):
-    url = f"{BASE_URL}/sessions/{session_id}/restful-segment-transcription/{recording_id}:finish"
-    headers = {
-        "Authorization": f"Bearer {jwt_token}",
-        "Heidi-Api-Key": os.getenv("HEIDI_API_KEY")
-    }
+    url = _transcription_url(session_id, recording_id, "finish")
+    headers = _transcription_headers(jwt_token)
 
-    response = requests.post(url, headers=headers)
+    response = client.post(url, headers=headers)
+    if response.status_code != 200:
+        return {
+            "error": True,
+            "status_code": response.status_code,
+            "message": response.text
+        }
     return response.json()
 
 def get_transcript(jwt_token, session_id):
-    url = f"{BASE_URL}/sessions/{session_id}/transcript"
-    headers = {
-        "Authorization": f"Bearer {jwt_token}",
-        "Heidi-Api-Key": os.getenv("HEIDI_API_KEY")
-    }
+    url = _transcript_url(session_id)
+    headers = _transcription_headers(jwt_token)
 
-    response = requests.get(url, headers=headers)
+    response = client.get(url, headers=headers)
+    if response.status_code != 200:
+        return {
+            "error": True,
+            "status_code": response.status_code,
+            "message": response.text
+        }
     return response.json()
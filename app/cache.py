@@ -0,0 +1,223 @@
+# app/cache.py - Size-bounded TTL caches with in-memory and on-disk backends
+import hashlib
+import json
+import os
+import sqlite3
+import tempfile
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Dict, Optional, Tuple
+
+DEFAULT_CACHE_PATH = os.path.join(tempfile.gettempdir(), "heidi_cache.sqlite3")
+
+
+def hash_key(*parts: str) -> str:
+    """SHA-256 over the parts, length-prefixed so boundaries are unambiguous."""
+    digest = hashlib.sha256()
+    for part in parts:
+        encoded = part.encode("utf-8")
+        digest.update(f"{len(encoded)}:".encode("ascii"))
+        digest.update(encoded)
+    return digest.hexdigest()
+
+
+class CacheBackend:
+    """Interface shared by cache backends. Values must be JSON-serialisable."""
+
+    def __init__(self, max_entries: int, ttl: Optional[float]):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self._stats = {"hits": 0, "misses": 0, "evictions": 0}
+        self._stats_lock = threading.Lock()
+
+    def get(self, key: str) -> Optional[Any]:
+        raise NotImplementedError
+
+    def set(self, key: str, value: Any, ttl: Optional[float] = None) -> None:
+        raise NotImplementedError
+
+    def delete(self, key: str) -> None:
+        raise NotImplementedError
+
+    def clear(self) -> None:
+        raise NotImplementedError
+
+    def __len__(self) -> int:
+        raise NotImplementedError
+
+    def stats(self) -> Dict[str, Any]:
+        with self._stats_lock:
+            stats = dict(self._stats)
+        stats.update(entries=len(self), max_entries=self.max_entries, ttl=self.ttl)
+        return stats
+
+    def _count(self, name: str, amount: int = 1) -> None:
+        with self._stats_lock:
+            self._stats[name] += amount
+
+    def _expiry(self, ttl: Optional[float]) -> Optional[float]:
+        ttl = self.ttl if ttl is None else ttl
+        return time.time() + ttl if ttl else None
+
+
+class MemoryCache(CacheBackend):
+    """Per-process LRU cache with optional TTL."""
+
+    def __init__(self, max_entries: int = 256, ttl: Optional[float] = None):
+        super().__init__(max_entries, ttl)
+        self._entries: "OrderedDict[str, Tuple[Any, Optional[float]]]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: str) -> Optional[Any]:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry[1] is not None and entry[1] <= time.time():
+                del self._entries[key]
+                entry = None
+            if entry is not None:
+                self._entries.move_to_end(key)
+        self._count("hits" if entry is not None else "misses")
+        return entry[0] if entry is not None else None
+
+    def set(self, key: str, value: Any, ttl: Optional[float] = None) -> None:
+        evicted = 0
+        with self._lock:
+            self._entries[key] = (value, self._expiry(ttl))
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                evicted += 1
+        if evicted:
+            self._count("evictions", evicted)
+
+    def delete(self, key: str) -> None:
+        with self._lock:
+            self._entries.pop(key, None)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+
+    def __len__(self) -> int:
+        with self._lock:
+            return len(self._entries)
+
+
+class SQLiteCache(CacheBackend):
+    """LRU cache in a SQLite file, so entries survive restarts and are shared by workers."""
+
+    def __init__(
+        self,
+        path: str = DEFAULT_CACHE_PATH,
+        namespace: str = "default",
+        max_entries: int = 1024,
+        ttl: Optional[float] = None,
+    ):
+        super().__init__(max_entries, ttl)
+        self.path = path
+        self.namespace = namespace
+        self._local = threading.local()
+        with self._connect() as conn:
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS cache_entries ("
+                " namespace TEXT NOT NULL,"
+                " key TEXT NOT NULL,"
+                " value TEXT NOT NULL,"
+                " expires_at REAL,"
+                " accessed_at REAL NOT NULL,"
+                " PRIMARY KEY (namespace, key))"
+            )
+            conn.execute(
+                "CREATE INDEX IF NOT EXISTS idx_cache_entries_lru"
+                " ON cache_entries (namespace, accessed_at)"
+            )
+
+    def _connect(self) -> sqlite3.Connection:
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=10)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    def get(self, key: str) -> Optional[Any]:
+        now = time.time()
+        conn = self._connect()
+        with conn:
+            row = conn.execute(
+                "SELECT value, expires_at FROM cache_entries WHERE namespace = ? AND key = ?",
+                (self.namespace, key),
+            ).fetchone()
+            if row is not None and row[1] is not None and row[1] <= now:
+                conn.execute(
+                    "DELETE FROM cache_entries WHERE namespace = ? AND key = ?",
+                    (self.namespace, key),
+                )
+                row = None
+            if row is not None:
+                conn.execute(
+                    "UPDATE cache_entries SET accessed_at = ? WHERE namespace = ? AND key = ?",
+                    (now, self.namespace, key),
+                )
+        self._count("hits" if row is not None else "misses")
+        return json.loads(row[0]) if row is not None else None
+
+    def set(self, key: str, value: Any, ttl: Optional[float] = None) -> None:
+        conn = self._connect()
+        with conn:
+            conn.execute(
+                "INSERT OR REPLACE INTO cache_entries"
+                " (namespace, key, value, expires_at, accessed_at) VALUES (?, ?, ?, ?, ?)",
+                (self.namespace, key, json.dumps(value), self._expiry(ttl), time.time()),
+            )
+            evicted = conn.execute(
+                "DELETE FROM cache_entries WHERE namespace = ? AND key IN ("
+                " SELECT key FROM cache_entries WHERE namespace = ?"
+                " ORDER BY accessed_at DESC LIMIT -1 OFFSET ?)",
+                (self.namespace, self.namespace, self.max_entries),
+            ).rowcount
+        if evicted:
+            self._count("evictions", evicted)
+
+    def delete(self, key: str) -> None:
+        conn = self._connect()
+        with conn:
+            conn.execute(
+                "DELETE FROM cache_entries WHERE namespace = ? AND key = ?",
+                (self.namespace, key),
+            )
+
+    def clear(self) -> None:
+        conn = self._connect()
+        with conn:
+            conn.execute("DELETE FROM cache_entries WHERE namespace = ?", (self.namespace,))
+
+    def __len__(self) -> int:
+        row = self._connect().execute(
+            "SELECT COUNT(*) FROM cache_entries WHERE namespace = ?", (self.namespace,)
+        ).fetchone()
+        return row[0]
+
+
+def cache_from_env(
+    prefix: str, namespace: str, default_size: int = 256, default_backend: str = ""
+) -> Optional[CacheBackend]:
+    """
+    Build a cache from ``<prefix>`` (``memory``/``disk``, unset falls back to
+    ``default_backend`` and disables it by default), ``<prefix>_SIZE``,
+    ``<prefix>_TTL`` (seconds) and ``<prefix>_PATH``.
+    """
+    backend = os.getenv(prefix, default_backend).strip().lower()
+    if backend in ("", "0", "off", "none", "false"):
+        return None
+
+    max_entries = int(os.getenv(f"{prefix}_SIZE", str(default_size)))
+    ttl = float(os.getenv(f"{prefix}_TTL", "0")) or None
+    if backend in ("disk", "sqlite"):
+        path = os.getenv(f"{prefix}_PATH", DEFAULT_CACHE_PATH)
+        return SQLiteCache(path=path, namespace=namespace, max_entries=max_entries, ttl=ttl)
+    if backend == "memory":
+        return MemoryCache(max_entries=max_entries, ttl=ttl)
+    raise ValueError(f"Unknown cache backend for {prefix}: {backend!r}")
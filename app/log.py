@@ -0,0 +1,169 @@
+# app/log.py - Structured JSON logging with redaction, per-module levels and sampling
+import json
+import logging
+import os
+import re
+import sys
+import threading
+import time
+from typing import Any, Dict, Iterable, Optional
+
+# Per-chunk events are logged once every N occurrences.
+LOG_SAMPLE_EVERY = int(os.getenv("HEIDI_LOG_SAMPLE_EVERY", "100"))
+
+REDACTED = "[REDACTED]"
+# Field names whose values are never logged.
+_SECRET_KEYS = re.compile(r"(authori[sz]ation|api[-_]?key|token|jwt|password|secret|cookie)", re.IGNORECASE)
+_BEARER = re.compile(r"(Bearer\s+)[A-Za-z0-9._~+/=-]+", re.IGNORECASE)
+# Environment variables holding credentials, scrubbed from any logged text.
+_SECRET_ENV = ("HEIDI_API_KEY",)
+
+# Attributes every LogRecord has; anything else came from ``extra=``.
+_RECORD_FIELDS = frozenset(vars(logging.LogRecord("", 0, "", 0, "", (), None))) | {"message", "asctime"}
+
+_HANDLER_NAME = "heidi-structured"
+
+
+def _secret_values() -> Iterable[str]:
+    return [value for value in (os.getenv(name) for name in _SECRET_ENV) if value and len(value) >= 6]
+
+
+def redact(value: Any) -> Any:
+    """Mask secret-looking keys, bearer tokens and configured credentials."""
+    if isinstance(value, dict):
+        return {
+            key: REDACTED if isinstance(key, str) and _SECRET_KEYS.search(key) else redact(item)
+            for key, item in value.items()
+        }
+    if isinstance(value, (list, tuple)):
+        return type(value)(redact(item) for item in value)
+    if isinstance(value, str):
+        value = _BEARER.sub(r"\1" + REDACTED, value)
+        for secret in _secret_values():
+            value = value.replace(secret, REDACTED)
+    return value
+
+
+class RedactingFilter(logging.Filter):
+    """Redact record arguments and extras before any handler formats them."""
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        if isinstance(record.args, dict):
+            record.args = redact(record.args)
+        elif record.args:
+            record.args = tuple(
+                redact(arg) if isinstance(arg, (str, dict, list, tuple)) else arg
+                for arg in record.args
+            )
+        if isinstance(record.msg, str):
+            record.msg = redact(record.msg)
+        for key, value in list(vars(record).items()):
+            if key not in _RECORD_FIELDS:
+                setattr(record, key, REDACTED if _SECRET_KEYS.search(key) else redact(value))
+        return True
+
+
+class JsonFormatter(logging.Formatter):
+    """One JSON object per line: time, level, logger, message and any extras."""
+
+    def format(self, record: logging.LogRecord) -> str:
+        entry: Dict[str, Any] = {
+            "ts": time.strftime("%Y-%m-%dT%H:%M:%S", time.gmtime(record.created))
+            + f".{int(record.msecs):03d}Z",
+            "level": record.levelname,
+            "logger": record.name,
+            "message": record.getMessage(),
+        }
+        for key, value in vars(record).items():
+            if key not in _RECORD_FIELDS and key not in entry:
+                entry[key] = value
+        if record.exc_info:
+            entry["exception"] = self.formatException(record.exc_info)
+        return json.dumps(entry, default=str, ensure_ascii=False)
+
+
+class SampledLogger:
+    """
+    Emit one in every ``every`` calls, for events that fire per stream chunk.
+
+    The level check comes first, so a disabled level costs one comparison and
+    never formats its arguments.
+    """
+
+    def __init__(self, logger: logging.Logger, every: Optional[int] = None):
+        self.logger = logger
+        self.every = max(1, every or LOG_SAMPLE_EVERY)
+        self._count = 0
+        self._lock = threading.Lock()
+
+    def log(self, level: int, msg: str, *args, **kwargs) -> None:
+        if not self.logger.isEnabledFor(level):
+            return
+        with self._lock:
+            self._count += 1
+            emit = self._count % self.every == 1 or self.every == 1
+        if emit:
+            extra = dict(kwargs.pop("extra", None) or {}, sample_every=self.every)
+            self.logger.log(level, msg, *args, extra=extra, **kwargs)
+
+    def debug(self, msg: str, *args, **kwargs) -> None:
+        self.log(logging.DEBUG, msg, *args, **kwargs)
+
+
+def sampled(logger: logging.Logger, every: Optional[int] = None) -> SampledLogger:
+    return SampledLogger(logger, every)
+
+
+class _StderrHandler(logging.StreamHandler):
+    # Resolve sys.stderr on every write so redirected/captured stderr is honoured.
+    @property
+    def stream(self):
+        return sys.stderr
+
+    @stream.setter
+    def stream(self, value):
+        pass
+
+
+def _parse_levels(spec: str) -> Dict[str, str]:
+    levels = {}
+    for item in spec.split(","):
+        name, _, level = item.partition("=")
+        if name.strip() and level.strip():
+            levels[name.strip()] = level.strip().upper()
+    return levels
+
+
+def configure_logging(
+    level: Optional[str] = None,
+    levels: Optional[str] = None,
+    fmt: Optional[str] = None,
+    stream=None,
+) -> logging.Handler:
+    """
+    Install the structured handler on the ``app`` logger (idempotent).
+
+    Defaults come from ``HEIDI_LOG_LEVEL`` (INFO), ``HEIDI_LOG_LEVELS``
+    (per-module overrides such as ``app.api.ask_heidi=DEBUG,app.services=WARNING``)
+    and ``HEIDI_LOG_FORMAT`` (``json`` or ``text``). Other libraries' loggers
+    are left to the host, and ``app.*`` records still propagate.
+    """
+    app_logger = logging.getLogger("app")
+    for handler in list(app_logger.handlers):
+        if handler.get_name() == _HANDLER_NAME:
+            app_logger.removeHandler(handler)
+
+    handler = logging.StreamHandler(stream) if stream is not None else _StderrHandler()
+    handler.set_name(_HANDLER_NAME)
+    handler.addFilter(RedactingFilter())
+    if (fmt or os.getenv("HEIDI_LOG_FORMAT", "json")).lower() == "text":
+        handler.setFormatter(logging.Formatter("%(asctime)s %(levelname)s %(name)s: %(message)s"))
+    else:
+        handler.setFormatter(JsonFormatter())
+    app_logger.addHandler(handler)
+    app_logger.setLevel((level or os.getenv("HEIDI_LOG_LEVEL", "INFO")).upper())
+
+    spec = os.getenv("HEIDI_LOG_LEVELS", "") if levels is None else levels
+    for name, module_level in _parse_levels(spec).items():
+        logging.getLogger(name).setLevel(module_level)
+    return handler
@@ -0,0 +1,289 @@
+# app/metrics.py - Upstream call and route timing in Prometheus text format
+import bisect
+import re
+import threading
+import time
+import weakref
+from typing import Dict, Iterator, List, Optional, Sequence, Tuple
+from urllib.parse import urlsplit
+
+# Seconds; wide enough for ask-ai and note generation, fine enough for JWT and sessions.
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120)
+# Path segments followed by an identifier in Heidi URLs.
+_ID_COLLECTIONS = frozenset({"sessions", "restful-segment-transcription"})
+_HAS_DIGIT = re.compile(r"\d")
+
+Labels = Tuple[str, ...]
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_labels(names: Sequence[str], values: Labels, extra: str = "") -> str:
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+def _format_number(value: float) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if not float(value).is_integer() else str(int(value))
+
+
+class Counter:
+    """Monotonic total per label combination."""
+
+    kind = "counter"
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._values: Dict[Labels, float] = {}
+        self._lock = threading.Lock()
+
+    def inc(self, labels: Labels = (), amount: float = 1) -> None:
+        with self._lock:
+            self._values[labels] = self._values.get(labels, 0) + amount
+
+    def value(self, labels: Labels = ()) -> float:
+        with self._lock:
+            return self._values.get(labels, 0)
+
+    def samples(self) -> Iterator[str]:
+        with self._lock:
+            values = sorted(self._values.items())
+        for labels, value in values:
+            yield f"{self.name}{_format_labels(self.labelnames, labels)} {_format_number(value)}"
+
+    def clear(self) -> None:
+        with self._lock:
+            self._values.clear()
+
+
+class Histogram:
+    """Cumulative bucket counts, sum and count per label combination."""
+
+    kind = "histogram"
+
+    def __init__(
+        self,
+        name: str,
+        documentation: str,
+        labelnames: Sequence[str] = (),
+        buckets: Sequence[float] = LATENCY_BUCKETS,
+    ):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self.buckets = tuple(sorted(buckets))
+        # labels -> [per-bucket counts (non-cumulative, last is +Inf), sum]
+        self._series: Dict[Labels, Tuple[List[int], List[float]]] = {}
+        self._lock = threading.Lock()
+
+    def observe(self, labels: Labels, value: float) -> None:
+        position = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            counts, total = self._series.setdefault(
+                labels, ([0] * (len(self.buckets) + 1), [0.0])
+            )
+            counts[position] += 1
+            total[0] += value
+
+    def count(self, labels: Labels = ()) -> int:
+        with self._lock:
+            series = self._series.get(labels)
+            return sum(series[0]) if series else 0
+
+    def samples(self) -> Iterator[str]:
+        with self._lock:
+            series = sorted((labels, (list(c), t[0])) for labels, (c, t) in self._series.items())
+        for labels, (counts, total) in series:
+            cumulative = 0
+            for bound, bucket_count in zip(self.buckets + (float("inf"),), counts):
+                cumulative += bucket_count
+                le = f'le="{_format_number(bound)}"'
+                yield f"{self.name}_bucket{_format_labels(self.labelnames, labels, le)} {cumulative}"
+            label_text = _format_labels(self.labelnames, labels)
+            yield f"{self.name}_sum{label_text} {_format_number(total)}"
+            yield f"{self.name}_count{label_text} {cumulative}"
+
+    def clear(self) -> None:
+        with self._lock:
+            self._series.clear()
+
+
+class Registry:
+    """Named metrics rendered together for ``/metrics``."""
+
+    def __init__(self):
+        self._metrics: List = []
+
+    def register(self, metric):
+        self._metrics.append(metric)
+        return metric
+
+    def render(self) -> str:
+        lines: List[str] = []
+        for metric in self._metrics:
+            lines.append(f"# HELP {metric.name} {metric.documentation}")
+            lines.append(f"# TYPE {metric.name} {metric.kind}")
+            lines.extend(metric.samples())
+        return "\n".join(lines) + "\n"
+
+    def clear(self) -> None:
+        for metric in self._metrics:
+            metric.clear()
+
+
+REGISTRY = Registry()
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+UPSTREAM_SECONDS = REGISTRY.register(Histogram(
+    "heidi_upstream_request_seconds",
+    "Heidi API call latency until response headers (whole body when not streamed).",
+    ("endpoint", "method", "status"),
+))
+UPSTREAM_SENT_BYTES = REGISTRY.register(Counter(
+    "heidi_upstream_sent_bytes_total", "Request body bytes sent to the Heidi API.", ("endpoint",)
+))
+UPSTREAM_RECEIVED_BYTES = REGISTRY.register(Counter(
+    "heidi_upstream_received_bytes_total", "Response body bytes received from the Heidi API.", ("endpoint",)
+))
+UPSTREAM_FIRST_CHUNK_SECONDS = REGISTRY.register(Histogram(
+    "heidi_upstream_first_chunk_seconds",
+    "Time from sending a streamed Heidi request to its first SSE data chunk.",
+    ("endpoint",),
+))
+UPSTREAM_REFUSED = REGISTRY.register(Counter(
+    "heidi_upstream_refused_total",
+    "Heidi API calls refused locally by an open circuit or the concurrency limit.",
+    ("endpoint", "reason"),
+))
+RATE_LIMITED = REGISTRY.register(Counter(
+    "heidi_rate_limited_total",
+    "Requests rejected with 429 by a clinic's rate limit or daily quota.",
+    ("endpoint_class", "scope"),
+))
+ASK_AI_COALESCED = REGISTRY.register(Counter(
+    "heidi_ask_ai_coalesced_total",
+    "Ask AI calls served by joining an identical request already in flight.",
+    ("mode",),
+))
+ROUTE_SECONDS = REGISTRY.register(Histogram(
+    "heidi_http_request_seconds",
+    "Flask route latency, including streamed response bodies.",
+    ("route", "method", "status"),
+))
+
+# Streamed responses -> (endpoint, request start) until their first chunk is seen.
+_stream_starts: "weakref.WeakKeyDictionary" = weakref.WeakKeyDictionary()
+_stream_lock = threading.Lock()
+
+
+def endpoint_label(url: str) -> str:
+    """
+    Bounded label for a Heidi URL: the path below the API base with ids
+    replaced, e.g. ``/sessions/{id}/restful-segment-transcription/{id}:finish``.
+    """
+    from app.api import BASE_URL
+
+    path = urlsplit(url).path
+    base_path = urlsplit(BASE_URL).path.rstrip("/")
+    if base_path and path.startswith(base_path):
+        path = path[len(base_path):]
+
+    segments = []
+    previous = ""
+    for segment in path.strip("/").split("/"):
+        name, colon, action = segment.partition(":")
+        if previous in _ID_COLLECTIONS or _HAS_DIGIT.search(name):
+            name = "{id}"
+        segments.append(name + colon + action)
+        previous = segment
+    return "/" + "/".join(segments)
+
+
+def record_upstream(
+    method: str,
+    url: str,
+    status: str,
+    seconds: float,
+    sent: int = 0,
+    received: int = 0,
+) -> str:
+    """Record one Heidi call; ``status`` is the HTTP status or ``"error"``."""
+    endpoint = endpoint_label(url)
+    UPSTREAM_SECONDS.observe((endpoint, method.upper(), status), seconds)
+    if sent:
+        UPSTREAM_SENT_BYTES.inc((endpoint,), sent)
+    if received:
+        UPSTREAM_RECEIVED_BYTES.inc((endpoint,), received)
+    return endpoint
+
+
+def record_received(endpoint: str, received: int) -> None:
+    if received:
+        UPSTREAM_RECEIVED_BYTES.inc((endpoint,), received)
+
+
+def watch_first_chunk(response, endpoint: str, started: float) -> None:
+    """Remember when a streamed request started, for ``first_chunk``."""
+    with _stream_lock:
+        _stream_starts[response] = (endpoint, started)
+
+
+def first_chunk(response) -> None:
+    """Record time to the first SSE chunk of ``response`` (once per response)."""
+    with _stream_lock:
+        entry = _stream_starts.pop(response, None)
+    if entry is not None:
+        endpoint, started = entry
+        UPSTREAM_FIRST_CHUNK_SECONDS.observe((endpoint,), time.perf_counter() - started)
+
+
+def content_length(headers) -> int:
+    try:
+        return int(headers.get("Content-Length") or 0)
+    except (TypeError, ValueError):
+        return 0
+
+
+def record_route(route: str, method: str, status: int, seconds: float) -> None:
+    ROUTE_SECONDS.observe((route, method, str(status)), seconds)
+
+
+def init_app(app) -> None:
+    """Time every Flask request by its URL rule, until the body is fully sent."""
+    from flask import g, request
+
+    @app.before_request
+    def _start_timer():
+        g.metrics_started = time.perf_counter()
+
+    @app.after_request
+    def _record_route(response):
+        started = g.pop("metrics_started", None)
+        if started is None:
+            return response
+        route = request.url_rule.rule if request.url_rule is not None else "unmatched"
+        method, status = request.method, response.status_code
+        # Runs once a streamed body has been fully relayed (or abandoned).
+        response.call_on_close(
+            lambda: record_route(route, method, status, time.perf_counter() - started)
+        )
+        return response
+
+
+def render(registry: Optional[Registry] = None) -> str:
+    return (registry or REGISTRY).render()
+
+
+def reset() -> None:
+    """Drop every recorded sample (tests)."""
+    REGISTRY.clear()
+    with _stream_lock:
+        _stream_starts.clear()
@@ -0,0 +1,460 @@
+# app/rate_limit.py - Per-clinic token-bucket rate limits and quotas
+"""
+Per-tenant admission control for the routes that spend Heidi calls.
+
+Each limited route belongs to an endpoint class (ask-ai, transcription or
+document) and each request is charged to a tenant (see ``tenant_of``).
+A request needs tokens from its tenant's bucket for that class and, when
+``HEIDI_QUOTA_PER_DAY`` is set, from the tenant's daily quota bucket shared
+by every class. Otherwise it is rejected with a 429 before its body is read,
+so an over-limit upload costs no temp file and no upstream call.
+
+Trust model: this app does not authenticate callers, so the ``X-Clinic-Id``
+and ``X-Api-Key`` headers are only believed from the proxies listed in
+``HEIDI_TRUSTED_PROXIES``, i.e. the gateway that authenticated the clinic
+and set them. Requests from any other peer are charged to their own
+address whatever headers they send, so rotating or dropping the header
+does not escape a limit.
+
+Buckets live in a ``BucketStore``: ``MemoryBucketStore`` counts per process,
+``SQLiteBucketStore`` shares the counters between every worker on a host.
+"""
+import asyncio
+import hashlib
+import ipaddress
+import logging
+import math
+import os
+import sqlite3
+import threading
+import time
+from typing import Any, Callable, Dict, List, Optional, Sequence, Tuple
+
+from app import metrics
+from app.cache import DEFAULT_CACHE_PATH
+
+logger = logging.getLogger(__name__)
+
+ASK_AI, TRANSCRIPTION, DOCUMENT = "ask-ai", "transcription", "document"
+
+# Flask rules (and aiohttp paths) that spend Heidi calls, by endpoint class.
+ROUTE_CLASSES = {
+    "/ask_heidi": ASK_AI,
+    "/ask_heidi_enhanced": ASK_AI,
+    "/ask-question": ASK_AI,
+    "/ask-questions": ASK_AI,
+    "/test-complete-flow": ASK_AI,
+    "/transcribe-audio": TRANSCRIPTION,
+    "/transcript/start": TRANSCRIPTION,
+    "/transcript/upload": TRANSCRIPTION,
+    "/transcript/finish": TRANSCRIPTION,
+    "/demo/full-transcript": TRANSCRIPTION,
+    "/jobs/transcription-note": TRANSCRIPTION,
+    "/test-audio-transcription": TRANSCRIPTION,
+    "/process-document": DOCUMENT,
+    "/upload-document": DOCUMENT,
+    "/consult/generate": DOCUMENT,
+}
+# Default (requests per minute, burst) per endpoint class.
+_CLASS_DEFAULTS = {ASK_AI: (60, 20), TRANSCRIPTION: (20, 5), DOCUMENT: (30, 10)}
+
+TENANT_HEADER = os.getenv("HEIDI_TENANT_HEADER", "X-Clinic-Id")
+API_KEY_HEADER = "X-Api-Key"
+FORWARDED_FOR_HEADER = "X-Forwarded-For"
+
+DAY_SECONDS = 86400.0
+# Buckets that have refilled completely are dropped after this many takes.
+_PURGE_EVERY = 1000
+
+
+def _parse_networks(value: str) -> List[Any]:
+    """Comma-separated addresses or CIDR ranges."""
+    return [ipaddress.ip_network(part.strip(), strict=False) for part in value.split(",") if part.strip()]
+
+
+# Peers allowed to name the tenant: the proxies or gateways that authenticate clinics.
+TRUSTED_PROXIES = _parse_networks(os.getenv("HEIDI_TRUSTED_PROXIES", ""))
+
+
+class Limit:
+    """A bucket holding up to ``capacity`` tokens, refilled at ``per_second``."""
+
+    def __init__(self, capacity: float, per_second: float):
+        self.capacity = float(capacity)
+        self.per_second = float(per_second)
+
+    @classmethod
+    def per_minute(cls, rate: float, burst: Optional[float] = None) -> "Limit":
+        return cls(burst or rate, rate / 60.0)
+
+    def __repr__(self) -> str:
+        return f"Limit(capacity={self.capacity:g}, per_second={self.per_second:g})"
+
+
+class Decision:
+    """Outcome of one ``RateLimiter.check``; ``scope`` names the bucket that ran out."""
+
+    def __init__(
+        self,
+        allowed: bool,
+        limit: float = 0,
+        remaining: float = 0,
+        retry_after: float = 0,
+        scope: Optional[str] = None,
+    ):
+        self.allowed = allowed
+        self.limit = limit
+        self.remaining = remaining
+        self.retry_after = retry_after
+        self.scope = scope
+
+    def headers(self) -> Dict[str, str]:
+        headers = {
+            "X-RateLimit-Limit": str(int(self.limit)),
+            "X-RateLimit-Remaining": str(int(self.remaining)),
+        }
+        if not self.allowed:
+            headers["Retry-After"] = str(max(1, math.ceil(self.retry_after)))
+        return headers
+
+
+def _refill(state: Optional[Tuple[float, float]], limit: Limit, now: float) -> float:
+    """Tokens in a bucket at ``now`` given its stored ``(tokens, updated_at)``."""
+    if state is None:
+        return limit.capacity
+    tokens, updated_at = state
+    return min(limit.capacity, tokens + max(0.0, now - updated_at) * limit.per_second)
+
+
+def _full_at(tokens: float, limit: Limit, now: float) -> float:
+    if limit.per_second <= 0:
+        return float("inf")
+    return now + (limit.capacity - tokens) / limit.per_second
+
+
+def _shortfall(
+    buckets: Sequence[Tuple[str, Limit]], levels: List[float], cost: float
+) -> Tuple[float, Optional[int]]:
+    """
+    ``(seconds until every bucket holds ``cost``, index of the slowest to
+    refill)``, or ``(0, None)`` when every bucket already does.
+    """
+    retry_after, short = 0.0, None
+    for index, ((_, limit), tokens) in enumerate(zip(buckets, levels)):
+        missing = min(cost, limit.capacity) - tokens
+        if missing > 0:
+            wait = missing / limit.per_second if limit.per_second > 0 else DAY_SECONDS
+            if short is None or wait > retry_after:
+                retry_after, short = wait, index
+    return retry_after, short
+
+
+class BucketStore:
+    """
+    Interface shared by bucket backends.
+
+    ``take`` must be atomic across everyone sharing the store: either every
+    bucket is charged ``cost`` or none is. Stores whose ``take`` can wait on
+    a lock held by another process set ``blocking``.
+    """
+
+    blocking = False
+
+    def take(
+        self, buckets: Sequence[Tuple[str, Limit]], cost: float, now: float
+    ) -> Tuple[bool, float, List[float]]:
+        """Return ``(allowed, retry_after, tokens left per bucket)``."""
+        raise NotImplementedError
+
+    def clear(self) -> None:
+        raise NotImplementedError
+
+    @staticmethod
+    def _settle(
+        buckets: Sequence[Tuple[str, Limit]], levels: List[float], cost: float
+    ) -> Tuple[bool, float, List[float]]:
+        retry_after, short = _shortfall(buckets, levels, cost)
+        allowed = short is None
+        if allowed:
+            levels = [tokens - min(cost, limit.capacity) for (_, limit), tokens in zip(buckets, levels)]
+        return allowed, retry_after, levels
+
+
+class MemoryBucketStore(BucketStore):
+    """Per-process buckets; each worker enforces the limits on its own."""
+
+    def __init__(self) -> None:
+        self._buckets: Dict[str, Tuple[float, float, float]] = {}  # key -> tokens, updated, full_at
+        self._takes = 0
+        self._lock = threading.Lock()
+
+    def take(
+        self, buckets: Sequence[Tuple[str, Limit]], cost: float, now: float
+    ) -> Tuple[bool, float, List[float]]:
+        with self._lock:
+            levels = []
+            for key, limit in buckets:
+                state = self._buckets.get(key)
+                levels.append(_refill(state[:2] if state is not None else None, limit, now))
+            allowed, retry_after, levels = self._settle(buckets, levels, cost)
+            if allowed:
+                for (key, limit), tokens in zip(buckets, levels):
+                    self._buckets[key] = (tokens, now, _full_at(tokens, limit, now))
+            self._takes += 1
+            if self._takes % _PURGE_EVERY == 0:
+                self._buckets = {key: state for key, state in self._buckets.items() if state[2] > now}
+        return allowed, retry_after, levels
+
+    def clear(self) -> None:
+        with self._lock:
+            self._buckets.clear()
+
+    def __len__(self) -> int:
+        with self._lock:
+            return len(self._buckets)
+
+
+class SQLiteBucketStore(BucketStore):
+    """Buckets in a SQLite file, so every worker process on the host shares them."""
+
+    # BEGIN IMMEDIATE waits up to the connection timeout for other workers.
+    blocking = True
+
+    def __init__(self, path: str = DEFAULT_CACHE_PATH):
+        self.path = path
+        self._local = threading.local()
+        self._takes = 0
+        conn = self._connect()
+        conn.execute(
+            "CREATE TABLE IF NOT EXISTS rate_buckets ("
+            " key TEXT PRIMARY KEY,"
+            " tokens REAL NOT NULL,"
+            " updated_at REAL NOT NULL,"
+            " full_at REAL NOT NULL)"
+        )
+
+    def _connect(self) -> sqlite3.Connection:
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            # Autocommit, so ``take`` can hold the write lock with BEGIN IMMEDIATE.
+            conn = sqlite3.connect(self.path, timeout=10, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    def take(
+        self, buckets: Sequence[Tuple[str, Limit]], cost: float, now: float
+    ) -> Tuple[bool, float, List[float]]:
+        conn = self._connect()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            levels = []
+            for key, limit in buckets:
+                row = conn.execute(
+                    "SELECT tokens, updated_at FROM rate_buckets WHERE key = ?", (key,)
+                ).fetchone()
+                levels.append(_refill(row, limit, now))
+            allowed, retry_after, levels = self._settle(buckets, levels, cost)
+            if allowed:
+                conn.executemany(
+                    "INSERT OR REPLACE INTO rate_buckets (key, tokens, updated_at, full_at)"
+                    " VALUES (?, ?, ?, ?)",
+                    [
+                        (key, tokens, now, _full_at(tokens, limit, now))
+                        for (key, limit), tokens in zip(buckets, levels)
+                    ],
+                )
+            self._takes += 1
+            if self._takes % _PURGE_EVERY == 0:
+                conn.execute("DELETE FROM rate_buckets WHERE full_at <= ?", (now,))
+            conn.execute("COMMIT")
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+        return allowed, retry_after, levels
+
+    def clear(self) -> None:
+        self._connect().execute("DELETE FROM rate_buckets")
+
+
+class RateLimiter:
+    """Per-tenant buckets per endpoint class, plus an optional daily quota per tenant."""
+
+    def __init__(
+        self,
+        store: Optional[BucketStore] = None,
+        limits: Optional[Dict[str, Limit]] = None,
+        quota: Optional[Limit] = None,
+        clock: Callable[[], float] = time.time,
+    ):
+        self.store = store if store is not None else MemoryBucketStore()
+        self.limits = dict(limits) if limits is not None else limits_from_env()
+        self.quota = quota
+        self._clock = clock
+
+    def check(self, tenant: str, endpoint_class: str, cost: float = 1) -> Decision:
+        """Charge ``cost`` tokens to ``tenant``; classes without a limit are always allowed."""
+        limit = self.limits.get(endpoint_class)
+        if limit is None:
+            return Decision(True)
+        buckets = [(f"{endpoint_class}:{tenant}", limit)]
+        if self.quota is not None:
+            buckets.append((f"quota:{tenant}", self.quota))
+
+        try:
+            allowed, retry_after, levels = self.store.take(buckets, cost, self._clock())
+        except sqlite3.Error:
+            # Counters unavailable: let traffic through rather than turn every request away.
+            logger.exception("Rate limit store failed; admitting %s", endpoint_class)
+            return Decision(True)
+
+        if allowed:
+            report = min(range(len(buckets)), key=levels.__getitem__)
+            scope = None
+        else:
+            _, report = _shortfall(buckets, levels, cost)
+            scope = "quota" if buckets[report][0].startswith("quota:") else "rate"
+        decision = Decision(
+            allowed,
+            limit=buckets[report][1].capacity,
+            remaining=max(0.0, levels[report]),
+            retry_after=retry_after,
+            scope=scope,
+        )
+        if not allowed:
+            metrics.RATE_LIMITED.inc((endpoint_class, scope))
+            logger.info("Rate limited tenant %s on %s (%s)", tenant, endpoint_class, scope)
+        return decision
+
+    async def check_async(self, tenant: str, endpoint_class: str, cost: float = 1) -> Decision:
+        """``check`` that keeps the event loop free while a shared store waits for its lock."""
+        if not self.store.blocking:
+            return self.check(tenant, endpoint_class, cost)
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(None, self.check, tenant, endpoint_class, cost)
+
+
+def limits_from_env() -> Dict[str, Limit]:
+    """
+    ``HEIDI_RATE_LIMIT_<CLASS>_PER_MINUTE`` and ``..._BURST`` per endpoint
+    class (``ASK_AI``, ``TRANSCRIPTION``, ``DOCUMENT``); a rate of 0 leaves
+    that class unlimited.
+    """
+    limits = {}
+    for endpoint_class, (rate, burst) in _CLASS_DEFAULTS.items():
+        prefix = "HEIDI_RATE_LIMIT_" + endpoint_class.replace("-", "_").upper()
+        per_minute = float(os.getenv(f"{prefix}_PER_MINUTE", str(rate)))
+        if per_minute > 0:
+            burst = float(os.getenv(f"{prefix}_BURST", str(burst)))
+            limits[endpoint_class] = Limit.per_minute(per_minute, burst)
+    return limits
+
+
+def is_trusted_proxy(remote_addr: Optional[str]) -> bool:
+    """Whether ``remote_addr`` is one of ``HEIDI_TRUSTED_PROXIES``."""
+    if not remote_addr or not TRUSTED_PROXIES:
+        return False
+    try:
+        address = ipaddress.ip_address(remote_addr)
+    except ValueError:
+        return False
+    return any(address in network for network in TRUSTED_PROXIES)
+
+
+def tenant_of(headers: Any, remote_addr: Optional[str]) -> str:
+    """
+    Tenant key for a request.
+
+    From a trusted proxy: the clinic id it set, else a hash of the API key,
+    else the client address it appended to ``X-Forwarded-For``. From any
+    other peer: that peer's address, ignoring identity headers.
+    """
+    if not is_trusted_proxy(remote_addr):
+        return f"addr:{remote_addr or 'unknown'}"
+    clinic = (headers.get(TENANT_HEADER) or "").strip()
+    if clinic:
+        return f"clinic:{clinic[:128]}"
+    api_key = (headers.get(API_KEY_HEADER) or "").strip()
+    if api_key:
+        return "key:" + hashlib.sha256(api_key.encode("utf-8")).hexdigest()[:16]
+    # The last hop is the one the trusted proxy added; earlier ones are client-supplied.
+    forwarded = (headers.get(FORWARDED_FOR_HEADER) or "").split(",")[-1].strip()
+    return f"addr:{forwarded or remote_addr}"
+
+
+def batch_cost(data: Any) -> int:
+    """An ``/ask-questions`` body costs one token per question."""
+    questions = data.get("questions") if isinstance(data, dict) else None
+    return max(1, len(questions)) if isinstance(questions, list) else 1
+
+
+def rejection(decision: Decision, endpoint_class: str) -> Dict[str, Any]:
+    """JSON body for a 429."""
+    return {
+        "error": "Rate limit exceeded",
+        "reason": decision.scope,
+        "endpoint_class": endpoint_class,
+        "message": (
+            "Daily request quota used up for this clinic"
+            if decision.scope == "quota"
+            else f"Too many {endpoint_class} requests from this clinic"
+        ),
+        "retry_after": int(decision.headers()["Retry-After"]),
+    }
+
+
+_UNSET: Any = object()
+_limiter: Any = _UNSET
+_limiter_lock = threading.Lock()
+
+
+def store_from_env() -> Optional[BucketStore]:
+    """``HEIDI_RATE_LIMIT``: ``memory`` (default), ``sqlite`` (``HEIDI_RATE_LIMIT_PATH``) or ``off``."""
+    backend = os.getenv("HEIDI_RATE_LIMIT", "memory").strip().lower()
+    if backend in ("", "0", "off", "none", "false"):
+        return None
+    if backend in ("disk", "sqlite"):
+        return SQLiteBucketStore(os.getenv("HEIDI_RATE_LIMIT_PATH") or DEFAULT_CACHE_PATH)
+    if backend == "memory":
+        return MemoryBucketStore()
+    raise ValueError(f"Unknown rate limit backend: {backend!r}")
+
+
+def get_rate_limiter() -> Optional[RateLimiter]:
+    """Return the process-wide limiter, or None when ``HEIDI_RATE_LIMIT`` is off."""
+    global _limiter
+    if _limiter is _UNSET:
+        with _limiter_lock:
+            if _limiter is _UNSET:
+                store = store_from_env()
+                per_day = float(os.getenv("HEIDI_QUOTA_PER_DAY", "0"))
+                quota = Limit(per_day, per_day / DAY_SECONDS) if per_day > 0 else None
+                _limiter = RateLimiter(store, quota=quota) if store is not None else None
+    return _limiter
+
+
+def configure_rate_limiter(limiter: Optional[RateLimiter] = _UNSET) -> None:
+    """Install a limiter (None disables limiting), or reset to re-read the environment on next use."""
+    global _limiter
+    with _limiter_lock:
+        _limiter = limiter
+
+
+def init_app(app) -> None:
+    """Reject over-limit requests to the Heidi-backed Flask routes before they run."""
+    from flask import jsonify, request
+
+    @app.before_request
+    def _enforce_rate_limit():
+        limiter = get_rate_limiter()
+        rule = request.url_rule.rule if request.url_rule is not None else None
+        endpoint_class = ROUTE_CLASSES.get(rule)
+        if limiter is None or endpoint_class is None or request.method != "POST":
+            return None
+        # JSON bodies are already in memory; uploads are never parsed here.
+        cost = batch_cost(request.get_json(silent=True)) if rule == "/ask-questions" else 1
+        decision = limiter.check(tenant_of(request.headers, request.remote_addr), endpoint_class, cost)
+        if decision.allowed:
+            return None
+        return jsonify(rejection(decision, endpoint_class)), 429, decision.headers()
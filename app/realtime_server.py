@@ -0,0 +1,94 @@
+# app/realtime_server.py - WebSocket endpoint for live microphone transcription
+import json
+import logging
+import os
+from urllib.parse import parse_qs, urlparse
+
+from websockets.asyncio.server import ServerConnection, serve
+from websockets.exceptions import ConnectionClosed
+
+from app.rate_limit import TRANSCRIPTION, get_rate_limiter, tenant_of
+from app.services.realtime import RealtimeTranscription
+
+logger = logging.getLogger(__name__)
+
+TRANSCRIBE_PATH = "/transcribe"
+# Largest single frame accepted from the browser.
+MAX_FRAME_BYTES = int(os.getenv("HEIDI_REALTIME_MAX_FRAME_BYTES", str(1024 * 1024)))
+
+
+async def transcribe(websocket: ServerConnection) -> None:
+    """
+    Live transcription over one socket.
+
+    Query: ``session_id`` (optional) and ``filename`` for the segment name,
+    whose extension tells Heidi the container (``segment.webm`` by default).
+    Binary messages are audio; text messages are JSON commands:
+    ``{"type": "flush"}`` closes the current segment now (send it after
+    restarting a MediaRecorder so every segment is a standalone file) and
+    ``{"type": "stop"}`` ends the recording and returns the final transcript.
+    """
+    query = parse_qs(urlparse(websocket.request.path).query)
+
+    limiter = get_rate_limiter()
+    if limiter is not None:
+        remote = websocket.remote_address[0] if websocket.remote_address else None
+        decision = await limiter.check_async(tenant_of(websocket.request.headers, remote), TRANSCRIPTION)
+        if not decision.allowed:
+            # 1013: try again later
+            await websocket.close(code=1013, reason="Rate limit exceeded")
+            return
+
+    async def send(message):
+        try:
+            await websocket.send(json.dumps(message))
+        except ConnectionClosed:
+            pass
+
+    live = RealtimeTranscription(send, filename=query.get("filename", ["segment.webm"])[0])
+    if not await live.start(query.get("session_id", [None])[0]):
+        await websocket.close(code=1011, reason="Could not start transcription")
+        return
+
+    stopped = False
+    try:
+        async for message in websocket:
+            if isinstance(message, bytes):
+                await live.add_audio(message)
+                continue
+            try:
+                command = json.loads(message).get("type")
+            except (ValueError, AttributeError):
+                await send({"type": "error", "message": "Commands must be JSON objects"})
+                continue
+            if command == "flush":
+                await live.flush()
+            elif command == "stop":
+                break
+            else:
+                await send({"type": "error", "message": f"Unknown command: {command!r}"})
+        stopped = True
+        await live.stop()
+    except ConnectionClosed:
+        logger.info("Live transcription socket for %s closed early", live.session_id)
+    finally:
+        if not stopped:
+            # Keep what was captured: finish the recording even if the browser went away.
+            try:
+                await live.stop()
+            except Exception:
+                logger.exception("Finishing recording %s after disconnect failed", live.recording_id)
+        await live.close()
+    await websocket.close()
+
+
+async def route(websocket: ServerConnection) -> None:
+    if urlparse(websocket.request.path).path != TRANSCRIBE_PATH:
+        await websocket.close(code=1008, reason="Unknown path")
+        return
+    await transcribe(websocket)
+
+
+def serve_realtime(host: str = "0.0.0.0", port: int = 5002):
+    """Return the (awaitable, async-context-managed) WebSocket server."""
+    return serve(route, host, port, max_size=MAX_FRAME_BYTES)
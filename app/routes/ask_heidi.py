@@ -1,7 +1,9 @@
 # app/routes/ask_heidi.py - Fixed blueprint and imports
 from flask import Blueprint, request, jsonify
-from app.api.auth import get_jwt_token
-from app.api.ask_heidi import ask_ai_stream, ask_ai_with_fallbacks
+from app.services.common import get_cached_jwt_token
+from app.api.ask_heidi import ask_ai_stream, ask_ai_with_fallbacks, open_ai_stream
+from app.routes.streaming import event_stream_response, wants_event_stream
+from app.services.streaming import relay_chunks
 import traceback
 
 # Create the blueprint
@@ -11,7 +13,7 @@ ask_heidi_bp = Blueprint('ask_heidi', __name__)
 def ask_heidi():
     """Original ask_heidi endpoint"""
     try:
-        jwt_token = get_jwt_token()
+        jwt_token = get_cached_jwt_token()
         if not jwt_token or 'Error' in str(jwt_token):
             return jsonify({"error": "Unauthorized", "details": str(jwt_token)}), 401
 
@@ -27,6 +29,12 @@ def ask_heidi():
         if not session_id or not ai_command_text or not content:
             return jsonify({"error": "Missing required parameters: session_id, ai_command_text, content"}), 400
 
+        if wants_event_stream(data):
+            chunks, error = open_ai_stream(jwt_token, session_id, ai_command_text, content, content_type)
+            if error:
+                return jsonify(error), error.get("status_code", 500)
+            return event_stream_response(relay_chunks(chunks, {"session_id": session_id}))
+
         response = ask_ai_stream(jwt_token, session_id, ai_command_text, content, content_type)
 
         if response.get("error"):
@@ -44,7 +52,7 @@ def ask_heidi():
 def ask_heidi_enhanced():
     """Enhanced ask_heidi endpoint with fallbacks"""
     try:
-        jwt_token = get_jwt_token()
+        jwt_token = get_cached_jwt_token()
         if not jwt_token or 'Error' in str(jwt_token):
             return jsonify({"error": "Unauthorized", "details": str(jwt_token)}), 401
 
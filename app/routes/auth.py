@@ -1,5 +1,5 @@
 from flask import Blueprint, jsonify
-from app.api.auth import get_jwt_token
+from app.services.common import get_cached_jwt_token
 
 main = Blueprint('auth_main', __name__)
 
@@ -9,5 +9,5 @@ def home():
 
 @main.route('/get-token')
 def token():
-    token = get_jwt_token()
+    token = get_cached_jwt_token()
     return jsonify({'jwt': token})
\ No newline at end of file
@@ -1,19 +1,39 @@
 from flask import Blueprint, jsonify, request
-from app.api.auth import get_jwt_token
-from app.api.consult import get_consult_note_templates, generate_consult_note, create_session
+from app.services.common import failure_status, get_cached_jwt_token
+from app.api.consult import generate_consult_note, create_session, open_consult_note_stream
+from app.routes.streaming import event_stream_response, wants_event_stream
+from app.services.streaming import iter_sections, relay_chunks
+from app.services.template_catalogue import get_template_catalogue
 
 consult_bp = Blueprint('consult', __name__)
 
+def _error_status(error):
+    """Heidi's own status for a failed call (503 for local refusals), else 502."""
+    upstream = error.get("status_code") if isinstance(error, dict) else None
+    return failure_status(error, upstream or 502)
+
 @consult_bp.route('/consult/templates', methods=['GET'])
 def templates():
-    jwt = get_jwt_token()
-    print(jwt)
-    result = get_consult_note_templates(jwt)
-    return jsonify(result)
+    jwt = get_cached_jwt_token()
+    refresh = request.args.get('refresh', '').lower() in ('1', 'true', 'yes')
+    catalogue, error = get_template_catalogue().get(jwt, force_refresh=refresh)
+    if error:
+        return jsonify(error), _error_status(error)
+    return jsonify(catalogue)
+
+@consult_bp.route('/consult/templates/<reference>', methods=['GET'])
+def template_lookup(reference):
+    jwt = get_cached_jwt_token()
+    template, error = get_template_catalogue().find(jwt, reference)
+    if error:
+        return jsonify(error), _error_status(error)
+    if template is None:
+        return jsonify({"error": True, "message": f"Template {reference!r} not found"}), 404
+    return jsonify(template)
 
 @consult_bp.route('/consult/generate', methods=['POST'])
 def generate():
-    jwt = get_jwt_token()
+    jwt = get_cached_jwt_token()
     data = request.get_json()
     session_id = data.get('session_id')
     template_id = data.get('template_id')
@@ -24,7 +44,16 @@ def generate():
     if not session_id or not template_id:
         return jsonify({"error": "session_id and template_id are required"}), 400
 
+    if wants_event_stream(data):
+        chunks, error = open_consult_note_stream(jwt, session_id, template_id, voice, brain, addition)
+        if error:
+            return jsonify(error), _error_status(error)
+        meta = {"session_id": session_id, "template_id": template_id}
+        return event_stream_response(relay_chunks(iter_sections(chunks), meta))
+
     result = generate_consult_note(jwt, session_id, template_id, voice, brain, addition)
+    if result.get("error"):
+        return jsonify(result), _error_status(result)
     return jsonify(result)
 
 
@@ -32,7 +61,7 @@ def generate():
 
 @consult_bp.route('/consult/session', methods=['POST'])
 def start_session():
-    jwt = get_jwt_token()
+    jwt = get_cached_jwt_token()
     session_id = create_session(jwt)
     
     if isinstance(session_id, str):
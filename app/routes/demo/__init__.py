@@ -4,14 +4,19 @@ import traceback
 
 from flask import Blueprint, jsonify, render_template, request
 
+from app.routes.streaming import event_stream_response, wants_event_stream
 from app.services.demo_flows import (
     ask_question_flow,
+    ask_question_stream_flow,
+    ask_questions_flow,
+    ask_questions_stream_flow,
     audio_transcription_test,
     build_debug_report,
     complete_flow_test,
     get_jwt_overview,
     get_session_overview,
     process_document_flow,
+    process_document_stream_flow,
     transcribe_audio_flow,
 )
 
@@ -36,6 +41,26 @@ def _dispatch(service_fn, *args, **kwargs):
         )
 
 
+def _dispatch_stream(stream_fn, *args, **kwargs):
+    try:
+        events, error = stream_fn(*args, **kwargs)
+    except Exception as exc:  # pragma: no cover - defensive
+        logger.exception("Demo stream setup failed")
+        return (
+            jsonify(
+                {
+                    "error": f"Server error: {str(exc)}",
+                    "traceback": traceback.format_exc(),
+                }
+            ),
+            500,
+        )
+    if error:
+        payload, status = error
+        return jsonify(payload), status
+    return event_stream_response(events)
+
+
 @demo_bp.route("/demo")
 def demo_home():
     """Serve the demo HTML page."""
@@ -87,9 +112,12 @@ def test_session():
 def process_document():
     """Generate a care plan from uploaded document text."""
     if request.is_json and request.json is not None:
-        document_text = request.json.get("document_text", "")
+        data = request.json
     else:
-        document_text = request.form.get("document_text", "")
+        data = request.form
+    document_text = data.get("document_text", "")
+    if wants_event_stream(data):
+        return _dispatch_stream(process_document_stream_flow, document_text)
     return _dispatch(process_document_flow, document_text)
 
 
@@ -99,9 +127,25 @@ def ask_question():
     data = request.get_json()
     if not data:
         return jsonify({"error": "No JSON data provided"}), 400
+    if wants_event_stream(data):
+        return _dispatch_stream(
+            ask_question_stream_flow, data.get("question", ""), data.get("session_id")
+        )
     return _dispatch(ask_question_flow, data.get("question", ""), data.get("session_id"))
 
 
+@demo_bp.route("/ask-questions", methods=["POST"])
+def ask_questions():
+    """Answer a batch of questions concurrently over one token and session."""
+    data = request.get_json()
+    if not data:
+        return jsonify({"error": "No JSON data provided"}), 400
+    questions, session_id = data.get("questions"), data.get("session_id")
+    if wants_event_stream(data):
+        return _dispatch_stream(ask_questions_stream_flow, questions, session_id)
+    return _dispatch(ask_questions_flow, questions, session_id)
+
+
 @demo_bp.route("/test-complete-flow", methods=["POST"])
 def test_complete_flow():
     """Test the complete flow from JWT to AI response."""
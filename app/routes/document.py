@@ -1,26 +1,42 @@
 from flask import Blueprint, request, jsonify
-import os
-import fitz  # PyMuPDF
+
+from app.routes.streaming import event_stream_response, wants_event_stream
+from app.services.pdf_text import (
+    PDF_MAX_BYTES,
+    extract_pdf_text,
+    stream_pdf_pages,
+    text_cache_stats,
+)
+from app.services.streaming import relay_chunks
 
 document_bp = Blueprint('document', __name__)
 
 @document_bp.route('/upload-document', methods=['POST'])
 def upload_document():
+    # Allow some room for the multipart envelope around the file itself.
+    if request.content_length and request.content_length > PDF_MAX_BYTES + 64 * 1024:
+        return jsonify({"error": f"PDF exceeds the {PDF_MAX_BYTES} byte limit"}), 413
+
     uploaded_file = request.files.get('file')
-    if not uploaded_file or not uploaded_file.filename.endswith('.pdf'):
+    if not uploaded_file or not uploaded_file.filename.lower().endswith('.pdf'):
         return jsonify({"error": "No valid PDF file provided"}), 400
 
-    file_path = os.path.join('/tmp', uploaded_file.filename)
-    uploaded_file.save(file_path)
+    # Read one byte past the cap so oversized files are rejected without buffering them whole.
+    data = uploaded_file.stream.read(PDF_MAX_BYTES + 1)
+
+    if wants_event_stream():
+        stream, error = stream_pdf_pages(data)
+        if error:
+            payload, status = error
+            return jsonify(payload), status
+        page_count, pages = stream
+        meta = {"filename": uploaded_file.filename, "pages": page_count}
+        return event_stream_response(relay_chunks(pages, meta))
+
+    payload, status = extract_pdf_text(data)
+    return jsonify(payload), status
 
-    try:
-        # Extract text using PyMuPDF
-        doc = fitz.open(file_path)
-        full_text = ''
-        for page in doc:
-            full_text += page.get_text()
-        doc.close()
 
-        return jsonify({"text": full_text.strip()})
-    except Exception as e:
-        return jsonify({"error": f"Failed to extract text: {str(e)}"}), 500
+@document_bp.route('/upload-document/cache-stats', methods=['GET'])
+def document_cache_stats():
+    return jsonify(text_cache_stats())
@@ -0,0 +1,56 @@
+from flask import Blueprint, jsonify, request
+
+from app.routes.streaming import event_stream_response
+from app.services.jobs import get_job_engine
+from app.services.note_pipeline import submit_transcription_note_job
+from app.services.streaming import format_sse
+
+jobs_bp = Blueprint("jobs", __name__)
+
+
+def jsonify_submission(result):
+    """A job submission reply; refusals from a full engine carry ``Retry-After``."""
+    payload, status = result
+    headers = {"Retry-After": str(payload["retry_after"])} if "retry_after" in payload else {}
+    return jsonify(payload), status, headers
+
+
+@jobs_bp.route("/jobs/transcription-note", methods=["POST"])
+def submit_transcription_note():
+    uploaded_file = request.files.get("audio")
+    if not uploaded_file or not uploaded_file.filename:
+        return jsonify({"success": False, "error": "No audio file provided"}), 400
+
+    return jsonify_submission(
+        submit_transcription_note_job(
+            uploaded_file.read(),
+            uploaded_file.filename,
+            template=request.form.get("template"),
+            session_id=request.form.get("session_id"),
+        )
+    )
+
+
+@jobs_bp.route("/jobs/<job_id>", methods=["GET"])
+def job_status(job_id):
+    snapshot = get_job_engine().status(job_id)
+    if snapshot is None:
+        return jsonify({"error": "Job not found", "job_id": job_id}), 404
+    return jsonify(snapshot)
+
+
+@jobs_bp.route("/jobs/<job_id>/events", methods=["GET"])
+def job_events(job_id):
+    engine = get_job_engine()
+    if engine.status(job_id) is None:
+        return jsonify({"error": "Job not found", "job_id": job_id}), 404
+
+    def events():
+        for event in engine.iter_events(job_id):
+            if event is None:
+                # SSE comment line keeps idle proxies from closing the stream.
+                yield ": keep-alive\n\n"
+                continue
+            yield format_sse(event, event=event["event"])
+
+    return event_stream_response(events())
@@ -1,5 +1,5 @@
 from flask import Blueprint, jsonify, request
-from app.api.auth import get_jwt_token
+from app.services.common import get_cached_jwt_token
 from app.api.session import create_session, get_session_details, update_session
 
 session_bp = Blueprint('session', __name__)
@@ -7,7 +7,7 @@ session_bp = Blueprint('session', __name__)
 
 @session_bp.route('', methods=['POST'])
 def create():
-    jwt_token = get_jwt_token()
+    jwt_token = get_cached_jwt_token()
     if not jwt_token:
         return jsonify({"error": "JWT token not found"}), 401
 
@@ -20,7 +20,7 @@ def create():
 
 @session_bp.route('/<session_id>', methods=['GET'])
 def details(session_id):
-    jwt_token = get_jwt_token()
+    jwt_token = get_cached_jwt_token()
     if not jwt_token:
         return jsonify({"error": "JWT token not found"}), 401
    
@@ -33,7 +33,7 @@ def details(session_id):
 
 @session_bp.route('/<session_id>', methods=['PATCH'])
 def update_session_route(session_id):
-    jwt_token = get_jwt_token()
+    jwt_token = get_cached_jwt_token()
     if not jwt_token:
         return jsonify({"error": "JWT token not found"}), 401
 
@@ -0,0 +1,24 @@
+from typing import Any, Iterator, Optional
+
+from flask import Response, request, stream_with_context
+
+_TRUTHY = ("1", "true", "yes", "on")
+
+
+def wants_event_stream(data: Optional[Any] = None) -> bool:
+    """True when the caller asked for SSE via ``?stream=``, a body flag or Accept."""
+    flag = request.args.get("stream")
+    if flag is None and data is not None and hasattr(data, "get"):
+        flag = data.get("stream")
+    if flag is None:
+        return "text/event-stream" in request.headers.get("Accept", "")
+    return flag is True or str(flag).lower() in _TRUTHY
+
+
+def event_stream_response(events: Iterator[str]) -> Response:
+    """Wrap an SSE message iterator in an unbuffered Flask response."""
+    response = Response(stream_with_context(events), mimetype="text/event-stream")
+    response.headers["Cache-Control"] = "no-cache"
+    # Stop nginx-style proxies from buffering the stream.
+    response.headers["X-Accel-Buffering"] = "no"
+    return response
@@ -1,12 +1,17 @@
 from flask import Blueprint, jsonify, request
 
-from app.api.consult import generate_consult_note, get_consult_note_templates
+from app.api.consult import generate_consult_note
+from app.routes.jobs import jsonify_submission
 from app.services.common import ensure_session, fetch_jwt_token
+from app.services.note_pipeline import submit_transcription_note_job
+from app.services.template_catalogue import resolve_template_id
 from app.services.transcription import (
     finish_transcription_service,
     start_transcription_service,
     transcript_lookup_service,
+    upload_audio_segmented_service,
     upload_audio_service,
+    upload_audio_stream_service,
 )
 
 transcript_bp = Blueprint("transcript", __name__)
@@ -37,15 +42,30 @@ def route_upload_audio():
     if error:
         return _jsonify_service(error)
 
-    session_id = request.form.get("session_id")
-    recording_id = request.form.get("recording_id")
+    session_id = request.form.get("session_id") or request.args.get("session_id")
+    recording_id = request.form.get("recording_id") or request.args.get("recording_id")
     file = request.files.get("file")
 
     if not session_id or not recording_id:
         return jsonify({"error": "session_id and recording_id are required"}), 400
 
+    if file is None and request.mimetype.startswith("audio/"):
+        # Raw audio body: relay request.stream upstream as it arrives.
+        return _jsonify_service(
+            upload_audio_stream_service(
+                jwt_token, session_id, recording_id, request.stream,
+                filename=request.args.get("filename", "audio.wav"),
+                content_length=request.content_length,
+                content_type=request.mimetype,
+                index=request.args.get("index", "0"),
+            )
+        )
+
     return _jsonify_service(
-        upload_audio_service(jwt_token, session_id, recording_id, file)
+        upload_audio_service(
+            jwt_token, session_id, recording_id, file,
+            index=request.form.get("index", "0"),
+        )
     )
 
 
@@ -82,6 +102,17 @@ def route_view_transcript():
 
 @transcript_bp.route("/demo/full-transcript", methods=["POST"])
 def full_transcription_demo():
+    if request.args.get("async", "").lower() in ("1", "true", "yes"):
+        # Hand the whole pipeline to a background job and return its id at once.
+        uploaded_file = request.files.get("audio")
+        if not uploaded_file or not uploaded_file.filename.lower().endswith(".mp3"):
+            return jsonify({"error": True, "message": "No valid MP3 file provided"}), 400
+        return jsonify_submission(
+            submit_transcription_note_job(
+                uploaded_file.read(), uploaded_file.filename, request.form.get("template")
+            )
+        )
+
     jwt_token, error = fetch_jwt_token()
     if error:
         return _jsonify_service(error)
@@ -99,7 +130,7 @@ def full_transcription_demo():
     if not uploaded_file or not uploaded_file.filename.lower().endswith(".mp3"):
         return jsonify({"error": True, "message": "No valid MP3 file provided"}), 400
 
-    upload_payload, upload_status = upload_audio_service(
+    upload_payload, upload_status = upload_audio_segmented_service(
         jwt_token, session_id, recording_id, uploaded_file
     )
     if upload_status != 200 or not upload_payload.get("success"):
@@ -111,15 +142,11 @@ def full_transcription_demo():
     if finish_status != 200 or not finish_payload.get("success"):
         return jsonify(finish_payload), finish_status
 
-    templates = get_consult_note_templates(jwt_token)
-    if (
-        not templates
-        or "templates" not in templates
-        or len(templates["templates"]) == 0
-    ):
-        return jsonify({"error": True, "message": "No consult templates found"}), 404
-
-    template_id = templates["templates"][0]["id"]
+    template_id, template_error = resolve_template_id(
+        jwt_token, request.form.get("template")
+    )
+    if template_error:
+        return _jsonify_service(template_error)
 
     note = generate_consult_note(
         jwt_token, session_id, template_id, voice_style="BRIEF", brain="LEFT"
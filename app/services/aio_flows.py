@@ -0,0 +1,412 @@
+"""Asyncio counterparts of the demo workflows in ``demo_flows``.
+
+Each flow awaits the aiohttp client instead of blocking on ``requests`` so a
+single event loop can hold many slow Ask AI calls open at once. Validation,
+prompts and response shapes are shared with the synchronous flows.
+"""
+import asyncio
+import logging
+import time
+from typing import Any, AsyncIterator, Dict, List, Optional, Tuple
+
+from app.api.aio import ask_heidi as aio_ask_heidi
+from app.api.aio import session as aio_session
+from app.api.aio import transcript as aio_transcript
+from app.services import common
+from app.services.care_plan import (
+    CARE_PLAN_MAP_WORKERS,
+    CARE_PLAN_PROMPT,
+    REDUCE_PROMPT,
+    combine_part_notes,
+    extract_prompt,
+    split_document,
+    validate_document_text,
+)
+from app.services.common import extract_ai_content, extract_transcript_text, transcript_pending_response
+from app.services.question_batch import (
+    BATCH_CONCURRENCY,
+    batch_summary,
+    empty_question_result,
+    normalize_questions,
+    question_prompt,
+    question_result,
+)
+from app.services.streaming import format_sse
+from app.services.transcript_waiter import wait_for_transcript_async
+from app.services.transcription import (
+    format_finish_result,
+    format_start_result,
+    format_upload_result,
+)
+
+logger = logging.getLogger(__name__)
+
+JsonResponse = Tuple[Dict[str, Any], int]
+AsyncStreamResult = Tuple[Optional[AsyncIterator[str]], Optional[JsonResponse]]
+
+
+async def fetch_jwt_token() -> Tuple[Optional[str], Optional[JsonResponse]]:
+    """Async ``fetch_jwt_token``; the cached token is normally returned at once."""
+    return await asyncio.to_thread(common.fetch_jwt_token)
+
+
+async def ensure_session(jwt_token: str, session_id: Optional[str]) -> Tuple[Optional[str], Optional[JsonResponse]]:
+    """Async ``ensure_session``."""
+    if session_id:
+        return session_id, None
+
+    pooled_session_id = common.acquire_pooled_session()
+    if pooled_session_id:
+        return pooled_session_id, None
+    return common._validate_new_session(await aio_session.create_session(jwt_token))
+
+
+async def relay_chunks(chunks: AsyncIterator[str], meta: Optional[Dict[str, Any]] = None) -> AsyncIterator[str]:
+    """Async ``streaming.relay_chunks``."""
+    if meta:
+        yield format_sse(meta, event="meta")
+
+    chunk_count = 0
+    character_count = 0
+    try:
+        async for chunk in chunks:
+            chunk_count += 1
+            character_count += len(chunk)
+            yield format_sse({"data": chunk})
+    except Exception as exc:
+        logger.exception("Upstream stream failed after %s chunks", chunk_count)
+        yield format_sse({"error": True, "message": str(exc)}, event="error")
+        return
+    finally:
+        await chunks.aclose()
+
+    yield format_sse({"chunks": chunk_count, "length": character_count}, event="done")
+
+
+async def _care_plan_request(
+    jwt_token: str, session_id: str, document_text: str
+) -> Tuple[str, str, Dict[str, Any], Optional[dict]]:
+    """Async ``demo_flows._care_plan_request``: parts are extracted concurrently on the loop."""
+    parts = split_document(document_text)
+    if len(parts) == 1:
+        return CARE_PLAN_PROMPT, document_text, {"document_parts": 1}, None
+
+    started = time.perf_counter()
+    slots = asyncio.Semaphore(CARE_PLAN_MAP_WORKERS)
+
+    async def extract(index: int, part: str) -> dict:
+        async with slots:
+            return await aio_ask_heidi.ask_ai_with_fallbacks(
+                jwt_token, session_id, extract_prompt(index, len(parts)), part, use_cache=True
+            )
+
+    tasks = [asyncio.ensure_future(extract(index, part)) for index, part in enumerate(parts, start=1)]
+    notes: List[str] = []
+    try:
+        for index, task in enumerate(tasks, start=1):
+            result = await task
+            if result.get("error"):
+                return "", "", {}, dict(result, document_part=index, document_parts=len(parts))
+            notes.append(extract_ai_content(result.get("response", "")))
+    finally:
+        for task in tasks:
+            task.cancel()
+
+    stats = {"document_parts": len(parts), "map_seconds": round(time.perf_counter() - started, 3)}
+    return REDUCE_PROMPT, combine_part_notes(notes), stats, None
+
+
+async def process_document_flow(document_text: str) -> JsonResponse:
+    error = validate_document_text(document_text)
+    if error:
+        return error
+
+    jwt_token, error = await fetch_jwt_token()
+    if error:
+        return error
+
+    session_id, error = await ensure_session(jwt_token, None)
+    if error:
+        return error
+
+    command, content, stats, ai_response = await _care_plan_request(jwt_token, session_id, document_text)
+    if ai_response is None:
+        ai_response = await aio_ask_heidi.ask_ai_with_fallbacks(
+            jwt_token, session_id, command, content, use_cache=True
+        )
+    if ai_response.get("error"):
+        common.report_session_error(session_id, ai_response)
+        return (
+            {
+                "error": "AI request failed",
+                "details": ai_response,
+                "suggestion": "Try again or check if session is still valid",
+            },
+            common.failure_status(ai_response),
+        )
+
+    response_content = extract_ai_content(ai_response.get("response", ""))
+    return (
+        {
+            "success": True,
+            "care_plan": response_content,
+            "session_id": session_id,
+            "extracted_text": document_text,
+            "response_format": ai_response.get("format", "unknown"),
+            "response_length": len(str(response_content)),
+            **stats,
+        },
+        200,
+    )
+
+
+async def ask_question_flow(question: str, session_id: Optional[str]) -> JsonResponse:
+    cleaned_question = question.strip()
+    if not cleaned_question:
+        return {"error": "Question cannot be empty"}, 400
+
+    jwt_token, error = await fetch_jwt_token()
+    if error:
+        return error
+
+    session_id_value, error = await ensure_session(jwt_token, session_id)
+    if error:
+        return error
+
+    ai_response = await aio_ask_heidi.ask_ai_with_fallbacks(
+        jwt_token, session_id_value, question_prompt(cleaned_question), cleaned_question
+    )
+    if ai_response.get("error"):
+        common.report_session_error(session_id_value, ai_response)
+        error = {"error": "Failed to get AI response", "details": ai_response}
+        return error, common.failure_status(ai_response)
+
+    response_content = extract_ai_content(ai_response.get("response", ""))
+    return (
+        {
+            "success": True,
+            "response": response_content,
+            "session_id": session_id_value,
+            "question_received": cleaned_question,
+            "response_format": ai_response.get("format", "unknown"),
+        },
+        200,
+    )
+
+
+async def ask_question_stream_flow(question: str, session_id: Optional[str]) -> AsyncStreamResult:
+    cleaned_question = question.strip()
+    if not cleaned_question:
+        return None, ({"error": "Question cannot be empty"}, 400)
+
+    jwt_token, error = await fetch_jwt_token()
+    if error:
+        return None, error
+
+    session_id_value, error = await ensure_session(jwt_token, session_id)
+    if error:
+        return None, error
+
+    chunks, ai_error = await aio_ask_heidi.open_ai_stream_with_fallbacks(
+        jwt_token, session_id_value, question_prompt(cleaned_question), cleaned_question
+    )
+    if ai_error:
+        common.report_session_error(session_id_value, ai_error)
+        error = {"error": "Failed to get AI response", "details": ai_error}
+        return None, (error, common.failure_status(ai_error))
+
+    meta = {"session_id": session_id_value, "question_received": cleaned_question}
+    return relay_chunks(chunks, meta), None
+
+
+async def _aiter_answers(jwt_token: str, session_id: str, questions: List[str]) -> AsyncIterator[Dict[str, Any]]:
+    """Async ``demo_flows._iter_answers``: results in completion order, bounded by a semaphore."""
+    for index, question in enumerate(questions):
+        if not question:
+            yield empty_question_result(index)
+
+    slots = asyncio.Semaphore(BATCH_CONCURRENCY)
+
+    async def answer(index: int, question: str) -> Dict[str, Any]:
+        async with slots:
+            started = time.perf_counter()
+            try:
+                ai_response = await aio_ask_heidi.ask_ai_with_fallbacks(
+                    jwt_token, session_id, question_prompt(question), question
+                )
+            except Exception as exc:
+                logger.exception("Batch question %s failed", index)
+                ai_response = {"error": True, "status_code": 500, "message": str(exc)}
+            if ai_response.get("error"):
+                common.report_session_error(session_id, ai_response)
+            return question_result(index, question, ai_response, time.perf_counter() - started)
+
+    tasks = [
+        asyncio.ensure_future(answer(index, question))
+        for index, question in enumerate(questions)
+        if question
+    ]
+    try:
+        for next_done in asyncio.as_completed(tasks):
+            yield await next_done
+    finally:
+        for task in tasks:
+            task.cancel()
+
+
+async def ask_questions_flow(questions: Any, session_id: Optional[str]) -> JsonResponse:
+    cleaned_questions, error = normalize_questions(questions)
+    if error:
+        return error
+
+    jwt_token, error = await fetch_jwt_token()
+    if error:
+        return error
+
+    session_id_value, error = await ensure_session(jwt_token, session_id)
+    if error:
+        return error
+
+    started = time.perf_counter()
+    results = [result async for result in _aiter_answers(jwt_token, session_id_value, cleaned_questions)]
+    results.sort(key=lambda result: result["index"])
+    summary = batch_summary(results, time.perf_counter() - started)
+    return (
+        {
+            "success": summary["failed"] == 0,
+            "session_id": session_id_value,
+            "results": results,
+            **summary,
+        },
+        200,
+    )
+
+
+async def _stream_answers(jwt_token: str, session_id: str, questions: List[str]) -> AsyncIterator[str]:
+    yield format_sse({"session_id": session_id, "questions": len(questions)}, event="meta")
+    started = time.perf_counter()
+    results = []
+    answers = _aiter_answers(jwt_token, session_id, questions)
+    try:
+        async for result in answers:
+            results.append(result)
+            yield format_sse(result, event="answer")
+    finally:
+        await answers.aclose()
+    yield format_sse(batch_summary(results, time.perf_counter() - started), event="done")
+
+
+async def ask_questions_stream_flow(questions: Any, session_id: Optional[str]) -> AsyncStreamResult:
+    cleaned_questions, error = normalize_questions(questions)
+    if error:
+        return None, error
+
+    jwt_token, error = await fetch_jwt_token()
+    if error:
+        return None, error
+
+    session_id_value, error = await ensure_session(jwt_token, session_id)
+    if error:
+        return None, error
+
+    return _stream_answers(jwt_token, session_id_value, cleaned_questions), None
+
+
+async def process_document_stream_flow(document_text: str) -> AsyncStreamResult:
+    error = validate_document_text(document_text)
+    if error:
+        return None, error
+
+    jwt_token, error = await fetch_jwt_token()
+    if error:
+        return None, error
+
+    session_id, error = await ensure_session(jwt_token, None)
+    if error:
+        return None, error
+
+    command, content, stats, ai_error = await _care_plan_request(jwt_token, session_id, document_text)
+    chunks = None
+    if ai_error is None:
+        chunks, ai_error = await aio_ask_heidi.open_ai_stream_with_fallbacks(
+            jwt_token, session_id, command, content
+        )
+    if ai_error:
+        common.report_session_error(session_id, ai_error)
+        return None, (
+            {
+                "error": "AI request failed",
+                "details": ai_error,
+                "suggestion": "Try again or check if session is still valid",
+            },
+            common.failure_status(ai_error),
+        )
+
+    return relay_chunks(chunks, dict(stats, session_id=session_id)), None
+
+
+async def transcribe_audio_flow(audio: bytes, filename: str, session_id: Optional[str]) -> JsonResponse:
+    """Async ``transcribe_audio_flow`` over an in-memory upload."""
+    if not audio:
+        return {"success": False, "error": "No audio file provided"}, 400
+
+    jwt_token, error = await fetch_jwt_token()
+    if error:
+        return error
+
+    session_id_value, error = await ensure_session(jwt_token, session_id)
+    if error:
+        return error
+
+    start_payload, status = format_start_result(
+        await aio_transcript.start_transcription(jwt_token, session_id_value)
+    )
+    if status != 200 or not start_payload.get("success"):
+        return start_payload, status
+    recording_id = start_payload["recording_id"]
+
+    upload_payload, status = format_upload_result(
+        await aio_transcript.upload_audio_bytes(
+            jwt_token, session_id_value, recording_id, audio, filename
+        ),
+        "Audio upload failed",
+    )
+    if status != 200 or not upload_payload.get("success"):
+        return upload_payload, status
+
+    finish_payload, status = format_finish_result(
+        await aio_transcript.finish_transcription(jwt_token, session_id_value, recording_id)
+    )
+    if status != 200 or not finish_payload.get("success"):
+        return finish_payload, status
+
+    transcript_payload, status = await wait_for_transcript_async(
+        jwt_token, session_id_value, aio_transcript.get_transcript
+    )
+    if status != 200 or not transcript_payload.get("success"):
+        return transcript_payload, status
+    pending = transcript_pending_response(transcript_payload, session_id_value, recording_id)
+    if pending:
+        return pending
+
+    transcript_text = extract_transcript_text(transcript_payload.get("transcript")).strip()
+    if not transcript_text or transcript_text == "{}":
+        return (
+            {
+                "success": False,
+                "error": "No speech detected in audio file",
+                "suggestion": "Please try recording again with clearer speech",
+            },
+            400,
+        )
+
+    return (
+        {
+            "success": True,
+            "transcript": transcript_text,
+            "partial": transcript_payload.get("partial", False),
+            "session_id": session_id_value,
+            "recording_id": recording_id,
+        },
+        200,
+    )
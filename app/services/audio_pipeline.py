@@ -0,0 +1,147 @@
+"""Split recordings into segments and upload them concurrently."""
+import io
+import logging
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Dict, List, Optional, Tuple
+
+from pydub import AudioSegment
+
+from app.api.resilience import is_retryable, retry_allowed
+from app.api.transcript import upload_audio_fileobj
+from app.services.common import failure_status
+
+logger = logging.getLogger(__name__)
+
+JsonResponse = Tuple[Dict[str, Any], int]
+
+# Segment length in seconds; 0 uploads every recording as a single segment.
+SEGMENT_SECONDS = float(os.getenv("HEIDI_AUDIO_SEGMENT_SECONDS", "60"))
+UPLOAD_CONCURRENCY = int(os.getenv("HEIDI_AUDIO_UPLOAD_CONCURRENCY", "4"))
+SEGMENT_RETRIES = int(os.getenv("HEIDI_AUDIO_SEGMENT_RETRIES", "2"))
+
+_EXPORT_FORMATS = ("mp3", "wav", "ogg", "flac")
+
+
+def _audio_format(filename: str) -> str:
+    extension = os.path.splitext(filename)[1].lstrip(".").lower()
+    return extension if extension in _EXPORT_FORMATS else "mp3"
+
+
+def split_audio(audio: bytes, filename: str, segment_seconds: float) -> List[bytes]:
+    """
+    Cut a recording into ``segment_seconds`` pieces, encoded like the source.
+
+    Recordings that fit in one segment, or that pydub cannot decode (for
+    example when ffmpeg is missing), are returned unchanged as one segment.
+    """
+    if segment_seconds <= 0:
+        return [audio]
+
+    audio_format = _audio_format(filename)
+    try:
+        recording = AudioSegment.from_file(io.BytesIO(audio), format=audio_format)
+    except Exception as exc:
+        logger.warning("Could not decode %s for segmenting, uploading whole: %s", filename, exc)
+        return [audio]
+
+    segment_ms = int(segment_seconds * 1000)
+    if len(recording) <= segment_ms:
+        return [audio]
+
+    segments = []
+    for start in range(0, len(recording), segment_ms):
+        buffer = io.BytesIO()
+        recording[start:start + segment_ms].export(buffer, format=audio_format)
+        segments.append(buffer.getvalue())
+    return segments
+
+
+def _upload_segment(
+    jwt_token: str,
+    session_id: str,
+    recording_id: str,
+    segment: bytes,
+    index: int,
+    filename: str,
+    retries: int,
+) -> Dict[str, Any]:
+    """
+    Upload one segment, retrying with backoff until Heidi acknowledges it.
+
+    Failures a retry cannot fix (auth, unknown recording, refusals) are not
+    retried, and every retry is paid for from the shared retry budget.
+    """
+    result: Any = None
+    attempts = 0
+    while True:
+        attempts += 1
+        try:
+            result = upload_audio_fileobj(
+                jwt_token, session_id, recording_id, io.BytesIO(segment), str(index), filename
+            )
+        except Exception as exc:
+            result = {"error": True, "message": str(exc)}
+        if isinstance(result, dict) and result.get("is_success") is True:
+            return {"index": index, "success": True, "attempts": attempts}
+        if attempts > retries or (isinstance(result, dict) and not is_retryable(result)):
+            break
+        if not retry_allowed():
+            break
+        time.sleep(0.5 * 2 ** (attempts - 1))
+
+    logger.warning("Segment %s of recording %s failed: %s", index, recording_id, result)
+    return {"index": index, "success": False, "attempts": attempts, "details": result}
+
+
+def upload_audio_segments(
+    jwt_token: str,
+    session_id: str,
+    recording_id: str,
+    audio: bytes,
+    filename: str,
+    *,
+    segment_seconds: Optional[float] = None,
+    max_workers: Optional[int] = None,
+    retries: Optional[int] = None,
+) -> JsonResponse:
+    """
+    Upload a recording as indexed segments with bounded parallelism.
+
+    Succeeds only when every index is acknowledged, so callers can safely
+    call ``finish_transcription`` afterwards.
+    """
+    segments = split_audio(
+        audio, filename, SEGMENT_SECONDS if segment_seconds is None else segment_seconds
+    )
+    workers = max(1, min(max_workers or UPLOAD_CONCURRENCY, len(segments)))
+    retries = SEGMENT_RETRIES if retries is None else retries
+    segment_name = f"segment.{_audio_format(filename)}" if len(segments) > 1 else filename
+
+    with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="audio-upload") as executor:
+        results = list(
+            executor.map(
+                lambda item: _upload_segment(
+                    jwt_token, session_id, recording_id, item[1], item[0], segment_name, retries
+                ),
+                enumerate(segments),
+            )
+        )
+
+    failed = [result for result in results if not result["success"]]
+    details = {
+        "segments": len(segments),
+        "acknowledged": [result["index"] for result in results if result["success"]],
+    }
+    if failed:
+        return (
+            {
+                "success": False,
+                "error": "Audio upload failed",
+                "details": dict(details, failed=failed),
+            },
+            # A refused segment means Heidi is unavailable: answer 503 so clients back off.
+            max(failure_status(result["details"]) for result in failed),
+        )
+    return {"success": True, "details": details}, 200
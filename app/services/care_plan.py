@@ -0,0 +1,142 @@
+"""Care-plan prompts and splitting of long discharge documents for map-reduce generation."""
+import math
+import os
+import re
+from typing import Any, Dict, List, Optional, Tuple
+
+JsonResponse = Tuple[Dict[str, Any], int]
+
+# Documents longer than this (characters) are split into parts that are
+# summarised concurrently and merged in one final call; 0 disables splitting.
+CARE_PLAN_CHUNK_CHARS = int(os.getenv("HEIDI_CARE_PLAN_CHUNK_CHARS", "12000"))
+# Upper bound on parts per document; longer documents get larger parts instead.
+CARE_PLAN_MAX_CHUNKS = int(os.getenv("HEIDI_CARE_PLAN_MAX_CHUNKS", "24"))
+CARE_PLAN_MAP_WORKERS = int(os.getenv("HEIDI_CARE_PLAN_MAP_WORKERS", "6"))
+
+CARE_PLAN_SECTIONS = """
+1. Medication Schedule: List medications with dosage, frequency, and special instructions
+2. Activity Guidelines: What activities are allowed/restricted and when
+3. Wound Care: How to care for surgical sites and dressings
+4. Warning Signs: Symptoms that require immediate medical attention
+5. Follow-up Care: Appointment reminders and next steps
+""".strip()
+
+CARE_PLAN_PROMPT = f"""
+You are a medical care assistant. Based on the following discharge document, create a structured post-surgery care plan.
+
+Please provide a helpful care plan with these sections:
+{CARE_PLAN_SECTIONS}
+
+Make it clear, practical, and reassuring for a patient recovering at home.
+Use bullet points and clear headings for easy reading.
+""".strip()
+
+EXTRACT_PROMPT = f"""
+You are reading part {{part}} of {{parts}} of one long hospital discharge document.
+Extract every detail in this part that belongs in a post-surgery care plan, under these headings:
+{CARE_PLAN_SECTIONS}
+
+Use short bullet points. Keep drug names, doses, dates and contact details exactly as written.
+Write "None in this part" under a heading with nothing relevant, and do not add anything that is not in the text.
+""".strip()
+
+REDUCE_PROMPT = f"""
+You are a medical care assistant. The notes below were extracted, part by part, from one long discharge document.
+Merge them into a single structured post-surgery care plan, removing duplicates; where parts disagree, prefer the later part.
+
+Please provide a helpful care plan with these sections:
+{CARE_PLAN_SECTIONS}
+
+Make it clear, practical, and reassuring for a patient recovering at home.
+Use bullet points and clear headings for easy reading.
+""".strip()
+
+# Preferred split points, coarsest first: page breaks, section headings
+# ("DISCHARGE MEDICATIONS", "Follow-up:"), paragraphs, lines, sentences.
+_BOUNDARIES = (
+    re.compile(r"\f"),
+    re.compile(r"\n(?=[ \t]*(?:[A-Z][A-Z0-9 /&(),-]{2,60}|[A-Z][A-Za-z0-9 /&(),-]{2,60}:)[ \t]*\n)"),
+    re.compile(r"\n[ \t]*\n"),
+    re.compile(r"\n"),
+    re.compile(r"(?<=[.!?;])\s+"),
+)
+
+
+def _split_keeping_separators(text: str, pattern: "re.Pattern[str]") -> List[str]:
+    pieces, start = [], 0
+    for match in pattern.finditer(text):
+        if match.end() > start:
+            pieces.append(text[start:match.end()])
+            start = match.end()
+    pieces.append(text[start:])
+    return [piece for piece in pieces if piece]
+
+
+def _pack(text: str, max_chars: int, level: int) -> List[str]:
+    if len(text) <= max_chars:
+        return [text]
+    if level == len(_BOUNDARIES):
+        return [text[start:start + max_chars] for start in range(0, len(text), max_chars)]
+
+    chunks: List[str] = []
+    current = ""
+    for piece in _split_keeping_separators(text, _BOUNDARIES[level]):
+        if len(piece) > max_chars:
+            parts = _pack(piece, max_chars, level + 1)
+            # Keep a heading or short lead-in together with the text that follows it.
+            if current and len(current) + len(parts[0]) <= max_chars:
+                parts[0] = current + parts[0]
+            elif current:
+                chunks.append(current)
+            chunks.extend(parts[:-1])
+            current = parts[-1]
+        elif len(current) + len(piece) > max_chars:
+            chunks.append(current)
+            current = piece
+        else:
+            current += piece
+    if current:
+        chunks.append(current)
+    return chunks
+
+
+def split_document(
+    text: str, max_chars: Optional[int] = None, max_chunks: Optional[int] = None
+) -> List[str]:
+    """
+    Split ``text`` into parts of at most ``max_chars`` characters, cutting at
+    the coarsest boundary that fits (page, section heading, paragraph, line,
+    sentence). Documents that fit are returned whole. ``max_chunks`` bounds
+    the number of parts roughly by growing the part size.
+    """
+    max_chars = CARE_PLAN_CHUNK_CHARS if max_chars is None else max_chars
+    max_chunks = CARE_PLAN_MAX_CHUNKS if max_chunks is None else max_chunks
+    if max_chars <= 0 or len(text) <= max_chars:
+        return [text]
+    if max_chunks > 0:
+        max_chars = max(max_chars, math.ceil(len(text) / max_chunks))
+    return [chunk for chunk in _pack(text, max_chars, 0) if chunk.strip()]
+
+
+def extract_prompt(part: int, parts: int) -> str:
+    return EXTRACT_PROMPT.format(part=part, parts=parts)
+
+
+def combine_part_notes(notes: List[str]) -> str:
+    """Content for the reduce call: every part's notes, in document order."""
+    return "\n\n".join(
+        f"### Part {index} of {len(notes)}\n{note.strip()}" for index, note in enumerate(notes, start=1)
+    )
+
+
+def validate_document_text(document_text: str) -> Optional[JsonResponse]:
+    if not document_text or len(document_text.strip()) < 10:
+        return (
+            {
+                "error": "Document text is too short or empty",
+                "received_length": len(document_text),
+                "minimum_required": 10,
+            },
+            400,
+        )
+    return None
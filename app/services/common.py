@@ -1,17 +1,23 @@
 import logging
 from typing import Any, Dict, Optional, Tuple
 
-from app.api.auth import get_jwt_token
 from app.api.session import create_session
+from app.services.session_pool import get_session_pool
+from app.services.token_manager import get_token_manager
 
 logger = logging.getLogger(__name__)
 
 JsonResponse = Tuple[Dict[str, Any], int]
 
 
+def get_cached_jwt_token() -> str:
+    """Return the cached JWT, refreshing it only when it is about to expire."""
+    return get_token_manager().get_token()
+
+
 def fetch_jwt_token() -> Tuple[Optional[str], Optional[JsonResponse]]:
     """Return a JWT token or an error response tuple."""
-    jwt_token = get_jwt_token()
+    jwt_token = get_cached_jwt_token()
     if not jwt_token or "Error" in str(jwt_token):
         logger.error("JWT retrieval failed: %s", jwt_token)
         return None, (
@@ -20,17 +26,47 @@ def fetch_jwt_token() -> Tuple[Optional[str], Optional[JsonResponse]]:
                 "error": "Authentication failed",
                 "details": str(jwt_token),
             },
-            401,
+            503 if str(jwt_token).startswith("Error: 503") else 401,
         )
     return jwt_token, None
 
 
 def ensure_session(jwt_token: str, session_id: Optional[str]) -> Tuple[Optional[str], Optional[JsonResponse]]:
-    """Ensure a valid session id, creating one when necessary."""
+    """Ensure a valid session id, taking a pre-warmed one or creating one when necessary."""
     if session_id:
         return session_id, None
 
-    new_session_id = create_session(jwt_token)
+    pooled_session_id = acquire_pooled_session()
+    if pooled_session_id:
+        return pooled_session_id, None
+
+    return _validate_new_session(create_session(jwt_token))
+
+
+def acquire_pooled_session() -> Optional[str]:
+    """Take a pre-created session from the pool, if one is ready."""
+    pool = get_session_pool()
+    return pool.acquire() if pool is not None else None
+
+
+def failure_status(error: Any, default: int = 500) -> int:
+    """503 when Heidi is unavailable or the call was refused locally, so clients back off."""
+    if isinstance(error, dict) and error.get("status_code") == 503:
+        return 503
+    return default
+
+
+def report_session_error(session_id: Optional[str], error: Any) -> None:
+    """Retire a session from the pool when Heidi says it no longer exists."""
+    if not session_id or not isinstance(error, dict) or error.get("status_code") != 404:
+        return
+    pool = get_session_pool()
+    if pool is not None:
+        pool.retire(session_id)
+
+
+def _validate_new_session(new_session_id: Any) -> Tuple[Optional[str], Optional[JsonResponse]]:
+    """Turn a ``create_session`` result into ``(session_id, error)``."""
     if isinstance(new_session_id, dict) and new_session_id.get("error"):
         logger.error("Session creation failed: %s", new_session_id)
         return None, (
@@ -55,3 +91,42 @@ def ensure_session(jwt_token: str, session_id: Optional[str]) -> Tuple[Optional[
         )
 
     return new_session_id, None
+
+
+def extract_transcript_text(transcript_result: Any) -> str:
+    if isinstance(transcript_result, dict):
+        for key in ("transcript", "text", "content", "speech_to_text"):
+            value = transcript_result.get(key)
+            if value:
+                return str(value)
+        return str(transcript_result)
+    return str(transcript_result)
+
+
+def transcript_pending_response(
+    transcript_payload: Dict[str, Any], session_id: str, recording_id: str
+) -> Optional[JsonResponse]:
+    """A 504 for a transcript still being prepared, so clients poll instead of re-uploading."""
+    if transcript_payload.get("ready") is not False or transcript_payload.get("partial"):
+        return None
+    return (
+        {
+            "success": False,
+            "error": "Transcript is still being prepared",
+            "session_id": session_id,
+            "recording_id": recording_id,
+            "attempts": transcript_payload.get("attempts"),
+            "suggestion": f"Poll /transcript/view?session_id={session_id} instead of uploading again",
+        },
+        504,
+    )
+
+
+def extract_ai_content(response_content: Any) -> str:
+    if isinstance(response_content, dict):
+        for key in ("content", "text", "data"):
+            value = response_content.get(key)
+            if value:
+                return str(value)
+        return str(response_content)
+    return str(response_content)
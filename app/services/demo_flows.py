@@ -1,43 +1,56 @@
 import logging
 import os
-from typing import Any, Dict, Optional, Tuple
+import threading
+import time
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, Future, ThreadPoolExecutor, wait
+from typing import Any, Dict, Iterator, List, Optional, Tuple
 
 from werkzeug.datastructures import FileStorage
 
-from app.api.ask_heidi import ask_ai_stream, ask_ai_with_fallbacks
-from app.api.auth import get_jwt_token
-from app.services.common import ensure_session, fetch_jwt_token
+from app.api.ask_heidi import ask_ai_stream, ask_ai_with_fallbacks, open_ai_stream_with_fallbacks
+from app.services.care_plan import (
+    CARE_PLAN_MAP_WORKERS,
+    CARE_PLAN_PROMPT,
+    REDUCE_PROMPT,
+    combine_part_notes,
+    extract_prompt,
+    split_document,
+    validate_document_text,
+)
+from app.services.common import (
+    ensure_session,
+    extract_ai_content,
+    extract_transcript_text,
+    failure_status,
+    fetch_jwt_token,
+    get_cached_jwt_token,
+    report_session_error,
+    transcript_pending_response,
+)
+from app.services.question_batch import (
+    BATCH_CONCURRENCY,
+    BATCH_WORKERS,
+    batch_summary,
+    empty_question_result,
+    normalize_questions,
+    question_prompt,
+    question_result,
+)
+from app.services.streaming import format_sse, relay_chunks
 from app.services.transcription import (
     finish_transcription_service,
     start_transcription_service,
-    transcript_lookup_service,
-    upload_audio_from_path_service,
-    upload_audio_service,
+    transcript_wait_service,
+    upload_audio_segmented_from_path_service,
+    upload_audio_segmented_service,
 )
 
 logger = logging.getLogger(__name__)
 
 JsonResponse = Tuple[Dict[str, Any], int]
-
-
-def _extract_transcript_text(transcript_result: Any) -> str:
-    if isinstance(transcript_result, dict):
-        for key in ("transcript", "text", "content", "speech_to_text"):
-            value = transcript_result.get(key)
-            if value:
-                return str(value)
-        return str(transcript_result)
-    return str(transcript_result)
-
-
-def _extract_ai_content(response_content: Any) -> str:
-    if isinstance(response_content, dict):
-        for key in ("content", "text", "data"):
-            value = response_content.get(key)
-            if value:
-                return str(value)
-        return str(response_content)
-    return str(response_content)
+# (SSE message iterator, None) on success, (None, error response) otherwise.
+StreamResult = Tuple[Optional[Iterator[str]], Optional[JsonResponse]]
 
 
 def transcribe_audio_flow(audio_file: Optional[FileStorage], session_id: Optional[str]) -> JsonResponse:
@@ -59,7 +72,7 @@ def transcribe_audio_flow(audio_file: Optional[FileStorage], session_id: Optiona
         return start_payload, status
     recording_id = start_payload["recording_id"]
 
-    upload_payload, status = upload_audio_service(
+    upload_payload, status = upload_audio_segmented_service(
         jwt_token, session_id_value, recording_id, audio_file
     )
     if status != 200 or not upload_payload.get("success"):
@@ -69,11 +82,14 @@ def transcribe_audio_flow(audio_file: Optional[FileStorage], session_id: Optiona
     if status != 200 or not finish_payload.get("success"):
         return finish_payload, status
 
-    transcript_payload, status = transcript_lookup_service(jwt_token, session_id_value)
+    transcript_payload, status = transcript_wait_service(jwt_token, session_id_value)
     if status != 200 or not transcript_payload.get("success"):
         return transcript_payload, status
+    pending = transcript_pending_response(transcript_payload, session_id_value, recording_id)
+    if pending:
+        return pending
 
-    transcript_text = _extract_transcript_text(transcript_payload.get("transcript")).strip()
+    transcript_text = extract_transcript_text(transcript_payload.get("transcript")).strip()
     if not transcript_text or transcript_text == "{}":
         return (
             {
@@ -88,6 +104,7 @@ def transcribe_audio_flow(audio_file: Optional[FileStorage], session_id: Optiona
         {
             "success": True,
             "transcript": transcript_text,
+            "partial": transcript_payload.get("partial", False),
             "session_id": session_id_value,
             "recording_id": recording_id,
         },
@@ -111,7 +128,7 @@ def build_debug_report() -> JsonResponse:
             "preview": f"{value[:10]}..." if value and len(value) > 10 else value,
         }
 
-    jwt_token = get_jwt_token()
+    jwt_token = get_cached_jwt_token()
     jwt_success = not ("Error" in str(jwt_token))
     debug_info["jwt_test"] = {
         "success": jwt_success,
@@ -160,7 +177,7 @@ def build_debug_report() -> JsonResponse:
 
 
 def get_jwt_overview() -> JsonResponse:
-    jwt_token = get_jwt_token()
+    jwt_token = get_cached_jwt_token()
     return (
         {
             "success": not ("Error" in str(jwt_token)),
@@ -196,31 +213,63 @@ def get_session_overview() -> JsonResponse:
     )
 
 
-CARE_PLAN_PROMPT = """
-You are a medical care assistant. Based on the following discharge document, create a structured post-surgery care plan.
-
-Please provide a helpful care plan with these sections:
-1. Medication Schedule: List medications with dosage, frequency, and special instructions
-2. Activity Guidelines: What activities are allowed/restricted and when
-3. Wound Care: How to care for surgical sites and dressings
-4. Warning Signs: Symptoms that require immediate medical attention
-5. Follow-up Care: Appointment reminders and next steps
-
-Make it clear, practical, and reassuring for a patient recovering at home.
-Use bullet points and clear headings for easy reading.
-""".strip()
+_map_executor: Optional[ThreadPoolExecutor] = None
+_map_executor_lock = threading.Lock()
+
+
+def _get_map_executor() -> ThreadPoolExecutor:
+    global _map_executor
+    if _map_executor is None:
+        with _map_executor_lock:
+            if _map_executor is None:
+                _map_executor = ThreadPoolExecutor(
+                    max_workers=CARE_PLAN_MAP_WORKERS, thread_name_prefix="care-plan-map"
+                )
+    return _map_executor
+
+
+def _care_plan_request(
+    jwt_token: str, session_id: str, document_text: str
+) -> Tuple[str, str, Dict[str, Any], Optional[dict]]:
+    """
+    Return ``(command, content, stats, error)`` for the care-plan call.
+
+    Short documents go out whole. Long ones are split at page/section
+    boundaries, each part's care-plan details are extracted concurrently,
+    and the final call merges those notes, so latency follows the slowest
+    part rather than the whole document.
+    """
+    parts = split_document(document_text)
+    if len(parts) == 1:
+        return CARE_PLAN_PROMPT, document_text, {"document_parts": 1}, None
+
+    started = time.perf_counter()
+    futures = [
+        _get_map_executor().submit(
+            ask_ai_with_fallbacks, jwt_token, session_id,
+            extract_prompt(index, len(parts)), part, use_cache=True,
+        )
+        for index, part in enumerate(parts, start=1)
+    ]
+    notes: List[str] = []
+    for index, future in enumerate(futures, start=1):
+        result = future.result()
+        if result.get("error"):
+            # A missing part could drop a medication or warning sign; never merge without it.
+            for pending in futures[index:]:
+                pending.cancel()
+            return "", "", {}, dict(result, document_part=index, document_parts=len(parts))
+        notes.append(extract_ai_content(result.get("response", "")))
+
+    stats = {"document_parts": len(parts), "map_seconds": round(time.perf_counter() - started, 3)}
+    logger.info("Extracted care-plan notes from %s parts in %.2fs", len(parts), stats["map_seconds"])
+    return REDUCE_PROMPT, combine_part_notes(notes), stats, None
 
 
 def process_document_flow(document_text: str) -> JsonResponse:
-    if not document_text or len(document_text.strip()) < 10:
-        return (
-            {
-                "error": "Document text is too short or empty",
-                "received_length": len(document_text),
-                "minimum_required": 10,
-            },
-            400,
-        )
+    error = validate_document_text(document_text)
+    if error:
+        return error
 
     jwt_token, error = fetch_jwt_token()
     if error:
@@ -230,24 +279,30 @@ def process_document_flow(document_text: str) -> JsonResponse:
     if error:
         return error
 
-    ai_response = ask_ai_with_fallbacks(
-        jwt_token=jwt_token,  # type: ignore[arg-type]
-        session_id=session_id,  # type: ignore[arg-type]
-        ai_command_text=CARE_PLAN_PROMPT,
-        content=document_text,
+    command, content, stats, ai_response = _care_plan_request(
+        jwt_token, session_id, document_text  # type: ignore[arg-type]
     )
+    if ai_response is None:
+        ai_response = ask_ai_with_fallbacks(
+            jwt_token=jwt_token,  # type: ignore[arg-type]
+            session_id=session_id,  # type: ignore[arg-type]
+            ai_command_text=command,
+            content=content,
+            use_cache=True,
+        )
 
     if ai_response.get("error"):
+        report_session_error(session_id, ai_response)
         return (
             {
                 "error": "AI request failed",
                 "details": ai_response,
                 "suggestion": "Try again or check if session is still valid",
             },
-            500,
+            failure_status(ai_response),
         )
 
-    response_content = _extract_ai_content(ai_response.get("response", ""))
+    response_content = extract_ai_content(ai_response.get("response", ""))
     return (
         {
             "success": True,
@@ -256,11 +311,46 @@ def process_document_flow(document_text: str) -> JsonResponse:
             "extracted_text": document_text,
             "response_format": ai_response.get("format", "unknown"),
             "response_length": len(str(response_content)),
+            **stats,
         },
         200,
     )
 
 
+def process_document_stream_flow(document_text: str) -> StreamResult:
+    """Stream the care plan to the client as Heidi generates it."""
+    error = validate_document_text(document_text)
+    if error:
+        return None, error
+
+    jwt_token, error = fetch_jwt_token()
+    if error:
+        return None, error
+
+    session_id, error = ensure_session(jwt_token, None)
+    if error:
+        return None, error
+
+    command, content, stats, ai_error = _care_plan_request(
+        jwt_token, session_id, document_text  # type: ignore[arg-type]
+    )
+    chunks = None
+    if ai_error is None:
+        chunks, ai_error = open_ai_stream_with_fallbacks(jwt_token, session_id, command, content)
+    if ai_error:
+        report_session_error(session_id, ai_error)
+        return None, (
+            {
+                "error": "AI request failed",
+                "details": ai_error,
+                "suggestion": "Try again or check if session is still valid",
+            },
+            failure_status(ai_error),
+        )
+
+    return relay_chunks(chunks, dict(stats, session_id=session_id)), None
+
+
 def ask_question_flow(question: str, session_id: Optional[str]) -> JsonResponse:
     cleaned_question = question.strip()
     if not cleaned_question:
@@ -274,37 +364,24 @@ def ask_question_flow(question: str, session_id: Optional[str]) -> JsonResponse:
     if error:
         return error
 
-    prompt = f"""
-You are a helpful post-surgery care assistant. Answer this patient question with:
-
-1. A supportive, reassuring tone
-2. Practical, actionable advice
-3. Clear guidance on when to contact healthcare provider
-4. Keep response concise but comprehensive
-5. Use bullet points for clarity when appropriate
-
-Patient question: {cleaned_question}
-
-Provide a helpful response that addresses their concern while emphasizing safety.
-""".strip()
-
     ai_response = ask_ai_with_fallbacks(
         jwt_token=jwt_token,  # type: ignore[arg-type]
         session_id=session_id_value,  # type: ignore[arg-type]
-        ai_command_text=prompt,
+        ai_command_text=question_prompt(cleaned_question),
         content=cleaned_question,
     )
 
     if ai_response.get("error"):
+        report_session_error(session_id_value, ai_response)
         return (
             {
                 "error": "Failed to get AI response",
                 "details": ai_response,
             },
-            500,
+            failure_status(ai_response),
         )
 
-    response_content = _extract_ai_content(ai_response.get("response", ""))
+    response_content = extract_ai_content(ai_response.get("response", ""))
     return (
         {
             "success": True,
@@ -317,6 +394,154 @@ Provide a helpful response that addresses their concern while emphasizing safety
     )
 
 
+def ask_question_stream_flow(question: str, session_id: Optional[str]) -> StreamResult:
+    """Stream the answer to a patient question as Heidi generates it."""
+    cleaned_question = question.strip()
+    if not cleaned_question:
+        return None, ({"error": "Question cannot be empty"}, 400)
+
+    jwt_token, error = fetch_jwt_token()
+    if error:
+        return None, error
+
+    session_id_value, error = ensure_session(jwt_token, session_id)
+    if error:
+        return None, error
+
+    chunks, ai_error = open_ai_stream_with_fallbacks(
+        jwt_token, session_id_value, question_prompt(cleaned_question), cleaned_question
+    )
+    if ai_error:
+        report_session_error(session_id_value, ai_error)
+        error = {"error": "Failed to get AI response", "details": ai_error}
+        return None, (error, failure_status(ai_error))
+
+    return (
+        relay_chunks(
+            chunks,
+            {"session_id": session_id_value, "question_received": cleaned_question},
+        ),
+        None,
+    )
+
+
+_batch_executor: Optional[ThreadPoolExecutor] = None
+_batch_executor_lock = threading.Lock()
+
+
+def _get_batch_executor() -> ThreadPoolExecutor:
+    global _batch_executor
+    if _batch_executor is None:
+        with _batch_executor_lock:
+            if _batch_executor is None:
+                _batch_executor = ThreadPoolExecutor(
+                    max_workers=BATCH_WORKERS, thread_name_prefix="question-batch"
+                )
+    return _batch_executor
+
+
+def _iter_answers(jwt_token: str, session_id: str, questions: List[str]) -> Iterator[Dict[str, Any]]:
+    """
+    Yield each question's result as soon as it is ready.
+
+    At most ``BATCH_CONCURRENCY`` ask-ai calls are in flight per batch, so one
+    large batch cannot take every shared worker. Closing the iterator early
+    (e.g. the SSE client went away) cancels the questions not yet started.
+    """
+    for index, question in enumerate(questions):
+        if not question:
+            yield empty_question_result(index)
+
+    queued = deque((index, question) for index, question in enumerate(questions) if question)
+    in_flight: Dict[Future, Tuple[int, str, float]] = {}
+    try:
+        while queued or in_flight:
+            while queued and len(in_flight) < BATCH_CONCURRENCY:
+                index, question = queued.popleft()
+                future = _get_batch_executor().submit(
+                    ask_ai_with_fallbacks, jwt_token, session_id, question_prompt(question), question
+                )
+                in_flight[future] = (index, question, time.perf_counter())
+
+            done, _ = wait(in_flight, return_when=FIRST_COMPLETED)
+            for future in done:
+                index, question, started = in_flight.pop(future)
+                try:
+                    ai_response = future.result()
+                except Exception as exc:
+                    logger.exception("Batch question %s failed", index)
+                    ai_response = {"error": True, "status_code": 500, "message": str(exc)}
+                if ai_response.get("error"):
+                    report_session_error(session_id, ai_response)
+                yield question_result(index, question, ai_response, time.perf_counter() - started)
+    finally:
+        for future in in_flight:
+            future.cancel()
+
+
+def ask_questions_flow(questions: Any, session_id: Optional[str]) -> JsonResponse:
+    """
+    Answer several questions concurrently over one JWT and one session.
+
+    The batch is a 200 once it has run; each entry of ``results`` (in request
+    order) carries its own ``status`` and ``success``.
+    """
+    cleaned_questions, error = normalize_questions(questions)
+    if error:
+        return error
+
+    jwt_token, error = fetch_jwt_token()
+    if error:
+        return error
+
+    session_id_value, error = ensure_session(jwt_token, session_id)
+    if error:
+        return error
+
+    started = time.perf_counter()
+    results = sorted(
+        _iter_answers(jwt_token, session_id_value, cleaned_questions),  # type: ignore[arg-type]
+        key=lambda result: result["index"],
+    )
+    summary = batch_summary(results, time.perf_counter() - started)
+    return (
+        {
+            "success": summary["failed"] == 0,
+            "session_id": session_id_value,
+            "results": results,
+            **summary,
+        },
+        200,
+    )
+
+
+def _stream_answers(jwt_token: str, session_id: str, questions: List[str]) -> Iterator[str]:
+    yield format_sse({"session_id": session_id, "questions": len(questions)}, event="meta")
+    started = time.perf_counter()
+    results = []
+    for result in _iter_answers(jwt_token, session_id, questions):
+        results.append(result)
+        yield format_sse(result, event="answer")
+    yield format_sse(batch_summary(results, time.perf_counter() - started), event="done")
+
+
+def ask_questions_stream_flow(questions: Any, session_id: Optional[str]) -> StreamResult:
+    """Stream one ``answer`` event per question, in completion order, then a ``done`` summary."""
+    cleaned_questions, error = normalize_questions(questions)
+    if error:
+        return None, error
+
+    jwt_token, error = fetch_jwt_token()
+    if error:
+        return None, error
+
+    session_id_value, error = ensure_session(jwt_token, session_id)
+    if error:
+        return None, error
+
+    return _stream_answers(jwt_token, session_id_value, cleaned_questions), None  # type: ignore[arg-type]
+
+
 def complete_flow_test() -> JsonResponse:
     document_sample = (
         "Patient discharged after knee surgery. Take Ibuprofen 400mg every 6 hours with food. "
@@ -333,7 +558,7 @@ def complete_flow_test() -> JsonResponse:
         "step4_question": {},
     }
 
-    jwt_token = get_jwt_token()
+    jwt_token = get_cached_jwt_token()
     jwt_success = not ("Error" in str(jwt_token))
     flow_results["step1_jwt"] = {
         "success": jwt_success,
@@ -357,6 +582,7 @@ def complete_flow_test() -> JsonResponse:
         session_id=session_id,  # type: ignore[arg-type]
         ai_command_text="Create a brief care plan for this patient",
         content=document_sample,
+        use_cache=True,
     )
     flow_results["step3_care_plan"] = {
         "success": care_plan_response.get("success", False),
@@ -371,6 +597,7 @@ def complete_flow_test() -> JsonResponse:
         session_id=session_id,  # type: ignore[arg-type]
         ai_command_text="Answer this patient question helpfully",
         content=question_sample,
+        use_cache=True,
     )
     flow_results["step4_question"] = {
         "success": qa_response.get("success", False),
@@ -424,7 +651,7 @@ def audio_transcription_test(sample_path: str) -> JsonResponse:
         return start_payload, status
     recording_id = start_payload["recording_id"]
 
-    upload_payload, status = upload_audio_from_path_service(
+    upload_payload, status = upload_audio_segmented_from_path_service(
         jwt_token, session_id, recording_id, sample_path
     )
     if status != 200 or not upload_payload.get("success"):
@@ -434,9 +661,12 @@ def audio_transcription_test(sample_path: str) -> JsonResponse:
     if status != 200 or not finish_payload.get("success"):
         return finish_payload, status
 
-    transcript_payload, status = transcript_lookup_service(jwt_token, session_id)
+    transcript_payload, status = transcript_wait_service(jwt_token, session_id)
     if status != 200 or not transcript_payload.get("success"):
         return transcript_payload, status
+    pending = transcript_pending_response(transcript_payload, session_id, recording_id)
+    if pending:
+        return pending
 
     return (
         {
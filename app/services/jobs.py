@@ -0,0 +1,297 @@
+"""Background jobs that report progress as they move through stages."""
+import logging
+import os
+import threading
+import time
+import uuid
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Any, Callable, Dict, Iterator, List, Optional, Tuple
+
+from app.cache import CacheBackend, cache_from_env
+
+logger = logging.getLogger(__name__)
+
+JsonResponse = Tuple[Dict[str, Any], int]
+
+JOB_WORKERS = int(os.getenv("HEIDI_JOB_WORKERS", "4"))
+# Threads for independent steps inside a job (e.g. template fetch next to session setup).
+JOB_STEP_WORKERS = int(os.getenv("HEIDI_JOB_STEP_WORKERS", "8"))
+# Finished jobs are kept this many seconds for polling.
+JOB_RETENTION = float(os.getenv("HEIDI_JOB_RETENTION", "3600"))
+# Jobs queued or running at once; further submissions are refused until one finishes.
+JOB_MAX_PENDING = int(os.getenv("HEIDI_JOB_MAX_PENDING", "32"))
+# Seconds a refused client is told to wait before submitting again.
+JOB_RETRY_AFTER = int(os.getenv("HEIDI_JOB_RETRY_AFTER", "10"))
+
+QUEUED, RUNNING, SUCCEEDED, FAILED = "queued", "running", "succeeded", "failed"
+FINISHED = (SUCCEEDED, FAILED)
+
+
+class JobFailed(Exception):
+    """Raised by a stage to fail the job with a JSON payload and status code."""
+
+    def __init__(self, payload: Dict[str, Any], status_code: int = 500):
+        super().__init__(payload.get("error") or payload.get("message") or "Job failed")
+        self.payload = payload
+        self.status_code = status_code
+
+
+class EngineFull(Exception):
+    """Raised by ``JobEngine.submit`` when ``max_pending`` jobs are already queued or running."""
+
+    def __init__(self, pending: int, retry_after: int):
+        super().__init__(f"{pending} jobs already queued or running")
+        self.pending = pending
+        self.retry_after = retry_after
+
+
+class Job:
+    """State of one job; every change is appended to ``events`` for progress streams."""
+
+    def __init__(self, kind: str, job_id: Optional[str] = None, clock: Callable[[], float] = time.time):
+        self.id = job_id or uuid.uuid4().hex
+        self.kind = kind
+        self.status = QUEUED
+        self.stage: Optional[str] = None
+        self.stages: List[Dict[str, Any]] = []
+        self.result: Optional[Dict[str, Any]] = None
+        self.error: Optional[Dict[str, Any]] = None
+        self.status_code: Optional[int] = None
+        self._clock = clock
+        self.created_at = clock()
+        self.finished_at: Optional[float] = None
+        self.events: List[Dict[str, Any]] = []
+        self._changed = threading.Condition()
+        self.on_change: Optional[Callable[["Job"], None]] = None
+
+    def _emit(self, event: str, **data: Any) -> None:
+        with self._changed:
+            self.events.append(dict(data, event=event, job_id=self.id, status=self.status, at=self._clock()))
+            self._changed.notify_all()
+        if self.on_change is not None:
+            self.on_change(self)
+
+    def start_stage(self, name: str) -> None:
+        if self.stages and self.stages[-1].get("finished_at") is None:
+            self._finish_stage()
+        self.status = RUNNING
+        self.stage = name
+        self.stages.append({"name": name, "started_at": self._clock(), "finished_at": None})
+        self._emit("stage", stage=name)
+
+    def _finish_stage(self) -> None:
+        current = self.stages[-1]
+        current["finished_at"] = self._clock()
+        current["seconds"] = round(current["finished_at"] - current["started_at"], 3)
+
+    def succeed(self, result: Dict[str, Any]) -> None:
+        if self.stages and self.stages[-1].get("finished_at") is None:
+            self._finish_stage()
+        self.status, self.result, self.status_code = SUCCEEDED, result, 200
+        self.finished_at = self._clock()
+        self._emit("done", result=result)
+
+    def fail(self, error: Dict[str, Any], status_code: int = 500) -> None:
+        if self.stages and self.stages[-1].get("finished_at") is None:
+            self._finish_stage()
+        self.status, self.error, self.status_code = FAILED, error, status_code
+        self.finished_at = self._clock()
+        self._emit("failed", stage=self.stage, error=error)
+
+    def snapshot(self) -> Dict[str, Any]:
+        return {
+            "job_id": self.id,
+            "kind": self.kind,
+            "status": self.status,
+            "stage": self.stage,
+            "stages": [dict(stage) for stage in self.stages],
+            "result": self.result,
+            "error": self.error,
+            "status_code": self.status_code,
+            "created_at": self.created_at,
+            "finished_at": self.finished_at,
+        }
+
+    def wait_for_events(self, seen: int, timeout: float) -> List[Dict[str, Any]]:
+        """Return events after the first ``seen``, waiting up to ``timeout`` for one."""
+        with self._changed:
+            if len(self.events) <= seen:
+                self._changed.wait(timeout)
+            return self.events[seen:]
+
+
+class JobEngine:
+    """
+    Run jobs on a bounded worker pool and keep their state for polling.
+
+    At most ``max_pending`` jobs are queued or running at once, so a burst of
+    submissions cannot pile up audio waiting for a worker.
+
+    Snapshots are also written to ``store`` so a worker process that did not
+    run a job can still answer status requests when the store is shared.
+    """
+
+    def __init__(
+        self,
+        max_workers: int = JOB_WORKERS,
+        step_workers: int = JOB_STEP_WORKERS,
+        retention: float = JOB_RETENTION,
+        store: Optional[CacheBackend] = None,
+        clock: Callable[[], float] = time.time,
+        max_pending: int = JOB_MAX_PENDING,
+        retry_after: int = JOB_RETRY_AFTER,
+    ):
+        self.retention = retention
+        self.max_pending = max_pending
+        self.retry_after = retry_after
+        self._pending = 0
+        self.store = store
+        self._clock = clock
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="job")
+        # Separate pool so parallel steps never wait behind the jobs that spawned them.
+        self._step_executor = ThreadPoolExecutor(max_workers=step_workers, thread_name_prefix="job-step")
+        self._jobs: Dict[str, Job] = {}
+        self._lock = threading.Lock()
+
+    def submit(self, kind: str, pipeline: Callable[..., Dict[str, Any]], *args: Any, **kwargs: Any) -> Job:
+        """
+        Queue ``pipeline(engine, job, *args, **kwargs)`` and return the job at once.
+
+        The pipeline marks stages with ``job.start_stage`` and returns the result;
+        raising ``JobFailed`` fails the job with its payload. Raises
+        ``EngineFull`` when ``max_pending`` jobs are already queued or running.
+        """
+        job = Job(kind, clock=self._clock)
+        job.on_change = self._persist
+        with self._lock:
+            if self._pending >= self.max_pending:
+                logger.warning("Refusing %s job: %d jobs queued or running", kind, self._pending)
+                raise EngineFull(self._pending, self.retry_after)
+            self._pending += 1
+            self._prune()
+            self._jobs[job.id] = job
+        self._persist(job)
+        try:
+            self._executor.submit(self._run, job, pipeline, args, kwargs)
+        except RuntimeError:
+            self._release()
+            raise
+        return job
+
+    def pending(self) -> int:
+        """Jobs queued or running."""
+        with self._lock:
+            return self._pending
+
+    def _release(self) -> None:
+        with self._lock:
+            self._pending -= 1
+
+    def _run(self, job: Job, pipeline: Callable[..., Dict[str, Any]], args: tuple, kwargs: dict) -> None:
+        try:
+            job.succeed(pipeline(self, job, *args, **kwargs))
+        except JobFailed as exc:
+            job.fail(exc.payload, exc.status_code)
+        except Exception as exc:
+            logger.exception("Job %s failed in stage %s", job.id, job.stage)
+            job.fail({"error": "Job failed", "message": str(exc)}, 500)
+        finally:
+            self._release()
+
+    def start_step(self, step: Callable[..., Any], *args: Any) -> Future:
+        """Start an independent step in the background; join it with ``.result()``."""
+        return self._step_executor.submit(step, *args)
+
+    def _persist(self, job: Job) -> None:
+        if self.store is not None:
+            self.store.set(job.id, job.snapshot(), ttl=self.retention)
+
+    def _prune(self) -> None:
+        cutoff = self._clock() - self.retention
+        expired = [
+            job_id for job_id, job in self._jobs.items()
+            if job.finished_at is not None and job.finished_at < cutoff
+        ]
+        for job_id in expired:
+            del self._jobs[job_id]
+
+    def get(self, job_id: str) -> Optional[Job]:
+        with self._lock:
+            return self._jobs.get(job_id)
+
+    def status(self, job_id: str) -> Optional[Dict[str, Any]]:
+        """Snapshot of a job run here, or of one another worker recorded in the store."""
+        job = self.get(job_id)
+        if job is not None:
+            return job.snapshot()
+        return self.store.get(job_id) if self.store is not None else None
+
+    def iter_events(self, job_id: str, heartbeat: float = 15.0) -> Iterator[Dict[str, Any]]:
+        """
+        Yield progress events until the job finishes.
+
+        Events for jobs run by another worker are synthesised by polling the store.
+        ``None`` is yielded after ``heartbeat`` seconds without news.
+        """
+        job = self.get(job_id)
+        if job is not None:
+            seen = 0
+            while True:
+                events = job.wait_for_events(seen, heartbeat)
+                if not events:
+                    yield None
+                    continue
+                seen += len(events)
+                for event in events:
+                    yield event
+                    if event["event"] in ("done", "failed"):
+                        return
+
+        last_stage = None
+        waited = 0.0
+        while True:
+            snapshot = self.status(job_id)
+            if snapshot is None:
+                return
+            if snapshot["status"] in FINISHED:
+                if snapshot["status"] == SUCCEEDED:
+                    yield {"event": "done", "job_id": job_id, "status": SUCCEEDED, "result": snapshot["result"]}
+                else:
+                    yield {"event": "failed", "job_id": job_id, "status": FAILED, "stage": snapshot["stage"], "error": snapshot["error"]}
+                return
+            if snapshot["stage"] != last_stage:
+                last_stage = snapshot["stage"]
+                waited = 0.0
+                yield {"event": "stage", "job_id": job_id, "status": snapshot["status"], "stage": last_stage}
+            elif waited >= heartbeat:
+                waited = 0.0
+                yield None
+            time.sleep(1.0)
+            waited += 1.0
+
+    def shutdown(self) -> None:
+        self._executor.shutdown(wait=False, cancel_futures=True)
+        self._step_executor.shutdown(wait=False, cancel_futures=True)
+
+
+_engine: Optional[JobEngine] = None
+_engine_lock = threading.Lock()
+
+
+def get_job_engine() -> JobEngine:
+    """Return the process-wide engine; ``HEIDI_JOB_STORE=disk`` shares job status between workers."""
+    global _engine
+    if _engine is None:
+        with _engine_lock:
+            if _engine is None:
+                _engine = JobEngine(store=cache_from_env("HEIDI_JOB_STORE", namespace="jobs", default_size=1024))
+    return _engine
+
+
+def reset_job_engine() -> None:
+    """Stop the process-wide engine; the next call re-reads the environment."""
+    global _engine
+    with _engine_lock:
+        if _engine is not None:
+            _engine.shutdown()
+        _engine = None
@@ -0,0 +1,272 @@
+"""
+Cut a live audio byte stream into segments that each decode on their own.
+
+Browsers record webm/opus (Chrome) or ogg/opus (Firefox): only the start of
+the stream carries the container header and codec setup, and cutting it
+every N bytes leaves every segment after the first undecodable. The
+segmenter sniffs the container, cuts only where a webm cluster, an ogg page
+or a whole WAV sample frame ends, and prefixes every later segment with the
+stream's header (WAV sizes are rewritten to match). Unrecognised streams,
+such as mp3 whose frames resynchronise by themselves, are cut by size.
+"""
+import logging
+import struct
+from typing import List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+_EBML_MAGIC = b"\x1a\x45\xdf\xa3"
+_OGG_MAGIC = b"OggS"
+_EBML, _SEGMENT, _CLUSTER = 0x1A45DFA3, 0x18538067, 0x1F43B675
+# A buffer this many times the segment size without a cut point is cut anyway.
+_MAX_SEGMENT_FACTOR = 8
+
+
+class _Container:
+    """
+    Incremental parser state for one buffered stream.
+
+    ``units`` are offsets where a segment may end, ``headers`` the
+    ``(start, end)`` of each stream header seen (``end`` is None until the
+    whole header has arrived) and ``init`` the header of the stream the
+    buffer currently continues.
+    """
+
+    def __init__(self) -> None:
+        self.units: List[int] = []
+        self.headers: List[Tuple[int, Optional[int]]] = []
+        self.init = b""
+        self._pos = 0
+
+    def scan(self, buffer: bytearray) -> None:
+        raise NotImplementedError
+
+    def content_start(self) -> Optional[int]:
+        """Where audio starts in the buffer: after a leading header, None if it is incomplete."""
+        for start, end in self.headers:
+            if start == 0:
+                return end
+        return 0
+
+    def frame(self, segment: bytes) -> bytes:
+        """Make ``segment`` (the first bytes of the buffer) a standalone file."""
+        end = self.content_start()
+        if end:
+            self.init = segment[:end]
+            return segment
+        return self.init + segment
+
+    def shift(self, cut: int) -> None:
+        self.units = [unit - cut for unit in self.units if unit > cut]
+        self.headers = [
+            (start - cut, None if end is None else end - cut) for start, end in self.headers if start >= cut
+        ]
+        self._pos -= cut
+
+
+class _Bytes(_Container):
+    """No container to respect: any offset is a cut point."""
+
+    def scan(self, buffer: bytearray) -> None:
+        self.units = [len(buffer)]
+
+
+def _vint(data: bytearray, pos: int, keep_marker: bool) -> Optional[Tuple[int, int, bool]]:
+    """EBML variable-length integer at ``pos``: ``(value, length, all ones)``, or None if cut off."""
+    if pos >= len(data):
+        return None
+    first, length, mask = data[pos], 1, 0x80
+    while length <= 8 and not first & mask:
+        mask >>= 1
+        length += 1
+    if length > 8 or (keep_marker and length > 4):
+        raise ValueError(f"Invalid EBML length marker at byte {pos}")
+    if pos + length > len(data):
+        return None
+    value = first if keep_marker else first & (mask - 1)
+    for byte in data[pos + 1:pos + length]:
+        value = (value << 8) | byte
+    return value, length, not keep_marker and value == (1 << (7 * length)) - 1
+
+
+class _Webm(_Container):
+    """Matroska/webm: segments end where a cluster or a new stream starts."""
+
+    def scan(self, buffer: bytearray) -> None:
+        while True:
+            pos = self._pos
+            element = _vint(buffer, pos, keep_marker=True)
+            size = element and _vint(buffer, pos + element[1], keep_marker=False)
+            if not size:
+                return
+            element_id, header = element[0], element[1] + size[1]
+            if element_id == _EBML:
+                self.headers.append((pos, None))
+                self._pos = pos + header + size[0]
+            elif element_id == _CLUSTER:
+                if self.headers and self.headers[-1][1] is None:
+                    self.headers[-1] = (self.headers[-1][0], pos)
+                else:
+                    self.units.append(pos)
+                self._pos = pos + header
+            elif element_id == _SEGMENT or size[2]:
+                # Containers (often of unknown size when recorded live): read their children.
+                self._pos = pos + header
+            else:
+                self._pos = pos + header + size[0]
+
+
+class _Ogg(_Container):
+    """Ogg: segments end after a whole audio page; codec header pages are the init."""
+
+    def __init__(self) -> None:
+        super().__init__()
+        self._in_headers = False
+
+    def scan(self, buffer: bytearray) -> None:
+        while len(buffer) - self._pos >= 27:
+            pos = self._pos
+            if buffer[pos:pos + 4] != _OGG_MAGIC:
+                raise ValueError(f"Lost ogg page sync at byte {pos}")
+            segments = buffer[pos + 26]
+            if len(buffer) - pos < 27 + segments:
+                return
+            size = 27 + segments + sum(buffer[pos + 27:pos + 27 + segments])
+            if len(buffer) - pos < size:
+                return
+            if buffer[pos + 5] & 0x02:  # beginning of a logical stream
+                self.headers.append((pos, None))
+                self._in_headers = True
+            granule = struct.unpack_from("<q", buffer, pos + 6)[0]
+            if self._in_headers and granule != 0:
+                self.headers[-1] = (self.headers[-1][0], pos)
+                self._in_headers = False
+            if not self._in_headers:
+                self.units.append(pos + size)
+            self._pos = pos + size
+
+
+class _Wav(_Container):
+    """RIFF/WAVE: segments hold whole sample frames behind a header with matching sizes."""
+
+    def __init__(self) -> None:
+        super().__init__()
+        self._block_align = 0
+        self._data_start: Optional[int] = None
+
+    def scan(self, buffer: bytearray) -> None:
+        if self._data_start is None:
+            self.headers = [(0, None)]
+            pos = 12
+            while pos + 8 <= len(buffer):
+                chunk, size = bytes(buffer[pos:pos + 4]), struct.unpack_from("<I", buffer, pos + 4)[0]
+                if chunk == b"data":
+                    self._data_start = pos + 8
+                    self.headers[0] = (0, self._data_start)
+                    break
+                if chunk == b"fmt ":
+                    if pos + 22 > len(buffer):
+                        return
+                    self._block_align = struct.unpack_from("<H", buffer, pos + 20)[0]
+                pos += 8 + size + (size & 1)
+            else:
+                return
+        floor = self.content_start() or 0
+        align = self._block_align or 1
+        self.units = [floor + (len(buffer) - floor) // align * align]
+
+    def frame(self, segment: bytes) -> bytes:
+        end = self.content_start()
+        if end:
+            self.init, data = segment[:end], segment[end:]
+        else:
+            data = segment
+        wav = bytearray(self.init + data)
+        if len(self.init) >= 12:
+            struct.pack_into("<I", wav, 4, len(wav) - 8)
+            struct.pack_into("<I", wav, len(self.init) - 4, len(data))
+        return bytes(wav)
+
+
+def _sniff(buffer: bytearray) -> Optional[_Container]:
+    """The container of a stream starting at ``buffer``, or None until there are enough bytes to tell."""
+    head = bytes(buffer[:12])
+    for magic, container in ((_EBML_MAGIC, _Webm), (_OGG_MAGIC, _Ogg)):
+        if head.startswith(magic):
+            return container()
+        if magic.startswith(head):
+            return None
+    if head.startswith(b"RIFF"):
+        if len(head) < 12:
+            return None
+        if head[8:12] == b"WAVE":
+            return _Wav()
+    elif b"RIFF".startswith(head):
+        return None
+    return _Bytes()
+
+
+class LiveSegmenter:
+    """
+    Buffer audio frames and hand back standalone segments of at least
+    ``segment_bytes`` (unless the stream restarts or is flushed).
+    """
+
+    def __init__(self, segment_bytes: int):
+        self.segment_bytes = segment_bytes
+        self.max_bytes = segment_bytes * _MAX_SEGMENT_FACTOR
+        self._buffer = bytearray()
+        self._container: Optional[_Container] = None
+
+    def feed(self, data: bytes) -> List[bytes]:
+        self._buffer.extend(data)
+        segments = []
+        while self._buffer:
+            cut = self._cut_point()
+            if cut is None:
+                if len(self._buffer) < self.max_bytes or self._container is None:
+                    break
+                logger.warning("No cut point in %d buffered audio bytes; cutting by size", len(self._buffer))
+                self._container = _Bytes()
+                cut = len(self._buffer)
+            segments.append(self._take(cut))
+        return segments
+
+    def flush(self) -> List[bytes]:
+        """Everything buffered, as standalone segments; the next frame may start a new stream."""
+        segments = self.feed(b"")
+        if self._buffer:
+            segments.append((self._container or _Bytes()).frame(bytes(self._buffer)))
+        self._buffer = bytearray()
+        self._container = None
+        return segments
+
+    def _cut_point(self) -> Optional[int]:
+        if self._container is None:
+            self._container = _sniff(self._buffer)
+            if self._container is None:
+                return None
+        container = self._container
+        try:
+            container.scan(self._buffer)
+        except ValueError as exc:
+            logger.warning("Unparseable live audio, cutting by size from now on: %s", exc)
+            container = self._container = _Bytes()
+            container.scan(self._buffer)
+
+        restarts = [start for start, _ in container.headers if start > 0]
+        if restarts:
+            # The previous stream ends here; its tail is a segment of its own.
+            return restarts[0]
+        floor = container.content_start()
+        if floor is None or len(self._buffer) < self.segment_bytes:
+            return None
+        candidates = [unit for unit in container.units if unit > floor]
+        return max(candidates) if candidates else None
+
+    def _take(self, cut: int) -> bytes:
+        container = self._container
+        segment = container.frame(bytes(self._buffer[:cut]))
+        container.shift(cut)
+        del self._buffer[:cut]
+        return segment
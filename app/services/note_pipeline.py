@@ -0,0 +1,145 @@
+"""Transcription-to-consult-note pipeline run as a background job."""
+import logging
+from typing import Any, Dict, Optional, Tuple
+
+from app.api.consult import generate_consult_note
+from app.services.audio_pipeline import upload_audio_segments
+from app.services.common import (
+    ensure_session,
+    extract_transcript_text,
+    fetch_jwt_token,
+    report_session_error,
+    transcript_pending_response,
+)
+from app.services.jobs import EngineFull, Job, JobEngine, JobFailed, get_job_engine
+from app.services.template_catalogue import resolve_template_id
+from app.services.transcription import (
+    finish_transcription_service,
+    start_transcription_service,
+    transcript_wait_service,
+)
+
+logger = logging.getLogger(__name__)
+
+JsonResponse = Tuple[Dict[str, Any], int]
+
+TRANSCRIPTION_NOTE_JOB = "transcription-note"
+
+
+def _require(result: JsonResponse) -> Dict[str, Any]:
+    """Return a successful service payload or fail the job with it."""
+    payload, status = result
+    if status != 200 or not payload.get("success"):
+        raise JobFailed(payload, status)
+    return payload
+
+
+def _raise_if_error(error: Optional[JsonResponse]) -> None:
+    if error:
+        raise JobFailed(*error)
+
+
+def transcription_note_pipeline(
+    engine: JobEngine,
+    job: Job,
+    audio: bytes,
+    filename: str,
+    template: Optional[str] = None,
+    session_id: Optional[str] = None,
+    voice_style: str = "BRIEF",
+) -> Dict[str, Any]:
+    """
+    Upload a recording, transcribe it and write a consult note.
+
+    The template lookup runs alongside the transcription stages and is only
+    joined when the note is generated.
+    """
+    job.start_stage("authenticate")
+    jwt_token, error = fetch_jwt_token()
+    _raise_if_error(error)
+
+    template_step = engine.start_step(resolve_template_id, jwt_token, template)
+
+    job.start_stage("session")
+    session_id, error = ensure_session(jwt_token, session_id)
+    _raise_if_error(error)
+
+    job.start_stage("start")
+    recording_id = _require(start_transcription_service(jwt_token, session_id))["recording_id"]
+
+    job.start_stage("upload")
+    _require(upload_audio_segments(jwt_token, session_id, recording_id, audio, filename))
+
+    job.start_stage("finish")
+    _require(finish_transcription_service(jwt_token, session_id, recording_id))
+
+    job.start_stage("transcript")
+    transcript_payload = _require(transcript_wait_service(jwt_token, session_id))
+    _raise_if_error(transcript_pending_response(transcript_payload, session_id, recording_id))
+    transcript_text = extract_transcript_text(transcript_payload.get("transcript")).strip()
+    if not transcript_text or transcript_text == "{}":
+        raise JobFailed(
+            {
+                "success": False,
+                "error": "No speech detected in audio file",
+                "suggestion": "Please try recording again with clearer speech",
+            },
+            400,
+        )
+
+    job.start_stage("note")
+    template_id, error = template_step.result()
+    _raise_if_error(error)
+    note = generate_consult_note(jwt_token, session_id, template_id, voice_style=voice_style, brain="LEFT")
+    if note.get("error"):
+        report_session_error(session_id, note)
+        raise JobFailed({"error": "Consult note generation failed", "details": note}, 502)
+
+    return {
+        "session_id": session_id,
+        "recording_id": recording_id,
+        "template_id": template_id,
+        "transcript": transcript_text,
+        "note": note.get("note", ""),
+    }
+
+
+def submit_transcription_note_job(
+    audio: bytes,
+    filename: str,
+    template: Optional[str] = None,
+    session_id: Optional[str] = None,
+) -> JsonResponse:
+    """Queue the pipeline and return the job id without waiting for it."""
+    if not audio:
+        return {"success": False, "error": "No audio file provided"}, 400
+
+    try:
+        job = get_job_engine().submit(
+            TRANSCRIPTION_NOTE_JOB,
+            transcription_note_pipeline,
+            audio,
+            filename,
+            template=template,
+            session_id=session_id,
+        )
+    except EngineFull as exc:
+        return (
+            {
+                "success": False,
+                "error": "Too many jobs in progress",
+                "pending": exc.pending,
+                "retry_after": exc.retry_after,
+            },
+            503,
+        )
+    return (
+        {
+            "success": True,
+            "job_id": job.id,
+            "status": job.status,
+            "status_url": f"/jobs/{job.id}",
+            "events_url": f"/jobs/{job.id}/events",
+        },
+        202,
+    )
@@ -0,0 +1,257 @@
+"""Extract text from uploaded PDFs in memory, in parallel for long documents."""
+import hashlib
+import logging
+import math
+import multiprocessing
+import os
+import tempfile
+import threading
+import time
+from concurrent.futures import Future, ProcessPoolExecutor
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+import fitz  # PyMuPDF
+
+from app.cache import CacheBackend, cache_from_env
+
+logger = logging.getLogger(__name__)
+
+JsonResponse = Tuple[Dict[str, Any], int]
+# Page count and an iterator over page text.
+PageStream = Tuple[int, Iterator[str]]
+
+PDF_MAX_BYTES = int(os.getenv("HEIDI_PDF_MAX_BYTES", str(25 * 1024 * 1024)))
+PDF_MAX_PAGES = int(os.getenv("HEIDI_PDF_MAX_PAGES", "500"))
+# Documents with more pages than this are split across the process pool.
+PDF_PARALLEL_PAGES = int(os.getenv("HEIDI_PDF_PARALLEL_PAGES", "32"))
+# Worker processes for long documents; 0 always extracts in the calling thread.
+PDF_WORKERS = int(os.getenv("HEIDI_PDF_WORKERS", str(min(os.cpu_count() or 1, 4))))
+
+_UNSET: Any = object()
+_text_cache: Any = _UNSET
+_text_cache_lock = threading.Lock()
+_saved = {"seconds_saved": 0.0, "seconds_extracting": 0.0}
+
+_pool: Optional[ProcessPoolExecutor] = None
+_pool_lock = threading.Lock()
+
+
+def _get_process_pool() -> ProcessPoolExecutor:
+    global _pool
+    if _pool is None:
+        with _pool_lock:
+            if _pool is None:
+                # Forking a threaded web worker is unsafe, so workers are spawned once and reused.
+                _pool = ProcessPoolExecutor(
+                    max_workers=PDF_WORKERS, mp_context=multiprocessing.get_context("spawn")
+                )
+    return _pool
+
+
+def shutdown_process_pool() -> None:
+    """Stop the extraction workers; the next long document starts a new pool."""
+    global _pool
+    with _pool_lock:
+        if _pool is not None:
+            _pool.shutdown(wait=True, cancel_futures=True)
+        _pool = None
+
+
+def _extract_page_range(path: str, start: int, stop: int) -> List[str]:
+    """Text of pages ``start`` to ``stop - 1``; runs inside a worker process."""
+    with fitz.open(path, filetype="pdf") as doc:
+        return [doc[number].get_text() for number in range(start, stop)]
+
+
+def _spill_to_disk(data: bytes) -> str:
+    """Write the upload once so workers receive a path instead of a pickled copy each."""
+    fd, path = tempfile.mkstemp(prefix="heidi-pdf-", suffix=".pdf")
+    with os.fdopen(fd, "wb") as handle:
+        handle.write(data)
+    return path
+
+
+def _remove_file(path: str) -> None:
+    try:
+        os.remove(path)
+    except OSError as exc:
+        logger.warning("Could not remove PDF spill file %s: %s", path, exc)
+
+
+def _remove_when_done(path: str, futures: List[Future]) -> None:
+    """Delete ``path`` once every range reading it has finished or been cancelled."""
+    if not futures:
+        _remove_file(path)
+        return
+    remaining = [len(futures)]
+    lock = threading.Lock()
+
+    def done(_: Future) -> None:
+        with lock:
+            remaining[0] -= 1
+            last = remaining[0] == 0
+        if last:
+            _remove_file(path)
+
+    for future in futures:
+        future.add_done_callback(done)
+
+
+def open_pdf(data: bytes, max_pages: Optional[int] = None) -> Tuple[Optional[Any], Optional[JsonResponse]]:
+    """Open PDF bytes without touching disk, enforcing the byte and page caps."""
+    max_pages = PDF_MAX_PAGES if max_pages is None else max_pages
+    if not data:
+        return None, ({"error": "No valid PDF file provided"}, 400)
+    if len(data) > PDF_MAX_BYTES:
+        return None, ({"error": f"PDF exceeds the {PDF_MAX_BYTES} byte limit"}, 413)
+
+    try:
+        doc = fitz.open(stream=data, filetype="pdf")
+    except Exception as exc:
+        return None, ({"error": f"Failed to extract text: {exc}"}, 500)
+
+    if doc.page_count > max_pages:
+        page_count = doc.page_count
+        doc.close()
+        return None, ({"error": f"PDF has {page_count} pages; the limit is {max_pages}"}, 413)
+    return doc, None
+
+
+def iter_page_text(
+    doc: Any,
+    data: bytes,
+    *,
+    workers: Optional[int] = None,
+    parallel_pages: Optional[int] = None,
+) -> Iterator[str]:
+    """
+    Yield the text of each page in order, closing ``doc`` when done.
+
+    Short documents are read from ``doc`` directly. Longer ones are written to
+    a temporary file once and split into page ranges handled by the process
+    pool, and each range is yielded as soon as it and the ranges before it
+    are finished.
+    """
+    workers = PDF_WORKERS if workers is None else workers
+    parallel_pages = PDF_PARALLEL_PAGES if parallel_pages is None else parallel_pages
+    page_count = doc.page_count
+    try:
+        if workers <= 0 or page_count <= parallel_pages:
+            for page in doc:
+                yield page.get_text()
+            return
+
+        # Several ranges per worker keeps the pool busy and the first pages early.
+        pages_per_task = max(1, math.ceil(page_count / (workers * 4)))
+        pool = _get_process_pool()
+        path = _spill_to_disk(data)
+        futures: List[Future] = []
+        try:
+            for start in range(0, page_count, pages_per_task):
+                futures.append(
+                    pool.submit(_extract_page_range, path, start, min(start + pages_per_task, page_count))
+                )
+        finally:
+            _remove_when_done(path, futures)
+        try:
+            for future in futures:
+                yield from future.result()
+        finally:
+            for future in futures:
+                future.cancel()
+    finally:
+        doc.close()
+
+
+def get_text_cache() -> Optional[CacheBackend]:
+    """Return the extracted-text cache configured by ``HEIDI_PDF_CACHE`` (memory by default)."""
+    global _text_cache
+    if _text_cache is _UNSET:
+        with _text_cache_lock:
+            if _text_cache is _UNSET:
+                _text_cache = cache_from_env(
+                    "HEIDI_PDF_CACHE", namespace="pdf-text", default_size=64, default_backend="memory"
+                )
+    return _text_cache
+
+
+def configure_text_cache(cache: Optional[CacheBackend] = _UNSET) -> None:
+    """Install a text cache, or reset to re-read the environment on next use."""
+    global _text_cache
+    with _text_cache_lock:
+        _text_cache = cache
+        _saved.update(seconds_saved=0.0, seconds_extracting=0.0)
+
+
+def _add_seconds(name: str, seconds: float) -> None:
+    with _text_cache_lock:
+        _saved[name] += seconds
+
+
+def text_cache_stats() -> Dict[str, Any]:
+    """Hits, misses, evictions and seconds of extraction saved by the text cache."""
+    cache = get_text_cache()
+    with _text_cache_lock:
+        saved = {name: round(value, 3) for name, value in _saved.items()}
+    if cache is None:
+        return dict(saved, enabled=False)
+    return dict(cache.stats(), **saved, enabled=True)
+
+
+def _record_pages(
+    cache: CacheBackend, key: str, pages: Iterator[str], started: float
+) -> Iterator[str]:
+    """Pass pages through, caching them once the last one has been extracted."""
+    collected: List[str] = []
+    elapsed = 0.0
+    resumed = started
+    for page in pages:
+        elapsed += time.perf_counter() - resumed
+        collected.append(page)
+        yield page
+        resumed = time.perf_counter()
+    elapsed += time.perf_counter() - resumed
+    # Only time spent extracting counts, not time the consumer held the stream.
+    cache.set(key, {"pages": collected, "seconds": elapsed})
+    _add_seconds("seconds_extracting", elapsed)
+
+
+def stream_pdf_pages(data: bytes, **options: Any) -> Tuple[Optional[PageStream], Optional[JsonResponse]]:
+    """
+    Open a PDF and stream its page text, serving repeat uploads from the cache.
+
+    The cache key is the SHA-256 of the uploaded bytes, so a hit skips PyMuPDF
+    entirely. Misses are cached once every page has been read.
+    """
+    cache = get_text_cache()
+    key = hashlib.sha256(data).hexdigest()
+    if cache is not None and data and len(data) <= PDF_MAX_BYTES:
+        entry = cache.get(key)
+        if entry is not None:
+            _add_seconds("seconds_saved", entry["seconds"])
+            return (len(entry["pages"]), iter(entry["pages"])), None
+
+    started = time.perf_counter()
+    doc, error = open_pdf(data)
+    if error:
+        return None, error
+
+    pages = iter_page_text(doc, data, **options)
+    if cache is not None:
+        pages = _record_pages(cache, key, pages, started)
+    return (doc.page_count, pages), None
+
+
+def extract_pdf_text(data: bytes, **options: Any) -> JsonResponse:
+    """Extract the full text of a PDF as ``{"text": ...}``."""
+    stream, error = stream_pdf_pages(data, **options)
+    if error:
+        return error
+
+    page_count, pages = stream
+    try:
+        text = "".join(pages)
+    except Exception as exc:
+        logger.exception("PDF text extraction failed")
+        return {"error": f"Failed to extract text: {exc}"}, 500
+    return {"text": text.strip(), "pages": page_count}, 200
@@ -0,0 +1,90 @@
+"""Prompt, validation and result shapes for answering patient questions, one or several per request."""
+import os
+from typing import Any, Dict, List, Optional, Tuple
+
+from app.services.common import extract_ai_content, failure_status
+
+JsonResponse = Tuple[Dict[str, Any], int]
+
+BATCH_MAX_QUESTIONS = int(os.getenv("HEIDI_BATCH_MAX_QUESTIONS", "20"))
+# Ask-ai calls one batch keeps in flight against its shared session.
+BATCH_CONCURRENCY = int(os.getenv("HEIDI_BATCH_CONCURRENCY", "4"))
+# Threads shared by every batch in the Flask app; each batch still stays within BATCH_CONCURRENCY.
+BATCH_WORKERS = int(os.getenv("HEIDI_BATCH_WORKERS", "16"))
+
+
+def normalize_questions(questions: Any) -> Tuple[List[str], Optional[JsonResponse]]:
+    """
+    Return the stripped questions or a 400 response for the whole batch.
+
+    Blank or non-string entries are kept (as ``""``) so that every result
+    lines up with its position in the request; they fail individually.
+    """
+    if not isinstance(questions, list) or not questions:
+        return [], ({"error": "questions must be a non-empty list of strings"}, 400)
+    if len(questions) > BATCH_MAX_QUESTIONS:
+        return [], (
+            {
+                "error": "Too many questions in one batch",
+                "received": len(questions),
+                "maximum": BATCH_MAX_QUESTIONS,
+            },
+            400,
+        )
+    return [question.strip() if isinstance(question, str) else "" for question in questions], None
+
+
+def empty_question_result(index: int) -> Dict[str, Any]:
+    return {
+        "index": index,
+        "question": "",
+        "status": 400,
+        "success": False,
+        "error": "Question cannot be empty",
+    }
+
+
+def batch_summary(results: List[Dict[str, Any]], seconds: float) -> Dict[str, Any]:
+    succeeded = sum(1 for result in results if result["success"])
+    return {
+        "questions": len(results),
+        "succeeded": succeeded,
+        "failed": len(results) - succeeded,
+        "seconds": round(seconds, 3),
+    }
+
+
+def question_prompt(cleaned_question: str) -> str:
+    return f"""
+You are a helpful post-surgery care assistant. Answer this patient question with:
+
+1. A supportive, reassuring tone
+2. Practical, actionable advice
+3. Clear guidance on when to contact healthcare provider
+4. Keep response concise but comprehensive
+5. Use bullet points for clarity when appropriate
+
+Patient question: {cleaned_question}
+
+Provide a helpful response that addresses their concern while emphasizing safety.
+""".strip()
+
+
+def question_result(index: int, question: str, ai_response: dict, seconds: float) -> Dict[str, Any]:
+    """One batch item, in the shape of an ``ask_question_flow`` reply plus its own status."""
+    result: Dict[str, Any] = {"index": index, "question": question, "seconds": round(seconds, 3)}
+    if ai_response.get("error"):
+        result.update(
+            status=failure_status(ai_response),
+            success=False,
+            error="Failed to get AI response",
+            details=ai_response,
+        )
+    else:
+        result.update(
+            status=200,
+            success=True,
+            response=extract_ai_content(ai_response.get("response", "")),
+            response_format=ai_response.get("format", "unknown"),
+        )
+    return result
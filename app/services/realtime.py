@@ -0,0 +1,192 @@
+"""Live transcription: upload audio segments while the consult is still running."""
+import asyncio
+import logging
+import os
+from typing import Any, Awaitable, Callable, Dict, Optional, Set
+
+from app.api.aio import transcript as aio_transcript
+from app.api.resilience import is_retryable, retry_allowed
+from app.services import aio_flows
+from app.services.live_segments import LiveSegmenter
+from app.services.transcript_waiter import transcript_text, wait_for_transcript_async
+from app.services.transcription import format_start_result
+
+logger = logging.getLogger(__name__)
+
+Send = Callable[[Dict[str, Any]], Awaitable[None]]
+
+# Audio buffered before it is cut into a segment (at the next container boundary) and uploaded.
+REALTIME_SEGMENT_BYTES = int(os.getenv("HEIDI_REALTIME_SEGMENT_BYTES", str(256 * 1024)))
+REALTIME_UPLOAD_CONCURRENCY = int(os.getenv("HEIDI_REALTIME_UPLOAD_CONCURRENCY", "2"))
+# Seconds between partial transcript checks while new segments are acknowledged.
+REALTIME_PARTIAL_INTERVAL = float(os.getenv("HEIDI_REALTIME_PARTIAL_INTERVAL", "3"))
+REALTIME_SEGMENT_RETRIES = int(os.getenv("HEIDI_AUDIO_SEGMENT_RETRIES", "2"))
+
+
+class RealtimeTranscription:
+    """
+    One live recording: buffers incoming audio frames, uploads each full
+    segment with the next ``index`` and reports progress through ``send``.
+    Segments are cut on container boundaries and carry the stream header,
+    so each one decodes on its own (see ``live_segments``).
+
+    ``send`` receives JSON-serialisable messages: ``started``, ``segment``,
+    ``partial``, ``final`` and ``error``. The transport (WebSocket) is the
+    caller's concern.
+    """
+
+    def __init__(
+        self,
+        send: Send,
+        *,
+        filename: str = "segment.webm",
+        segment_bytes: Optional[int] = None,
+        max_in_flight: Optional[int] = None,
+        partial_interval: Optional[float] = None,
+        retries: Optional[int] = None,
+    ):
+        self._send = send
+        self.filename = filename
+        self.segment_bytes = segment_bytes or REALTIME_SEGMENT_BYTES
+        self.partial_interval = REALTIME_PARTIAL_INTERVAL if partial_interval is None else partial_interval
+        self.retries = REALTIME_SEGMENT_RETRIES if retries is None else retries
+        self.jwt_token: Optional[str] = None
+        self.session_id: Optional[str] = None
+        self.recording_id: Optional[str] = None
+        self._segments = LiveSegmenter(self.segment_bytes)
+        self._next_index = 0
+        self._acknowledged: Set[int] = set()
+        self._failed: Set[int] = set()
+        self._uploads: Set[asyncio.Task] = set()
+        self._upload_slots = asyncio.Semaphore(max_in_flight or REALTIME_UPLOAD_CONCURRENCY)
+        self._new_segments = asyncio.Event()
+        self._partial_task: Optional[asyncio.Task] = None
+        self._last_partial = ""
+
+    async def start(self, session_id: Optional[str] = None) -> bool:
+        """Open a session and recording; returns False after reporting an error."""
+        jwt_token, error = await aio_flows.fetch_jwt_token()
+        if not error:
+            session_id, error = await aio_flows.ensure_session(jwt_token, session_id)
+        if error:
+            await self._send(dict(error[0], type="error"))
+            return False
+
+        start_payload, status = format_start_result(
+            await aio_transcript.start_transcription(jwt_token, session_id)
+        )
+        if status != 200 or not start_payload.get("success"):
+            await self._send(dict(start_payload, type="error"))
+            return False
+
+        self.jwt_token, self.session_id = jwt_token, session_id
+        self.recording_id = start_payload["recording_id"]
+        self._partial_task = asyncio.create_task(self._partial_loop())
+        await self._send({"type": "started", "session_id": session_id, "recording_id": self.recording_id})
+        return True
+
+    async def add_audio(self, frame: bytes) -> None:
+        for segment in self._segments.feed(frame):
+            await self._enqueue(segment)
+
+    async def flush(self) -> None:
+        """Upload whatever is buffered; the next frame may start a new recorder stream."""
+        for segment in self._segments.flush():
+            await self._enqueue(segment)
+
+    async def _enqueue(self, segment: bytes) -> None:
+        index, self._next_index = self._next_index, self._next_index + 1
+        # Wait for a free slot here so a slow upstream applies back-pressure to the socket.
+        await self._upload_slots.acquire()
+        task = asyncio.create_task(self._upload(index, segment))
+        self._uploads.add(task)
+        task.add_done_callback(self._uploads.discard)
+
+    async def _upload(self, index: int, segment: bytes) -> None:
+        try:
+            result: Any = None
+            attempts = 0
+            while True:
+                attempts += 1
+                try:
+                    result = await aio_transcript.upload_audio_bytes(
+                        self.jwt_token, self.session_id, self.recording_id, segment, self.filename, str(index)
+                    )
+                except Exception as exc:
+                    result = {"error": True, "message": str(exc)}
+                if isinstance(result, dict) and result.get("is_success") is True:
+                    self._acknowledged.add(index)
+                    self._new_segments.set()
+                    await self._send({"type": "segment", "index": index, "success": True, "attempts": attempts})
+                    return
+                # Refusals and auth failures will not clear up on retry; retries spend the shared budget.
+                if attempts > self.retries or (isinstance(result, dict) and not is_retryable(result)):
+                    break
+                if not retry_allowed():
+                    break
+                await asyncio.sleep(0.5 * 2 ** (attempts - 1))
+
+            logger.warning("Live segment %s of recording %s failed: %s", index, self.recording_id, result)
+            self._failed.add(index)
+            await self._send({"type": "segment", "index": index, "success": False, "attempts": attempts, "details": result})
+        finally:
+            self._upload_slots.release()
+
+    async def _partial_loop(self) -> None:
+        while True:
+            await self._new_segments.wait()
+            self._new_segments.clear()
+            try:
+                text = transcript_text(
+                    await aio_transcript.get_transcript(self.jwt_token, self.session_id)
+                )
+            except Exception as exc:
+                logger.debug("Partial transcript fetch failed: %s", exc)
+                text = ""
+            if text and text != "{}" and text != self._last_partial:
+                self._last_partial = text
+                await self._send({"type": "partial", "transcript": text, "segments": len(self._acknowledged)})
+            await asyncio.sleep(self.partial_interval)
+
+    async def stop(self) -> Dict[str, Any]:
+        """Upload the tail, finish the recording and send the final transcript."""
+        await self.flush()
+        if self._uploads:
+            await asyncio.gather(*list(self._uploads))
+        await self._cancel_partials()
+
+        finish = await aio_transcript.finish_transcription(self.jwt_token, self.session_id, self.recording_id)
+        if isinstance(finish, dict) and finish.get("error"):
+            message = dict(finish, type="error")
+            await self._send(message)
+            return message
+
+        transcript_payload, status = await wait_for_transcript_async(
+            self.jwt_token, self.session_id, aio_transcript.get_transcript
+        )
+        message = {
+            "type": "final" if status == 200 else "error",
+            "session_id": self.session_id,
+            "recording_id": self.recording_id,
+            "segments": self._next_index,
+            "failed_segments": sorted(self._failed),
+            "transcript": transcript_text(transcript_payload.get("transcript")),
+            "ready": transcript_payload.get("ready", False),
+            "partial": transcript_payload.get("partial", False),
+        }
+        await self._send(message)
+        return message
+
+    async def _cancel_partials(self) -> None:
+        if self._partial_task is not None:
+            self._partial_task.cancel()
+            await asyncio.gather(self._partial_task, return_exceptions=True)
+            self._partial_task = None
+
+    async def close(self) -> None:
+        """Abandon in-flight work, e.g. when the socket drops before ``stop``."""
+        await self._cancel_partials()
+        for task in list(self._uploads):
+            task.cancel()
+        if self._uploads:
+            await asyncio.gather(*list(self._uploads), return_exceptions=True)
@@ -0,0 +1,187 @@
+"""Pool of pre-created Heidi sessions handed out without a round trip."""
+import logging
+import os
+import threading
+import time
+from collections import deque
+from typing import Any, Callable, Deque, Dict, List, Optional
+
+from app.api.session import create_session
+from app.services.token_manager import get_token_manager
+
+logger = logging.getLogger(__name__)
+
+
+class PooledSession:
+    """A pre-created session and its bookkeeping."""
+
+    def __init__(self, session_id: str, created_at: float):
+        self.session_id = session_id
+        self.created_at = created_at
+        self.uses = 0
+        self.last_used_at: Optional[float] = None
+
+    def describe(self, now: float) -> Dict[str, Any]:
+        return {
+            "session_id": self.session_id,
+            "age_seconds": round(now - self.created_at, 1),
+            "uses": self.uses,
+        }
+
+
+class SessionPool:
+    """
+    Keep ``size`` sessions ready and refill them on a background thread.
+
+    Each session is handed out up to ``max_uses`` times (1 keeps sessions
+    exclusive, which transcription requires) and is discarded once older than
+    ``max_age`` seconds. Sessions Heidi reports as missing are retired.
+    """
+
+    def __init__(
+        self,
+        size: int,
+        max_uses: int = 1,
+        max_age: float = 1800.0,
+        creator: Callable[[str], Any] = create_session,
+        token_provider: Optional[Callable[[], str]] = None,
+        clock: Callable[[], float] = time.time,
+    ):
+        self.size = size
+        self.max_uses = max_uses
+        self.max_age = max_age
+        self._creator = creator
+        self._token_provider = token_provider or (lambda: get_token_manager().get_token())
+        self._clock = clock
+        self._ready: Deque[PooledSession] = deque()
+        self._lock = threading.Lock()
+        self._wakeup = threading.Event()
+        self._stopped = threading.Event()
+        self._counters = {"created": 0, "handed_out": 0, "misses": 0, "retired": 0, "expired": 0, "create_failures": 0}
+        self._thread: Optional[threading.Thread] = None
+
+    def start(self) -> None:
+        if self._thread is None and self.size > 0:
+            self._thread = threading.Thread(target=self._refill_loop, name="session-pool", daemon=True)
+            self._thread.start()
+
+    def shutdown(self) -> None:
+        self._stopped.set()
+        self._wakeup.set()
+
+    def acquire(self) -> Optional[str]:
+        """Return a ready session id, or None when the pool is empty."""
+        now = self._clock()
+        with self._lock:
+            while self._ready:
+                pooled = self._ready[0]
+                if now - pooled.created_at > self.max_age:
+                    self._ready.popleft()
+                    self._counters["expired"] += 1
+                    continue
+                pooled.uses += 1
+                pooled.last_used_at = now
+                if pooled.uses >= self.max_uses:
+                    self._ready.popleft()
+                else:
+                    self._ready.rotate(-1)
+                self._counters["handed_out"] += 1
+                session_id = pooled.session_id
+                break
+            else:
+                session_id = None
+                self._counters["misses"] += 1
+        self._wakeup.set()
+        return session_id
+
+    def retire(self, session_id: str) -> None:
+        """Drop a session Heidi no longer recognises (e.g. after a 404)."""
+        with self._lock:
+            self._ready = deque(p for p in self._ready if p.session_id != session_id)
+            self._counters["retired"] += 1
+        self._wakeup.set()
+
+    def stats(self) -> Dict[str, Any]:
+        now = self._clock()
+        with self._lock:
+            sessions: List[Dict[str, Any]] = [p.describe(now) for p in self._ready]
+            counters = dict(self._counters)
+        return dict(counters, size=self.size, ready=len(sessions), sessions=sessions)
+
+    def _deficit(self) -> int:
+        with self._lock:
+            return self.size - len(self._ready)
+
+    def _refill_loop(self) -> None:
+        backoff = 1.0
+        while not self._stopped.is_set():
+            if self._deficit() > 0 and not self._create_one():
+                # Heidi or auth is unhealthy; back off instead of hammering it.
+                self._stopped.wait(backoff)
+                backoff = min(backoff * 2, 60.0)
+                continue
+            backoff = 1.0
+            if self._deficit() <= 0:
+                self._wakeup.clear()
+                if self._deficit() <= 0:
+                    self._wakeup.wait(timeout=max(self.max_age / 4, 1.0))
+                self._drop_expired()
+
+    def _create_one(self) -> bool:
+        token = self._token_provider()
+        if not token or "Error" in str(token):
+            with self._lock:
+                self._counters["create_failures"] += 1
+            return False
+
+        session_id = self._creator(token)
+        if not isinstance(session_id, str) or not session_id:
+            logger.warning("Session pool refill failed: %s", session_id)
+            with self._lock:
+                self._counters["create_failures"] += 1
+            return False
+
+        with self._lock:
+            self._ready.append(PooledSession(session_id, self._clock()))
+            self._counters["created"] += 1
+        return True
+
+    def _drop_expired(self) -> None:
+        now = self._clock()
+        with self._lock:
+            fresh = deque(p for p in self._ready if now - p.created_at <= self.max_age)
+            self._counters["expired"] += len(self._ready) - len(fresh)
+            self._ready = fresh
+
+
+_pool: Optional[SessionPool] = None
+_pool_initialised = False
+_pool_lock = threading.Lock()
+
+
+def get_session_pool() -> Optional[SessionPool]:
+    """Return the process-wide pool, or None when ``HEIDI_SESSION_POOL_SIZE`` is 0."""
+    global _pool, _pool_initialised
+    if not _pool_initialised:
+        with _pool_lock:
+            if not _pool_initialised:
+                size = int(os.getenv("HEIDI_SESSION_POOL_SIZE", "2"))
+                if size > 0:
+                    _pool = SessionPool(
+                        size=size,
+                        max_uses=int(os.getenv("HEIDI_SESSION_POOL_MAX_USES", "1")),
+                        max_age=float(os.getenv("HEIDI_SESSION_POOL_MAX_AGE", "1800")),
+                    )
+                    _pool.start()
+                _pool_initialised = True
+    return _pool
+
+
+def reset_session_pool() -> None:
+    """Stop the process-wide pool; the next call re-reads the environment."""
+    global _pool, _pool_initialised
+    with _pool_lock:
+        if _pool is not None:
+            _pool.shutdown()
+        _pool = None
+        _pool_initialised = False
@@ -0,0 +1,67 @@
+"""Helpers for relaying Heidi output to the browser as Server-Sent Events."""
+import json
+import logging
+from typing import Any, Dict, Iterable, Iterator, Optional
+
+logger = logging.getLogger(__name__)
+
+
+def format_sse(data: Any, event: Optional[str] = None) -> str:
+    """Serialise one SSE message; ``data`` is JSON-encoded."""
+    message = ""
+    if event:
+        message += f"event: {event}\n"
+    message += f"data: {json.dumps(data)}\n\n"
+    return message
+
+
+def iter_sections(chunks: Iterable[str], separator: str = "\n\n") -> Iterator[str]:
+    """
+    Regroup text fragments into complete sections ending at ``separator``.
+
+    Heidi streams a note a few tokens at a time; forwarding whole paragraphs
+    lets clients render each section once, as soon as it is finished.
+    """
+    buffer = ""
+    try:
+        for chunk in chunks:
+            buffer += chunk
+            while separator in buffer:
+                section, buffer = buffer.split(separator, 1)
+                yield section + separator
+    finally:
+        close = getattr(chunks, "close", None)
+        if close is not None:
+            close()
+    if buffer:
+        yield buffer
+
+
+def relay_chunks(chunks: Iterable[str], meta: Optional[Dict[str, Any]] = None) -> Iterator[str]:
+    """
+    Re-emit upstream text fragments as SSE messages without accumulating them.
+
+    Emits an optional ``meta`` event first, one ``data`` message per fragment in
+    the same ``{"data": ...}`` shape Heidi uses, and a closing ``done`` event.
+    Upstream failures after the first byte surface as an ``error`` event.
+    """
+    if meta:
+        yield format_sse(meta, event="meta")
+
+    chunk_count = 0
+    character_count = 0
+    try:
+        for chunk in chunks:
+            chunk_count += 1
+            character_count += len(chunk)
+            yield format_sse({"data": chunk})
+    except Exception as exc:
+        logger.exception("Upstream stream failed after %s chunks", chunk_count)
+        yield format_sse({"error": True, "message": str(exc)}, event="error")
+        return
+    finally:
+        close = getattr(chunks, "close", None)
+        if close is not None:
+            close()
+
+    yield format_sse({"chunks": chunk_count, "length": character_count}, event="done")
@@ -0,0 +1,196 @@
+"""Consult-note template catalogue cached across requests and workers."""
+import logging
+import os
+import threading
+import time
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from app.api.consult import revalidate_consult_note_templates
+from app.cache import CacheBackend, cache_from_env, hash_key
+
+logger = logging.getLogger(__name__)
+
+JsonResponse = Tuple[Dict[str, Any], int]
+
+# Seconds a fetched catalogue is served before it is revalidated upstream.
+TEMPLATE_TTL = float(os.getenv("HEIDI_TEMPLATE_TTL", "3600"))
+
+
+def _index_templates(catalogue: Any) -> Tuple[Dict[str, dict], Dict[str, dict]]:
+    """Map template ids and lower-cased names to their entries."""
+    by_id: Dict[str, dict] = {}
+    by_name: Dict[str, dict] = {}
+    templates = catalogue.get("templates") if isinstance(catalogue, dict) else None
+    for template in templates or []:
+        if not isinstance(template, dict):
+            continue
+        if template.get("id") is not None:
+            by_id[str(template["id"])] = template
+        if isinstance(template.get("name"), str):
+            by_name.setdefault(template["name"].strip().lower(), template)
+    return by_id, by_name
+
+
+class TemplateCatalogue:
+    """
+    Serve the template catalogue from a shared cache, revalidating it every
+    ``ttl`` seconds with ``If-None-Match``/``If-Modified-Since``.
+
+    With a SQLite cache every worker reads the same copy, and only one
+    revalidation per process runs at a time. When Heidi is unreachable the
+    last good copy keeps being served.
+    """
+
+    def __init__(
+        self,
+        cache: Optional[CacheBackend],
+        ttl: float = TEMPLATE_TTL,
+        fetcher: Callable[..., dict] = revalidate_consult_note_templates,
+        clock: Callable[[], float] = time.time,
+    ):
+        self.cache = cache
+        self.ttl = ttl
+        self._fetcher = fetcher
+        self._clock = clock
+        # The catalogue is per Heidi user, so accounts sharing a cache file stay apart.
+        self._key = hash_key("templates", os.getenv("HEIDI_EMAIL", ""), os.getenv("HEIDI_USER_ID", ""))
+        self._refresh_lock = threading.Lock()
+        self._stats_lock = threading.Lock()
+        self._index_key: Optional[Tuple[Any, Any]] = None
+        self._index: Tuple[Dict[str, dict], Dict[str, dict]] = ({}, {})
+        self._counters = {"fresh_hits": 0, "revalidated": 0, "fetched": 0, "stale_served": 0}
+
+    def _count(self, name: str) -> None:
+        with self._stats_lock:
+            self._counters[name] += 1
+
+    def _entry(self) -> Optional[dict]:
+        return self.cache.get(self._key) if self.cache is not None else None
+
+    def _is_fresh(self, entry: Optional[dict]) -> bool:
+        return entry is not None and self._clock() - entry["checked_at"] < self.ttl
+
+    def get(self, jwt_token: str, force_refresh: bool = False) -> Tuple[Optional[dict], Optional[dict]]:
+        """Return ``(catalogue, None)`` or ``(None, error)``."""
+        entry = self._entry()
+        if not force_refresh and self._is_fresh(entry):
+            self._count("fresh_hits")
+            return entry["catalogue"], None
+
+        with self._refresh_lock:
+            # Another thread may have refreshed while we waited.
+            latest = self._entry()
+            if not force_refresh and self._is_fresh(latest):
+                return latest["catalogue"], None
+            entry = latest or entry
+            result = self._fetcher(
+                jwt_token,
+                etag=entry.get("etag") if entry else None,
+                last_modified=entry.get("last_modified") if entry else None,
+            )
+
+            if result.get("status") == 304 and entry is not None:
+                entry = dict(entry, checked_at=self._clock())
+                self._count("revalidated")
+            elif result.get("status") == 200:
+                entry = {
+                    "catalogue": result["catalogue"],
+                    "etag": result.get("etag"),
+                    "last_modified": result.get("last_modified"),
+                    "fetched_at": self._clock(),
+                    "checked_at": self._clock(),
+                }
+                self._count("fetched")
+            elif entry is not None:
+                logger.warning("Template refresh failed, serving cached catalogue: %s", result)
+                self._count("stale_served")
+                return entry["catalogue"], None
+            else:
+                return None, result
+
+            if self.cache is not None:
+                self.cache.set(self._key, entry)
+        return entry["catalogue"], None
+
+    def _indexes(self, jwt_token: str) -> Tuple[Optional[Tuple[Dict[str, dict], Dict[str, dict]]], Optional[dict]]:
+        entry = self._entry()
+        if not self._is_fresh(entry):
+            catalogue, error = self.get(jwt_token)
+            if error:
+                return None, error
+            entry = self._entry() or {"catalogue": catalogue}
+
+        key = (entry.get("etag"), entry.get("fetched_at"))
+        if self.cache is None or key != self._index_key:
+            self._index = _index_templates(entry["catalogue"])
+            self._index_key = key
+        return self._index, None
+
+    def find(self, jwt_token: str, reference: str) -> Tuple[Optional[dict], Optional[dict]]:
+        """Look a template up by id, or by case-insensitive name."""
+        indexes, error = self._indexes(jwt_token)
+        if error:
+            return None, error
+        by_id, by_name = indexes
+        return by_id.get(str(reference)) or by_name.get(str(reference).strip().lower()), None
+
+    def templates(self, jwt_token: str) -> Tuple[List[dict], Optional[dict]]:
+        catalogue, error = self.get(jwt_token)
+        if error:
+            return [], error
+        templates = catalogue.get("templates") if isinstance(catalogue, dict) else None
+        return list(templates or []), None
+
+    def stats(self) -> Dict[str, Any]:
+        entry = self._entry()
+        with self._stats_lock:
+            counters = dict(self._counters)
+        return dict(
+            counters,
+            ttl=self.ttl,
+            cached=entry is not None,
+            age_seconds=round(self._clock() - entry["fetched_at"], 1) if entry else None,
+        )
+
+
+_catalogue: Optional[TemplateCatalogue] = None
+_catalogue_lock = threading.Lock()
+
+
+def get_template_catalogue() -> TemplateCatalogue:
+    """Return the process-wide catalogue, cached per ``HEIDI_TEMPLATE_CACHE`` (disk by default)."""
+    global _catalogue
+    if _catalogue is None:
+        with _catalogue_lock:
+            if _catalogue is None:
+                cache = cache_from_env(
+                    "HEIDI_TEMPLATE_CACHE",
+                    namespace="consult-templates",
+                    default_size=4,
+                    default_backend="disk",
+                )
+                _catalogue = TemplateCatalogue(cache)
+    return _catalogue
+
+
+def configure_template_catalogue(catalogue: Optional[TemplateCatalogue] = None) -> None:
+    """Install a catalogue, or reset to re-read the environment on next use."""
+    global _catalogue
+    with _catalogue_lock:
+        _catalogue = catalogue
+
+
+def resolve_template_id(jwt_token: str, reference: Optional[str] = None) -> Tuple[Optional[str], Optional[JsonResponse]]:
+    """Resolve a template id or name, defaulting to the first template in the catalogue."""
+    catalogue = get_template_catalogue()
+    if reference:
+        template, error = catalogue.find(jwt_token, reference)
+    else:
+        templates, error = catalogue.templates(jwt_token)
+        template = templates[0] if templates else None
+
+    if error:
+        return None, ({"error": True, "message": "Failed to load consult templates", "details": error}, 502)
+    if template is None:
+        return None, ({"error": True, "message": "No consult templates found"}, 404)
+    return str(template["id"]), None
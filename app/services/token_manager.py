@@ -0,0 +1,208 @@
+"""Process-wide JWT cache with background refresh."""
+import base64
+import json
+import logging
+import os
+import threading
+import time
+from typing import Callable, Optional
+
+from app.api.auth import get_jwt_token
+from app.api.client import add_unauthorized_listener, remove_unauthorized_listener
+
+logger = logging.getLogger(__name__)
+
+# Refresh this many seconds before the token's ``exp`` claim.
+REFRESH_MARGIN_SECONDS = float(os.getenv("HEIDI_JWT_REFRESH_MARGIN", "60"))
+# Lifetime assumed when the token carries no readable ``exp`` claim.
+DEFAULT_TOKEN_TTL_SECONDS = float(os.getenv("HEIDI_JWT_DEFAULT_TTL", "300"))
+# Tokens living no longer than the margin are refreshed after min(ttl / 2, 5s), never sooner than 1s.
+_SHORT_TOKEN_REFRESH_SECONDS = 5.0
+_MIN_REFRESH_DELAY_SECONDS = 1.0
+# Backoff between failed background refreshes while the cached token is still valid.
+_RETRY_BASE_SECONDS = 1.0
+_RETRY_MAX_SECONDS = 30.0
+
+
+def decode_jwt_expiry(token: str) -> Optional[float]:
+    """Return the ``exp`` claim of a JWT as a unix timestamp, if present."""
+    try:
+        payload_segment = token.split(".")[1]
+        padded = payload_segment + "=" * (-len(payload_segment) % 4)
+        claims = json.loads(base64.urlsafe_b64decode(padded.encode("ascii")))
+    except (IndexError, ValueError, UnicodeError):
+        return None
+
+    expiry = claims.get("exp") if isinstance(claims, dict) else None
+    if isinstance(expiry, (int, float)):
+        return float(expiry)
+    return None
+
+
+def _is_error_token(token: object) -> bool:
+    return not token or not isinstance(token, str) or "Error" in token or token.startswith("Exception")
+
+
+class TokenManager:
+    """Cache a JWT until shortly before it expires.
+
+    Callers inside the refresh margin keep receiving the cached token while a
+    background refresh runs; only callers holding an expired (or missing) token
+    block, and they share a single upstream ``GET /jwt``. A failed background
+    refresh is retried with backoff until the cached token expires.
+    """
+
+    def __init__(
+        self,
+        fetcher: Callable[[], str] = get_jwt_token,
+        refresh_margin: float = REFRESH_MARGIN_SECONDS,
+        default_ttl: float = DEFAULT_TOKEN_TTL_SECONDS,
+        clock: Callable[[], float] = time.time,
+    ):
+        self._fetcher = fetcher
+        self._refresh_margin = refresh_margin
+        self._default_ttl = default_ttl
+        self._clock = clock
+        self._state_lock = threading.Lock()
+        self._refresh_lock = threading.Lock()
+        self._token: Optional[str] = None
+        self._expires_at = 0.0
+        self._refresh_at = 0.0
+        self._failures = 0
+        self._timer: Optional[threading.Timer] = None
+
+    @property
+    def expires_at(self) -> float:
+        return self._expires_at
+
+    def get_token(self) -> str:
+        """Return a valid token, or the upstream error string on failure."""
+        token, expires_at = self._snapshot()
+        now = self._clock()
+        if token and now < expires_at:
+            if now >= self._refresh_at:
+                self._start_background_refresh()
+            return token
+
+        with self._refresh_lock:
+            # Another caller may have refreshed while we waited for the lock.
+            token, expires_at = self._snapshot()
+            if token and self._clock() < expires_at:
+                return token
+            return self._refresh()
+
+    def invalidate(self, token: Optional[str] = None) -> None:
+        """
+        Drop the cached token so the next caller fetches a new one; with
+        ``token``, only if that is still the cached one (Heidi rejected it).
+        """
+        with self._state_lock:
+            if token is not None and token != self._token:
+                return
+            self._token = None
+            self._expires_at = 0.0
+        if token is not None:
+            logger.warning("Heidi rejected the cached JWT; fetching a new one on next use")
+
+    def shutdown(self) -> None:
+        """Cancel any scheduled background refresh."""
+        with self._state_lock:
+            if self._timer is not None:
+                self._timer.cancel()
+                self._timer = None
+
+    def _snapshot(self):
+        with self._state_lock:
+            return self._token, self._expires_at
+
+    def _refresh(self) -> str:
+        token = self._fetcher()
+        if _is_error_token(token):
+            logger.error("JWT refresh failed: %s", token)
+            self._schedule_retry()
+            return token
+
+        now = self._clock()
+        expires_at = decode_jwt_expiry(token) or now + self._default_ttl
+        ttl = expires_at - now
+        if ttl <= 0:
+            logger.warning("Heidi issued a JWT that has already expired (%.0fs ago); check the clock", -ttl)
+        delay = max(
+            ttl - self._refresh_margin,
+            min(ttl / 2, _SHORT_TOKEN_REFRESH_SECONDS),
+            _MIN_REFRESH_DELAY_SECONDS,
+        )
+        with self._state_lock:
+            self._token = token
+            self._expires_at = expires_at
+            self._refresh_at = now + delay
+            self._failures = 0
+        self._schedule_refresh(delay)
+        logger.debug("JWT refreshed, expires in %.0fs", ttl)
+        return token
+
+    def _schedule_retry(self) -> None:
+        """Retry a failed refresh with backoff while the cached token is still usable."""
+        now = self._clock()
+        with self._state_lock:
+            if not self._token or now >= self._expires_at:
+                return  # the next caller fetches on demand
+            self._failures += 1
+            delay = min(_RETRY_BASE_SECONDS * 2 ** (self._failures - 1), _RETRY_MAX_SECONDS)
+            delay = max(min(delay, (self._expires_at - now) / 2), _MIN_REFRESH_DELAY_SECONDS)
+            self._refresh_at = now + delay
+        self._schedule_refresh(delay)
+
+    def _start_background_refresh(self) -> None:
+        if not self._refresh_lock.acquire(blocking=False):
+            return  # a refresh is already running
+        thread = threading.Thread(target=self._refresh_holding_lock, daemon=True)
+        thread.start()
+
+    def _refresh_in_background(self) -> None:
+        if not self._refresh_lock.acquire(blocking=False):
+            return
+        self._refresh_holding_lock()
+
+    def _refresh_holding_lock(self) -> None:
+        try:
+            self._refresh()
+        except Exception:  # pragma: no cover - keep serving the cached token
+            logger.exception("Background JWT refresh failed")
+        finally:
+            self._refresh_lock.release()
+
+    def _schedule_refresh(self, delay: float) -> None:
+        timer = threading.Timer(delay, self._refresh_in_background)
+        timer.daemon = True
+        with self._state_lock:
+            if self._timer is not None:
+                self._timer.cancel()
+            self._timer = timer
+        timer.start()
+
+
+_manager: Optional[TokenManager] = None
+_manager_lock = threading.Lock()
+
+
+def get_token_manager() -> TokenManager:
+    """Return the process-wide token manager, creating it on first use."""
+    global _manager
+    if _manager is None:
+        with _manager_lock:
+            if _manager is None:
+                _manager = TokenManager()
+                # A 401 from Heidi means the cached token is no longer accepted.
+                add_unauthorized_listener(_manager.invalidate)
+    return _manager
+
+
+def reset_token_manager() -> None:
+    """Discard the process-wide token manager (used by tests)."""
+    global _manager
+    with _manager_lock:
+        if _manager is not None:
+            remove_unauthorized_listener(_manager.invalidate)
+            _manager.shutdown()
+        _manager = None
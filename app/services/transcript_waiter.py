@@ -0,0 +1,281 @@
+"""Wait for a finished recording's transcript to become available."""
+import asyncio
+import heapq
+import itertools
+import logging
+import os
+import random
+import threading
+import time
+from concurrent.futures import Future
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Tuple
+
+from app.api.transcript import get_transcript
+
+logger = logging.getLogger(__name__)
+
+JsonResponse = Tuple[Dict[str, Any], int]
+
+TRANSCRIPT_WAIT_SECONDS = float(os.getenv("HEIDI_TRANSCRIPT_WAIT_SECONDS", "30"))
+TRANSCRIPT_POLL_INITIAL = float(os.getenv("HEIDI_TRANSCRIPT_POLL_INITIAL", "0.5"))
+TRANSCRIPT_POLL_MAX = float(os.getenv("HEIDI_TRANSCRIPT_POLL_MAX", "5"))
+# Route waits through one shared poller thread instead of polling in each caller.
+TRANSCRIPT_POLLER = os.getenv("HEIDI_TRANSCRIPT_POLLER", "").strip().lower() in ("1", "true", "yes", "on")
+
+READY, PARTIAL, PENDING, FAILED = "ready", "partial", "pending", "failed"
+
+_PENDING_STATES = {"pending", "queued", "processing", "in_progress", "running", "transcribing", "not_ready"}
+_TEXT_KEYS = ("transcript", "text", "content", "speech_to_text")
+
+
+def transcript_text(result: Any) -> str:
+    """The text of a ``get_transcript`` result, or ``""`` when there is none yet."""
+    if isinstance(result, dict):
+        for key in _TEXT_KEYS:
+            value = result.get(key)
+            if isinstance(value, str):
+                return value.strip()
+            if isinstance(value, (dict, list)) and value:
+                return str(value)
+        return ""
+    return str(result or "").strip()
+
+
+def classify_transcript(result: Any) -> str:
+    """
+    Classify a ``get_transcript`` result as ready, partial, pending or failed.
+
+    Empty bodies and status fields such as ``PROCESSING`` mean Heidi is still
+    preparing the transcript; text alongside such a marker is partial.
+    """
+    if isinstance(result, dict) and result.get("error"):
+        status_code = result.get("status_code")
+        # 404/409/425 are what Heidi answers while the transcript does not exist yet.
+        return PENDING if status_code in (404, 409, 425) else FAILED
+
+    in_progress = False
+    if isinstance(result, dict):
+        state = str(result.get("status") or result.get("state") or "").strip().lower()
+        in_progress = (
+            state in _PENDING_STATES
+            or result.get("is_final") is False
+            or result.get("partial") is True
+        )
+
+    text = transcript_text(result)
+    if not text or text == "{}":
+        return PENDING
+    return PARTIAL if in_progress else READY
+
+
+def backoff_delays(
+    initial: float = TRANSCRIPT_POLL_INITIAL,
+    maximum: float = TRANSCRIPT_POLL_MAX,
+    rng: Callable[[], float] = random.random,
+):
+    """Yield exponentially growing delays with equal jitter (half fixed, half random)."""
+    for attempt in itertools.count():
+        delay = min(maximum, initial * 2 ** attempt)
+        yield delay / 2 + rng() * delay / 2
+
+
+def _fetch_error(session_id: str, exc: Exception) -> Dict[str, Any]:
+    """The poll result for a fetch that raised ``exc``."""
+    if isinstance(exc, ValueError):
+        # A body that is not JSON yet is how Heidi answers before the transcript exists.
+        logger.debug("Transcript for %s not ready: %s", session_id, exc)
+        return {"error": True, "status_code": 404, "message": str(exc)}
+    # DNS failures, refused connections, timeouts: there is no status to report and
+    # nothing to gain from polling until the deadline, so the wait fails.
+    logger.warning("Transcript poll for %s failed: %s", session_id, exc)
+    return {"error": True, "status_code": None, "message": str(exc)}
+
+
+def _fetch(fetch: Callable[[str, str], Any], jwt_token: str, session_id: str) -> Any:
+    try:
+        return fetch(jwt_token, session_id)
+    except Exception as exc:
+        return _fetch_error(session_id, exc)
+
+
+def _result(last: Any, state: str, attempts: int, waited: float) -> JsonResponse:
+    if state == FAILED:
+        payload = dict(last, attempts=attempts)
+        # Transport errors carry no upstream status: report them as a bad gateway.
+        return payload, payload.get("status_code") or 502
+    return (
+        {
+            "success": True,
+            "transcript": {} if isinstance(last, dict) and last.get("error") else last,
+            "ready": state == READY,
+            "partial": state == PARTIAL,
+            "attempts": attempts,
+            "waited_seconds": round(waited, 3),
+        },
+        200,
+    )
+
+
+def wait_for_transcript(
+    jwt_token: str,
+    session_id: str,
+    *,
+    deadline: Optional[float] = None,
+    fetch: Callable[[str, str], Any] = get_transcript,
+    sleep: Callable[[float], None] = time.sleep,
+    clock: Callable[[], float] = time.monotonic,
+    delays=None,
+) -> JsonResponse:
+    """
+    Poll until the transcript is ready or ``deadline`` seconds have passed.
+
+    Returns the ``transcript_lookup_service`` payload plus ``ready``,
+    ``partial`` and ``attempts``. A transcript still pending or partial at
+    the deadline is returned as-is so callers can decide what to do with it.
+    """
+    if TRANSCRIPT_POLLER and fetch is get_transcript and delays is None:
+        return get_transcript_poller().watch(jwt_token, session_id, deadline).result()
+
+    deadline = TRANSCRIPT_WAIT_SECONDS if deadline is None else deadline
+    delays = delays or backoff_delays()
+    started = clock()
+    attempts = 0
+    while True:
+        last = _fetch(fetch, jwt_token, session_id)
+        attempts += 1
+        state = classify_transcript(last)
+        remaining = deadline - (clock() - started)
+        if state in (READY, FAILED) or remaining <= 0:
+            return _result(last, state, attempts, clock() - started)
+        sleep(min(next(delays), remaining))
+
+
+async def wait_for_transcript_async(
+    jwt_token: str,
+    session_id: str,
+    fetch: Callable[[str, str], Awaitable[Any]],
+    *,
+    deadline: Optional[float] = None,
+    delays=None,
+) -> JsonResponse:
+    """Async ``wait_for_transcript`` for the aiohttp client."""
+    deadline = TRANSCRIPT_WAIT_SECONDS if deadline is None else deadline
+    delays = delays or backoff_delays()
+    loop = asyncio.get_running_loop()
+    started = loop.time()
+    attempts = 0
+    while True:
+        try:
+            last = await fetch(jwt_token, session_id)
+        except Exception as exc:
+            last = _fetch_error(session_id, exc)
+        attempts += 1
+        state = classify_transcript(last)
+        remaining = deadline - (loop.time() - started)
+        if state in (READY, FAILED) or remaining <= 0:
+            return _result(last, state, attempts, loop.time() - started)
+        await asyncio.sleep(min(next(delays), remaining))
+
+
+class _Watch:
+    def __init__(self, jwt_token: str, session_id: str, deadline: float, started: float):
+        self.jwt_token = jwt_token
+        self.session_id = session_id
+        self.deadline_at = started + deadline
+        self.started = started
+        self.delays = backoff_delays()
+        self.attempts = 0
+        self.future: Future = Future()
+
+
+class TranscriptPoller:
+    """
+    One background thread polling every pending transcript on its own schedule.
+
+    Waiting callers block on a future instead of sleeping in their own
+    request thread, and polls for different sessions are interleaved.
+    """
+
+    def __init__(
+        self,
+        fetch: Callable[[str, str], Any] = get_transcript,
+        clock: Callable[[], float] = time.monotonic,
+    ):
+        self._fetch = fetch
+        self._clock = clock
+        self._queue: List[Tuple[float, int, _Watch]] = []
+        self._counter = itertools.count()
+        self._condition = threading.Condition()
+        self._stopped = False
+        self._thread = threading.Thread(target=self._run, name="transcript-poller", daemon=True)
+        self._thread.start()
+
+    def watch(self, jwt_token: str, session_id: str, deadline: Optional[float] = None) -> Future:
+        """Start polling a session; the future resolves to a ``wait_for_transcript`` result."""
+        deadline = TRANSCRIPT_WAIT_SECONDS if deadline is None else deadline
+        watch = _Watch(jwt_token, session_id, deadline, self._clock())
+        self._schedule(watch, 0.0)
+        return watch.future
+
+    def pending(self) -> int:
+        with self._condition:
+            return len(self._queue)
+
+    def shutdown(self) -> None:
+        with self._condition:
+            self._stopped = True
+            self._condition.notify_all()
+
+    def _schedule(self, watch: _Watch, delay: float) -> None:
+        with self._condition:
+            heapq.heappush(self._queue, (self._clock() + delay, next(self._counter), watch))
+            self._condition.notify_all()
+
+    def _run(self) -> None:
+        while True:
+            with self._condition:
+                while not self._stopped and (
+                    not self._queue or self._queue[0][0] > self._clock()
+                ):
+                    timeout = self._queue[0][0] - self._clock() if self._queue else None
+                    self._condition.wait(timeout)
+                if self._stopped:
+                    return
+                _, _, watch = heapq.heappop(self._queue)
+            self._poll(watch)
+
+    def _poll(self, watch: _Watch) -> None:
+        try:
+            last = _fetch(self._fetch, watch.jwt_token, watch.session_id)
+            watch.attempts += 1
+            state = classify_transcript(last)
+            now = self._clock()
+            remaining = watch.deadline_at - now
+            if state in (READY, FAILED) or remaining <= 0:
+                watch.future.set_result(_result(last, state, watch.attempts, now - watch.started))
+                return
+            self._schedule(watch, min(next(watch.delays), remaining))
+        except Exception as exc:  # pragma: no cover - keeps the poller thread alive
+            logger.exception("Transcript poller failed for %s", watch.session_id)
+            watch.future.set_exception(exc)
+
+
+_poller: Optional[TranscriptPoller] = None
+_poller_lock = threading.Lock()
+
+
+def get_transcript_poller() -> TranscriptPoller:
+    global _poller
+    if _poller is None:
+        with _poller_lock:
+            if _poller is None:
+                _poller = TranscriptPoller()
+    return _poller
+
+
+def reset_transcript_poller() -> None:
+    global _poller
+    with _poller_lock:
+        if _poller is not None:
+            _poller.shutdown()
+        _poller = None
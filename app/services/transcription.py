@@ -1,7 +1,6 @@
 import logging
 import os
-import tempfile
-from typing import Any, Dict, Tuple
+from typing import Any, BinaryIO, Dict, Optional, Tuple
 
 from werkzeug.datastructures import FileStorage
 
@@ -10,7 +9,10 @@ from app.api.transcript import (
     get_transcript,
     start_transcription,
     upload_audio,
+    upload_audio_fileobj,
 )
+from app.services.audio_pipeline import upload_audio_segments
+from app.services.transcript_waiter import wait_for_transcript
 
 logger = logging.getLogger(__name__)
 
@@ -19,8 +21,11 @@ JsonResponse = Tuple[Dict[str, Any], int]
 
 def start_transcription_service(jwt_token: str, session_id: str) -> JsonResponse:
     """Start the transcription workflow and return a recording id."""
-    result = start_transcription(jwt_token, session_id)
+    return format_start_result(start_transcription(jwt_token, session_id))
 
+
+def format_start_result(result: Any) -> JsonResponse:
+    """Map a ``start_transcription`` result to a service response."""
     if isinstance(result, dict) and result.get("error"):
         return result, result.get("status_code", 500)
 
@@ -37,7 +42,8 @@ def start_transcription_service(jwt_token: str, session_id: str) -> JsonResponse
     return {"success": True, "recording_id": result}, 200
 
 
-def _format_upload_result(result: Any, failure_message: str) -> JsonResponse:
+def format_upload_result(result: Any, failure_message: str) -> JsonResponse:
+    """Map an audio upload result to a service response."""
     if isinstance(result, dict):
         is_success = result.get("is_success")
         if is_success is True:
@@ -85,7 +91,7 @@ def upload_audio_from_path_service(
         )
 
     result = upload_audio(jwt_token, session_id, recording_id, file_path, index)
-    return _format_upload_result(result, "Audio upload failed")
+    return format_upload_result(result, "Audio upload failed")
 
 
 def upload_audio_service(
@@ -103,25 +109,88 @@ def upload_audio_service(
     if not file_storage.filename:
         return {"success": False, "error": "No audio file selected"}, 400
 
-    suffix = os.path.splitext(file_storage.filename)[1] or ".wav"
+    # Werkzeug has already buffered the part; send it on from there instead
+    # of writing a second copy to disk.
+    result = upload_audio_fileobj(
+        jwt_token,
+        session_id,
+        recording_id,
+        file_storage.stream,
+        index,
+        file_storage.filename,
+        content_type=file_storage.mimetype or "application/octet-stream",
+    )
+    return format_upload_result(result, "Audio upload failed")
+
+
+def upload_audio_stream_service(
+    jwt_token: str,
+    session_id: str,
+    recording_id: str,
+    stream: BinaryIO,
+    *,
+    filename: str = "audio.wav",
+    content_length: Optional[int] = None,
+    content_type: str = "application/octet-stream",
+    index: str = "0",
+) -> JsonResponse:
+    """Upload audio sent as the raw request body, relaying it as it arrives."""
+    if content_length == 0:
+        return {"success": False, "error": "No audio file provided"}, 400
+
+    result = upload_audio_fileobj(
+        jwt_token,
+        session_id,
+        recording_id,
+        stream,
+        index,
+        filename,
+        content_length=content_length,
+        content_type=content_type,
+    )
+    return format_upload_result(result, "Audio upload failed")
+
+
+def upload_audio_segmented_service(
+    jwt_token: str,
+    session_id: str,
+    recording_id: str,
+    file_storage: FileStorage,
+) -> JsonResponse:
+    """Upload a recording as concurrent indexed segments."""
+    if not file_storage:
+        return {"success": False, "error": "No audio file provided"}, 400
 
-    temp_path = ""
-    try:
-        with tempfile.NamedTemporaryFile(delete=False, suffix=suffix) as temp_file:
-            file_storage.save(temp_file.name)
-            temp_path = temp_file.name
-            logger.debug("Temporary audio saved to %s", temp_path)
+    if not file_storage.filename:
+        return {"success": False, "error": "No audio file selected"}, 400
 
-        return upload_audio_from_path_service(
-            jwt_token, session_id, recording_id, temp_path, index=index
+    return upload_audio_segments(
+        jwt_token, session_id, recording_id, file_storage.read(), file_storage.filename
+    )
+
+
+def upload_audio_segmented_from_path_service(
+    jwt_token: str,
+    session_id: str,
+    recording_id: str,
+    file_path: str,
+) -> JsonResponse:
+    """Upload a recording on disk as concurrent indexed segments."""
+    if not os.path.exists(file_path):
+        return (
+            {
+                "success": False,
+                "error": "Audio file not found",
+                "path": file_path,
+            },
+            400,
         )
-    finally:
-        if temp_path and os.path.exists(temp_path):
-            try:
-                os.unlink(temp_path)
-                logger.debug("Temporary audio removed: %s", temp_path)
-            except OSError as exc:  # pragma: no cover - best effort cleanup
-                logger.warning("Failed to remove temp file %s: %s", temp_path, exc)
+
+    with open(file_path, "rb") as audio_file:
+        audio = audio_file.read()
+    return upload_audio_segments(
+        jwt_token, session_id, recording_id, audio, os.path.basename(file_path)
+    )
 
 
 def finish_transcription_service(
@@ -130,8 +199,11 @@ def finish_transcription_service(
     recording_id: str,
 ) -> JsonResponse:
     """Mark the transcription as complete."""
-    result = finish_transcription(jwt_token, session_id, recording_id)
+    return format_finish_result(finish_transcription(jwt_token, session_id, recording_id))
 
+
+def format_finish_result(result: Any) -> JsonResponse:
+    """Map a ``finish_transcription`` result to a service response."""
     if isinstance(result, dict):
         if result.get("is_success") is True:
             return {"success": True, "details": result}, 200
@@ -150,8 +222,17 @@ def finish_transcription_service(
 
 def transcript_lookup_service(jwt_token: str, session_id: str) -> JsonResponse:
     """Retrieve the transcript for a session."""
-    result = get_transcript(jwt_token, session_id)
+    return _format_transcript_result(get_transcript(jwt_token, session_id))
+
+
+def transcript_wait_service(
+    jwt_token: str, session_id: str, *, deadline: Optional[float] = None
+) -> JsonResponse:
+    """Wait, with backoff, for the transcript of a just-finished recording."""
+    return wait_for_transcript(jwt_token, session_id, deadline=deadline)
+
 
+def _format_transcript_result(result: Any) -> JsonResponse:
     if isinstance(result, dict) and result.get("error"):
         return result, result.get("status_code", 500)
 
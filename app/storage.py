@@ -1,70 +1,299 @@
-# app/storage.py - Simple in-memory storage for demo
-from datetime import datetime
+# app/storage.py - Care plan, session and note storage with pluggable backends
+import bisect
 import json
+import os
+import sqlite3
+import tempfile
+import threading
+from datetime import datetime
+from typing import Any, Dict, Iterable, Iterator, List, Optional
+
+DEFAULT_STORAGE_PATH = os.path.join(tempfile.gettempdir(), "heidi_storage.sqlite3")
+SESSION_PAGE_SIZE = 100
+
+
+def _now() -> str:
+    return datetime.now().isoformat()
+
+
+class StorageBackend:
+    """Interface shared by storage backends. Stored data must be JSON-serialisable."""
+
+    def save_care_plan(self, session_id: str, care_plan_data: Any) -> str:
+        raise NotImplementedError
+
+    def get_care_plan(self, session_id: str) -> Optional[Dict[str, Any]]:
+        raise NotImplementedError
+
+    def save_patient_notes(self, session_id: str, note_texts: Iterable[str]) -> int:
+        """Append several notes in one write; returns how many were stored."""
+        raise NotImplementedError
+
+    def get_patient_notes(
+        self, session_id: str, limit: Optional[int] = None, offset: int = 0
+    ) -> List[Dict[str, Any]]:
+        raise NotImplementedError
+
+    def save_session_data(self, session_id: str, patient_data: Any) -> bool:
+        raise NotImplementedError
+
+    def get_session_data(self, session_id: str) -> Optional[Dict[str, Any]]:
+        raise NotImplementedError
 
-# Simple in-memory storage - resets when server restarts (perfect for demo)
-care_plans = {}
-patient_sessions = {}
-patient_notes = {}
-
-class SimpleStorage:
-    @staticmethod
-    def save_care_plan(session_id, care_plan_data):
-        """Save care plan for a session"""
-        care_plans[session_id] = {
-            'data': care_plan_data,
-            'created_at': datetime.now().isoformat(),
-            'session_id': session_id
-        }
+    def list_sessions(self, limit: int = SESSION_PAGE_SIZE, after: Optional[str] = None) -> List[str]:
+        """One page of session ids in ascending order, starting after ``after``."""
+        raise NotImplementedError
+
+    def seed_session(self, session_id: str, care_plan_data: Any, note_texts: Iterable[str]) -> bool:
+        """Store a care plan and notes unless the session already has a care plan.
+
+        Check and write are atomic, so workers seeding at the same time store
+        the data once. Returns whether this call stored it.
+        """
+        raise NotImplementedError
+
+    def save_patient_note(self, session_id: str, note_text: str) -> bool:
+        self.save_patient_notes(session_id, [note_text])
+        return True
+
+    def iter_sessions(self, page_size: int = SESSION_PAGE_SIZE) -> Iterator[str]:
+        """Yield every session id, fetching ``page_size`` at a time."""
+        after = None
+        while True:
+            page = self.list_sessions(limit=page_size, after=after)
+            yield from page
+            if len(page) < page_size:
+                return
+            after = page[-1]
+
+
+class MemoryStorage(StorageBackend):
+    """Per-process dictionaries; lost on restart and not shared between workers."""
+
+    def __init__(self):
+        self._care_plans: Dict[str, Dict[str, Any]] = {}
+        self._sessions: Dict[str, Dict[str, Any]] = {}
+        # Session ids kept sorted, so each page is a bisect and a slice.
+        self._session_ids: List[str] = []
+        self._notes: Dict[str, List[Dict[str, Any]]] = {}
+        self._lock = threading.Lock()
+
+    def save_care_plan(self, session_id, care_plan_data):
+        with self._lock:
+            self._care_plans[session_id] = {
+                'data': care_plan_data,
+                'created_at': _now(),
+                'session_id': session_id
+            }
         return session_id
 
-    @staticmethod
-    def get_care_plan(session_id):
-        """Get care plan by session ID"""
-        return care_plans.get(session_id)
-
-    @staticmethod
-    def save_patient_note(session_id, note_text):
-        """Save patient daily notes"""
-        if session_id not in patient_notes:
-            patient_notes[session_id] = []
-
-        patient_notes[session_id].append({
-            'text': note_text,
-            'timestamp': datetime.now().isoformat()
-        })
+    def get_care_plan(self, session_id):
+        return self._care_plans.get(session_id)
+
+    def save_patient_notes(self, session_id, note_texts):
+        timestamp = _now()
+        notes = [{'text': text, 'timestamp': timestamp} for text in note_texts]
+        with self._lock:
+            self._notes.setdefault(session_id, []).extend(notes)
+        return len(notes)
+
+    def get_patient_notes(self, session_id, limit=None, offset=0):
+        with self._lock:
+            notes = self._notes.get(session_id, [])
+            end = None if limit is None else offset + limit
+            return list(notes[offset:end])
+
+    def save_session_data(self, session_id, patient_data):
+        with self._lock:
+            if session_id not in self._sessions:
+                bisect.insort(self._session_ids, session_id)
+            self._sessions[session_id] = {
+                'patient_data': patient_data,
+                'last_updated': _now()
+            }
         return True
 
-    @staticmethod
-    def get_patient_notes(session_id):
-        """Get all notes for a session"""
-        return patient_notes.get(session_id, [])
-
-    @staticmethod
-    def save_session_data(session_id, patient_data):
-        """Save any session-related data"""
-        patient_sessions[session_id] = {
-            'patient_data': patient_data,
-            'last_updated': datetime.now().isoformat()
-        }
+    def get_session_data(self, session_id):
+        return self._sessions.get(session_id)
+
+    def seed_session(self, session_id, care_plan_data, note_texts):
+        with self._lock:
+            if session_id in self._care_plans:
+                return False
+            timestamp = _now()
+            self._care_plans[session_id] = {
+                'data': care_plan_data,
+                'created_at': timestamp,
+                'session_id': session_id
+            }
+            self._notes.setdefault(session_id, []).extend(
+                {'text': text, 'timestamp': timestamp} for text in note_texts
+            )
         return True
 
-    @staticmethod
-    def get_session_data(session_id):
-        """Get session data"""
-        return patient_sessions.get(session_id)
+    def list_sessions(self, limit=SESSION_PAGE_SIZE, after=None):
+        with self._lock:
+            start = 0 if after is None else bisect.bisect_right(self._session_ids, after)
+            return self._session_ids[start:start + limit]
+
+
+class SQLiteStorage(StorageBackend):
+    """SQLite file in WAL mode, so data survives restarts and every worker sees the same rows."""
+
+    def __init__(self, path: str = DEFAULT_STORAGE_PATH):
+        self.path = path
+        self._local = threading.local()
+        with self._connect() as conn:
+            conn.executescript(
+                "CREATE TABLE IF NOT EXISTS care_plans ("
+                " session_id TEXT PRIMARY KEY,"
+                " data TEXT NOT NULL,"
+                " created_at TEXT NOT NULL);"
+                "CREATE INDEX IF NOT EXISTS idx_care_plans_created_at ON care_plans (created_at);"
+                "CREATE TABLE IF NOT EXISTS patient_sessions ("
+                " session_id TEXT PRIMARY KEY,"
+                " patient_data TEXT NOT NULL,"
+                " last_updated TEXT NOT NULL);"
+                "CREATE INDEX IF NOT EXISTS idx_patient_sessions_last_updated"
+                " ON patient_sessions (last_updated);"
+                "CREATE TABLE IF NOT EXISTS patient_notes ("
+                " id INTEGER PRIMARY KEY AUTOINCREMENT,"
+                " session_id TEXT NOT NULL,"
+                " text TEXT NOT NULL,"
+                " timestamp TEXT NOT NULL);"
+                "CREATE INDEX IF NOT EXISTS idx_patient_notes_session"
+                " ON patient_notes (session_id, timestamp);"
+            )
+
+    def _connect(self) -> sqlite3.Connection:
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=10)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    def save_care_plan(self, session_id, care_plan_data):
+        conn = self._connect()
+        with conn:
+            conn.execute(
+                "INSERT OR REPLACE INTO care_plans (session_id, data, created_at) VALUES (?, ?, ?)",
+                (session_id, json.dumps(care_plan_data), _now()),
+            )
+        return session_id
+
+    def get_care_plan(self, session_id):
+        row = self._connect().execute(
+            "SELECT data, created_at FROM care_plans WHERE session_id = ?", (session_id,)
+        ).fetchone()
+        if row is None:
+            return None
+        return {'data': json.loads(row[0]), 'created_at': row[1], 'session_id': session_id}
+
+    def save_patient_notes(self, session_id, note_texts):
+        timestamp = _now()
+        conn = self._connect()
+        with conn:
+            inserted = conn.executemany(
+                "INSERT INTO patient_notes (session_id, text, timestamp) VALUES (?, ?, ?)",
+                ((session_id, text, timestamp) for text in note_texts),
+            ).rowcount
+        return inserted
+
+    def get_patient_notes(self, session_id, limit=None, offset=0):
+        rows = self._connect().execute(
+            "SELECT text, timestamp FROM patient_notes WHERE session_id = ?"
+            " ORDER BY timestamp, id LIMIT ? OFFSET ?",
+            (session_id, -1 if limit is None else limit, offset),
+        )
+        return [{'text': text, 'timestamp': timestamp} for text, timestamp in rows]
+
+    def save_session_data(self, session_id, patient_data):
+        conn = self._connect()
+        with conn:
+            conn.execute(
+                "INSERT OR REPLACE INTO patient_sessions (session_id, patient_data, last_updated)"
+                " VALUES (?, ?, ?)",
+                (session_id, json.dumps(patient_data), _now()),
+            )
+        return True
+
+    def get_session_data(self, session_id):
+        row = self._connect().execute(
+            "SELECT patient_data, last_updated FROM patient_sessions WHERE session_id = ?",
+            (session_id,),
+        ).fetchone()
+        if row is None:
+            return None
+        return {'patient_data': json.loads(row[0]), 'last_updated': row[1]}
+
+    def seed_session(self, session_id, care_plan_data, note_texts):
+        timestamp = _now()
+        conn = self._connect()
+        with conn:
+            # Take the write lock before checking, so other workers wait and then see the seed.
+            conn.execute("BEGIN IMMEDIATE")
+            if conn.execute(
+                "SELECT 1 FROM care_plans WHERE session_id = ?", (session_id,)
+            ).fetchone():
+                return False
+            conn.execute(
+                "INSERT INTO care_plans (session_id, data, created_at) VALUES (?, ?, ?)",
+                (session_id, json.dumps(care_plan_data), timestamp),
+            )
+            conn.executemany(
+                "INSERT INTO patient_notes (session_id, text, timestamp) VALUES (?, ?, ?)",
+                ((session_id, text, timestamp) for text in note_texts),
+            )
+        return True
+
+    def list_sessions(self, limit=SESSION_PAGE_SIZE, after=None):
+        # Keyset pagination on the primary key keeps each page an index range scan.
+        rows = self._connect().execute(
+            "SELECT session_id FROM patient_sessions WHERE session_id > ?"
+            " ORDER BY session_id LIMIT ?",
+            ("" if after is None else after, limit),
+        )
+        return [row[0] for row in rows]
+
+
+def storage_from_env() -> StorageBackend:
+    """Build the backend named by ``HEIDI_STORAGE`` (``memory``, the default, or ``sqlite``)."""
+    backend = os.getenv("HEIDI_STORAGE", "memory").strip().lower()
+    if backend in ("sqlite", "disk"):
+        return SQLiteStorage(os.getenv("HEIDI_STORAGE_PATH", DEFAULT_STORAGE_PATH))
+    if backend in ("", "memory"):
+        return MemoryStorage()
+    raise ValueError(f"Unknown storage backend: {backend!r}")
+
+
+_storage: Optional[StorageBackend] = None
+_storage_lock = threading.Lock()
+
+
+def get_storage() -> StorageBackend:
+    """Return the process-wide backend, creating it from the environment on first use."""
+    global _storage
+    if _storage is None:
+        with _storage_lock:
+            if _storage is None:
+                _storage = storage_from_env()
+    return _storage
+
+
+def configure_storage(backend: Optional[StorageBackend] = None) -> None:
+    """Install ``backend`` as the process-wide store; None re-reads the environment on next use."""
+    global _storage
+    with _storage_lock:
+        _storage = backend
 
-    @staticmethod
-    def get_all_sessions():
-        """Get all sessions - useful for demo"""
-        return list(patient_sessions.keys())
 
 # For demo purposes - populate with sample data
 def init_demo_data():
-    """Initialize with sample data for demo"""
+    """Initialize with sample data for demo (once per store)"""
     sample_session = "demo_session_123"
-
-    SimpleStorage.save_care_plan(sample_session, {
+    get_storage().seed_session(sample_session, {
         'medications': [
             {'name': 'Ibuprofen 400mg', 'frequency': 'Every 6 hours', 'instructions': 'Take with food'},
             {'name': 'Amoxicillin 500mg', 'frequency': '3 times daily', 'instructions': 'Complete full course'}
@@ -83,12 +312,12 @@ def init_demo_data():
             'Severe pain not controlled by medication',
             'Signs of infection at incision site'
         ]
-    })
-
-    SimpleStorage.save_patient_note(sample_session, "Day 1: Pain level manageable, took morning medication on time")
-    SimpleStorage.save_patient_note(sample_session, "Day 2: Feeling better, completed short walk")
+    }, [
+        "Day 1: Pain level manageable, took morning medication on time",
+        "Day 2: Feeling better, completed short walk",
+    ])
 
     return sample_session
 
 # Initialize demo data on import
-DEMO_SESSION_ID = init_demo_data()
\ No newline at end of file
+DEMO_SESSION_ID = init_demo_data()
@@ -0,0 +1,166 @@
+# benchmarks/fake_heidi.py - Local stand-in for the Heidi API with tunable latency
+import asyncio
+import base64
+import itertools
+import json
+import threading
+import time
+from dataclasses import dataclass
+from typing import Optional
+
+from aiohttp import web
+
+
+@dataclass
+class FakeHeidiConfig:
+    """Shape of the simulated upstream. Times are seconds."""
+
+    latency: float = 0.005          # added to every non-streamed call
+    sse_chunks: int = 20            # ask-ai / consult-note chunks per answer
+    chunk_delay: float = 0.01       # pause between SSE chunks
+    first_chunk_delay: float = 0.05  # "model thinking" before the first chunk
+    upload_delay: float = 0.02      # per audio segment upload
+    transcript_delay: float = 0.0   # transcript is empty until this long after finish
+
+
+def _fake_jwt(lifetime: float = 3600) -> str:
+    def segment(obj):
+        return base64.urlsafe_b64encode(json.dumps(obj).encode()).rstrip(b"=").decode()
+
+    return ".".join([segment({"alg": "none"}), segment({"exp": int(time.time() + lifetime)}), "sig"])
+
+
+def build_app(config: FakeHeidiConfig) -> web.Application:
+    """aiohttp app answering the Heidi endpoints this service calls."""
+    ids = itertools.count(1)
+    finished_at = {}
+
+    async def pause(seconds):
+        if seconds > 0:
+            await asyncio.sleep(seconds)
+
+    async def jwt(request):
+        await pause(config.latency)
+        return web.json_response({"token": _fake_jwt()})
+
+    async def create_session(request):
+        await pause(config.latency)
+        return web.json_response({"session_id": f"bench-session-{next(ids)}"})
+
+    async def session_details(request):
+        await pause(config.latency)
+        return web.json_response({"session_id": request.match_info["session_id"]})
+
+    async def stream_words(request, prefix):
+        response = web.StreamResponse(headers={"Content-Type": "text/event-stream"})
+        await response.prepare(request)
+        await pause(config.first_chunk_delay)
+        for index in range(config.sse_chunks):
+            if index:
+                await pause(config.chunk_delay)
+            payload = json.dumps({"data": f"{prefix} {index} "})
+            await response.write(f"data: {payload}\n\n".encode())
+        await response.write_eof()
+        return response
+
+    async def ask_ai(request):
+        await request.read()
+        return await stream_words(request, "advice")
+
+    async def consult_note(request):
+        await request.read()
+        return await stream_words(request, "note")
+
+    async def templates(request):
+        await pause(config.latency)
+        return web.json_response(
+            {"templates": [{"id": "tpl-soap", "name": "SOAP note"}]}, headers={"ETag": '"bench-1"'}
+        )
+
+    async def start_recording(request):
+        await pause(config.latency)
+        return web.json_response({"recording_id": f"bench-recording-{next(ids)}"})
+
+    async def recording_action(request):
+        if request.match_info["action"] == "transcribe":
+            await request.read()
+            await pause(config.upload_delay)
+            return web.json_response({"is_success": True})
+        await pause(config.latency)
+        finished_at[request.match_info["session_id"]] = time.monotonic()
+        return web.json_response({"is_success": True})
+
+    async def transcript(request):
+        await pause(config.latency)
+        finished = finished_at.get(request.match_info["session_id"])
+        if finished is None or time.monotonic() - finished < config.transcript_delay:
+            return web.json_response({"transcript": ""})
+        return web.json_response({"transcript": "Patient reports the pain is better with rest."})
+
+    app = web.Application(client_max_size=64 * 1024 * 1024)
+    app.router.add_get("/jwt", jwt)
+    app.router.add_post("/sessions", create_session)
+    app.router.add_get("/sessions/{session_id}", session_details)
+    app.router.add_patch("/sessions/{session_id}", session_details)
+    app.router.add_post("/sessions/{session_id}/ask-ai", ask_ai)
+    app.router.add_post("/sessions/{session_id}/consult-note", consult_note)
+    app.router.add_get("/templates/consult-note-templates", templates)
+    segments = "/sessions/{session_id}/restful-segment-transcription"
+    app.router.add_post(segments, start_recording)
+    app.router.add_post(segments + "/{recording_id}:{action}", recording_action)
+    app.router.add_get("/sessions/{session_id}/transcript", transcript)
+    return app
+
+
+class FakeHeidiServer:
+    """Run the stand-in on its own event loop thread; ``start()`` returns its base URL."""
+
+    def __init__(self, config: Optional[FakeHeidiConfig] = None, host: str = "127.0.0.1", port: int = 0):
+        self.config = config or FakeHeidiConfig()
+        self.host = host
+        self.port = port
+        self.base_url: Optional[str] = None
+        self._loop = asyncio.new_event_loop()
+        self._runner: Optional[web.AppRunner] = None
+        self._thread = threading.Thread(target=self._loop.run_forever, name="fake-heidi", daemon=True)
+
+    def start(self) -> str:
+        self._thread.start()
+        asyncio.run_coroutine_threadsafe(self._start(), self._loop).result(timeout=10)
+        return self.base_url
+
+    async def _start(self) -> None:
+        self._runner = web.AppRunner(build_app(self.config), access_log=None)
+        await self._runner.setup()
+        site = web.TCPSite(self._runner, self.host, self.port)
+        await site.start()
+        port = site._server.sockets[0].getsockname()[1]
+        self.base_url = f"http://{self.host}:{port}"
+
+    def stop(self) -> None:
+        if self._runner is not None:
+            asyncio.run_coroutine_threadsafe(self._runner.cleanup(), self._loop).result(timeout=10)
+        self._loop.call_soon_threadsafe(self._loop.stop)
+        self._thread.join(timeout=10)
+
+    def __enter__(self) -> "FakeHeidiServer":
+        self.start()
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self.stop()
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Serve a local Heidi API stand-in.")
+    parser.add_argument("--port", type=int, default=5010)
+    parser.add_argument("--chunks", type=int, default=FakeHeidiConfig.sse_chunks)
+    parser.add_argument("--chunk-delay", type=float, default=FakeHeidiConfig.chunk_delay)
+    args = parser.parse_args()
+    web.run_app(
+        build_app(FakeHeidiConfig(sse_chunks=args.chunks, chunk_delay=args.chunk_delay)),
+        host="127.0.0.1",
+        port=args.port,
+    )
@@ -0,0 +1,289 @@
+# benchmarks/run.py - Load scenarios against the Flask app backed by the fake Heidi API
+"""
+Usage::
+
+    python -m benchmarks.run                       # every scenario, default load
+    python -m benchmarks.run -s ask-question -n 200 -c 16 --chunks 50
+    python -m benchmarks.run -o after.json --compare before.json
+
+Each scenario sends ``--requests`` requests from ``--concurrency`` client
+threads after ``--warmup`` untimed ones. The fake upstream, payloads and
+cache settings are fixed by the arguments, so two result files taken with
+the same arguments on the same machine are comparable.
+"""
+import argparse
+import io
+import json
+import logging
+import math
+import os
+import platform
+import resource
+import subprocess
+import sys
+import threading
+import time
+import tracemalloc
+import wave
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import asdict
+from typing import Callable, Dict, List, Optional
+
+import requests
+
+from benchmarks.fake_heidi import FakeHeidiConfig, FakeHeidiServer
+
+DOCUMENT_TEXT = (
+    "Discharge summary: 68 year old admitted with community acquired pneumonia. "
+    "Treated with IV antibiotics, switched to oral amoxicillin on day 3. "
+    "Follow up with GP in one week; return if fever or breathlessness worsens. "
+) * 20
+
+
+def _wav_bytes(seconds: float = 2.0, rate: int = 16000) -> bytes:
+    buffer = io.BytesIO()
+    with wave.open(buffer, "wb") as audio:
+        audio.setnchannels(1)
+        audio.setsampwidth(2)
+        audio.setframerate(rate)
+        audio.writeframes(b"\x00\x00" * int(seconds * rate))
+    return buffer.getvalue()
+
+
+def _pdf_bytes(pages: int = 10) -> bytes:
+    import fitz
+
+    doc = fitz.open()
+    for number in range(pages):
+        page = doc.new_page()
+        page.insert_text((72, 72), f"Page {number + 1}\n" + DOCUMENT_TEXT[:1500], fontsize=9)
+    data = doc.tobytes()
+    doc.close()
+    return data
+
+
+def build_scenarios(args) -> Dict[str, Callable[[requests.Session, str], requests.Response]]:
+    """Scenario name -> function sending one request to the app at ``base``."""
+    audio = _wav_bytes()
+    pdf = _pdf_bytes(args.pdf_pages)
+    stream_flag = {"stream": True} if args.stream else {}
+
+    def ask_question(http, base):
+        response = http.post(
+            f"{base}/ask-question",
+            json=dict(question="How should I take amoxicillin with food?", **stream_flag),
+            stream=args.stream,
+        )
+        response.content  # read streamed bodies to the end
+        return response
+
+    def process_document(http, base):
+        response = http.post(
+            f"{base}/process-document",
+            json=dict(document_text=DOCUMENT_TEXT, **stream_flag),
+            stream=args.stream,
+        )
+        response.content
+        return response
+
+    def transcribe_audio(http, base):
+        return http.post(
+            f"{base}/transcribe-audio", files={"audio_file": ("visit.wav", audio, "audio/wav")}
+        )
+
+    def upload_document(http, base):
+        return http.post(
+            f"{base}/upload-document", files={"file": ("discharge.pdf", pdf, "application/pdf")}
+        )
+
+    return {
+        "ask-question": ask_question,
+        "process-document": process_document,
+        "transcribe-audio": transcribe_audio,
+        "upload-document": upload_document,
+    }
+
+
+def percentile(sorted_values: List[float], fraction: float) -> float:
+    """Nearest-rank percentile of an already sorted list."""
+    if not sorted_values:
+        return 0.0
+    rank = min(max(1, math.ceil(fraction * len(sorted_values))), len(sorted_values))
+    return sorted_values[rank - 1]
+
+
+def _rss_mb() -> float:
+    try:
+        with open("/proc/self/statm") as statm:
+            return int(statm.read().split()[1]) * os.sysconf("SC_PAGE_SIZE") / 2 ** 20
+    except (OSError, ValueError):
+        return 0.0
+
+
+def _peak_rss_mb() -> float:
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # kilobytes on Linux, bytes on macOS
+    return peak / 2 ** 20 if sys.platform == "darwin" else peak / 1024
+
+
+def run_scenario(name, send, base, requests_count, concurrency, warmup, trace_memory=False) -> dict:
+    local = threading.local()
+
+    def http() -> requests.Session:
+        if not hasattr(local, "session"):
+            local.session = requests.Session()
+        return local.session
+
+    def timed(_):
+        started = time.perf_counter()
+        try:
+            response = send(http(), base)
+            ok = response.status_code < 400
+        except requests.RequestException:
+            ok = False
+        return time.perf_counter() - started, ok
+
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        list(pool.map(timed, range(warmup)))
+
+        rss_before = _rss_mb()
+        if trace_memory:
+            tracemalloc.start()
+        started = time.perf_counter()
+        results = list(pool.map(timed, range(requests_count)))
+        wall = time.perf_counter() - started
+        heap_peak = tracemalloc.get_traced_memory()[1] / 2 ** 20 if trace_memory else None
+        if trace_memory:
+            tracemalloc.stop()
+
+    latencies = sorted(seconds for seconds, ok in results if ok)
+    summary = {
+        "scenario": name,
+        "requests": requests_count,
+        "concurrency": concurrency,
+        "errors": sum(1 for _, ok in results if not ok),
+        "p50_ms": round(percentile(latencies, 0.50) * 1000, 2),
+        "p95_ms": round(percentile(latencies, 0.95) * 1000, 2),
+        "p99_ms": round(percentile(latencies, 0.99) * 1000, 2),
+        "max_ms": round(latencies[-1] * 1000, 2) if latencies else 0.0,
+        "throughput_rps": round(len(latencies) / wall, 2) if wall else 0.0,
+        "rss_mb": round(_rss_mb(), 1),
+        "rss_growth_mb": round(_rss_mb() - rss_before, 1),
+        "peak_rss_mb": round(_peak_rss_mb(), 1),
+    }
+    if heap_peak is not None:
+        summary["python_heap_peak_mb"] = round(heap_peak, 1)
+    return summary
+
+
+def _configure_environment(base_url: str, args) -> None:
+    os.environ["HEIDI_BASE_URL"] = base_url
+    os.environ.setdefault("HEIDI_API_KEY", "benchmark-key")
+    os.environ.setdefault("HEIDI_EMAIL", "benchmark@example.com")
+    os.environ.setdefault("HEIDI_USER_ID", "benchmark-user")
+    os.environ.setdefault("HEIDI_LOG_LEVEL", "WARNING")
+    # Every benchmark request comes from one client; per-clinic limits would throttle the load.
+    os.environ.setdefault("HEIDI_RATE_LIMIT", "off")
+    if not args.keep_caches:
+        # Measure the uncached path; identical payloads would otherwise be cache hits.
+        for name in ("HEIDI_PDF_CACHE", "HEIDI_AI_CACHE"):
+            os.environ[name] = "off"
+
+
+def _start_app():
+    from werkzeug.serving import make_server
+
+    from app import create_app
+
+    logging.getLogger("werkzeug").setLevel(logging.WARNING)  # no per-request access log
+    server = make_server("127.0.0.1", 0, create_app(), threaded=True)
+    threading.Thread(target=server.serve_forever, name="bench-app", daemon=True).start()
+    return server, f"http://127.0.0.1:{server.server_port}"
+
+
+def _git_revision() -> Optional[str]:
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def print_results(results: List[dict], baseline: Optional[Dict[str, dict]] = None) -> None:
+    columns = ("p50_ms", "p95_ms", "p99_ms", "throughput_rps", "errors", "rss_mb")
+    print(f"{'scenario':<18}" + "".join(f"{column:>16}" for column in columns))
+    for result in results:
+        row = f"{result['scenario']:<18}"
+        before = (baseline or {}).get(result["scenario"])
+        for column in columns:
+            cell = f"{result[column]}"
+            if before and before.get(column):
+                change = (result[column] - before[column]) / before[column] * 100
+                cell += f" ({change:+.0f}%)"
+            row += f"{cell:>16}"
+        print(row)
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("-s", "--scenario", action="append", help="scenario to run (repeatable; default all)")
+    parser.add_argument("-n", "--requests", type=int, default=50)
+    parser.add_argument("-c", "--concurrency", type=int, default=8)
+    parser.add_argument("--warmup", type=int, default=5)
+    parser.add_argument("--chunks", type=int, default=FakeHeidiConfig.sse_chunks, help="SSE chunks per AI answer")
+    parser.add_argument("--chunk-delay", type=float, default=FakeHeidiConfig.chunk_delay)
+    parser.add_argument("--latency", type=float, default=FakeHeidiConfig.latency, help="upstream latency per call")
+    parser.add_argument("--pdf-pages", type=int, default=10)
+    parser.add_argument("--stream", action="store_true", help="use ?stream=1 for ask-question/process-document")
+    parser.add_argument("--keep-caches", action="store_true", help="leave PDF/AI response caches as configured")
+    parser.add_argument("--trace-memory", action="store_true", help="also report Python heap peak (slower)")
+    parser.add_argument("-o", "--output", help="write results as JSON")
+    parser.add_argument("--compare", help="earlier JSON results to show changes against")
+    args = parser.parse_args(argv)
+
+    config = FakeHeidiConfig(latency=args.latency, sse_chunks=args.chunks, chunk_delay=args.chunk_delay)
+    with FakeHeidiServer(config) as upstream:
+        _configure_environment(upstream.base_url, args)
+        server, base = _start_app()
+        try:
+            scenarios = build_scenarios(args)
+            names = args.scenario or list(scenarios)
+            unknown = [name for name in names if name not in scenarios]
+            if unknown:
+                parser.error(f"unknown scenario(s) {unknown}; choose from {list(scenarios)}")
+            results = [
+                run_scenario(
+                    name, scenarios[name], base, args.requests, args.concurrency,
+                    args.warmup, args.trace_memory,
+                )
+                for name in names
+            ]
+        finally:
+            server.shutdown()
+
+    baseline = None
+    if args.compare:
+        with open(args.compare) as handle:
+            baseline = {result["scenario"]: result for result in json.load(handle)["results"]}
+    print_results(results, baseline)
+
+    if args.output:
+        report = {
+            "meta": {
+                "revision": _git_revision(),
+                "python": platform.python_version(),
+                "platform": platform.platform(),
+                "cpus": os.cpu_count(),
+                "timestamp": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime()),
+            },
+            "config": dict(vars(args), upstream=asdict(config)),
+            "results": results,
+        }
+        with open(args.output, "w") as handle:
+            json.dump(report, handle, indent=2)
+    return 0 if all(result["errors"] == 0 for result in results) else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,6 +1,8 @@
 from app import create_app
 
+# Module level so WSGI servers can load it: `gunicorn run:app`, `flask --app run run`.
 app = create_app()
 
 if __name__ == '__main__':
+    # Only the dev server goes under the guard: spawned PDF workers re-import this module.
     app.run(debug=True)
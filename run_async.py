@@ -0,0 +1,8 @@
+import os
+
+from aiohttp import web
+
+from app.aio_app import create_async_app
+
+if __name__ == '__main__':
+    web.run_app(create_async_app(), port=int(os.getenv("ASYNC_PORT", "5001")))
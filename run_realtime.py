@@ -0,0 +1,22 @@
+import asyncio
+import os
+
+from dotenv import load_dotenv
+
+from app.api.aio.client import close_session
+from app.log import configure_logging
+from app.realtime_server import serve_realtime
+
+
+async def main():
+    load_dotenv()
+    configure_logging()
+    try:
+        async with serve_realtime(port=int(os.getenv("REALTIME_PORT", "5002"))) as server:
+            await server.serve_forever()
+    finally:
+        await close_session()
+
+
+if __name__ == '__main__':
+    asyncio.run(main())
@@ -25,7 +25,83 @@ def heidi_env(monkeypatch):
             "https://registrar.api.heidihealth.com/api/v2/ml-scribe/open-api",
         ),
     )
+    # No background session pre-warming against the mocked API.
+    monkeypatch.setenv("HEIDI_SESSION_POOL_SIZE", "0")
+    from app.services.session_pool import reset_session_pool
+
+    reset_session_pool()
+    yield
+    reset_session_pool()
+
+
+@pytest.fixture(autouse=True)
+def reset_token_cache():
+    """Start every test without a cached JWT."""
+    from app.services.token_manager import reset_token_manager
+
+    reset_token_manager()
+    yield
+    reset_token_manager()
+
+
+@pytest.fixture(autouse=True)
+def reset_content_type_memory():
+    """Forget which Ask AI content types succeeded in earlier tests."""
+    from app.api.ask_heidi import content_type_memory
+
+    content_type_memory.clear()
+    yield
+
+
+@pytest.fixture(autouse=True)
+def no_response_cache():
+    """Keep the Ask AI response cache off unless a test installs one."""
+    from app.api.ask_heidi import configure_response_cache
+
+    configure_response_cache(None)
+    yield
+    configure_response_cache()
+
+
+@pytest.fixture(autouse=True)
+def no_pdf_text_cache():
+    """Keep the extracted PDF text cache off unless a test installs one."""
+    from app.services.pdf_text import configure_text_cache
+
+    configure_text_cache(None)
+    yield
+    configure_text_cache()
+
+
+@pytest.fixture(autouse=True)
+def memory_template_catalogue():
+    """Give each test its own in-memory template catalogue instead of the shared file."""
+    from app.cache import MemoryCache
+    from app.services.template_catalogue import TemplateCatalogue, configure_template_catalogue
+
+    configure_template_catalogue(TemplateCatalogue(MemoryCache()))
+    yield
+    configure_template_catalogue()
+
+
+@pytest.fixture(autouse=True)
+def fresh_resilience():
+    """Give each test its own circuit breakers, concurrency limit and retry budget."""
+    from app.api.resilience import configure_resilience
+
+    configure_resilience()
+    yield
+    configure_resilience()
+
+
+@pytest.fixture(autouse=True)
+def no_rate_limit():
+    """Keep per-clinic rate limiting off unless a test installs a limiter."""
+    from app.rate_limit import configure_rate_limiter
+
+    configure_rate_limiter(None)
     yield
+    configure_rate_limiter()
 
 
 @pytest.fixture
@@ -0,0 +1,124 @@
+import asyncio
+import json
+
+from aiohttp import web
+from aiohttp.test_utils import TestServer
+
+from app.api.aio import ask_heidi as aio_ask_heidi
+from app.api.aio import client as aio_client
+from app.api.aio import consult as aio_consult
+from app.api.aio import session as aio_session
+from app.services import aio_flows
+
+
+async def _ask_ai(request):
+    body = await request.json()
+    if request.match_info["session_id"] == "missing":
+        return web.json_response({"message": "not found"}, status=404)
+    response = web.StreamResponse(headers={"Content-Type": "text/event-stream"})
+    await response.prepare(request)
+    for word in ("Rest ", "and ", body["content_type"]):
+        await response.write(f"data: {json.dumps({'data': word})}\n\n".encode())
+    await response.write_eof()
+    return response
+
+
+async def _consult_note(request):
+    response = web.StreamResponse(headers={"Content-Type": "text/plain"})
+    await response.prepare(request)
+    for part in ("## Plan\n", "Walk daily\n", "\nRest"):
+        await response.write(part.encode())
+    await response.write_eof()
+    return response
+
+
+async def _create_session(request):
+    return web.json_response({"session_id": "session-async"}, status=201)
+
+
+def _run_against_fake_heidi(monkeypatch, scenario):
+    async def runner():
+        app = web.Application()
+        app.router.add_post("/sessions", _create_session)
+        app.router.add_post("/sessions/{session_id}/ask-ai", _ask_ai)
+        app.router.add_post("/sessions/{session_id}/consult-note", _consult_note)
+        server = TestServer(app)
+        await server.start_server()
+        base_url = str(server.make_url("")).rstrip("/")
+        for module in ("app.api.ask_heidi", "app.api.consult", "app.api.session"):
+            monkeypatch.setattr(f"{module}.BASE_URL", base_url)
+        try:
+            return await scenario()
+        finally:
+            await aio_client.close_session()
+            await server.close()
+
+    return asyncio.run(runner())
+
+
+def test_async_ask_ai_stream_parses_sse(monkeypatch):
+    result = _run_against_fake_heidi(
+        monkeypatch,
+        lambda: aio_ask_heidi.ask_ai_stream("jwt", "session-1", "Advise", "Notes"),
+    )
+
+    assert result == {"success": True, "response": "Rest and MARKDOWN", "format": "sse"}
+
+
+def test_async_ask_ai_stream_maps_404(monkeypatch):
+    result = _run_against_fake_heidi(
+        monkeypatch,
+        lambda: aio_ask_heidi.ask_ai_stream("jwt", "missing", "Advise", "Notes"),
+    )
+
+    assert result["error"] is True
+    assert result["status_code"] == 404
+
+
+def test_async_open_ai_stream_yields_chunks(monkeypatch):
+    async def scenario():
+        chunks, error = await aio_ask_heidi.open_ai_stream("jwt", "s-1", "Advise", "Notes", "TEXT")
+        assert error is None
+        return [chunk async for chunk in chunks]
+
+    assert _run_against_fake_heidi(monkeypatch, scenario) == ["Rest ", "and ", "TEXT"]
+
+
+def test_async_ask_question_flow_creates_session(monkeypatch):
+    monkeypatch.setattr(
+        "app.services.common.fetch_jwt_token", lambda: ("jwt-token", None)
+    )
+
+    payload, status = _run_against_fake_heidi(
+        monkeypatch, lambda: aio_flows.ask_question_flow("Is swelling normal?", None)
+    )
+
+    assert status == 200
+    assert payload["session_id"] == "session-async"
+    assert payload["response"] == "Rest and MARKDOWN"
+
+
+def test_async_create_session_reports_errors(monkeypatch):
+    async def scenario():
+        return await aio_session.create_session("jwt")
+
+    monkeypatch.setattr("app.api.session.BASE_URL", "http://127.0.0.1:9")
+    result = asyncio.run(_closing(scenario))
+
+    assert result["error"] is True
+
+
+async def _closing(scenario):
+    try:
+        return await scenario()
+    finally:
+        await aio_client.close_session()
+
+
+def test_async_generate_consult_note_keeps_newlines(monkeypatch):
+    result = _run_against_fake_heidi(
+        monkeypatch,
+        lambda: aio_consult.generate_consult_note("jwt", "session-1", "tpl-1"),
+    )
+
+    assert result == {"success": True, "note": "## Plan\nWalk daily\n\nRest"}
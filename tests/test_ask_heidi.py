@@ -1,6 +1,13 @@
 import json
 
-from app.api.ask_heidi import ask_ai_stream, parse_sse_response
+import threading
+
+from app.api.ask_heidi import (
+    ask_ai_stream,
+    ask_ai_with_fallbacks,
+    open_ai_stream,
+    parse_sse_response,
+)
 
 
 def test_parse_sse_response_combines_chunks():
@@ -24,7 +31,7 @@ def test_ask_ai_stream_sse_format(monkeypatch):
     )
 
     monkeypatch.setattr(
-        "app.api.ask_heidi.requests.post",
+        "app.api.ask_heidi.client.post",
         lambda *args, **kwargs: response,
     )
 
@@ -48,7 +55,7 @@ def test_ask_ai_stream_json_format(monkeypatch):
     )
 
     monkeypatch.setattr(
-        "app.api.ask_heidi.requests.post",
+        "app.api.ask_heidi.client.post",
         lambda *args, **kwargs: response,
     )
 
@@ -72,7 +79,7 @@ def test_ask_ai_stream_handles_errors(monkeypatch):
     )
 
     monkeypatch.setattr(
-        "app.api.ask_heidi.requests.post",
+        "app.api.ask_heidi.client.post",
         lambda *args, **kwargs: response,
     )
 
@@ -87,6 +94,156 @@ def test_ask_ai_stream_handles_errors(monkeypatch):
     assert result["status_code"] == 401
 
 
+def test_open_ai_stream_yields_chunks_incrementally(monkeypatch):
+    lines = ['data: {"data": "Care "}', "", 'data: {"data": "plan"}', ""]
+    response = _DummyResponse(
+        status_code=200,
+        headers={"Content-Type": "text/event-stream"},
+        lines=lines,
+    )
+
+    monkeypatch.setattr(
+        "app.api.ask_heidi.client.post",
+        lambda *args, **kwargs: response,
+    )
+
+    chunks, error = open_ai_stream("jwt-token", "session-123", "Generate", "Document")
+
+    assert error is None
+    assert next(chunks) == "Care "
+    assert response.closed is False
+    assert list(chunks) == ["plan"]
+    assert response.closed is True
+
+
+def test_open_ai_stream_reports_status_errors(monkeypatch):
+    response = _DummyResponse(status_code=404, headers={"Content-Type": "application/json"})
+
+    monkeypatch.setattr(
+        "app.api.ask_heidi.client.post",
+        lambda *args, **kwargs: response,
+    )
+
+    chunks, error = open_ai_stream("jwt-token", "session-123", "Generate", "Document")
+
+    assert chunks is None
+    assert error["status_code"] == 404
+    assert response.closed is True
+
+
+def _fake_ask_ai(monkeypatch, outcomes):
+    """Patch ask_ai_stream with per-content-type results and record the call order."""
+    calls = []
+
+    def fake(jwt_token, session_id, ai_command_text, content, content_type="MARKDOWN", **kwargs):
+        calls.append(content_type)
+        return outcomes[content_type]
+
+    monkeypatch.setattr("app.api.ask_heidi.ask_ai_stream", fake)
+    return calls
+
+
+_OK = {"success": True, "response": "answer", "format": "sse"}
+_BAD_REQUEST = {"error": True, "status_code": 400, "message": "bad content type"}
+
+
+def test_fallbacks_remember_last_working_content_type(monkeypatch):
+    calls = _fake_ask_ai(
+        monkeypatch, {"MARKDOWN": _BAD_REQUEST, "TEXT": _OK, "PLAIN_TEXT": _OK}
+    )
+
+    first = ask_ai_with_fallbacks("jwt", "s-1", "Summarise", "short note")
+    second = ask_ai_with_fallbacks("jwt", "s-1", "Summarise", "another short note")
+
+    assert first["content_type"] == "TEXT"
+    assert [a["content_type"] for a in first["attempts"]] == ["MARKDOWN", "TEXT"]
+    assert all("elapsed_ms" in attempt for attempt in first["attempts"])
+    assert second["content_type"] == "TEXT"
+    assert calls == ["MARKDOWN", "TEXT", "TEXT"]
+
+
+def test_fallbacks_stop_on_non_retryable_errors(monkeypatch):
+    unauthorized = {"error": True, "status_code": 401, "message": "expired"}
+    calls = _fake_ask_ai(
+        monkeypatch, {"MARKDOWN": unauthorized, "TEXT": _OK, "PLAIN_TEXT": _OK}
+    )
+
+    result = ask_ai_with_fallbacks("jwt", "s-1", "Summarise", "note")
+
+    assert calls == ["MARKDOWN"]
+    assert result["status_code"] == 401
+    assert len(result["attempts"]) == 1
+
+
+def test_fallbacks_race_returns_first_success_and_cancels_losers(monkeypatch):
+    released = threading.Event()
+    cancel_events = []
+
+    def fake(jwt_token, session_id, ai_command_text, content, content_type="MARKDOWN", cancel_event=None):
+        cancel_events.append(cancel_event)
+        if content_type == "PLAIN_TEXT":
+            return _OK
+        released.wait(1)
+        return {"error": True, "cancelled": True}
+
+    monkeypatch.setattr("app.api.ask_heidi.ask_ai_stream", fake)
+
+    result = ask_ai_with_fallbacks("jwt", "s-1", "Summarise", "note", race=True)
+    released.set()
+
+    assert result["content_type"] == "PLAIN_TEXT"
+    assert result["attempts"][0]["content_type"] == "PLAIN_TEXT"
+    assert cancel_events and all(event.is_set() for event in cancel_events)
+
+
+def test_race_winner_shuts_down_losers_blocked_between_chunks(monkeypatch):
+    import requests
+
+    class _StalledRaw:
+        def __init__(self):
+            self.shut = threading.Event()
+
+        def shutdown(self):
+            self.shut.set()
+
+    class _StalledResponse(_DummyResponse):
+        """Sends one chunk, then stalls until its socket is shut down."""
+
+        def __init__(self):
+            super().__init__(headers={"Content-Type": "text/event-stream"})
+            self.raw = _StalledRaw()
+
+        def iter_lines(self, decode_unicode=False):
+            yield 'data: {"data": "partial"}'
+            if not self.raw.shut.wait(30):
+                yield 'data: {"data": "too late"}'
+            raise requests.exceptions.ChunkedEncodingError("Response ended prematurely")
+
+    stalled = _StalledResponse()
+    answered = threading.Event()
+
+    def fake_post(jwt_token, session_id, ai_command_text, content, content_type):
+        if content_type == "MARKDOWN":
+            return stalled
+        answered.wait(5)  # answer once the loser is blocked mid-stream
+        return _DummyResponse(headers={"Content-Type": "text/event-stream"}, lines=['data: {"data": "Rest"}'])
+
+    def fake_iter(response):
+        for line in response.iter_lines(decode_unicode=True):
+            if response is stalled:
+                answered.set()
+            yield json.loads(line[5:])["data"]
+
+    monkeypatch.setattr("app.api.ask_heidi._post_ask_ai", fake_post)
+    monkeypatch.setattr("app.api.ask_heidi.iter_sse_chunks", fake_iter)
+    monkeypatch.setattr("app.api.ask_heidi.COALESCE_REQUESTS", False)
+
+    result = ask_ai_with_fallbacks("jwt", "s-1", "Summarise", "note", race=True)
+
+    assert result["content_type"] in ("TEXT", "PLAIN_TEXT")
+    assert stalled.raw.shut.wait(1)
+
+
 class _DummyResponse:
     def __init__(self, status_code=200, headers=None, lines=None, json_payload=None, text_body=None):
         self.status_code = status_code
@@ -94,6 +251,10 @@ class _DummyResponse:
         self._lines = lines or []
         self._json_payload = json_payload
         self._text_body = text_body
+        self.closed = False
+
+    def close(self):
+        self.closed = True
 
     def __enter__(self):
         return self
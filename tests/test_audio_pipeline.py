@@ -0,0 +1,100 @@
+import io
+import threading
+
+from pydub import AudioSegment
+
+from app.services.audio_pipeline import split_audio, upload_audio_segments
+
+
+def _silent_wav(milliseconds):
+    buffer = io.BytesIO()
+    AudioSegment.silent(duration=milliseconds).export(buffer, format="wav")
+    return buffer.getvalue()
+
+
+def test_split_audio_cuts_into_segments():
+    segments = split_audio(_silent_wav(2500), "consult.wav", segment_seconds=1)
+
+    assert len(segments) == 3
+    durations = [len(AudioSegment.from_file(io.BytesIO(s), format="wav")) for s in segments]
+    assert durations == [1000, 1000, 500]
+
+
+def test_split_audio_keeps_short_or_undecodable_audio_whole():
+    short = _silent_wav(500)
+    assert split_audio(short, "short.wav", segment_seconds=1) == [short]
+    assert split_audio(b"not audio", "broken.wav", segment_seconds=1) == [b"not audio"]
+
+
+def test_upload_audio_segments_uploads_every_index_concurrently(monkeypatch):
+    uploaded = []
+    lock = threading.Lock()
+
+    def fake_upload(jwt_token, session_id, recording_id, fileobj, index, filename):
+        with lock:
+            uploaded.append((index, filename, len(fileobj.read())))
+        return {"is_success": True}
+
+    monkeypatch.setattr("app.services.audio_pipeline.upload_audio_fileobj", fake_upload)
+
+    payload, status = upload_audio_segments(
+        "jwt", "s-1", "rec-1", _silent_wav(2500), "consult.wav",
+        segment_seconds=1, max_workers=3,
+    )
+
+    assert status == 200
+    assert payload["details"]["acknowledged"] == [0, 1, 2]
+    assert sorted(index for index, _, _ in uploaded) == ["0", "1", "2"]
+    assert all(filename == "segment.wav" for _, filename, _ in uploaded)
+
+
+def test_upload_audio_segments_retries_then_reports_failures(monkeypatch):
+    attempts = {}
+
+    def flaky_upload(jwt_token, session_id, recording_id, fileobj, index, filename):
+        attempts[index] = attempts.get(index, 0) + 1
+        if index == "1":
+            return {"is_success": False}
+        if attempts[index] == 1:
+            raise ConnectionError("reset")
+        return {"is_success": True}
+
+    monkeypatch.setattr("app.services.audio_pipeline.upload_audio_fileobj", flaky_upload)
+    monkeypatch.setattr("app.services.audio_pipeline.time.sleep", lambda seconds: None)
+
+    payload, status = upload_audio_segments(
+        "jwt", "s-1", "rec-1", _silent_wav(2000), "consult.wav",
+        segment_seconds=1, retries=2,
+    )
+
+    assert status == 500
+    assert attempts == {"0": 2, "1": 3}
+    assert payload["details"]["acknowledged"] == [0]
+    assert payload["details"]["failed"][0]["index"] == 1
+
+
+def test_upload_audio_segments_stops_on_refusals_and_an_exhausted_budget(monkeypatch):
+    attempts = []
+    sleeps = []
+    answers = {
+        "0": {"error": True, "status_code": 503, "message": "Heidi API unavailable"},
+        "1": {"error": True, "status_code": 502, "message": "bad gateway"},
+    }
+
+    def failing_upload(jwt_token, session_id, recording_id, fileobj, index, filename):
+        attempts.append(index)
+        return answers[index]
+
+    monkeypatch.setattr("app.services.audio_pipeline.upload_audio_fileobj", failing_upload)
+    monkeypatch.setattr("app.services.audio_pipeline.retry_allowed", lambda: False)
+    monkeypatch.setattr("app.services.audio_pipeline.time.sleep", sleeps.append)
+
+    payload, status = upload_audio_segments(
+        "jwt", "s-1", "rec-1", _silent_wav(2000), "consult.wav",
+        segment_seconds=1, retries=2,
+    )
+
+    assert status == 503
+    assert sorted(attempts) == ["0", "1"]
+    assert sleeps == []
+    assert [failure["attempts"] for failure in payload["details"]["failed"]] == [1, 1]
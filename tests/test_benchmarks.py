@@ -0,0 +1,24 @@
+from benchmarks.fake_heidi import FakeHeidiConfig, FakeHeidiServer
+from benchmarks.run import percentile
+
+from app.api.ask_heidi import open_ai_stream
+
+
+def test_percentile_is_nearest_rank():
+    values = [float(n) for n in range(1, 101)]
+
+    assert percentile(values, 0.50) == 50
+    assert percentile(values, 0.95) == 95
+    assert percentile(values, 0.99) == 99
+    assert percentile([7.0], 0.99) == 7
+    assert percentile([], 0.5) == 0.0
+
+
+def test_fake_heidi_streams_configured_chunks(monkeypatch):
+    config = FakeHeidiConfig(sse_chunks=3, chunk_delay=0, first_chunk_delay=0, latency=0)
+    with FakeHeidiServer(config) as upstream:
+        monkeypatch.setattr("app.api.ask_heidi.BASE_URL", upstream.base_url)
+        chunks, error = open_ai_stream("jwt", "bench-session-1", "Advise", "Notes")
+
+        assert error is None
+        assert list(chunks) == ["advice 0 ", "advice 1 ", "advice 2 "]
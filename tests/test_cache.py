@@ -0,0 +1,73 @@
+import time
+
+from app.api.ask_heidi import ask_ai_with_fallbacks, configure_response_cache
+from app.cache import MemoryCache, SQLiteCache, cache_from_env, hash_key
+
+
+def test_hash_key_separates_parts():
+    assert hash_key("ab", "c") != hash_key("a", "bc")
+
+
+def test_memory_cache_evicts_least_recently_used():
+    cache = MemoryCache(max_entries=2)
+    cache.set("a", 1)
+    cache.set("b", 2)
+    cache.get("a")
+    cache.set("c", 3)
+
+    assert cache.get("b") is None
+    assert cache.get("a") == 1
+    assert cache.stats()["evictions"] == 1
+
+
+def test_memory_cache_expires_entries():
+    cache = MemoryCache(ttl=0.01)
+    cache.set("a", {"v": 1})
+    time.sleep(0.02)
+
+    assert cache.get("a") is None
+    assert cache.stats()["misses"] == 1
+
+
+def test_sqlite_cache_survives_reopen_and_bounds_size(tmp_path):
+    path = str(tmp_path / "cache.sqlite3")
+    cache = SQLiteCache(path=path, namespace="ask-ai", max_entries=2)
+    cache.set("a", {"response": "first"})
+    cache.set("b", {"response": "second"})
+    cache.set("c", {"response": "third"})
+
+    reopened = SQLiteCache(path=path, namespace="ask-ai", max_entries=2)
+    assert reopened.get("a") is None
+    assert reopened.get("c") == {"response": "third"}
+    assert len(reopened) == 2
+    assert len(SQLiteCache(path=path, namespace="other")) == 0
+
+
+def test_cache_from_env_is_opt_in(monkeypatch, tmp_path):
+    monkeypatch.delenv("HEIDI_AI_CACHE", raising=False)
+    assert cache_from_env("HEIDI_AI_CACHE", "ask-ai") is None
+
+    monkeypatch.setenv("HEIDI_AI_CACHE", "disk")
+    monkeypatch.setenv("HEIDI_AI_CACHE_PATH", str(tmp_path / "c.sqlite3"))
+    assert isinstance(cache_from_env("HEIDI_AI_CACHE", "ask-ai"), SQLiteCache)
+
+
+def test_ask_ai_with_fallbacks_serves_repeat_prompts_from_cache(monkeypatch):
+    calls = []
+
+    def fake(jwt_token, session_id, ai_command_text, content, content_type="MARKDOWN", **kwargs):
+        calls.append(content_type)
+        return {"success": True, "response": "care plan", "format": "sse"}
+
+    monkeypatch.setattr("app.api.ask_heidi.ask_ai_stream", fake)
+    configure_response_cache(MemoryCache())
+
+    first = ask_ai_with_fallbacks("jwt", "s-1", "Care plan", "discharge", use_cache=True)
+    second = ask_ai_with_fallbacks("jwt", "s-2", "Care plan", "discharge", use_cache=True)
+    uncached = ask_ai_with_fallbacks("jwt", "s-3", "Care plan", "discharge")
+
+    assert "cached" not in first
+    assert second["cached"] is True
+    assert second["response"] == "care plan"
+    assert "cached" not in uncached
+    assert len(calls) == 2
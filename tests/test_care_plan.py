@@ -0,0 +1,106 @@
+import asyncio
+import threading
+
+import pytest
+
+from app.services import aio_flows, demo_flows
+from app.services.care_plan import CARE_PLAN_PROMPT, REDUCE_PROMPT, split_document
+
+SECTION = "DISCHARGE MEDICATIONS\n" + "Amoxicillin 500mg three times daily with food. " * 10 + "\n\n"
+
+
+def test_short_documents_are_not_split():
+    assert split_document("Rest for a week.", max_chars=100) == ["Rest for a week."]
+    assert split_document("x" * 500, max_chars=0) == ["x" * 500]
+
+
+def test_split_keeps_headings_with_their_section():
+    text = SECTION * 4
+    parts = split_document(text, max_chars=len(SECTION) + 10, max_chunks=0)
+
+    assert len(parts) == 4
+    assert all(part.startswith("DISCHARGE MEDICATIONS\n") for part in parts)
+    assert "".join(parts) == text
+
+
+def test_split_falls_back_to_sentences_and_caps_part_count():
+    text = "Walk daily. " * 1000
+
+    parts = split_document(text, max_chars=100, max_chunks=10)
+
+    assert len(parts) <= 12
+    assert all(part.endswith(". ") or part.endswith(".") for part in parts[:-1])
+    assert "".join(parts) == text
+
+
+@pytest.fixture
+def long_document(monkeypatch):
+    monkeypatch.setattr("app.services.care_plan.CARE_PLAN_CHUNK_CHARS", len(SECTION) + 10)
+    monkeypatch.setattr("app.services.care_plan.CARE_PLAN_MAX_CHUNKS", 0)
+    monkeypatch.setattr(demo_flows, "fetch_jwt_token", lambda: ("jwt", None))
+    monkeypatch.setattr(demo_flows, "ensure_session", lambda jwt, sid: ("s-1", None))
+    return SECTION * 3
+
+
+def test_long_documents_are_extracted_concurrently_then_merged(monkeypatch, long_document):
+    all_parts_in_flight = threading.Barrier(3, timeout=5)
+    calls = []
+
+    def ask_ai(jwt_token, session_id, ai_command_text, content, **kwargs):
+        calls.append((ai_command_text, content))
+        if ai_command_text == REDUCE_PROMPT:
+            return {"success": True, "response": "## Medication Schedule\n- Amoxicillin", "format": "sse"}
+        all_parts_in_flight.wait()
+        part = ai_command_text.split("part ")[1].split(" of")[0]
+        return {"success": True, "response": f"notes {part}", "format": "sse"}
+
+    monkeypatch.setattr(demo_flows, "ask_ai_with_fallbacks", ask_ai)
+
+    payload, status = demo_flows.process_document_flow(long_document)
+
+    assert status == 200
+    assert payload["care_plan"] == "## Medication Schedule\n- Amoxicillin"
+    assert payload["document_parts"] == 3
+    reduce_content = calls[-1][1]
+    assert reduce_content.index("### Part 1 of 3\nnotes 1") < reduce_content.index("### Part 3 of 3\nnotes 3")
+    assert CARE_PLAN_PROMPT not in [command for command, _ in calls]
+
+
+def test_a_failed_part_fails_the_care_plan(monkeypatch, long_document):
+    def ask_ai(jwt_token, session_id, ai_command_text, content, **kwargs):
+        if "part 2 of" in ai_command_text:
+            return {"error": True, "status_code": 502, "message": "bad gateway"}
+        return {"success": True, "response": "notes"}
+
+    monkeypatch.setattr(demo_flows, "ask_ai_with_fallbacks", ask_ai)
+    monkeypatch.setattr(demo_flows, "report_session_error", lambda *args: None)
+
+    payload, status = demo_flows.process_document_flow(long_document)
+
+    assert status == 500
+    assert payload["details"]["document_part"] == 2
+    assert payload["details"]["document_parts"] == 3
+
+
+def test_async_flow_merges_parts(monkeypatch, long_document):
+    async def fetch_jwt_token():
+        return "jwt", None
+
+    async def ensure_session(jwt_token, session_id):
+        return "s-1", None
+
+    async def ask_ai(jwt_token, session_id, ai_command_text, content, **kwargs):
+        if ai_command_text == REDUCE_PROMPT:
+            return {"success": True, "response": content}
+        await asyncio.sleep(0)
+        return {"success": True, "response": "notes"}
+
+    monkeypatch.setattr(aio_flows, "fetch_jwt_token", fetch_jwt_token)
+    monkeypatch.setattr(aio_flows, "ensure_session", ensure_session)
+    monkeypatch.setattr(aio_flows.aio_ask_heidi, "ask_ai_with_fallbacks", ask_ai)
+
+    payload, status = asyncio.run(aio_flows.process_document_flow(long_document))
+
+    assert status == 200
+    assert payload["document_parts"] == 3
+    assert payload["care_plan"].count("notes") == 3
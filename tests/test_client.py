@@ -0,0 +1,83 @@
+import requests
+
+from app.api import client
+
+
+def test_requests_share_one_pooled_session():
+    client.reset_session()
+    try:
+        first = client.get_session()
+        assert client.get_session() is first
+        adapter = first.get_adapter("https://registrar.api.heidihealth.com")
+        assert adapter._pool_maxsize == client.POOL_MAXSIZE
+    finally:
+        client.reset_session()
+
+
+def test_default_timeout_applied(monkeypatch):
+    captured = {}
+    response = requests.Response()
+    response.status_code, response._content = 200, b""
+    response.request = requests.Request("GET", "https://example.test").prepare()
+
+    class _Session:
+        def request(self, method, url, **kwargs):
+            captured.update(kwargs, method=method)
+            return response
+
+    monkeypatch.setattr(client, "get_session", lambda: _Session())
+
+    assert client.get("https://example.test") is response
+    assert captured["timeout"] == client.DEFAULT_TIMEOUT
+
+    client.post("https://example.test", timeout=(1, 2))
+    assert captured["method"] == "POST"
+    assert captured["timeout"] == (1, 2)
+
+
+def test_exhausted_pool_does_not_block_other_calls(monkeypatch):
+    import threading
+    from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+    release = threading.Event()
+
+    class _Handler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+
+        def do_GET(self):
+            body = b"data: first\n\n"
+            self.send_response(200)
+            self.send_header("Content-Length", str(len(body) * 2))
+            self.end_headers()
+            self.wfile.write(body)
+            self.wfile.flush()
+            if self.path == "/stream":
+                release.wait(10)
+            self.wfile.write(body)
+
+        def log_message(self, *args):
+            pass
+
+    server = ThreadingHTTPServer(("127.0.0.1", 0), _Handler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    base = f"http://127.0.0.1:{server.server_address[1]}"
+    monkeypatch.setattr(client, "POOL_MAXSIZE", 1)
+    client.reset_session()
+    try:
+        stream = client.get(f"{base}/stream", stream=True)
+        # The only pooled connection is held by the open stream.
+        statuses = []
+        caller = threading.Thread(
+            target=lambda: statuses.append(client.get(f"{base}/quick", timeout=(2, 2)).status_code),
+            daemon=True,
+        )
+        caller.start()
+        caller.join(5)
+        assert statuses == [200]
+        release.set()
+        stream.close()
+    finally:
+        release.set()
+        client.reset_session()
+        server.shutdown()
+        server.server_close()
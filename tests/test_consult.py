@@ -0,0 +1,76 @@
+import responses
+
+from app import create_app
+from app.api import BASE_URL
+from app.api.consult import generate_consult_note, open_consult_note_stream
+from app.services.streaming import iter_sections
+
+NOTE_URL = f"{BASE_URL}/sessions/session-123/consult-note"
+
+
+def test_generate_consult_note_keeps_plain_text_newlines(http_mock):
+    http_mock.add(
+        responses.POST,
+        NOTE_URL,
+        body="## Subjective\nPain 3/10\n\n## Plan\nWalk daily\n",
+        content_type="text/plain",
+    )
+
+    result = generate_consult_note("jwt-token", "session-123", "tpl-1")
+
+    assert result == {
+        "success": True,
+        "note": "## Subjective\nPain 3/10\n\n## Plan\nWalk daily\n",
+    }
+
+
+def test_generate_consult_note_assembles_sse_payloads(http_mock):
+    http_mock.add(
+        responses.POST,
+        NOTE_URL,
+        body='data: {"data": "## Plan\\n"}\n\ndata: {"data": "Walk daily"}\n\n',
+        content_type="text/event-stream",
+    )
+
+    result = generate_consult_note("jwt-token", "session-123", "tpl-1")
+
+    assert result["note"] == "## Plan\nWalk daily"
+
+
+def test_open_consult_note_stream_reports_upstream_errors(http_mock):
+    http_mock.add(responses.POST, NOTE_URL, body="missing", status=404)
+
+    chunks, error = open_consult_note_stream("jwt-token", "session-123", "tpl-1")
+
+    assert chunks is None
+    assert error == {"error": True, "status_code": 404, "message": "missing"}
+
+
+def test_iter_sections_regroups_fragments():
+    fragments = ["## Subj", "ective\nPain\n", "\n## Pl", "an\n\nWalk"]
+
+    assert list(iter_sections(iter(fragments))) == [
+        "## Subjective\nPain\n\n",
+        "## Plan\n\n",
+        "Walk",
+    ]
+
+
+def test_consult_generate_route_streams_sections(monkeypatch):
+    monkeypatch.setattr("app.routes.consult.get_cached_jwt_token", lambda: "jwt-token")
+    monkeypatch.setattr(
+        "app.routes.consult.open_consult_note_stream",
+        lambda *args: (iter(["## Plan\n", "\nWalk daily"]), None),
+    )
+    client = create_app().test_client()
+
+    response = client.post(
+        "/consult/generate?stream=1",
+        json={"session_id": "session-123", "template_id": "tpl-1"},
+    )
+
+    body = response.get_data(as_text=True)
+    assert response.mimetype == "text/event-stream"
+    assert 'data: {"data": "## Plan\\n\\n"}' in body
+    assert 'data: {"data": "Walk daily"}' in body
+    assert "event: done" in body
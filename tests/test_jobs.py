@@ -0,0 +1,184 @@
+import io
+import threading
+import time
+
+import pytest
+
+from app import create_app
+from app.cache import MemoryCache
+from app.services import jobs, note_pipeline
+from app.services.jobs import JobEngine, JobFailed
+
+
+@pytest.fixture
+def engine(monkeypatch):
+    engine = JobEngine(max_workers=2, step_workers=2)
+    monkeypatch.setattr(jobs, "_engine", engine)
+    yield engine
+    engine.shutdown()
+
+
+def _wait(engine, job_id):
+    events = [event for event in engine.iter_events(job_id, heartbeat=5) if event is not None]
+    return events, engine.status(job_id)
+
+
+def test_job_runs_stages_and_reports_progress(engine):
+    release = threading.Event()
+
+    def pipeline(engine, job, value):
+        job.start_stage("first")
+        release.wait(5)
+        job.start_stage("second")
+        return {"value": value * 2}
+
+    job = engine.submit("demo", pipeline, 21)
+    assert engine.status(job.id)["status"] in ("queued", "running")
+    release.set()
+
+    events, snapshot = _wait(engine, job.id)
+
+    assert [(e["event"], e.get("stage")) for e in events] == [
+        ("stage", "first"), ("stage", "second"), ("done", None)
+    ]
+    assert snapshot["status"] == "succeeded"
+    assert snapshot["result"] == {"value": 42}
+    assert [stage["name"] for stage in snapshot["stages"]] == ["first", "second"]
+    assert all("seconds" in stage for stage in snapshot["stages"])
+
+
+def test_job_failure_keeps_payload_and_status(engine):
+    def pipeline(engine, job):
+        job.start_stage("upload")
+        raise JobFailed({"error": "Audio upload failed"}, 502)
+
+    job = engine.submit("demo", pipeline)
+    events, snapshot = _wait(engine, job.id)
+
+    assert events[-1]["event"] == "failed"
+    assert events[-1]["stage"] == "upload"
+    assert snapshot["status"] == "failed"
+    assert (snapshot["error"], snapshot["status_code"]) == ({"error": "Audio upload failed"}, 502)
+
+
+def test_status_is_read_from_shared_store_for_other_workers(engine):
+    store = MemoryCache()
+    engine.store = store
+    job = engine.submit("demo", lambda engine, job: {"ok": True})
+    _wait(engine, job.id)
+
+    other_worker = JobEngine(store=store)
+    try:
+        assert other_worker.status(job.id)["result"] == {"ok": True}
+        assert list(other_worker.iter_events(job.id))[-1]["event"] == "done"
+    finally:
+        other_worker.shutdown()
+
+
+def test_transcription_note_pipeline_fetches_template_alongside(engine, monkeypatch):
+    template_started = threading.Event()
+    upload_seen_template_started = []
+
+    def resolve_template_id(jwt_token, reference):
+        template_started.set()
+        return "tpl-1", None
+
+    def upload(*args):
+        upload_seen_template_started.append(template_started.wait(5))
+        return {"success": True}, 200
+
+    monkeypatch.setattr(note_pipeline, "fetch_jwt_token", lambda: ("jwt", None))
+    monkeypatch.setattr(note_pipeline, "ensure_session", lambda jwt, sid: ("s-1", None))
+    monkeypatch.setattr(note_pipeline, "resolve_template_id", resolve_template_id)
+    monkeypatch.setattr(
+        note_pipeline, "start_transcription_service",
+        lambda jwt, sid: ({"success": True, "recording_id": "rec-1"}, 200),
+    )
+    monkeypatch.setattr(note_pipeline, "upload_audio_segments", upload)
+    monkeypatch.setattr(note_pipeline, "finish_transcription_service", lambda *a: ({"success": True}, 200))
+    monkeypatch.setattr(
+        note_pipeline, "transcript_wait_service",
+        lambda *a: ({"success": True, "transcript": "Pain is better", "ready": True}, 200),
+    )
+    monkeypatch.setattr(
+        note_pipeline, "generate_consult_note",
+        lambda *a, **k: {"success": True, "note": "## Plan\nRest"},
+    )
+
+    payload, status = note_pipeline.submit_transcription_note_job(b"mp3", "visit.mp3")
+    _, snapshot = _wait(engine, payload["job_id"])
+
+    assert status == 202
+    assert upload_seen_template_started == [True]
+    assert snapshot["result"] == {
+        "session_id": "s-1",
+        "recording_id": "rec-1",
+        "template_id": "tpl-1",
+        "transcript": "Pain is better",
+        "note": "## Plan\nRest",
+    }
+
+
+def test_job_routes_submit_poll_and_stream(engine, monkeypatch):
+    def pipeline(engine, job, audio, filename, template=None, session_id=None):
+        job.start_stage("upload")
+        return {"bytes": len(audio), "filename": filename}
+
+    monkeypatch.setattr(note_pipeline, "transcription_note_pipeline", pipeline)
+    client = create_app().test_client()
+
+    submitted = client.post(
+        "/jobs/transcription-note",
+        data={"audio": (io.BytesIO(b"abc"), "visit.mp3")},
+        content_type="multipart/form-data",
+    )
+    job_id = submitted.get_json()["job_id"]
+    stream = client.get(f"/jobs/{job_id}/events").get_data(as_text=True)
+    status = client.get(f"/jobs/{job_id}").get_json()
+
+    assert submitted.status_code == 202
+    assert "event: stage" in stream and "event: done" in stream
+    assert status["result"] == {"bytes": 3, "filename": "visit.mp3"}
+    assert client.get("/jobs/unknown").status_code == 404
+
+
+def test_full_engine_refuses_jobs_with_retry_after(monkeypatch):
+    engine = JobEngine(max_workers=1, step_workers=1, max_pending=2, retry_after=7)
+    monkeypatch.setattr(jobs, "_engine", engine)
+    release = threading.Event()
+
+    def pipeline(engine, job, audio, filename, template=None, session_id=None):
+        release.wait(5)
+        return {"bytes": len(audio)}
+
+    monkeypatch.setattr(note_pipeline, "transcription_note_pipeline", pipeline)
+    client = create_app().test_client()
+
+    def submit():
+        return client.post(
+            "/jobs/transcription-note",
+            data={"audio": (io.BytesIO(b"abc"), "visit.mp3")},
+            content_type="multipart/form-data",
+        )
+
+    try:
+        # One running and one queued fill the engine.
+        accepted = [submit(), submit()]
+        refused = submit()
+
+        assert [response.status_code for response in accepted] == [202, 202]
+        assert refused.status_code == 503
+        assert refused.headers["Retry-After"] == "7"
+        assert refused.get_json()["pending"] == 2
+
+        release.set()
+        for response in accepted:
+            _wait(engine, response.get_json()["job_id"])
+        deadline = time.monotonic() + 5
+        while engine.pending() and time.monotonic() < deadline:
+            time.sleep(0.01)
+        assert engine.pending() == 0
+        assert submit().status_code == 202
+    finally:
+        release.set()
+        engine.shutdown()
@@ -0,0 +1,83 @@
+import io
+import json
+import logging
+
+import pytest
+import responses
+
+from app.api import BASE_URL
+from app.api.session import get_session_details
+from app.log import REDACTED, configure_logging, redact, sampled
+
+
+@pytest.fixture
+def log_output():
+    app_logger = logging.getLogger("app")
+    previous_level = app_logger.level
+    stream = io.StringIO()
+    handler = configure_logging(level="DEBUG", levels="app.noisy=WARNING", fmt="json", stream=stream)
+    yield stream
+    app_logger.removeHandler(handler)
+    app_logger.setLevel(previous_level)
+    logging.getLogger("app.noisy").setLevel(logging.NOTSET)
+
+
+def _entries(stream):
+    return [json.loads(line) for line in stream.getvalue().splitlines()]
+
+
+def test_json_lines_carry_extras_and_redact_secrets(log_output):
+    logging.getLogger("app.api.demo").info(
+        "Calling %s with %s",
+        "ask-ai",
+        {"Authorization": "Bearer abc.def", "Heidi-Api-Key": "k", "content_type": "TEXT"},
+        extra={"session_id": "s-1", "jwt_token": "abc.def"},
+    )
+
+    [entry] = _entries(log_output)
+    assert entry["level"] == "INFO"
+    assert entry["logger"] == "app.api.demo"
+    assert entry["session_id"] == "s-1"
+    assert entry["jwt_token"] == REDACTED
+    assert "abc.def" not in entry["message"]
+    assert "'content_type': 'TEXT'" in entry["message"]
+
+
+def test_configured_api_key_and_bearer_tokens_are_scrubbed():
+    assert redact("key=test-api-key") == f"key={REDACTED}"
+    assert redact({"headers": {"authorization": "Bearer x"}, "n": 1}) == {
+        "headers": {"authorization": REDACTED}, "n": 1
+    }
+    assert redact(["Bearer eyJ.abc"]) == [f"Bearer {REDACTED}"]
+
+
+def test_per_module_levels(log_output):
+    logging.getLogger("app.noisy").info("hidden")
+    logging.getLogger("app.noisy").warning("shown")
+
+    assert [entry["message"] for entry in _entries(log_output)] == ["shown"]
+
+
+def test_sampled_logger_keeps_one_in_n_and_skips_disabled_levels(log_output):
+    chunk_logger = sampled(logging.getLogger("app.api.chunks"), every=3)
+    for index in range(7):
+        chunk_logger.debug("chunk %s", index)
+
+    entries = _entries(log_output)
+    assert [entry["message"] for entry in entries] == ["chunk 0", "chunk 3", "chunk 6"]
+    assert entries[0]["sample_every"] == 3
+
+    class _Expensive:
+        def __str__(self):
+            raise AssertionError("formatted while disabled")
+
+    quiet = sampled(logging.getLogger("app.noisy"), every=1)
+    quiet.debug("chunk %s", _Expensive())
+    assert len(_entries(log_output)) == 3
+
+
+def test_session_details_no_longer_print_the_api_key(http_mock, capsys):
+    http_mock.add(responses.GET, f"{BASE_URL}/sessions/s-1", json={"session_id": "s-1"})
+
+    assert get_session_details("jwt", "s-1") == {"session_id": "s-1"}
+    assert "test-api-key" not in capsys.readouterr().out
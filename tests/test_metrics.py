@@ -0,0 +1,125 @@
+import asyncio
+import json
+
+import pytest
+import responses
+from aiohttp import web
+from aiohttp.test_utils import TestServer
+
+from app import create_app, metrics
+from app.api import BASE_URL
+from app.api.aio import ask_heidi as aio_ask_heidi
+from app.api.aio import client as aio_client
+from app.api.ask_heidi import open_ai_stream
+from app.api.session import create_session
+
+
+@pytest.fixture(autouse=True)
+def fresh_metrics():
+    metrics.reset()
+    yield
+    metrics.reset()
+
+
+@pytest.mark.parametrize(
+    "url, label",
+    [
+        (f"{BASE_URL}/jwt", "/jwt"),
+        (f"{BASE_URL}/sessions", "/sessions"),
+        (f"{BASE_URL}/sessions/abc/ask-ai", "/sessions/{id}/ask-ai"),
+        (
+            f"{BASE_URL}/sessions/s-1/restful-segment-transcription/rec-9:finish",
+            "/sessions/{id}/restful-segment-transcription/{id}:finish",
+        ),
+        ("http://127.0.0.1:8080/sessions/42/transcript", "/sessions/{id}/transcript"),
+    ],
+)
+def test_endpoint_label_replaces_ids(url, label):
+    assert metrics.endpoint_label(url) == label
+
+
+def test_histogram_renders_cumulative_buckets():
+    histogram = metrics.Histogram("demo_seconds", "Demo.", ("op",), buckets=(0.1, 1))
+    histogram.observe(("a",), 0.05)
+    histogram.observe(("a",), 0.5)
+    histogram.observe(("a",), 3)
+
+    assert list(histogram.samples()) == [
+        'demo_seconds_bucket{op="a",le="0.1"} 1',
+        'demo_seconds_bucket{op="a",le="1"} 2',
+        'demo_seconds_bucket{op="a",le="+Inf"} 3',
+        'demo_seconds_sum{op="a"} 3.55',
+        'demo_seconds_count{op="a"} 3',
+    ]
+
+
+def test_sync_calls_record_latency_bytes_and_first_chunk(http_mock):
+    http_mock.add(responses.POST, f"{BASE_URL}/sessions", json={"session_id": "s-1"})
+    body = 'data: {"data": "Rest "}\n\ndata: {"data": "well"}\n\n'
+    http_mock.add(
+        responses.POST,
+        f"{BASE_URL}/sessions/s-1/ask-ai",
+        body=body,
+        headers={"Content-Type": "text/event-stream"},
+    )
+
+    assert create_session("jwt") == "s-1"
+    chunks, error = open_ai_stream("jwt", "s-1", "Advise", "Notes")
+    assert error is None
+    assert "".join(chunks) == "Rest well"
+
+    ask_ai = "/sessions/{id}/ask-ai"
+    assert metrics.UPSTREAM_SECONDS.count(("/sessions", "POST", "200")) == 1
+    assert metrics.UPSTREAM_SECONDS.count((ask_ai, "POST", "200")) == 1
+    assert metrics.UPSTREAM_FIRST_CHUNK_SECONDS.count((ask_ai,)) == 1
+    assert metrics.UPSTREAM_SENT_BYTES.value((ask_ai,)) > 0
+    assert metrics.UPSTREAM_RECEIVED_BYTES.value((ask_ai,)) == len(body)
+
+
+def test_failed_calls_are_recorded_as_errors(http_mock):
+    http_mock.add(responses.POST, f"{BASE_URL}/sessions", body=ConnectionError("refused"))
+
+    assert create_session("jwt")["error"] is True
+    assert metrics.UPSTREAM_SECONDS.count(("/sessions", "POST", "error")) == 1
+
+
+def test_async_calls_are_traced(monkeypatch):
+    async def ask_ai(request):
+        response = web.StreamResponse(headers={"Content-Type": "text/event-stream"})
+        await response.prepare(request)
+        await response.write(f"data: {json.dumps({'data': 'Rest'})}\n\n".encode())
+        await response.write_eof()
+        return response
+
+    async def scenario():
+        app = web.Application()
+        app.router.add_post("/sessions/{session_id}/ask-ai", ask_ai)
+        server = TestServer(app)
+        await server.start_server()
+        monkeypatch.setattr("app.api.ask_heidi.BASE_URL", str(server.make_url("")).rstrip("/"))
+        try:
+            return await aio_ask_heidi.ask_ai_stream("jwt", "s-1", "Advise", "Notes")
+        finally:
+            await aio_client.close_session()
+            await server.close()
+
+    assert asyncio.run(scenario())["response"] == "Rest"
+    ask_ai_label = "/sessions/{id}/ask-ai"
+    assert metrics.UPSTREAM_SECONDS.count((ask_ai_label, "POST", "200")) == 1
+    assert metrics.UPSTREAM_FIRST_CHUNK_SECONDS.count((ask_ai_label,)) == 1
+    assert metrics.UPSTREAM_SENT_BYTES.value((ask_ai_label,)) > 0
+    assert metrics.UPSTREAM_RECEIVED_BYTES.value((ask_ai_label,)) > 0
+
+
+def test_metrics_endpoint_reports_routes():
+    client = create_app().test_client()
+    client.get("/health").close()
+    client.get("/sessions/unknown-route/nowhere/at/all").close()
+
+    response = client.get("/metrics")
+    text = response.get_data(as_text=True)
+
+    assert response.headers["Content-Type"].startswith("text/plain; version=0.0.4")
+    assert "# TYPE heidi_http_request_seconds histogram" in text
+    assert 'heidi_http_request_seconds_count{route="/health",method="GET",status="200"} 1' in text
+    assert 'route="unmatched",method="GET",status="404"' in text
@@ -0,0 +1,128 @@
+import io
+
+import fitz
+import pytest
+
+from app import create_app
+from app.cache import MemoryCache
+from app.services import pdf_text
+
+
+def _make_pdf(page_count):
+    doc = fitz.open()
+    for number in range(page_count):
+        doc.new_page().insert_text((72, 72), f"Page {number} instructions")
+    data = doc.tobytes()
+    doc.close()
+    return data
+
+
+def test_extract_pdf_text_reads_pages_in_order():
+    payload, status = pdf_text.extract_pdf_text(_make_pdf(3), workers=0)
+
+    assert status == 200
+    assert payload["pages"] == 3
+    assert payload["text"].split("\n")[0] == "Page 0 instructions"
+    assert payload["text"].index("Page 1") < payload["text"].index("Page 2")
+
+
+def test_extract_pdf_text_uses_process_pool_for_long_documents():
+    data = _make_pdf(12)
+    try:
+        parallel, _ = pdf_text.extract_pdf_text(data, workers=2, parallel_pages=4)
+    finally:
+        pdf_text.shutdown_process_pool()
+    sequential, _ = pdf_text.extract_pdf_text(data, workers=0)
+
+    assert parallel == sequential
+
+
+def test_process_pool_reads_one_spilled_copy_of_the_pdf(monkeypatch, tmp_path):
+    monkeypatch.setattr(pdf_text.tempfile, "tempdir", str(tmp_path))
+    submitted = []
+    extract = pdf_text._extract_page_range
+    monkeypatch.setattr(
+        pdf_text, "_extract_page_range", lambda *args: submitted.append(args) or extract(*args)
+    )
+
+    class _InlinePool:
+        def submit(self, fn, *args):
+            future = pdf_text.Future()
+            future.set_result(fn(*args))
+            return future
+
+    monkeypatch.setattr(pdf_text, "_get_process_pool", _InlinePool)
+    payload, _ = pdf_text.extract_pdf_text(_make_pdf(12), workers=2, parallel_pages=4)
+
+    assert payload["pages"] == 12
+    assert len(submitted) == 6
+    # Every range gets the same path, never the PDF bytes, and the file is gone afterwards.
+    assert {type(args[0]) for args in submitted} == {str}
+    assert len({args[0] for args in submitted}) == 1
+    assert list(tmp_path.iterdir()) == []
+
+
+def test_open_pdf_enforces_caps(monkeypatch):
+    _, error = pdf_text.open_pdf(_make_pdf(3), max_pages=2)
+    assert error[1] == 413
+    assert "3 pages" in error[0]["error"]
+
+    monkeypatch.setattr(pdf_text, "PDF_MAX_BYTES", 10)
+    _, error = pdf_text.open_pdf(_make_pdf(1))
+    assert error[1] == 413
+
+    _, error = pdf_text.open_pdf(b"")
+    assert error[1] == 400
+
+
+def test_upload_document_route_streams_pages():
+    client = create_app().test_client()
+
+    response = client.post(
+        "/upload-document?stream=1",
+        data={"file": (io.BytesIO(_make_pdf(2)), "discharge.pdf")},
+        content_type="multipart/form-data",
+    )
+
+    body = response.get_data(as_text=True)
+    assert response.mimetype == "text/event-stream"
+    assert '"pages": 2' in body
+    assert "Page 1 instructions" in body
+    assert "event: done" in body
+
+
+def test_upload_document_route_rejects_non_pdf():
+    client = create_app().test_client()
+
+    response = client.post(
+        "/upload-document",
+        data={"file": (io.BytesIO(b"text"), "notes.txt")},
+        content_type="multipart/form-data",
+    )
+
+    assert response.status_code == 400
+
+
+def test_repeat_uploads_are_served_from_text_cache(monkeypatch):
+    pdf_text.configure_text_cache(MemoryCache(max_entries=4))
+    data = _make_pdf(2)
+
+    first, _ = pdf_text.extract_pdf_text(data, workers=0)
+    monkeypatch.setattr(
+        pdf_text.fitz, "open", lambda *a, **k: (_ for _ in ()).throw(AssertionError("re-parsed"))
+    )
+    second, _ = pdf_text.extract_pdf_text(data, workers=0)
+
+    assert second == first
+    stats = pdf_text.text_cache_stats()
+    assert stats["enabled"] is True
+    assert (stats["hits"], stats["misses"]) == (1, 1)
+    assert stats["seconds_saved"] == pytest.approx(stats["seconds_extracting"], abs=0.002)
+
+
+def test_cache_stats_route_reports_disabled_cache():
+    client = create_app().test_client()
+
+    response = client.get("/upload-document/cache-stats")
+
+    assert response.get_json()["enabled"] is False
@@ -0,0 +1,147 @@
+import asyncio
+import json
+import threading
+import time
+
+import pytest
+
+from app.services import aio_flows, demo_flows
+from app.services.question_batch import normalize_questions
+
+
+@pytest.fixture
+def shared_session(monkeypatch):
+    calls = {"jwt": 0, "session": 0}
+
+    def fetch_jwt_token():
+        calls["jwt"] += 1
+        return "jwt", None
+
+    def ensure_session(jwt_token, session_id):
+        calls["session"] += 1
+        return session_id or "s-1", None
+
+    monkeypatch.setattr(demo_flows, "fetch_jwt_token", fetch_jwt_token)
+    monkeypatch.setattr(demo_flows, "ensure_session", ensure_session)
+    monkeypatch.setattr(demo_flows, "report_session_error", lambda *args: None)
+    return calls
+
+
+def test_batches_are_validated_before_any_upstream_call(monkeypatch):
+    monkeypatch.setattr("app.services.question_batch.BATCH_MAX_QUESTIONS", 2)
+
+    assert normalize_questions("one question")[1][1] == 400
+    assert normalize_questions([])[1][1] == 400
+    assert normalize_questions(["a", "b", "c"])[1][0]["maximum"] == 2
+    assert normalize_questions([" a ", None]) == (["a", ""], None)
+
+
+def test_questions_share_one_token_and_run_concurrently(monkeypatch, shared_session):
+    monkeypatch.setattr(demo_flows, "BATCH_CONCURRENCY", 3)
+    all_in_flight = threading.Barrier(3, timeout=5)
+
+    def ask_ai(jwt_token, session_id, ai_command_text, content, **kwargs):
+        all_in_flight.wait()
+        if content == "bad":
+            return {"error": True, "status_code": 502, "message": "bad gateway"}
+        return {"success": True, "response": f"answer to {content}", "format": "sse"}
+
+    monkeypatch.setattr(demo_flows, "ask_ai_with_fallbacks", ask_ai)
+
+    payload, status = demo_flows.ask_questions_flow(["walk?", "bad", "  ", "eat?"], None)
+
+    assert status == 200
+    assert shared_session == {"jwt": 1, "session": 1}
+    assert [result["index"] for result in payload["results"]] == [0, 1, 2, 3]
+    assert [result["status"] for result in payload["results"]] == [200, 500, 400, 200]
+    assert payload["results"][0]["response"] == "answer to walk?"
+    assert payload["results"][1]["details"]["status_code"] == 502
+    assert (payload["succeeded"], payload["failed"], payload["success"]) == (2, 2, False)
+
+
+def test_in_flight_calls_are_bounded_per_batch(monkeypatch, shared_session):
+    monkeypatch.setattr(demo_flows, "BATCH_CONCURRENCY", 2)
+    lock = threading.Lock()
+    active, peak = [0], [0]
+
+    def ask_ai(jwt_token, session_id, ai_command_text, content, **kwargs):
+        with lock:
+            active[0] += 1
+            peak[0] = max(peak[0], active[0])
+        time.sleep(0.01)
+        with lock:
+            active[0] -= 1
+        return {"success": True, "response": content}
+
+    monkeypatch.setattr(demo_flows, "ask_ai_with_fallbacks", ask_ai)
+
+    payload, _ = demo_flows.ask_questions_flow([f"q{index}" for index in range(8)], "s-9")
+
+    assert payload["succeeded"] == 8
+    assert payload["session_id"] == "s-9"
+    assert peak[0] == 2
+
+
+def test_stream_emits_answers_as_they_finish(monkeypatch, shared_session):
+    slow_may_finish = threading.Event()
+
+    def ask_ai(jwt_token, session_id, ai_command_text, content, **kwargs):
+        if content == "slow":
+            slow_may_finish.wait(timeout=5)
+        return {"success": True, "response": content}
+
+    monkeypatch.setattr(demo_flows, "ask_ai_with_fallbacks", ask_ai)
+
+    events, error = demo_flows.ask_questions_stream_flow(["slow", "fast"], None)
+    assert error is None
+
+    assert next(events).startswith("event: meta")
+    first = next(events)
+    assert json.loads(first.split("data: ", 1)[1])["question"] == "fast"
+    slow_may_finish.set()
+    rest = list(events)
+    assert json.loads(rest[0].split("data: ", 1)[1])["question"] == "slow"
+    assert rest[-1].startswith("event: done")
+    assert json.loads(rest[-1].split("data: ", 1)[1])["succeeded"] == 2
+
+
+def test_route_streams_or_returns_all(monkeypatch, shared_session):
+    from app import create_app
+
+    monkeypatch.setattr(
+        demo_flows, "ask_ai_with_fallbacks",
+        lambda jwt, sid, command, content, **kwargs: {"success": True, "response": content},
+    )
+    client = create_app().test_client()
+
+    response = client.post("/ask-questions", json={"questions": ["a", "b"]})
+    assert response.status_code == 200
+    assert [result["response"] for result in response.get_json()["results"]] == ["a", "b"]
+
+    response = client.post("/ask-questions?stream=1", json={"questions": ["a"]})
+    assert response.mimetype == "text/event-stream"
+    assert response.get_data(as_text=True).count("event: answer") == 1
+
+    assert client.post("/ask-questions", json={"questions": "a"}).status_code == 400
+
+
+def test_async_batch_runs_on_the_loop(monkeypatch):
+    async def fetch_jwt_token():
+        return "jwt", None
+
+    async def ensure_session(jwt_token, session_id):
+        return "s-1", None
+
+    async def ask_ai(jwt_token, session_id, ai_command_text, content, **kwargs):
+        await asyncio.sleep(0.01 if content == "slow" else 0)
+        return {"success": True, "response": content}
+
+    monkeypatch.setattr(aio_flows, "fetch_jwt_token", fetch_jwt_token)
+    monkeypatch.setattr(aio_flows, "ensure_session", ensure_session)
+    monkeypatch.setattr(aio_flows.aio_ask_heidi, "ask_ai_with_fallbacks", ask_ai)
+
+    payload, status = asyncio.run(aio_flows.ask_questions_flow(["slow", "", "fast"], None))
+
+    assert status == 200
+    assert [result["status"] for result in payload["results"]] == [200, 400, 200]
+    assert payload["results"][0]["response"] == "slow"
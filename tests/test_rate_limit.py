@@ -0,0 +1,220 @@
+import asyncio
+
+import threading
+
+import pytest
+from aiohttp import FormData
+from aiohttp.test_utils import TestClient, TestServer
+
+from app import metrics, rate_limit
+from app.rate_limit import (
+    ASK_AI,
+    DOCUMENT,
+    TRANSCRIPTION,
+    Limit,
+    RateLimiter,
+    SQLiteBucketStore,
+    configure_rate_limiter,
+    tenant_of,
+)
+from app.services import aio_flows
+
+
+class _Clock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+@pytest.fixture
+def clock():
+    return _Clock()
+
+
+@pytest.fixture
+def trusted_localhost(monkeypatch):
+    """Treat test clients on the loopback address as the authenticating proxy."""
+    monkeypatch.setattr(rate_limit, "TRUSTED_PROXIES", rate_limit._parse_networks("127.0.0.0/8, ::1"))
+
+
+@pytest.fixture(autouse=True)
+def fresh_metrics():
+    metrics.reset()
+    yield
+    metrics.reset()
+
+
+def _limiter(clock, store=None, quota=None):
+    return RateLimiter(
+        store,
+        limits={ASK_AI: Limit.per_minute(60, burst=2), TRANSCRIPTION: Limit.per_minute(6, burst=1)},
+        quota=quota,
+        clock=clock,
+    )
+
+
+def test_bursts_then_refills_at_the_class_rate(clock):
+    limiter = _limiter(clock)
+
+    assert [limiter.check("clinic:a", ASK_AI).allowed for _ in range(3)] == [True, True, False]
+    refused = limiter.check("clinic:a", ASK_AI)
+    assert (refused.scope, refused.headers()["Retry-After"]) == ("rate", "1")
+
+    clock.now += 1  # one token per second at 60/minute
+    allowed = limiter.check("clinic:a", ASK_AI)
+    assert allowed.allowed and allowed.headers() == {"X-RateLimit-Limit": "2", "X-RateLimit-Remaining": "0"}
+    assert metrics.RATE_LIMITED.value((ASK_AI, "rate")) == 2
+
+
+def test_clinics_and_endpoint_classes_have_separate_buckets(clock):
+    limiter = _limiter(clock)
+
+    assert limiter.check("clinic:a", TRANSCRIPTION).allowed
+    assert not limiter.check("clinic:a", TRANSCRIPTION).allowed
+    assert limiter.check("clinic:b", TRANSCRIPTION).allowed
+    assert limiter.check("clinic:a", ASK_AI).allowed
+    assert limiter.check("clinic:a", DOCUMENT).allowed  # no limit configured for the class
+
+
+def test_daily_quota_is_shared_by_classes_and_charged_all_or_nothing(clock):
+    limiter = _limiter(clock, quota=Limit(2, 2 / 86400))
+
+    assert limiter.check("clinic:a", ASK_AI).allowed
+    assert limiter.check("clinic:a", TRANSCRIPTION).allowed
+    refused = limiter.check("clinic:a", ASK_AI)
+    assert (refused.allowed, refused.scope) == (False, "quota")
+    assert refused.retry_after > 3600
+
+    # The refused request did not spend its class token.
+    limiter.quota = None
+    assert [limiter.check("clinic:a", ASK_AI).allowed for _ in range(2)] == [True, False]
+
+
+def test_batches_cost_one_token_per_question_capped_at_the_burst(clock):
+    limiter = _limiter(clock)
+
+    assert limiter.check("clinic:a", ASK_AI, cost=5).allowed
+    assert not limiter.check("clinic:a", ASK_AI).allowed
+
+
+def test_sqlite_store_shares_counters_between_workers(tmp_path, clock):
+    path = str(tmp_path / "limits.sqlite3")
+    worker_one = _limiter(clock, SQLiteBucketStore(path))
+    worker_two = _limiter(clock, SQLiteBucketStore(path))
+
+    assert worker_one.check("clinic:a", ASK_AI).allowed
+    assert worker_two.check("clinic:a", ASK_AI).allowed
+    assert not worker_one.check("clinic:a", ASK_AI).allowed
+    clock.now += 1
+    assert worker_two.check("clinic:a", ASK_AI).allowed
+
+
+def test_tenant_is_the_clinic_then_a_hashed_api_key_then_the_address(monkeypatch):
+    monkeypatch.setattr(rate_limit, "TRUSTED_PROXIES", rate_limit._parse_networks("10.0.0.0/24"))
+
+    assert tenant_of({"X-Clinic-Id": " north ", "X-Api-Key": "k"}, "10.0.0.1") == "clinic:north"
+    keyed = tenant_of({"X-Api-Key": "secret-key"}, "10.0.0.1")
+    assert keyed.startswith("key:") and "secret" not in keyed
+    assert tenant_of({"X-Forwarded-For": "1.2.3.4, 198.51.100.7"}, "10.0.0.1") == "addr:198.51.100.7"
+    assert tenant_of({}, "10.0.0.1") == "addr:10.0.0.1"
+
+
+def test_identity_headers_from_untrusted_peers_are_ignored(monkeypatch, clock):
+    monkeypatch.setattr(rate_limit, "TRUSTED_PROXIES", rate_limit._parse_networks("10.0.0.0/24"))
+    limiter = _limiter(clock)
+
+    for headers in ({"X-Clinic-Id": "north"}, {"X-Clinic-Id": "south", "X-Forwarded-For": "10.0.0.9"}, {}):
+        assert tenant_of(headers, "203.0.113.5") == "addr:203.0.113.5"
+    # Rotating the header does not buy a fresh bucket.
+    decisions = [
+        limiter.check(tenant_of({"X-Clinic-Id": f"clinic-{n}"}, "203.0.113.5"), TRANSCRIPTION)
+        for n in range(2)
+    ]
+    assert [decision.allowed for decision in decisions] == [True, False]
+
+    monkeypatch.setattr(rate_limit, "TRUSTED_PROXIES", [])
+    assert tenant_of({"X-Clinic-Id": "north"}, "10.0.0.1") == "addr:10.0.0.1"
+
+
+def test_async_check_runs_shared_stores_off_the_event_loop(tmp_path, clock):
+    threads = []
+
+    class _RecordingStore(SQLiteBucketStore):
+        def take(self, buckets, cost, now):
+            threads.append(threading.current_thread())
+            return super().take(buckets, cost, now)
+
+    limiter = _limiter(clock, _RecordingStore(str(tmp_path / "limits.sqlite3")))
+
+    assert asyncio.run(limiter.check_async("clinic:a", ASK_AI)).allowed
+    assert threads and threads[0] is not threading.main_thread()
+
+    memory = _limiter(clock)
+    assert asyncio.run(memory.check_async("clinic:a", ASK_AI)).allowed
+
+
+def test_route_rejects_over_limit_clinic_before_running_the_flow(monkeypatch, clock, trusted_localhost):
+    from app import create_app
+
+    calls = []
+    monkeypatch.setattr(
+        "app.routes.demo.ask_question_flow",
+        lambda question, session_id: calls.append(question) or ({"success": True}, 200),
+    )
+    monkeypatch.setattr(
+        "app.routes.demo.ask_questions_flow",
+        lambda questions, session_id: ({"success": True, "results": []}, 200),
+    )
+    configure_rate_limiter(_limiter(clock))
+    client = create_app().test_client()
+    north = {"X-Clinic-Id": "north"}
+
+    responses = [
+        client.post("/ask-question", json={"question": "Can I walk?"}, headers=north) for _ in range(3)
+    ]
+
+    assert [response.status_code for response in responses] == [200, 200, 429]
+    assert responses[2].headers["Retry-After"] == "1"
+    assert responses[2].get_json()["endpoint_class"] == ASK_AI
+    assert len(calls) == 2
+    south = client.post("/ask-question", json={"question": "Q"}, headers={"X-Clinic-Id": "south"})
+    assert south.status_code == 200
+    # Routes that do not call Heidi are never limited.
+    assert client.get("/health", headers=north).status_code == 200
+
+    batch = client.post("/ask-questions", json={"questions": ["a", "b"]}, headers={"X-Clinic-Id": "east"})
+    assert batch.status_code == 200
+    # Two questions used the east clinic's whole burst.
+    east = client.post("/ask-question", json={"question": "Q"}, headers={"X-Clinic-Id": "east"})
+    assert east.status_code == 429
+
+
+def test_async_app_applies_the_same_limits(monkeypatch, clock, trusted_localhost):
+    from app.aio_app import create_async_app
+
+    async def transcribe_audio_flow(audio, filename, session_id):
+        return {"success": True}, 200
+
+    monkeypatch.setattr(aio_flows, "transcribe_audio_flow", transcribe_audio_flow)
+    configure_rate_limiter(_limiter(clock))
+
+    async def scenario():
+        client = TestClient(TestServer(create_async_app()))
+        await client.start_server()
+        try:
+            statuses = []
+            for _ in range(2):
+                form = FormData()
+                form.add_field("audio_file", b"RIFF", filename="question.wav")
+                response = await client.post("/transcribe-audio", data=form, headers={"X-Clinic-Id": "north"})
+                statuses.append(response.status)
+            return statuses, response.headers.get("Retry-After")
+        finally:
+            await client.close()
+
+    statuses, retry_after = asyncio.run(scenario())
+
+    assert statuses == [200, 429]
+    assert retry_after == "10"
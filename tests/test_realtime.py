@@ -0,0 +1,255 @@
+import asyncio
+import io
+import json
+import struct
+import wave
+
+from aiohttp import web
+from aiohttp.test_utils import TestServer
+from websockets.asyncio.client import connect
+
+from app.api.aio import client as aio_client
+from app.realtime_server import serve_realtime
+from app.services import aio_flows
+from app.services.live_segments import LiveSegmenter
+from app.services.realtime import RealtimeTranscription
+
+
+class _FakeHeidi:
+    """Segment transcription endpoints that transcribe each upload as its index."""
+
+    def __init__(self):
+        self.uploads = []
+        self.finished = False
+
+    async def start(self, request):
+        return web.json_response({"recording_id": "rec-live"})
+
+    async def recording_action(self, request):
+        action = request.match_info["action"]
+        if action == "transcribe":
+            form = await request.post()
+            self.uploads.append((form["index"], form["file"].filename, form["file"].file.read()))
+            return web.json_response({"is_success": True})
+        self.finished = True
+        return web.json_response({"is_success": True})
+
+    async def transcript(self, request):
+        words = " ".join(f"part{index}" for index, _, _ in sorted(self.uploads))
+        return web.json_response({"transcript": words})
+
+
+def _run_live_session(monkeypatch, frames, segment_bytes):
+    heidi = _FakeHeidi()
+
+    async def fetch_jwt_token():
+        return "jwt", None
+
+    monkeypatch.setattr(aio_flows, "fetch_jwt_token", fetch_jwt_token)
+    monkeypatch.setattr("app.services.realtime.REALTIME_PARTIAL_INTERVAL", 0)
+
+    async def scenario():
+        app = web.Application()
+        base = "/sessions/{session_id}/restful-segment-transcription"
+        app.router.add_post(base, heidi.start)
+        app.router.add_post(base + "/{recording_id}:{action}", heidi.recording_action)
+        app.router.add_get("/sessions/{session_id}/transcript", heidi.transcript)
+        fake = TestServer(app)
+        await fake.start_server()
+        monkeypatch.setattr("app.api.transcript.BASE_URL", str(fake.make_url("")).rstrip("/"))
+        monkeypatch.setattr("app.services.realtime.REALTIME_SEGMENT_BYTES", segment_bytes)
+
+        messages = []
+        try:
+            async with serve_realtime(host="127.0.0.1", port=0) as server:
+                port = server.sockets[0].getsockname()[1]
+                url = f"ws://127.0.0.1:{port}/transcribe?session_id=s-live&filename=clip.wav"
+                async with connect(url) as socket:
+                    for frame in frames:
+                        if isinstance(frame, dict):
+                            await socket.send(json.dumps(frame))
+                        else:
+                            await socket.send(frame)
+                    await socket.send(json.dumps({"type": "stop"}))
+                    async for raw in socket:
+                        messages.append(json.loads(raw))
+        finally:
+            await aio_client.close_session()
+            await fake.close()
+        return messages
+
+    return heidi, asyncio.run(scenario())
+
+
+def test_live_audio_is_uploaded_as_indexed_segments(monkeypatch):
+    heidi, messages = _run_live_session(
+        monkeypatch, [b"aaaa", b"bbbb", b"cc", {"type": "flush"}, b"dd"], segment_bytes=8
+    )
+
+    assert messages[0] == {"type": "started", "session_id": "s-live", "recording_id": "rec-live"}
+    assert sorted(heidi.uploads) == [
+        ("0", "clip.wav", b"aaaabbbb"),
+        ("1", "clip.wav", b"cc"),
+        ("2", "clip.wav", b"dd"),
+    ]
+    assert heidi.finished is True
+    assert sorted(m["index"] for m in messages if m["type"] == "segment") == [0, 1, 2]
+    final = messages[-1]
+    assert final["type"] == "final"
+    assert final["transcript"] == "part0 part1 part2"
+    assert (final["segments"], final["failed_segments"], final["ready"]) == (3, [], True)
+
+
+def test_unknown_commands_are_reported(monkeypatch):
+    _, messages = _run_live_session(monkeypatch, [{"type": "pause"}, b"x"], segment_bytes=8)
+
+    assert {"type": "error", "message": "Unknown command: 'pause'"} in messages
+    assert messages[-1]["type"] == "final"
+
+
+def _ebml(element_id: bytes, payload: bytes = b"", unknown_size: bool = False) -> bytes:
+    size = b"\x01\xff\xff\xff\xff\xff\xff\xff" if unknown_size else bytes([0x80 | len(payload)])
+    return element_id + size + payload
+
+
+def _webm_recording(clusters: int, blocks_per_cluster: int = 3):
+    """A MediaRecorder-like webm stream (unknown-size segment and clusters) and its audio blocks."""
+    header = _ebml(b"\x1a\x45\xdf\xa3", _ebml(b"\x42\x82", b"webm"))
+    header += _ebml(b"\x18\x53\x80\x67", unknown_size=True)
+    header += _ebml(b"\x15\x49\xa9\x66", _ebml(b"\x2a\xd7\xb1", b"\x0f\x42\x40"))
+    header += _ebml(b"\x16\x54\xae\x6b", _ebml(b"\xae", _ebml(b"\x86", b"A_OPUS")))
+    body, blocks = b"", []
+    for cluster in range(clusters):
+        body += _ebml(b"\x1f\x43\xb6\x75", unknown_size=True) + _ebml(b"\xe7", bytes([cluster]))
+        for block in range(blocks_per_cluster):
+            payload = bytes([0x81, cluster, block]) + bytes([cluster * 16 + block]) * 40
+            blocks.append(payload)
+            body += _ebml(b"\xa3", payload)
+    return header + body, blocks
+
+
+def _decode_webm(data: bytes):
+    """Walk a webm file as a player would; return its audio blocks, failing on any truncation."""
+    assert data.startswith(b"\x1a\x45\xdf\xa3"), "segment does not start with an EBML header"
+    pos, blocks, seen = 0, [], set()
+    while pos < len(data):
+        id_length = 1 + (8 - data[pos].bit_length())
+        element_id = data[pos:pos + id_length]
+        first = data[pos + id_length]
+        size_length = 1 + (8 - first.bit_length())
+        size_bytes = data[pos + id_length:pos + id_length + size_length]
+        size = int.from_bytes(bytes([first & (0xFF >> size_length)]) + size_bytes[1:], "big")
+        pos += id_length + size_length
+        seen.add(element_id)
+        if element_id in (b"\x18\x53\x80\x67", b"\x1f\x43\xb6\x75"):
+            continue  # unknown-size container: children follow
+        assert pos + size <= len(data), "element cut off"
+        if element_id == b"\xa3":
+            assert b"\x1f\x43\xb6\x75" in seen, "block outside a cluster"
+            blocks.append(data[pos:pos + size])
+        pos += size
+    assert b"\x16\x54\xae\x6b" in seen, "segment has no track header"
+    return blocks
+
+
+def test_webm_segments_after_the_first_decode_on_their_own(monkeypatch):
+    recording, blocks = _webm_recording(clusters=6)
+    frames = [recording[start:start + 37] for start in range(0, len(recording), 37)]
+
+    heidi, messages = _run_live_session(monkeypatch, frames, segment_bytes=300)
+
+    uploads = [data for _, _, data in sorted(heidi.uploads, key=lambda upload: int(upload[0]))]
+    assert len(uploads) >= 3
+    decoded = [_decode_webm(upload) for upload in uploads]
+    assert all(decoded)
+    assert [block for segment in decoded for block in segment] == blocks
+    assert messages[-1]["type"] == "final"
+
+
+def test_recorder_restarts_and_wav_streams_are_cut_on_boundaries():
+    first, first_blocks = _webm_recording(clusters=2)
+    second, second_blocks = _webm_recording(clusters=2)
+    segmenter = LiveSegmenter(segment_bytes=10_000)
+
+    segments = segmenter.feed(first + second) + segmenter.flush()
+
+    assert [_decode_webm(segment) for segment in segments] == [first_blocks, second_blocks]
+
+    samples = bytes(range(256)) * 20
+    recording = io.BytesIO()
+    with wave.open(recording, "wb") as writer:
+        writer.setnchannels(2)
+        writer.setsampwidth(2)
+        writer.setframerate(16000)
+        writer.writeframes(samples)
+    data = recording.getvalue()
+    segmenter = LiveSegmenter(segment_bytes=1001)
+
+    segments = [s for start in range(0, len(data), 333) for s in segmenter.feed(data[start:start + 333])]
+    segments += segmenter.flush()
+
+    assert len(segments) > 2
+    decoded = b""
+    for segment in segments:
+        with wave.open(io.BytesIO(segment)) as reader:
+            assert (reader.getnchannels(), reader.getsampwidth()) == (2, 2)
+            decoded += reader.readframes(reader.getnframes())
+    assert decoded == samples
+
+
+def test_ogg_segments_carry_the_codec_header_pages():
+    def page(flags, granule, packet):
+        lacing = bytes([1, len(packet)])
+        return b"OggS\x00" + bytes([flags]) + struct.pack("<qIII", granule, 1, 0, 0) + lacing + packet
+
+    headers = page(0x02, 0, b"OpusHead" + b"\x01" * 11) + page(0, 0, b"OpusTags" + b"\x00" * 8)
+    audio = [page(0, 960 * (n + 1), bytes([n]) * 100) for n in range(6)]
+    stream = headers + b"".join(audio)
+    segmenter = LiveSegmenter(segment_bytes=250)
+
+    segments = [s for start in range(0, len(stream), 50) for s in segmenter.feed(stream[start:start + 50])]
+    segments += segmenter.flush()
+
+    assert len(segments) > 1
+    for segment in segments:
+        assert segment.startswith(headers)
+        assert (len(segment) - len(headers)) % len(audio[0]) == 0
+    assert b"".join(segment[len(headers):] for segment in segments) == b"".join(audio)
+
+
+def test_live_segment_uploads_stop_on_refusals_and_an_exhausted_budget(monkeypatch):
+    answers = {
+        "0": {"error": True, "status_code": 503, "message": "Heidi API unavailable"},
+        "1": {"error": True, "status_code": 502, "message": "bad gateway"},
+    }
+    attempts = []
+    sleeps = []
+
+    async def upload_audio_bytes(jwt_token, session_id, recording_id, segment, filename, index):
+        attempts.append(index)
+        return answers[index]
+
+    async def sleep(seconds):
+        sleeps.append(seconds)
+
+    monkeypatch.setattr("app.services.realtime.aio_transcript.upload_audio_bytes", upload_audio_bytes)
+    monkeypatch.setattr("app.services.realtime.retry_allowed", lambda: False)
+    monkeypatch.setattr("app.services.realtime.asyncio.sleep", sleep)
+
+    async def scenario():
+        messages = []
+
+        async def send(message):
+            messages.append(message)
+
+        live = RealtimeTranscription(send, retries=2)
+        for index in (0, 1):
+            await live._upload_slots.acquire()
+            await live._upload(index, b"segment")
+        return messages
+
+    messages = asyncio.run(scenario())
+
+    assert attempts == ["0", "1"]
+    assert sleeps == []
+    assert [(m["index"], m["success"], m["attempts"]) for m in messages] == [(0, False, 1), (1, False, 1)]
@@ -0,0 +1,221 @@
+import asyncio
+import io
+
+import pytest
+import responses
+from werkzeug.datastructures import FileStorage
+
+from app import metrics
+from app.api import BASE_URL, client
+from app.api.aio import ask_heidi as aio_ask_heidi
+from app.api.aio import session as aio_session
+from app.api.ask_heidi import ask_ai_with_fallbacks
+from app.api.resilience import (
+    CLOSED,
+    HALF_OPEN,
+    OPEN,
+    AdaptiveLimiter,
+    CircuitBreaker,
+    Resilience,
+    RetryBudget,
+    configure_resilience,
+)
+from app.api.session import create_session
+from app.services import demo_flows
+from app.services.transcription import finish_transcription_service, upload_audio_service
+
+SESSIONS = "POST /sessions"
+ASK_AI = "POST /sessions/{id}/ask-ai"
+
+
+class _Clock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+@pytest.fixture
+def clock():
+    return _Clock()
+
+
+@pytest.fixture
+def layer(clock):
+    resilience = Resilience(
+        breaker_factory=lambda name: CircuitBreaker(
+            name, window=4, min_calls=4, error_rate=0.5, open_seconds=10, clock=clock
+        ),
+        queue_seconds=0,
+    )
+    configure_resilience(resilience)
+    metrics.reset()
+    yield resilience
+    metrics.reset()
+
+
+def test_breaker_opens_on_errors_fails_fast_then_probes(http_mock, layer, clock):
+    http_mock.add(responses.POST, f"{BASE_URL}/sessions", status=500, body="upstream down")
+
+    for _ in range(4):
+        assert create_session("jwt")["status_code"] == 500
+    assert layer.breaker(SESSIONS).state == OPEN
+
+    refused = create_session("jwt")
+    assert refused["status_code"] == 503
+    assert '"reason": "circuit_open"' in refused["message"]
+    assert len(http_mock.calls) == 4
+    assert metrics.UPSTREAM_REFUSED.value((SESSIONS, "circuit_open")) == 1
+
+    clock.now += 10
+    http_mock.replace(responses.POST, f"{BASE_URL}/sessions", json={"session_id": "s-1"})
+    assert layer.breaker(SESSIONS).allow() is True
+    assert layer.breaker(SESSIONS).state == HALF_OPEN
+    assert layer.breaker(SESSIONS).allow() is False  # one probe at a time
+    layer.breaker(SESSIONS).cancel_probe()
+
+    assert create_session("jwt") == "s-1"
+    assert layer.breaker(SESSIONS).state == CLOSED
+
+
+def test_client_errors_do_not_trip_the_breaker(http_mock, layer):
+    http_mock.add(responses.POST, f"{BASE_URL}/sessions", status=400, body="bad payload")
+
+    for _ in range(6):
+        create_session("jwt")
+
+    assert layer.breaker(SESSIONS).state == CLOSED
+
+
+def test_mostly_slow_calls_trip_the_breaker(clock):
+    breaker = CircuitBreaker(
+        "GET /jwt", window=5, min_calls=5, slow_seconds=2, slow_rate=0.8, clock=clock
+    )
+    for seconds in (3, 3, 3, 0.1, 3):
+        breaker.record(False, seconds)
+
+    assert breaker.state == OPEN
+    assert breaker.retry_after() > 0
+
+
+def test_limiter_grows_additively_and_halves_on_failure(clock):
+    limiter = AdaptiveLimiter(initial=4, minimum=1, maximum=6, slow_seconds=5, clock=clock)
+
+    for _ in range(5):  # about one step per round of `limit` healthy calls
+        limiter.sample(False, 0.1)
+    assert limiter.limit == 5
+
+    limiter.sample(True, 0.1)
+    assert limiter.limit == 2
+    limiter.sample(True, 0.1)  # same burst: no second cut within the interval
+    assert limiter.limit == 2
+    clock.now += 1
+    limiter.sample(False, 9)  # slow counts as overload
+    assert limiter.limit == 1
+
+    assert limiter.acquire() is True
+    assert limiter.acquire() is False
+    limiter.release()
+    assert limiter.in_flight == 0
+
+
+def test_calls_over_the_limit_are_refused_and_streams_hold_their_slot(http_mock, layer):
+    layer.limiter = AdaptiveLimiter(initial=1, minimum=1, maximum=1)
+    http_mock.add(
+        responses.POST, f"{BASE_URL}/sessions/s-1/ask-ai",
+        body='data: {"data": "ok"}\n\n', headers={"Content-Type": "text/event-stream"},
+    )
+
+    stream = client.post(f"{BASE_URL}/sessions/s-1/ask-ai", json={}, stream=True)
+    assert layer.limiter.in_flight == 1
+
+    refused = client.post(f"{BASE_URL}/sessions", json={})
+    assert refused.status_code == 503
+    assert refused.json()["reason"] == "overloaded"
+    assert refused.headers["Retry-After"] == "1"
+
+    stream.close()
+    assert layer.limiter.in_flight == 0
+
+
+def test_retry_budget_allows_a_ratio_of_requests_plus_a_floor(clock):
+    budget = RetryBudget(ratio=0.5, min_per_second=0, window_seconds=10, clock=clock)
+    for _ in range(4):
+        budget.record_request()
+
+    assert [budget.try_spend() for _ in range(3)] == [True, True, False]
+    clock.now += 11
+    assert budget.try_spend() is False
+
+
+def test_exhausted_retry_budget_stops_content_type_fallbacks(monkeypatch):
+    configure_resilience(Resilience(retry_budget=RetryBudget(ratio=0, min_per_second=0)))
+    calls = []
+
+    def fake(jwt_token, session_id, ai_command_text, content, content_type="MARKDOWN", cancel_event=None):
+        calls.append(content_type)
+        return {"error": True, "status_code": 500, "message": "boom"}
+
+    monkeypatch.setattr("app.api.ask_heidi.ask_ai_stream", fake)
+
+    result = ask_ai_with_fallbacks("jwt", "s-1", "Summarise", "note")
+    raced = ask_ai_with_fallbacks("jwt", "s-1", "Summarise", "note", race=True)
+
+    assert calls == ["MARKDOWN", "MARKDOWN"]
+    assert result["error"] and raced["error"]
+
+
+def test_open_circuit_surfaces_as_503_from_the_flow(monkeypatch, http_mock, layer):
+    monkeypatch.setattr(demo_flows, "fetch_jwt_token", lambda: ("jwt", None))
+    breaker = layer.breaker(ASK_AI)
+    for _ in range(4):
+        breaker.record(True, 0.1)
+
+    payload, status = demo_flows.ask_question_flow("Can I shower?", "s-1")
+
+    assert status == 503
+    assert payload["details"]["status_code"] == 503
+    assert len(payload["details"]["attempts"]) == 1
+    assert not http_mock.calls
+
+
+def test_async_client_refuses_with_the_same_503(layer):
+    breaker = layer.breaker(ASK_AI)
+    for _ in range(4):
+        breaker.record(True, 0.1)
+    layer.breaker(SESSIONS)._trip("test")
+
+    async def scenario():
+        result = await aio_ask_heidi.ask_ai_stream("jwt", "s-1", "Advise", "Notes")
+        created = await aio_session.create_session("jwt")
+        return result, created
+
+    result, created = asyncio.run(scenario())
+
+    assert result["status_code"] == 503
+    assert created["status_code"] == 503
+    assert layer.limiter.in_flight == 0
+
+
+def test_refusals_reach_transcription_and_consult_clients_as_503(monkeypatch, clock):
+    def open_breaker(name):
+        breaker = CircuitBreaker(name, window=4, min_calls=4, error_rate=0.5, open_seconds=10, clock=clock)
+        breaker._trip("test")
+        return breaker
+
+    configure_resilience(Resilience(breaker_factory=open_breaker, queue_seconds=0))
+    monkeypatch.setattr("app.routes.consult.get_cached_jwt_token", lambda: "jwt")
+    audio = FileStorage(io.BytesIO(b"ID3audio"), filename="visit.mp3")
+
+    assert upload_audio_service("jwt", "s-1", "rec-1", audio)[1] == 503
+    assert finish_transcription_service("jwt", "s-1", "rec-1")[1] == 503
+
+    from app import create_app
+
+    web = create_app().test_client()
+    assert web.get("/consult/templates").status_code == 503
+    assert web.get("/consult/templates/SOAP").status_code == 503
+    for stream in (False, True):
+        body = {"session_id": "s-1", "template_id": "t-1", "stream": stream}
+        assert web.post("/consult/generate", json=body).status_code == 503
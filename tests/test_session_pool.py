@@ -0,0 +1,85 @@
+import itertools
+import threading
+
+from app.services import common
+from app.services.session_pool import SessionPool, get_session_pool
+
+
+def _counter_creator():
+    counter = itertools.count(1)
+    return lambda jwt_token: f"session-{next(counter)}"
+
+
+def _wait_until(predicate, timeout=2.0):
+    done = threading.Event()
+    for _ in range(int(timeout / 0.01)):
+        if predicate():
+            return True
+        done.wait(0.01)
+    return predicate()
+
+
+def test_pool_prewarms_and_refills_after_acquire():
+    pool = SessionPool(size=2, creator=_counter_creator(), token_provider=lambda: "jwt")
+    pool.start()
+    try:
+        assert _wait_until(lambda: pool.stats()["ready"] == 2)
+        first = pool.acquire()
+        assert first == "session-1"
+        assert _wait_until(lambda: pool.stats()["created"] == 3)
+        assert pool.acquire() == "session-2"
+    finally:
+        pool.shutdown()
+
+
+def test_pool_tracks_usage_and_age():
+    now = [1000.0]
+    pool = SessionPool(
+        size=1, max_uses=2, max_age=60, creator=_counter_creator(),
+        token_provider=lambda: "jwt", clock=lambda: now[0],
+    )
+    assert pool._create_one()
+
+    assert pool.acquire() == "session-1"
+    assert pool.stats()["sessions"][0]["uses"] == 1
+    assert pool.acquire() == "session-1"
+    assert pool.stats()["ready"] == 0
+
+    assert pool._create_one()
+    now[0] += 61
+    assert pool.acquire() is None
+    assert pool.stats()["expired"] == 1
+
+
+def test_pool_retires_sessions_heidi_reports_missing(monkeypatch):
+    pool = SessionPool(size=1, max_uses=5, creator=_counter_creator(), token_provider=lambda: "jwt")
+    assert pool._create_one()
+    monkeypatch.setattr(common, "get_session_pool", lambda: pool)
+
+    common.report_session_error("session-1", {"error": True, "status_code": 500})
+    assert pool.stats()["ready"] == 1
+
+    common.report_session_error("session-1", {"error": True, "status_code": 404})
+    assert pool.acquire() is None
+    assert pool.stats()["retired"] == 1
+
+
+def test_pool_does_not_create_without_token():
+    pool = SessionPool(size=1, creator=_counter_creator(), token_provider=lambda: "Error: 401 - nope")
+
+    assert pool._create_one() is False
+    assert pool.stats()["create_failures"] == 1
+
+
+def test_ensure_session_prefers_pooled_session(monkeypatch):
+    pool = SessionPool(size=1, creator=_counter_creator(), token_provider=lambda: "jwt")
+    assert pool._create_one()
+    monkeypatch.setattr(common, "get_session_pool", lambda: pool)
+    monkeypatch.setattr(common, "create_session", lambda jwt: "fresh-session")
+
+    assert common.ensure_session("jwt", None) == ("session-1", None)
+    assert common.ensure_session("jwt", None) == ("fresh-session", None)
+
+
+def test_pool_disabled_by_env():
+    assert get_session_pool() is None
@@ -0,0 +1,251 @@
+import asyncio
+import threading
+import time
+
+import pytest
+
+from app import metrics
+from app.api import ask_heidi
+from app.api.aio import ask_heidi as aio_ask_heidi
+from app.api.single_flight import StreamFlights
+
+
+@pytest.fixture(autouse=True)
+def fresh_metrics():
+    metrics.reset()
+    yield
+    metrics.reset()
+
+
+class _Upstream:
+    """Chunk iterator that records how far it was read and whether it was closed."""
+
+    def __init__(self, chunks):
+        self._chunks = iter(chunks)
+        self.closed = False
+
+    def __iter__(self):
+        return self
+
+    def __next__(self):
+        return next(self._chunks)
+
+    def close(self):
+        self.closed = True
+
+
+def test_concurrent_identical_calls_share_one_upstream_request(monkeypatch):
+    entered, release = threading.Event(), threading.Event()
+    calls = []
+
+    def ask_once(jwt_token, session_id, ai_command_text, content, content_type, cancel_event):
+        calls.append(content_type)
+        entered.set()
+        release.wait(timeout=5)
+        return {"success": True, "response": "Rest and fluids", "format": "sse"}
+
+    monkeypatch.setattr(ask_heidi, "_ask_ai_once", ask_once)
+    results = []
+
+    def ask():
+        results.append(ask_heidi.ask_ai_stream("jwt", "s-1", "Care plan", "Document"))
+
+    threads = [threading.Thread(target=ask) for _ in range(4)]
+    threads[0].start()
+    assert entered.wait(timeout=5)
+    for thread in threads[1:]:
+        thread.start()
+    time.sleep(0.05)
+    release.set()
+    for thread in threads:
+        thread.join(timeout=5)
+
+    assert calls == ["MARKDOWN"]
+    assert [result["response"] for result in results] == ["Rest and fluids"] * 4
+    assert metrics.ASK_AI_COALESCED.value(("call",)) == 3
+
+    # Finished flights are forgotten: the next call goes upstream again.
+    ask_heidi.ask_ai_stream("jwt", "s-1", "Care plan", "Document")
+    assert len(calls) == 2
+
+
+def test_calls_differing_in_content_type_or_session_are_not_shared(monkeypatch):
+    calls = []
+    monkeypatch.setattr(
+        ask_heidi, "_ask_ai_once",
+        lambda *args: calls.append(args[:5]) or {"success": True, "response": "ok"},
+    )
+
+    ask_heidi.ask_ai_stream("jwt", "s-1", "Care plan", "Document", "MARKDOWN")
+    ask_heidi.ask_ai_stream("jwt", "s-1", "Care plan", "Document", "TEXT")
+    ask_heidi.ask_ai_stream("jwt", "s-2", "Care plan", "Document", "TEXT")
+
+    assert len(calls) == 3
+
+
+def test_late_stream_joiners_replay_then_follow_live():
+    flights = StreamFlights()
+    upstream = _Upstream(["Take ", "amoxicillin ", "with food"])
+    opened = []
+
+    def opener():
+        opened.append(1)
+        return upstream, None
+
+    first, error, shared = flights.open("key", opener)
+    assert (error, shared) == (None, False)
+    assert next(first) == "Take "
+    assert next(first) == "amoxicillin "
+
+    late, error, shared = flights.open("key", opener)
+    assert (error, shared) == (None, True)
+    assert next(late) == "Take "
+    assert next(late) == "amoxicillin "
+    # The late joiner is now ahead of no one; it pulls the next chunk for both.
+    assert next(late) == "with food"
+    assert next(first) == "with food"
+    assert list(late) == [] and list(first) == []
+
+    assert opened == [1]
+    assert flights.in_flight() == 0
+
+
+def test_upstream_closes_only_when_the_last_subscriber_leaves():
+    flights = StreamFlights()
+    upstream = _Upstream(["a", "b", "c"])
+
+    first, _, _ = flights.open("key", lambda: (upstream, None))
+    second, _, _ = flights.open("key", lambda: pytest.fail("opened twice"))
+    assert next(first) == "a"
+
+    first.close()
+    assert upstream.closed is False
+    assert list(second) == ["a", "b", "c"]
+
+    third, _, shared = flights.open("key", lambda: (_Upstream(["fresh"]), None))
+    assert shared is False
+    third.close()
+
+    abandoned = _Upstream(["x", "y"])
+    only, _, _ = flights.open("other", lambda: (abandoned, None))
+    next(only)
+    only.close()
+    assert abandoned.closed is True
+    assert flights.in_flight() == 0
+
+
+def test_open_errors_reach_every_waiter_and_are_not_kept():
+    flights = StreamFlights()
+    release = threading.Event()
+    results = []
+
+    def failing_opener():
+        release.wait(timeout=5)
+        return None, {"error": True, "status_code": 404, "message": "Session not found"}
+
+    def open_stream():
+        results.append(flights.open("key", failing_opener))
+
+    threads = [threading.Thread(target=open_stream) for _ in range(3)]
+    for thread in threads:
+        thread.start()
+    time.sleep(0.05)
+    release.set()
+    for thread in threads:
+        thread.join(timeout=5)
+
+    assert [(chunks, error["status_code"]) for chunks, error, _ in results] == [(None, 404)] * 3
+    assert flights.in_flight() == 0
+
+
+def test_open_ai_stream_shares_identical_streams(monkeypatch):
+    opened = []
+
+    def open_once(jwt_token, session_id, ai_command_text, content, content_type):
+        opened.append(content_type)
+        return _Upstream(["Keep ", "the wound dry"]), None
+
+    monkeypatch.setattr(ask_heidi, "_open_ai_stream_once", open_once)
+
+    first, _ = ask_heidi.open_ai_stream("jwt", "s-1", "Care plan", "Document")
+    assert next(first) == "Keep "
+    second, _ = ask_heidi.open_ai_stream("jwt", "s-1", "Care plan", "Document")
+
+    assert list(second) == ["Keep ", "the wound dry"]
+    assert list(first) == ["the wound dry"]
+    assert opened == ["MARKDOWN"]
+    assert metrics.ASK_AI_COALESCED.value(("stream",)) == 1
+
+
+def test_coalescing_can_be_switched_off(monkeypatch):
+    calls = []
+    monkeypatch.setattr(ask_heidi, "COALESCE_REQUESTS", False)
+    monkeypatch.setattr(
+        ask_heidi, "_open_ai_stream_once", lambda *args: calls.append(args) or (_Upstream(["x"]), None)
+    )
+
+    ask_heidi.open_ai_stream("jwt", "s-1", "Care plan", "Document")
+    ask_heidi.open_ai_stream("jwt", "s-1", "Care plan", "Document")
+
+    assert len(calls) == 2
+
+
+def test_async_calls_and_streams_are_shared(monkeypatch):
+    calls, opened = [], []
+
+    async def ask_once(jwt_token, session_id, ai_command_text, content, content_type):
+        calls.append(content_type)
+        await asyncio.sleep(0.01)
+        return {"success": True, "response": "ok"}
+
+    async def chunks():
+        for chunk in ("Rest ", "well"):
+            await asyncio.sleep(0)
+            yield chunk
+
+    async def open_once(jwt_token, session_id, ai_command_text, content, content_type):
+        opened.append(content_type)
+        return chunks(), None
+
+    monkeypatch.setattr(aio_ask_heidi, "_ask_ai_once", ask_once)
+    monkeypatch.setattr(aio_ask_heidi, "_open_ai_stream_once", open_once)
+
+    async def read(stream):
+        return [chunk async for chunk in stream]
+
+    async def scenario():
+        results = await asyncio.gather(
+            *(aio_ask_heidi.ask_ai_stream("jwt", "s-1", "Care plan", "Document") for _ in range(3))
+        )
+        streams = await asyncio.gather(
+            *(aio_ask_heidi.open_ai_stream("jwt", "s-1", "Care plan", "Document") for _ in range(2))
+        )
+        texts = await asyncio.gather(*(read(stream) for stream, _ in streams))
+        return results, texts
+
+    results, texts = asyncio.run(scenario())
+
+    assert calls == ["MARKDOWN"] and opened == ["MARKDOWN"]
+    assert all(result["response"] == "ok" for result in results)
+    assert texts == [["Rest ", "well"], ["Rest ", "well"]]
+
+
+def test_async_call_survives_one_waiter_being_cancelled(monkeypatch):
+    calls = []
+
+    async def ask_once(*args):
+        calls.append(args)
+        await asyncio.sleep(0.02)
+        return {"success": True, "response": "ok"}
+
+    monkeypatch.setattr(aio_ask_heidi, "_ask_ai_once", ask_once)
+
+    async def scenario():
+        impatient = asyncio.ensure_future(aio_ask_heidi.ask_ai_stream("jwt", "s-1", "Q", "C"))
+        patient = asyncio.ensure_future(aio_ask_heidi.ask_ai_stream("jwt", "s-1", "Q", "C"))
+        await asyncio.sleep(0)
+        impatient.cancel()
+        return await patient
+
+    assert asyncio.run(scenario())["response"] == "ok"
+    assert len(calls) == 1
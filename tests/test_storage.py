@@ -0,0 +1,91 @@
+import threading
+
+import pytest
+
+from app import storage
+from app.storage import MemoryStorage, SQLiteStorage
+
+
+@pytest.fixture(params=["memory", "sqlite"])
+def backend(request, tmp_path):
+    if request.param == "memory":
+        return MemoryStorage()
+    return SQLiteStorage(str(tmp_path / "storage.sqlite3"))
+
+
+def test_care_plan_and_session_round_trip(backend):
+    backend.save_care_plan("s-1", {"medications": ["Ibuprofen"]})
+    backend.save_session_data("s-1", {"name": "Alex"})
+
+    care_plan = backend.get_care_plan("s-1")
+    assert care_plan["data"] == {"medications": ["Ibuprofen"]}
+    assert care_plan["session_id"] == "s-1"
+    assert backend.get_session_data("s-1")["patient_data"] == {"name": "Alex"}
+    assert backend.get_care_plan("missing") is None
+    assert backend.get_session_data("missing") is None
+
+
+def test_bulk_notes_are_paginated_in_insert_order(backend):
+    assert backend.save_patient_notes("s-1", [f"note {i}" for i in range(5)]) == 5
+    backend.save_patient_note("s-1", "note 5")
+    backend.save_patient_note("s-2", "other")
+
+    assert [n["text"] for n in backend.get_patient_notes("s-1")] == [f"note {i}" for i in range(6)]
+    assert [n["text"] for n in backend.get_patient_notes("s-1", limit=2, offset=3)] == ["note 3", "note 4"]
+    assert backend.get_patient_notes("missing") == []
+
+
+def test_sessions_are_listed_page_by_page(backend):
+    for index in (4, 0, 6, 2, 5, 1, 3, 2):
+        backend.save_session_data(f"s-{index}", {})
+
+    first = backend.list_sessions(limit=3)
+    second = backend.list_sessions(limit=3, after=first[-1])
+
+    assert first == ["s-0", "s-1", "s-2"]
+    assert second == ["s-3", "s-4", "s-5"]
+    assert backend.list_sessions(limit=3, after="s-35") == ["s-4", "s-5", "s-6"]
+    assert list(backend.iter_sessions(page_size=3)) == [f"s-{i}" for i in range(7)]
+
+
+def test_sqlite_store_is_shared_between_instances(tmp_path):
+    path = str(tmp_path / "shared.sqlite3")
+    SQLiteStorage(path).save_patient_notes("s-1", ["from worker one"])
+
+    other_worker = SQLiteStorage(path)
+
+    assert other_worker.get_patient_notes("s-1")[0]["text"] == "from worker one"
+    assert other_worker._connect().execute("PRAGMA journal_mode").fetchone()[0] == "wal"
+
+
+def test_demo_data_goes_to_the_configured_backend(tmp_path):
+    backend = SQLiteStorage(str(tmp_path / "app.sqlite3"))
+    storage.configure_storage(backend)
+    try:
+        assert storage.init_demo_data() == storage.DEMO_SESSION_ID
+        storage.init_demo_data()
+
+        assert backend.get_care_plan(storage.DEMO_SESSION_ID) is not None
+        assert len(backend.get_patient_notes(storage.DEMO_SESSION_ID)) == 2
+    finally:
+        storage.configure_storage(None)
+
+
+def test_concurrent_workers_seed_demo_data_once(tmp_path):
+    path = str(tmp_path / "workers.sqlite3")
+    workers = [SQLiteStorage(path) for _ in range(4)]
+    start = threading.Barrier(len(workers))
+    seeded = []
+
+    def seed(backend):
+        start.wait()
+        seeded.append(backend.seed_session("demo", {"medications": []}, ["Day 1", "Day 2"]))
+
+    threads = [threading.Thread(target=seed, args=(backend,)) for backend in workers]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join(10)
+
+    assert sorted(seeded) == [False, False, False, True]
+    assert len(workers[0].get_patient_notes("demo")) == 2
@@ -0,0 +1,59 @@
+import json
+
+from app import create_app
+from app.services.streaming import format_sse, relay_chunks
+
+
+def _parse_events(body):
+    events = []
+    for block in body.strip().split("\n\n"):
+        event = {"event": None}
+        for line in block.split("\n"):
+            field, _, value = line.partition(": ")
+            event[field] = json.loads(value) if field == "data" else value
+        events.append(event)
+    return events
+
+
+def test_format_sse_with_event_name():
+    assert format_sse({"a": 1}, event="meta") == 'event: meta\ndata: {"a": 1}\n\n'
+
+
+def test_relay_chunks_emits_meta_data_and_done():
+    events = _parse_events("".join(relay_chunks(iter(["Hel", "lo"]), {"session_id": "s-1"})))
+
+    assert events[0] == {"event": "meta", "data": {"session_id": "s-1"}}
+    assert [e["data"]["data"] for e in events[1:3]] == ["Hel", "lo"]
+    assert events[-1] == {"event": "done", "data": {"chunks": 2, "length": 5}}
+
+
+def test_relay_chunks_reports_midstream_failure():
+    def chunks():
+        yield "partial"
+        raise RuntimeError("connection reset")
+
+    events = _parse_events("".join(relay_chunks(chunks())))
+
+    assert events[0]["data"] == {"data": "partial"}
+    assert events[-1]["event"] == "error"
+
+
+def test_ask_heidi_route_streams_when_requested(monkeypatch):
+    monkeypatch.setattr(
+        "app.routes.ask_heidi.get_cached_jwt_token", lambda: "jwt-token"
+    )
+    monkeypatch.setattr(
+        "app.routes.ask_heidi.open_ai_stream",
+        lambda *args, **kwargs: (iter(["one ", "two"]), None),
+    )
+    client = create_app().test_client()
+
+    response = client.post(
+        "/ask_heidi?stream=1",
+        json={"session_id": "s-1", "ai_command_text": "Summarise", "content": "Notes"},
+    )
+
+    assert response.status_code == 200
+    assert response.mimetype == "text/event-stream"
+    events = _parse_events(response.get_data(as_text=True))
+    assert [e["data"].get("data") for e in events if e["event"] is None] == ["one ", "two"]
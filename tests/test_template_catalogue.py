@@ -0,0 +1,104 @@
+import responses
+
+from app import create_app
+from app.api import BASE_URL
+from app.cache import MemoryCache, SQLiteCache
+from app.services import template_catalogue
+from app.services.template_catalogue import TemplateCatalogue
+
+CATALOGUE = {"templates": [{"id": "tpl-1", "name": "SOAP Note"}, {"id": "tpl-2", "name": "Discharge"}]}
+
+
+class _Clock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+class _Fetcher:
+    def __init__(self, *results):
+        self.results = list(results)
+        self.calls = []
+
+    def __call__(self, jwt_token, etag=None, last_modified=None):
+        self.calls.append(etag)
+        return self.results.pop(0)
+
+
+def test_catalogue_is_served_from_cache_until_ttl():
+    clock = _Clock()
+    fetcher = _Fetcher({"status": 200, "catalogue": CATALOGUE, "etag": '"v1"'}, {"status": 304})
+    catalogue = TemplateCatalogue(MemoryCache(), ttl=60, fetcher=fetcher, clock=clock)
+
+    assert catalogue.get("jwt") == (CATALOGUE, None)
+    assert catalogue.get("jwt") == (CATALOGUE, None)
+    clock.now += 61
+    assert catalogue.get("jwt") == (CATALOGUE, None)
+
+    assert fetcher.calls == [None, '"v1"']
+    stats = catalogue.stats()
+    assert (stats["fetched"], stats["revalidated"], stats["fresh_hits"]) == (1, 1, 1)
+
+
+def test_stale_catalogue_is_served_when_refresh_fails():
+    clock = _Clock()
+    fetcher = _Fetcher(
+        {"status": 200, "catalogue": CATALOGUE},
+        {"error": True, "status_code": 503, "message": "down"},
+    )
+    catalogue = TemplateCatalogue(MemoryCache(), ttl=60, fetcher=fetcher, clock=clock)
+    catalogue.get("jwt")
+    clock.now += 61
+
+    assert catalogue.get("jwt") == (CATALOGUE, None)
+    assert catalogue.stats()["stale_served"] == 1
+
+
+def test_find_looks_up_by_id_or_name_without_refetching():
+    fetcher = _Fetcher({"status": 200, "catalogue": CATALOGUE})
+    catalogue = TemplateCatalogue(MemoryCache(), ttl=60, fetcher=fetcher)
+
+    assert catalogue.find("jwt", "tpl-2")[0]["name"] == "Discharge"
+    assert catalogue.find("jwt", "soap note")[0]["id"] == "tpl-1"
+    assert catalogue.find("jwt", "unknown") == (None, None)
+    assert len(fetcher.calls) == 1
+
+
+def test_workers_share_the_catalogue_through_sqlite(tmp_path):
+    path = str(tmp_path / "templates.sqlite3")
+    first = TemplateCatalogue(
+        SQLiteCache(path, namespace="consult-templates"),
+        fetcher=_Fetcher({"status": 200, "catalogue": CATALOGUE}),
+    )
+    first.get("jwt")
+    second = TemplateCatalogue(SQLiteCache(path, namespace="consult-templates"), fetcher=_Fetcher())
+
+    assert second.get("jwt") == (CATALOGUE, None)
+
+
+def test_resolve_template_id_defaults_to_first_template(http_mock):
+    http_mock.add(
+        responses.GET,
+        f"{BASE_URL}/templates/consult-note-templates",
+        json=CATALOGUE,
+        headers={"ETag": '"v1"'},
+    )
+
+    assert template_catalogue.resolve_template_id("jwt") == ("tpl-1", None)
+    assert template_catalogue.resolve_template_id("jwt", "Discharge") == ("tpl-2", None)
+    assert template_catalogue.resolve_template_id("jwt", "missing")[1][1] == 404
+    assert len(http_mock.calls) == 1
+
+
+def test_template_lookup_route(monkeypatch):
+    monkeypatch.setattr("app.routes.consult.get_cached_jwt_token", lambda: "jwt")
+    template_catalogue.configure_template_catalogue(
+        TemplateCatalogue(MemoryCache(), fetcher=_Fetcher({"status": 200, "catalogue": CATALOGUE}))
+    )
+    client = create_app().test_client()
+
+    assert client.get("/consult/templates").get_json() == CATALOGUE
+    assert client.get("/consult/templates/SOAP%20Note").get_json()["id"] == "tpl-1"
+    assert client.get("/consult/templates/nope").status_code == 404
@@ -0,0 +1,151 @@
+import base64
+import json
+import threading
+import time
+
+import responses
+
+from app.api import BASE_URL
+from app.services.common import fetch_jwt_token
+from app.services.token_manager import TokenManager, decode_jwt_expiry
+
+
+def _make_jwt(exp):
+    def encode(obj):
+        raw = json.dumps(obj).encode()
+        return base64.urlsafe_b64encode(raw).rstrip(b"=").decode()
+
+    return f"{encode({'alg': 'HS256'})}.{encode({'exp': exp})}.signature"
+
+
+def test_decode_jwt_expiry_reads_exp_claim():
+    assert decode_jwt_expiry(_make_jwt(1_700_000_000)) == 1_700_000_000.0
+    assert decode_jwt_expiry("not-a-jwt") is None
+
+
+def test_token_is_cached_until_refresh_margin():
+    now = [1000.0]
+    calls = []
+
+    def fetcher():
+        calls.append(now[0])
+        return _make_jwt(now[0] + 600)
+
+    manager = TokenManager(fetcher=fetcher, refresh_margin=60, clock=lambda: now[0])
+    try:
+        first = manager.get_token()
+        now[0] += 300
+        assert manager.get_token() == first
+        assert len(calls) == 1
+
+        now[0] += 400  # past expiry
+        assert manager.get_token() != first
+        assert len(calls) == 2
+    finally:
+        manager.shutdown()
+
+
+def test_errors_are_not_cached():
+    results = iter(["Error: 500 - boom", _make_jwt(time.time() + 600)])
+    manager = TokenManager(fetcher=lambda: next(results))
+    try:
+        assert manager.get_token().startswith("Error")
+        assert not manager.get_token().startswith("Error")
+    finally:
+        manager.shutdown()
+
+
+def test_concurrent_callers_share_one_refresh():
+    calls = []
+    release = threading.Event()
+
+    def fetcher():
+        calls.append(1)
+        release.wait(1)
+        return _make_jwt(time.time() + 600)
+
+    manager = TokenManager(fetcher=fetcher)
+    try:
+        threads = [threading.Thread(target=manager.get_token) for _ in range(8)]
+        for thread in threads:
+            thread.start()
+        release.set()
+        for thread in threads:
+            thread.join()
+        assert len(calls) == 1
+    finally:
+        manager.shutdown()
+
+
+def test_fetch_jwt_token_uses_cache(http_mock):
+    http_mock.add(
+        responses.GET,
+        f"{BASE_URL}/jwt",
+        json={"token": _make_jwt(time.time() + 600)},
+        status=200,
+    )
+
+    first, error = fetch_jwt_token()
+    second, _ = fetch_jwt_token()
+
+    assert error is None
+    assert first == second
+    assert len(http_mock.calls) == 1
+
+
+def _recording_delays(monkeypatch, manager):
+    delays = []
+    monkeypatch.setattr(manager, "_schedule_refresh", delays.append)
+    return delays
+
+
+def test_short_lived_or_expired_tokens_do_not_refresh_in_a_tight_loop(monkeypatch):
+    now = [1000.0]
+    lifetimes = iter([30, -10])
+    calls = []
+
+    def fetcher():
+        calls.append(now[0])
+        return _make_jwt(now[0] + next(lifetimes))
+
+    manager = TokenManager(fetcher=fetcher, refresh_margin=60, clock=lambda: now[0])
+    delays = _recording_delays(monkeypatch, manager)
+
+    token = manager.get_token()
+    for _ in range(5):  # inside the margin from the start, but the refresh is not due yet
+        assert manager.get_token() == token
+    assert len(calls) == 1
+
+    manager._refresh()  # a token that is already past its exp
+    assert delays == [5.0, 1.0]
+
+
+def test_failed_background_refresh_retries_with_backoff(monkeypatch):
+    now = [1000.0]
+    results = iter([_make_jwt(1600), "Error: 503 - down", "Error: 503 - down", _make_jwt(1700)])
+    manager = TokenManager(fetcher=lambda: next(results), refresh_margin=60, clock=lambda: now[0])
+    delays = _recording_delays(monkeypatch, manager)
+
+    cached = manager.get_token()
+    now[0] = 1550.0
+    manager._refresh_in_background()
+    manager._refresh_in_background()
+    manager._refresh_in_background()
+
+    assert delays == [540.0, 1.0, 2.0, 90.0]
+    assert manager.get_token() != cached
+
+
+def test_a_401_from_heidi_drops_the_rejected_token(http_mock):
+    from app.api.session import create_session
+
+    stale, fresh = _make_jwt(time.time() + 600), _make_jwt(time.time() + 700)
+    http_mock.add(responses.GET, f"{BASE_URL}/jwt", json={"token": stale})
+    http_mock.add(responses.GET, f"{BASE_URL}/jwt", json={"token": fresh})
+    http_mock.add(responses.POST, f"{BASE_URL}/sessions", status=401, body="jwt expired")
+
+    token, _ = fetch_jwt_token()
+    assert create_session(token)["status_code"] == 401
+
+    assert fetch_jwt_token()[0] == fresh
+    assert len(http_mock.calls) == 3
@@ -1,12 +1,58 @@
+import io
+
 import responses
+from werkzeug.datastructures import FileStorage
+from werkzeug.formparser import parse_form_data
 
+from app import create_app
 from app.api import BASE_URL
 from app.api.transcript import (
     finish_transcription,
     get_transcript,
     start_transcription,
     upload_audio,
+    upload_audio_fileobj,
 )
+from app.services.transcription import upload_audio_service
+
+UPLOAD_URL = f"{BASE_URL}/sessions/session-123/restful-segment-transcription/rec-123:transcribe"
+
+
+class _NonSeekable(io.RawIOBase):
+    """A request-body-like stream that can only be read forwards."""
+
+    def __init__(self, data):
+        self._buffer = io.BytesIO(data)
+
+    def readable(self):
+        return True
+
+    def readinto(self, buffer):
+        return self._buffer.readinto(buffer)
+
+
+def _capture_upload(http_mock):
+    """Register the transcribe endpoint and return the parsed multipart parts it receives."""
+    received = {}
+
+    def callback(request):
+        body = request.body.read() if hasattr(request.body, "read") else request.body
+        received["content_length"] = request.headers.get("Content-Length")
+        environ = {
+            "REQUEST_METHOD": "POST",
+            "CONTENT_TYPE": request.headers["Content-Type"],
+            "CONTENT_LENGTH": str(len(body)),
+            "wsgi.input": io.BytesIO(body),
+        }
+        _, form, files = parse_form_data(environ)
+        received["body_length"] = len(body)
+        received["form"] = dict(form)
+        received["file"] = files["file"]
+        received["audio"] = files["file"].read()
+        return 200, {}, '{"is_success": true}'
+
+    http_mock.add_callback(responses.POST, UPLOAD_URL, callback=callback)
+    return received
 
 
 def test_start_transcription_returns_recording_id(http_mock):
@@ -38,6 +84,94 @@ def test_upload_audio_posts_file(http_mock, tmp_path):
     assert result["is_success"] is True
 
 
+def test_upload_audio_fileobj_streams_multipart_body(http_mock):
+    received = _capture_upload(http_mock)
+
+    result = upload_audio_fileobj(
+        "jwt-token", "session-123", "rec-123", io.BytesIO(b"RIFF-audio"), 3, "clip.wav",
+        content_type="audio/wav",
+    )
+
+    assert result["is_success"] is True
+    assert received["form"] == {"index": "3"}
+    assert received["file"].filename == "clip.wav"
+    assert received["file"].mimetype == "audio/wav"
+    assert received["audio"] == b"RIFF-audio"
+    assert int(received["content_length"]) == received["body_length"]
+
+
+def test_upload_audio_fileobj_spools_streams_of_unknown_length(http_mock):
+    received = _capture_upload(http_mock)
+    audio = bytes(range(256)) * 64
+
+    result = upload_audio_fileobj(
+        "jwt-token", "session-123", "rec-123", _NonSeekable(audio), filename="live.webm"
+    )
+
+    assert result["is_success"] is True
+    assert received["audio"] == audio
+    assert int(received["content_length"]) == received["body_length"]
+
+
+def test_upload_audio_service_sends_file_storage_without_temp_file(http_mock, monkeypatch):
+    received = _capture_upload(http_mock)
+    monkeypatch.setattr(
+        "tempfile.NamedTemporaryFile",
+        lambda *args, **kwargs: (_ for _ in ()).throw(AssertionError("temp file used")),
+    )
+    storage = FileStorage(io.BytesIO(b"mp3-bytes"), filename="visit.mp3", content_type="audio/mpeg")
+
+    payload, status = upload_audio_service("jwt-token", "session-123", "rec-123", storage, index="1")
+
+    assert status == 200
+    assert payload["success"] is True
+    assert received["form"] == {"index": "1"}
+    assert received["audio"] == b"mp3-bytes"
+
+
+def test_upload_route_relays_raw_audio_body(http_mock, monkeypatch):
+    received = _capture_upload(http_mock)
+    monkeypatch.setattr(
+        "app.routes.transcript.fetch_jwt_token", lambda: ("jwt-token", None)
+    )
+    client = create_app().test_client()
+
+    response = client.post(
+        "/transcript/upload?session_id=session-123&recording_id=rec-123&index=2&filename=take.ogg",
+        data=b"ogg-bytes",
+        content_type="audio/ogg",
+    )
+
+    assert response.status_code == 200
+    assert response.get_json()["success"] is True
+    assert received["form"] == {"index": "2"}
+    assert received["file"].filename == "take.ogg"
+    assert received["audio"] == b"ogg-bytes"
+
+
+def test_upload_route_escapes_hostile_filenames(http_mock, monkeypatch):
+    received = _capture_upload(http_mock)
+    monkeypatch.setattr(
+        "app.routes.transcript.fetch_jwt_token", lambda: ("jwt-token", None)
+    )
+    client = create_app().test_client()
+    hostile = 'x.ogg"\r\nContent-Disposition: form-data; name="index"\r\n\r\n99'
+
+    response = client.post(
+        "/transcript/upload",
+        query_string={
+            "session_id": "session-123", "recording_id": "rec-123", "index": "2", "filename": hostile,
+        },
+        data=b"ogg-bytes",
+        content_type="audio/ogg",
+    )
+
+    assert response.status_code == 200
+    assert received["form"] == {"index": "2"}
+    assert "\r" not in received["file"].filename and "\n" not in received["file"].filename
+    assert received["audio"] == b"ogg-bytes"
+
+
 def test_finish_transcription_returns_payload(http_mock):
     http_mock.add(
         responses.POST,
@@ -0,0 +1,188 @@
+import asyncio
+
+import pytest
+import requests
+import responses
+
+from app.api import BASE_URL
+from app.services import transcript_waiter
+from app.services.transcript_waiter import (
+    PARTIAL,
+    PENDING,
+    READY,
+    TranscriptPoller,
+    backoff_delays,
+    classify_transcript,
+    wait_for_transcript,
+    wait_for_transcript_async,
+)
+
+
+class _FakeTime:
+    def __init__(self):
+        self.now = 0.0
+        self.sleeps = []
+
+    def clock(self):
+        return self.now
+
+    def sleep(self, seconds):
+        self.sleeps.append(seconds)
+        self.now += seconds
+
+
+def _sequence(*results):
+    results = list(results)
+
+    def fetch(jwt_token, session_id):
+        result = results.pop(0) if len(results) > 1 else results[0]
+        if isinstance(result, Exception):
+            raise result
+        return result
+
+    return fetch
+
+
+@pytest.mark.parametrize(
+    "result, state",
+    [
+        ({"transcript": "Pain is better"}, READY),
+        ({"transcript": ""}, PENDING),
+        ({}, PENDING),
+        ({"status": "PROCESSING"}, PENDING),
+        ({"transcript": "Pain is", "status": "processing"}, PARTIAL),
+        ({"transcript": "Pain is", "is_final": False}, PARTIAL),
+        ({"error": True, "status_code": 404, "message": "not found"}, PENDING),
+        ({"error": True, "status_code": 401, "message": "expired"}, "failed"),
+    ],
+)
+def test_classify_transcript(result, state):
+    assert classify_transcript(result) == state
+
+
+def test_backoff_delays_grow_with_jitter_and_cap():
+    delays = backoff_delays(initial=1, maximum=4, rng=lambda: 1.0)
+    assert [next(delays) for _ in range(5)] == [1, 2, 4, 4, 4]
+
+    low = backoff_delays(initial=1, maximum=4, rng=lambda: 0.0)
+    assert [next(low) for _ in range(3)] == [0.5, 1, 2]
+
+
+def test_wait_for_transcript_polls_until_ready():
+    fake = _FakeTime()
+    fetch = _sequence({}, ValueError("not json"), {"transcript": "Pain", "is_final": False}, {"transcript": "Pain is better"})
+
+    payload, status = wait_for_transcript(
+        "jwt", "s-1", deadline=30, fetch=fetch, sleep=fake.sleep, clock=fake.clock,
+        delays=iter([1, 2, 4]),
+    )
+
+    assert status == 200
+    assert payload["transcript"] == {"transcript": "Pain is better"}
+    assert (payload["ready"], payload["partial"], payload["attempts"]) == (True, False, 4)
+    assert fake.sleeps == [1, 2, 4]
+
+
+def test_wait_for_transcript_returns_partial_at_deadline():
+    fake = _FakeTime()
+    fetch = _sequence({"transcript": "Pain is", "status": "processing"})
+
+    payload, status = wait_for_transcript(
+        "jwt", "s-1", deadline=5, fetch=fetch, sleep=fake.sleep, clock=fake.clock,
+        delays=iter([2, 2, 2, 2]),
+    )
+
+    assert status == 200
+    assert (payload["ready"], payload["partial"]) == (False, True)
+    assert fake.sleeps == [2, 2, 1]
+
+
+def test_wait_for_transcript_stops_on_hard_errors():
+    fake = _FakeTime()
+    fetch = _sequence({"error": True, "status_code": 401, "message": "expired"})
+
+    payload, status = wait_for_transcript("jwt", "s-1", fetch=fetch, sleep=fake.sleep, clock=fake.clock)
+
+    assert status == 401
+    assert payload["attempts"] == 1
+    assert fake.sleeps == []
+
+
+def test_transport_errors_and_refusals_fail_instead_of_polling_to_the_deadline(http_mock):
+    url = f"{BASE_URL}/sessions/s-1/transcript"
+    http_mock.add(responses.GET, url, body=requests.ConnectionError("connection refused"))
+    fake = _FakeTime()
+
+    payload, status = wait_for_transcript("jwt", "s-1", deadline=30, sleep=fake.sleep, clock=fake.clock)
+
+    assert (status, payload["attempts"], fake.sleeps) == (502, 1, [])
+    assert "connection refused" in payload["message"]
+
+    http_mock.replace(responses.GET, url, json={"error": "Heidi API unavailable"}, status=503)
+    payload, status = wait_for_transcript("jwt", "s-1", deadline=30, sleep=fake.sleep, clock=fake.clock)
+
+    assert (status, payload["attempts"], fake.sleeps) == (503, 1, [])
+
+
+def test_not_ready_bodies_keep_polling(http_mock):
+    url = f"{BASE_URL}/sessions/s-1/transcript"
+    http_mock.add(responses.GET, url, body="not ready", status=200)
+    http_mock.add(responses.GET, url, body="no transcript yet", status=404)
+    http_mock.add(responses.GET, url, json={"transcript": "Pain is better"}, status=200)
+    fake = _FakeTime()
+
+    payload, status = wait_for_transcript(
+        "jwt", "s-1", deadline=30, sleep=fake.sleep, clock=fake.clock, delays=iter([1, 1])
+    )
+
+    assert status == 200
+    assert (payload["ready"], payload["attempts"]) == (True, 3)
+
+
+def test_async_wait_for_transcript_fails_on_transport_errors():
+    async def fetch(jwt_token, session_id):
+        raise asyncio.TimeoutError()
+
+    payload, status = asyncio.run(
+        wait_for_transcript_async("jwt", "s-1", fetch, deadline=5, delays=iter([0, 0]))
+    )
+
+    assert (status, payload["attempts"]) == (502, 1)
+
+
+def test_async_wait_for_transcript():
+    results = [{}, {"transcript": "Rest"}]
+
+    async def fetch(jwt_token, session_id):
+        return results.pop(0)
+
+    payload, status = asyncio.run(
+        wait_for_transcript_async("jwt", "s-1", fetch, deadline=5, delays=iter([0, 0]))
+    )
+
+    assert status == 200
+    assert payload["ready"] is True
+    assert payload["attempts"] == 2
+
+
+def test_poller_multiplexes_sessions_on_one_thread(monkeypatch):
+    monkeypatch.setattr(
+        transcript_waiter, "backoff_delays", lambda: iter([0.01] * 100)
+    )
+    calls = {"s-1": 0, "s-2": 0}
+
+    def fetch(jwt_token, session_id):
+        calls[session_id] += 1
+        ready_after = 2 if session_id == "s-1" else 3
+        return {"transcript": session_id} if calls[session_id] >= ready_after else {}
+
+    poller = TranscriptPoller(fetch=fetch)
+    try:
+        first = poller.watch("jwt", "s-1", deadline=5)
+        second = poller.watch("jwt", "s-2", deadline=5)
+
+        assert first.result(timeout=5)[0]["transcript"] == {"transcript": "s-1"}
+        assert second.result(timeout=5)[0]["attempts"] == 3
+        assert poller.pending() == 0
+    finally:
+        poller.shutdown()